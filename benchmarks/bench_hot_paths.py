@@ -0,0 +1,296 @@
+"""
+Wall time, peak memory and throughput of the backtest hot paths at several data sizes.
+
+Runs on Linux without a MetaTrader 5 terminal: when the MetaTrader5 package is not
+installed, the local simulator (src/mt5_simulator.py) is registered in its place so
+src.data_handler can be imported. Data is a synthetic 1-minute random walk written
+to a temporary CSV per size.
+
+Each case is timed --repeat times (best run reported) and run once more under
+tracemalloc for its peak memory. Results are written as JSON, one file per run,
+so releases can be compared with --compare.
+
+Usage:
+    python benchmarks/bench_hot_paths.py [--sizes 10000,100000,500000] [--repeat 3]
+                                         [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+if importlib.util.find_spec("MetaTrader5") is None:
+    from src import mt5_simulator
+    mt5_simulator.install()
+
+from src import config
+from src.data_handler import DataHandler
+from src.strategy import CRTStrategy
+from src.risk_manager import RiskManager
+from src.metrics import compute_metrics
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+ORDER_BLOCK_CALLS = 2000  # get_order_block lookups per size
+
+
+def write_ohlcv(path, rows, seed=7):
+    """Synthetic 1-minute gold-like OHLCV random walk in the CSV layout load_data() reads"""
+    rng = np.random.default_rng(seed)
+    close = 2000 + np.cumsum(rng.normal(0, 0.35, rows))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    spread = np.abs(rng.normal(0, 0.25, rows))
+    df = pd.DataFrame({
+        'timestamp': pd.date_range("2020-01-01", periods=rows, freq="min").strftime(config.DATE_FORMAT),
+        'open': open_.round(2),
+        'high': (np.maximum(open_, close) + spread).round(2),
+        'low': (np.minimum(open_, close) - spread).round(2),
+        'close': close.round(2),
+        'volume': rng.integers(1, 500, rows),
+    })
+    df.to_csv(path, index=False)
+
+
+def prepared_handler(path):
+    handler = DataHandler(csv_path=path)
+    handler.load_data()
+    handler.prepare_data_for_strategy()
+    return handler
+
+
+# --- Cases: setup(path) -> state, run(state) -> number of items processed ---
+def setup_load(path):
+    return DataHandler(csv_path=path)
+
+
+def run_load(handler):
+    return len(handler.load_data())
+
+
+def setup_resample(path):
+    handler = DataHandler(csv_path=path)
+    handler.load_data()
+    return handler
+
+
+def run_resample(handler):
+    handler.resample_data()
+    return len(handler.raw_data)
+
+
+def setup_prepare(path):
+    handler = setup_resample(path)
+    handler.resample_data()
+    return handler
+
+
+def run_prepare(handler):
+    handler.prepare_data_for_strategy()
+    return len(handler.data_5m)
+
+
+def setup_detect(path):
+    handler = prepared_handler(path)
+    # Hourly candle and its 5min candles, grouped once outside the timed part
+    groups = dict(tuple(handler.data_5m.groupby('hour_ref')))
+    hours = [(candle, groups[ts]) for ts, candle in handler.data_1h.iterrows() if ts in groups]
+    return CRTStrategy(), hours
+
+
+def run_detect(state):
+    strategy, hours = state
+    bars = 0
+    for hourly_candle, five_min in hours:
+        strategy.detect_signals(hourly_candle, five_min)
+        bars += len(five_min)
+    return bars
+
+
+def setup_order_block(path):
+    handler = prepared_handler(path)
+    index = handler.data_1h.index
+    picks = np.linspace(5, len(index) - 1, min(ORDER_BLOCK_CALLS, max(len(index) - 5, 1))).astype(int)
+    return CRTStrategy(), handler.data_1h, [(index[i], 'LONG' if i % 2 else 'SHORT') for i in picks]
+
+
+def run_order_block(state):
+    strategy, data_1h, lookups = state
+    for timestamp, direction in lookups:
+        strategy.get_order_block(data_1h, timestamp, direction)
+    return len(lookups)
+
+
+def setup_exits(path):
+    handler = setup_prepare(path)
+    handler.prepare_data_for_strategy()
+    data = handler.data_5m
+    candles = list(zip(data.index, data[['open', 'high', 'low', 'close']].to_dict('records')))
+    return RiskManager(), candles
+
+
+def run_exits(state):
+    risk_manager, candles = state
+    for timestamp, candle in candles:
+        if not risk_manager.open_positions:
+            # Keep one position open so every candle goes through the exit checks
+            price = candle['close']
+            risk_manager.open_position({
+                'direction': 'LONG', 'entry_price': price, 'stop_loss': price - 3, 'tp1': price + 3,
+                'tp2': price + 6, 'risk': 3, 'rr1': 1, 'rr2': 2, 'crt_high': price + 6, 'crt_low': price - 3,
+            }, timestamp)
+        risk_manager.check_position_exits(timestamp, candle)
+    return len(candles)
+
+
+def setup_metrics(path):
+    state = setup_exits(path)
+    run_exits(state)
+    return state[0]
+
+
+def run_metrics(risk_manager):
+    risk_manager.get_performance_metrics()
+    return risk_manager.metrics.n
+
+
+def setup_compute_metrics(path):
+    risk_manager = setup_metrics(path)
+    history = risk_manager.trade_history
+    return history['pnl'].to_numpy(float), history['entry_time'].to_numpy(), history['exit_time'].to_numpy()
+
+
+def run_compute_metrics(state):
+    pnl, entries, exits = state
+    compute_metrics(pnl, config.INITIAL_CAPITAL, entries, exits)
+    return len(pnl)
+
+
+CASES = [
+    ("DataHandler.load_data", "rows", setup_load, run_load),
+    ("DataHandler.resample_data", "rows", setup_resample, run_resample),
+    ("DataHandler.prepare_data_for_strategy", "5min bars", setup_prepare, run_prepare),
+    ("CRTStrategy.detect_signals", "5min bars", setup_detect, run_detect),
+    ("CRTStrategy.get_order_block", "calls", setup_order_block, run_order_block),
+    ("RiskManager.check_position_exits", "5min bars", setup_exits, run_exits),
+    ("RiskManager.get_performance_metrics", "trades", setup_metrics, run_metrics),
+    ("metrics.compute_metrics", "trades", setup_compute_metrics, run_compute_metrics),
+]
+
+
+def measure(setup, run, path, repeat):
+    """Best wall time over `repeat` fresh runs, then one more run for the tracemalloc peak"""
+    best, items = None, 0
+    for _ in range(repeat):
+        state = setup(path)
+        started = time.perf_counter()
+        items = run(state)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    state = setup(path)
+    tracemalloc.start()
+    run(state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, items
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+    }
+
+
+def compare(results, baseline_path, threshold):
+    """Print wall-time ratios against a previous results file; returns the regressions"""
+    with open(baseline_path) as f:
+        baseline = {(r['name'], r['size']): r for r in json.load(f)['results']}
+    regressions = []
+    print(f"\nCompared with {baseline_path} (regression: > {threshold:.2f}x)")
+    for result in results:
+        before = baseline.get((result['name'], result['size']))
+        if before is None or not before.get('wall_seconds'):
+            continue
+        ratio = result['wall_seconds'] / before['wall_seconds']
+        flag = "  REGRESSION" if ratio > threshold else ""
+        print(f"  {result['name']:<40} {result['size']:>9}  {ratio:6.2f}x{flag}")
+        if flag:
+            regressions.append(result)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,500000", help="Rows of 1-minute data per run")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--cases", default="", help="Comma-separated substrings of case names to run (default: all)")
+    parser.add_argument("--output", default=None, help="JSON file (default: benchmarks/results/hot_paths-<commit>-<time>.json)")
+    parser.add_argument("--compare", default=None, help="Earlier results JSON to compare wall times with")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Slowdown ratio reported as a regression")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    selected = [c.strip() for c in args.cases.split(",") if c.strip()]
+    cases = [case for case in CASES if not selected or any(s in case[0] for s in selected)]
+    env = environment()
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            path = os.path.join(directory, f"ohlcv_{size}.csv")
+            write_ohlcv(path, size)
+            for name, unit, setup, run in cases:
+                # The code under test prints progress for every candle / trade
+                with contextlib.redirect_stdout(io.StringIO()):
+                    wall, peak, items = measure(setup, run, path, args.repeat)
+                result = {
+                    'name': name,
+                    'size': size,
+                    'items': items,
+                    'unit': unit,
+                    'wall_seconds': round(wall, 6),
+                    'peak_memory_bytes': peak,
+                    'throughput_per_second': round(items / wall, 1) if wall > 0 else None,
+                }
+                results.append(result)
+                print(f"{name:<40} {size:>9} rows  {wall * 1000:10.1f} ms  {peak / 2**20:8.1f} MiB  "
+                      f"{result['throughput_per_second'] or 0:>12,.0f} {unit}/s")
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"hot_paths-{env['commit'] or 'nogit'}-{stamp}.json")
+    with open(output, "w") as f:
+        json.dump({'environment': env, 'repeat': args.repeat, 'results': results}, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
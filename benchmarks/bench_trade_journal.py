@@ -0,0 +1,103 @@
+"""
+Per-write cost of the trade journal as it grows.
+
+Compares the append-only CSV journal (src/trade_journal.py) with the old
+load_workbook/append/save cycle of the Excel journal.
+
+Usage:
+    python benchmarks/bench_trade_journal.py [--rows 100000] [--bucket 10000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from src.trade_journal import TradeJournal
+
+HEADERS = [
+    "Ticket", "DateTime", "Symbol", "Direction", "EntryPrice", "SL", "TP", "LotSize", "RR1", "RR2", "Status", "ExitPrice", "Profit", "PnL%", "MaxProfit", "MaxLoss", "Comment"
+]
+
+
+def sample_row(i):
+    return [
+        100000 + i, datetime(2025, 1, 1, 10, 0), "XAUUSDm", "BUY", 2650.12, 2630.5, 2690.0, 0.05, 1.2, 2.0,
+        "CLOSED", 2671.3, 105.9, 1.05, 0.0, 0.0, "CRT TP1",
+    ]
+
+
+def bench_csv(directory, rows, bucket, fsync, background):
+    path = os.path.join(directory, f"journal_{int(fsync)}_{int(background)}.csv")
+    journal = TradeJournal(path, HEADERS, fsync=fsync)
+    if background:
+        journal.start()
+    buckets = []
+    started = time.perf_counter()
+    for i in range(rows):
+        journal.append(sample_row(i))
+        if (i + 1) % bucket == 0:
+            now = time.perf_counter()
+            buckets.append((i + 1, (now - started) / bucket * 1e6))
+            started = now
+    flush_started = time.perf_counter()
+    journal.close()
+    drain = time.perf_counter() - flush_started
+    return buckets, drain, journal.stats()
+
+
+def bench_xlsx(directory, sizes):
+    import openpyxl
+    path = os.path.join(directory, "journal.xlsx")
+    wb = openpyxl.Workbook()
+    wb.active.append(HEADERS)
+    wb.save(path)
+    written = 0
+    results = []
+    for size in sizes:
+        # Grow the workbook to `size` rows in one go, then time a single log_trade-style write
+        wb = openpyxl.load_workbook(path)
+        for i in range(written, size - 1):
+            wb.active.append(sample_row(i))
+        wb.save(path)
+        written = size - 1
+        started = time.perf_counter()
+        wb = openpyxl.load_workbook(path)
+        wb.active.append(sample_row(written))
+        wb.save(path)
+        written += 1
+        results.append((size, (time.perf_counter() - started) * 1e6))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--bucket", type=int, default=10000)
+    parser.add_argument("--xlsx-sizes", default="100,1000,5000", help="Journal sizes for the old Excel write (empty to skip)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for fsync, background, label in [
+            (False, False, "CSV inline, no fsync"),
+            (True, True, "CSV background writer, fsync per batch (append() cost on the caller)"),
+        ]:
+            buckets, drain, stats = bench_csv(directory, args.rows, args.bucket, fsync, background)
+            print(f"\n{label}")
+            print(f"  {'rows':>8}  {'us/write':>9}")
+            for rows, us in buckets:
+                print(f"  {rows:>8}  {us:>9.2f}")
+            print(f"  drain on close: {drain * 1000:.1f} ms, {stats['batches']} batches")
+
+        sizes = [int(s) for s in args.xlsx_sizes.split(",") if s]
+        if sizes:
+            print("\nExcel load_workbook/append/save (old log_trade)")
+            print(f"  {'rows':>8}  {'us/write':>12}")
+            for rows, us in bench_xlsx(directory, sizes):
+                print(f"  {rows:>8}  {us:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
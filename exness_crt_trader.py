@@ -1,37 +1,60 @@
 import MetaTrader5 as mt5
 import time
-from datetime import datetime, timedelta, timezone
-import pandas as pd
+import asyncio
+from datetime import datetime, timezone
 import os
-import openpyxl
 import sys
-import os
-import threading
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
-from src.news_filter import is_news_blocking, SESSION_NEWS_WINDOWS
+from src.news_filter import is_news_blocking, news_blackout_until, news_calendar_status, load_calendar, NewsRefresher, session_for_hour, SESSION_NEWS_WINDOWS
+from src.tick_pump import TickPump
+from src.broker_state import BrokerState, CallCounter
+from src.mt5_gateway import get_gateway
+from src.order_bracket import build_bracket_requests, submit_bracket, is_done, FILLED, CHECK_FAILED
+from src.stop_model import StopDistanceModel
+from src.deal_mirror import DealMirror
+from src.position_supervisor import PositionSupervisor
+from src.async_runtime import AsyncRuntime
+from src.bar_snapshot import BarSnapshotBuilder
+from src.symbol_catalog import SymbolCatalog
+from src.trade_journal import TradeJournal, JOURNAL_HEADERS
+from src.decision_log import DecisionLog
+from src.trade_store import TradeStore
+from src.journal_reconcile import JournalReconciler
+from src.portfolio_risk import PortfolioRisk
+from src.latency_metrics import get_registry, MetricsServer
+from src.profiling import OnDemandProfiler
+
+# All terminal calls are serialized on the gateway thread; CallCounter counts the
+# calls the live loop makes (exposed per cycle by BrokerState).
+# Nothing below talks to the terminal at import time: the gateway thread starts on
+# the first call, and connecting / symbol detection happen in initialize().
+gateway = get_gateway(mt5)
+mt5 = CallCounter(gateway)
+# Symbols of each trade server, persisted under logs/symbol_catalog/
+symbol_catalog = SymbolCatalog(api=mt5)
+# Per-stage latency histograms (the gateway, supervisor and news refresh record into the same registry)
+latency = get_registry()
+# Captures the next strategy cycles on request: touch logs/profile.flag or send SIGUSR1 (see src/profiling.py)
+profiler = OnDemandProfiler()
 
 # --- CONFIG ---
 # Auto-detect the correct XAUUSD symbol (e.g., XAUUSD, XAUUSDm, GOLD, etc.)
 def detect_gold_symbol():
-    candidates = [
-        'XAUUSDm', 'XAUUSD', 'GOLD', 'XAUUSD.', 'XAUUSDz', 'XAUUSDmicro', 'XAUUSDpro', 'XAUUSDc', 'XAUUSD.x', 'XAUUSD.a', 'XAUUSD.r', 'XAUUSD.s'
-    ]
-    for sym in candidates:
-        info = mt5.symbol_info(sym)
-        if info is not None:
-            print(f"Auto-detected gold symbol: {sym}")
+    """Resolve this server's gold symbol from the cached symbol catalog (one dictionary
+    lookup; the catalog is rebuilt only when the server changes or the symbol is missing)."""
+    if symbol_catalog.ensure():
+        sym = symbol_catalog.resolve_gold()
+        if sym is None:
+            # Stored catalog may predate the symbol: rebuild once and retry
+            symbol_catalog.refresh()
+            sym = symbol_catalog.resolve_gold()
+        if sym is not None:
+            print(f"Auto-detected gold symbol: {sym} (server {symbol_catalog.server})")
             return sym
-    # Fallback: try to find any symbol containing 'XAU' and 'USD'
-    all_symbols = mt5.symbols_get()
-    if all_symbols is not None:
-        for s in all_symbols:
-            if 'XAU' in s.name and 'USD' in s.name:
-                print(f"Auto-detected gold symbol (fallback): {s.name}")
-                return s.name
     print("Could not auto-detect a valid XAUUSD symbol. Please check your broker's Market Watch.")
     return 'XAUUSDm'  # Default/fallback
 
-SYMBOL = detect_gold_symbol()
+SYMBOL = None  # Resolved by initialize() (detect_gold_symbol() unless given)
 RISK_PER_TRADE = 0.01
 # Set session hours to match Exness Market Watch time (UTC+0)
 SESSION_HOURS = sorted(set([1, 5, 9, 13, 15, 18, 21] + list(range(7, 22))))  # Compare legacy and full London/NY sessions
@@ -47,6 +70,22 @@ MAX_TRADES_PER_SIGNAL = 2   # Maximum trades per CRT signal (should be 2 for TP1
 COOLDOWN_MINUTES = 240      # Minutes to wait after a trade before looking for new signals (increased for higher TF)
 RANGE_TIMEFRAME = mt5.TIMEFRAME_D1  # Changed from H1 to D1 for proper range analysis
 ENTRY_TIMEFRAME = mt5.TIMEFRAME_H1  # Changed from M5 to H1 for better entry timing
+RANGE_BARS = 30             # RANGE_TIMEFRAME candles scanned for CRT ranges
+ENTRY_BARS = 20             # ENTRY_TIMEFRAME candles scanned for FVG entries
+ATR_PERIOD = 14             # ATR period for dynamic stops
+TICK_POLL_INTERVAL = 0.05   # Seconds between terminal polls in the shared tick pump
+POSITION_REFRESH_SECONDS = 30  # How often the position supervisor re-reads open positions
+SYMBOL_SPEC_TTL = 3600      # Seconds to cache static symbol specs (point, digits, contract size, ...)
+BRACKET_ON_PARTIAL = "keep" # If only one bracket leg fills: "keep" it open or "close" it again
+USE_ASYNC_RUNTIME = True    # asyncio runtime (separate tasks per component); False = blocking loop
+NEWS_REFRESH_SECONDS = 3600     # Background refresh of the prefetched news calendar (a week ahead)
+NEWS_RETRY_SECONDS = 30         # First retry after a failed refresh (doubles up to NEWS_MAX_BACKOFF)
+NEWS_MAX_BACKOFF = 1800
+NEWS_CACHE_MAX_AGE = 6 * 3600   # An older calendar counts as unknown
+NEWS_FAIL_SAFE = True           # Unknown calendar (API down since start or too stale): True = don't trade
+METRICS_PORT = 9108             # Prometheus text endpoint on http://127.0.0.1:<port>/metrics (None = off)
+LATENCY_SUMMARY_SECONDS = 300   # How often the stage latency summary line is printed
+STOP_MODEL_SAVE_SECONDS = 300   # How often learned stop distances are written to disk (and on shutdown)
 
 # --- Trading Lock to prevent duplicate entries ---
 TRADE_LOCK = False  # Global lock for trading
@@ -55,19 +94,39 @@ TRADE_LOCK = False  # Global lock for trading
 EXNESS_MT5_PATH = r"C:\\Program Files\\MetaTrader 5 EXNESS\\terminal64.exe"  # Update if needed
 
 # --- MT5 Attach Only to Exness ---
-print(f"Connecting to Exness MT5 terminal at {EXNESS_MT5_PATH} (attach only)...")
-if not mt5.initialize(EXNESS_MT5_PATH, portable=True):
-    print(f"MT5 initialize() failed: {mt5.last_error()}")
-    quit()
-account = mt5.account_info()
-if account is None:
-    print("Failed to get account info. Please ensure you are logged in manually.")
-    mt5.shutdown()
-    quit()
-print(f"Connected: {account.name} | Balance: {account.balance}")
+def connect():
+    """Attach to the Exness terminal. Returns the account info or None on failure."""
+    print(f"Connecting to Exness MT5 terminal at {EXNESS_MT5_PATH} (attach only)...")
+    if not mt5.initialize(EXNESS_MT5_PATH, portable=True):
+        print(f"MT5 initialize() failed: {mt5.last_error()}")
+        return None
+    account = mt5.account_info()
+    if account is None:
+        print("Failed to get account info. Please ensure you are logged in manually.")
+        mt5.shutdown()
+        return None
+    print(f"Connected: {account.name} | Balance: {account.balance}")
+    return account
+
+# --- Live components, created by initialize() ---
+tick_pump = None     # Shared tick pump: one poller for SYMBOL, every consumer reads from it
+broker = None        # Cached symbol specs + one account/positions/tick snapshot per cycle
+deal_mirror = None   # Local deal history, synced incrementally and indexed by position
+stop_model = None    # Learned minimum stop distance per symbol/session
+bar_builder = None   # Bars for one strategy cycle: every timeframe fetched once
+supervisor = None    # One thread for all open positions (profit lock, TP1 -> breakeven, trailing, cooldown)
+news_refresher = None  # Keeps the prefetched news calendar fresh in the background (stale-while-revalidate)
+portfolio_risk = None  # Exposure, margin and correlated risk over all symbols of the account (pre-trade checks)
+ACCOUNT = None         # Login of the connected account (portfolio key)
+_initialized = False
+
+def get_tick():
+    """Latest tick for SYMBOL from the tick pump (falls back to a direct call if the pump is not running)."""
+    return tick_pump.get_tick()
 
 # --- Helper: Get last N candles as DataFrame ---
 def get_rates(symbol, timeframe, count, shift=0):
+    import pandas as pd
     rates = mt5.copy_rates_from_pos(symbol, timeframe, shift, count)
     if rates is None or len(rates) < count:
         return None
@@ -77,26 +136,33 @@ def get_rates(symbol, timeframe, count, shift=0):
     return df
 
 # --- Helper: Calculate Average True Range (ATR) for volatility-based stop loss ---
-def calculate_atr(symbol, timeframe, period=14):
+def calculate_atr(symbol, timeframe, period=14, bars=None):
     """Calculate Average True Range (ATR) for volatility-based stop loss.
+    Uses the cycle's bar snapshot if given, otherwise fetches the candles.
     Returns the ATR value or None if calculation fails."""
+    import pandas as pd
     # Get enough candles for proper ATR calculation
-    df = get_rates(symbol, timeframe, period+10, 0)
+    if bars is not None:
+        df = bars.frame(timeframe, period+10, 0)
+    else:
+        df = get_rates(symbol, timeframe, period+10, 0)
     if df is None or len(df) < period+1:
         print(f"Failed to get enough data for ATR calculation")
         return None
     
-    # Calculate true range
-    df['high_low'] = df['high'] - df['low']
-    df['high_close'] = abs(df['high'] - df['close'].shift(1))
-    df['low_close'] = abs(df['low'] - df['close'].shift(1))
-    df['tr'] = df[['high_low', 'high_close', 'low_close']].max(axis=1)
+    # Calculate true range (without adding columns: df may be a slice of the shared snapshot)
+    prev_close = df['close'].shift(1)
+    tr = pd.concat([
+        df['high'] - df['low'],
+        (df['high'] - prev_close).abs(),
+        (df['low'] - prev_close).abs(),
+    ], axis=1).max(axis=1)
     
     # Calculate ATR
-    df['atr'] = df['tr'].rolling(period).mean()
+    atr = tr.rolling(period).mean()
     
     # Return the latest ATR value
-    latest_atr = df['atr'].iloc[-1]
+    latest_atr = atr.iloc[-1]
     if pd.isna(latest_atr):
         return None
     
@@ -115,92 +181,175 @@ def find_order_block(df, direction):
 
 # --- Helper: Get Market Watch (broker) time ---
 def get_broker_time():
-    tick = mt5.symbol_info_tick(SYMBOL)
+    tick = get_tick()
     if tick is None:
         return datetime.now(timezone.utc)
     return datetime.fromtimestamp(tick.time, timezone.utc)
 
-# --- Helper: Get broker time ---
+# --- Helper: Trading session for a broker hour ---
+def get_session_name(hour):
+    """Session name used for news windows and the stop model (hours in news_filter.SESSION_HOURS,
+    shared with the backtest news mask)."""
+    return session_for_hour(hour)
 
 # --- Helper: Get detailed symbol info including stop levels ---
 def get_symbol_details():
     """Get comprehensive symbol details including stop levels and point values.
     Returns a dictionary with symbol information or None if unavailable."""
-    info = mt5.symbol_info(SYMBOL)
-    if info is None:
+    spec = broker.symbol_spec()
+    if spec is None:
         print(f"Failed to get symbol info for {SYMBOL}")
         return None
     
-    # Convert named tuple to dictionary using _asdict()
-    info_dict = info._asdict()
+    # Static values come from the cached spec, prices from the shared tick
+    tick = get_tick()
+    bid = tick.bid if tick else 0.0
+    ask = tick.ask if tick else 0.0
     
     # Create a detailed dictionary of symbol properties
     details = {
-        "name": info_dict.get("name", SYMBOL),
-        "point": info_dict.get("point", 0.001),
-        "digits": info_dict.get("digits", 3),
-        "trade_contract_size": info_dict.get("trade_contract_size", 100.0),
-        "volume_min": info_dict.get("volume_min", 0.01),
-        "volume_step": info_dict.get("volume_step", 0.01),
-        "bid": info_dict.get("bid", 0.0),
-        "ask": info_dict.get("ask", 0.0),
-        "spread": info_dict.get("spread", 0),
-        "stops_level": info_dict.get("trade_stops_level", 0)
+        "name": spec.name,
+        "point": spec.point,
+        "digits": spec.digits,
+        "trade_contract_size": spec.trade_contract_size,
+        "volume_min": spec.volume_min,
+        "volume_step": spec.volume_step,
+        "bid": bid,
+        "ask": ask,
+        "spread": round((ask - bid) / spec.point) if spec.point else 0,
+        "stops_level": spec.trade_stops_level
     }
     
-    # For XAUUSDm, use empirically determined stop distance
+    # Minimum stop distance learned from previous broker accepts/rejects and the reported stops level
+    session = get_session_name(get_broker_time().hour)
+    stop_model.observe_stops_level(SYMBOL, session, details["stops_level"], details["point"])
+    details["adjusted_min_stop"] = max(stop_model.min_distance(SYMBOL, session), 0.0001)
     if SYMBOL.startswith("XAU"):
-        # Based on our testing, Exness allows stops as close as $0.50, 
-        # but we'll use $1.00 for safety
-        details["adjusted_min_stop"] = 1.0
         print(f"Gold {SYMBOL} details - Point: {details['point']}, Digits: {details['digits']}, Stops level: {details['stops_level']}")
-        print(f"Using empirically tested minimum stop for Gold: $1.00")
-    else:
-        # For other symbols, calculate based on reported stops level
-        min_stop_price = details["stops_level"] * details["point"]
-        if min_stop_price < 0.0001:  # If essentially zero, use a safe default
-            details["adjusted_min_stop"] = 0.0001
-        else:
-            details["adjusted_min_stop"] = min_stop_price
+        print(f"Using learned minimum stop for Gold ({session}): ${details['adjusted_min_stop']:.2f}")
         
     return details
 
+# --- Helper: Feed broker answers for a bracket into the stop model ---
+def record_stop_outcomes(bracket, current_price, session):
+    """Record every order_check/order_send answer of a bracket as an accepted or rejected stop distance.
+    Returns the number of rejected stops."""
+    rejected = 0
+    for request, check, result in zip(bracket.requests, bracket.checks, bracket.first_results):
+        distance = abs(current_price - request['sl'])
+        for answer in (check, result):
+            if answer is None:
+                continue
+            if answer.retcode == 10016:
+                stop_model.record(SYMBOL, session, distance, accepted=False)
+                rejected += 1
+            elif answer.retcode in (0, mt5.TRADE_RETCODE_DONE):
+                stop_model.record(SYMBOL, session, distance, accepted=True)
+    return rejected
+
 # --- Trade Limiting and R:R Filter ---
 trades_today = 0  # Total trades count
 last_trade_day = None
 
-# --- Excel Journal Setup ---
-JOURNAL_FILE = "trade_journal.xlsx"
-JOURNAL_HEADERS = [
-    "Ticket", "DateTime", "Symbol", "Direction", "EntryPrice", "SL", "TP", "LotSize", "RR1", "RR2", "Status", "ExitPrice", "Profit", "PnL%", "MaxProfit", "MaxLoss", "Comment"
-]
-if not os.path.exists(JOURNAL_FILE):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.append(JOURNAL_HEADERS)
-    wb.save(JOURNAL_FILE)
+# --- Trade Journal Setup ---
+JOURNAL_FILE = "trade_journal.csv"          # Append-only journal (see src/trade_journal.py)
+JOURNAL_EXPORT_FILE = "trade_journal.xlsx"  # Excel export of the journal
+JOURNAL_EXPORT_SECONDS = 3600               # How often the async runtime refreshes the Excel export
+RECONCILE_SECONDS = 24 * 3600               # How often missing exits are filled in from deal history
+journal = None  # TradeJournal, opened by ensure_journal()
+
+def ensure_journal():
+    """Open the CSV journal, importing the rows of an existing Excel journal the first time"""
+    global journal
+    if journal is not None:
+        return journal
+    migrate = not os.path.exists(JOURNAL_FILE) and os.path.exists(JOURNAL_EXPORT_FILE)
+    journal = TradeJournal(JOURNAL_FILE, JOURNAL_HEADERS)
+    if migrate:
+        print(f"Imported {journal.import_xlsx(JOURNAL_EXPORT_FILE)} rows from {JOURNAL_EXPORT_FILE} into {JOURNAL_FILE}")
+    return journal
+
+def export_journal():
+    """Refresh the Excel copy of the journal"""
+    if journal is not None:
+        with latency.span("journal_export"):
+            journal.export_xlsx(JOURNAL_EXPORT_FILE)
+
+# --- Decision log (skips, ranges, sweeps, entries; query with `python -m src.decision_log`) ---
+decision_log = None  # DecisionLog, created by initialize()
+
+def log_decision(level, stage, reason, ts=None, **fields):
+    """Buffer one structured decision record; written in batches by the log's writer thread"""
+    if decision_log is not None:
+        decision_log.record(level, stage, reason, ts=ts, **fields)
 
-# --- Helper: Log trade to Excel journal ---
+# --- Trade store (SQLite: signals, orders, fills, position updates, closes) ---
+trade_store = None  # TradeStore, created by initialize()
+
+def store_event(table, **row):
+    """Queue one row for the trade store; committed in batches by its writer thread"""
+    if trade_store is not None:
+        trade_store.add(table, **row)
+
+def reconcile_journal():
+    """Fill exits missing from the journal from the deal history added since the last run"""
+    with latency.span("reconcile"):
+        summary = JournalReconciler(journal, api=mt5, store=trade_store).run()
+    if summary['filled']:
+        print(f"Journal reconciliation filled {summary['filled']} missing exits")
+    sync_portfolio()
+    return summary
+
+def sync_portfolio():
+    """Rebuild the account's portfolio exposure from all open positions (any symbol, manual trades included)"""
+    account = mt5.account_info()
+    if account is None:
+        return
+    portfolio_risk.add_account(account.login, account.equity, account.leverage)
+    if not portfolio_risk.sync(account.login, mt5.positions_get()):
+        print(f"Could not read open positions ({mt5.last_error()}); portfolio exposure left unchanged")
+
+# --- Helper: Log trade to the journal ---
 def log_trade(ticket, dt, symbol, direction, entry, sl, tp, lot, rr1, rr2, status, exit_price, profit, pnl_pct, max_profit, max_loss, comment):
-    wb = openpyxl.load_workbook(JOURNAL_FILE)
-    ws = wb.active
-    ws.append([
+    row = [
         ticket, dt, symbol, direction, entry, sl, tp, lot, rr1, rr2, status, exit_price, profit, pnl_pct, max_profit, max_loss, comment
-    ])
-    wb.save(JOURNAL_FILE)
+    ]
+    # Only enqueues: the journal's writer thread appends the row
+    with latency.span("journal"):
+        ensure_journal().append(row)
 
 # --- Helper: Move SL to breakeven ---
 def move_sl_to_breakeven(ticket, breakeven_price):
-    """Move stop loss to breakeven for a given position.
-    Returns True if successful, False otherwise."""
+    """Move stop loss to breakeven (or any new level) for a given position.
+    The level may be widened to the learned minimum stop distance.
+    Returns the SL the broker accepted, or None if it was not moved."""
     # First, check if the position exists and get its current TP
     positions = mt5.positions_get(ticket=ticket)
     if not positions or len(positions) == 0:
         print(f"Position {ticket} not found when trying to move SL to breakeven")
-        return False
+        return None
         
     position = positions[0]
     
+    # Respect the learned minimum stop distance up front instead of waiting for a 10016
+    session = get_session_name(get_broker_time().hour)
+    spec = broker.symbol_spec()
+    tick = get_tick()
+    if tick is not None and spec is not None:
+        if position.type == mt5.POSITION_TYPE_BUY:
+            safe_price = stop_model.safe_sl(SYMBOL, session, 'BUY', tick.bid, breakeven_price, spec.digits)
+        else:
+            safe_price = stop_model.safe_sl(SYMBOL, session, 'SELL', tick.ask, breakeven_price, spec.digits)
+        if safe_price != breakeven_price:
+            print(f"Breakeven SL {breakeven_price} is closer than the learned minimum stop, using {safe_price}")
+            breakeven_price = safe_price
+    # Widening may leave the stop no better than it already is: don't loosen it
+    if position.sl and ((position.type == mt5.POSITION_TYPE_BUY and breakeven_price <= position.sl) or
+                        (position.type != mt5.POSITION_TYPE_BUY and breakeven_price >= position.sl)):
+        print(f"SL {breakeven_price} would not improve the current SL {position.sl} of position {ticket}")
+        return None
+    market_price = (tick.bid if position.type == mt5.POSITION_TYPE_BUY else tick.ask) if tick is not None else None
+    
     # Create request with the correct TP value (keep original TP)
     request = {
         "action": mt5.TRADE_ACTION_SLTP,
@@ -213,9 +362,13 @@ def move_sl_to_breakeven(ticket, breakeven_price):
     # Send the request
     result = mt5.order_send(request)
     
+    if market_price is not None and result and result.retcode in (mt5.TRADE_RETCODE_DONE, 10016):
+        stop_model.record(SYMBOL, session, market_price - breakeven_price, accepted=result.retcode == mt5.TRADE_RETCODE_DONE)
+    
     if result and result.retcode == mt5.TRADE_RETCODE_DONE:
         print(f"Successfully moved SL to breakeven {breakeven_price} for position {ticket}")
-        return True
+        stop_model.record_submission(retries=0)
+        return breakeven_price
     else:
         error_code = result.retcode if result else "Unknown"
         error_msg = result.comment if result else "No result"
@@ -223,8 +376,8 @@ def move_sl_to_breakeven(ticket, breakeven_price):
         
         # If failure is due to invalid SL, try with a bit more buffer
         if result and result.retcode == 10016:
-            symbol_details = get_symbol_details()
-            point = symbol_details["point"] if symbol_details else 0.01
+            spec = broker.symbol_spec()
+            point = spec.point if spec else 0.01
             
             # Add a bit more buffer in the direction away from the current price
             if position.type == mt5.POSITION_TYPE_BUY:  # If BUY position, move SL a bit lower
@@ -237,11 +390,59 @@ def move_sl_to_breakeven(ticket, breakeven_price):
             request["sl"] = adjusted_sl
             retry_result = mt5.order_send(request)
             
+            if market_price is not None and retry_result and retry_result.retcode in (mt5.TRADE_RETCODE_DONE, 10016):
+                stop_model.record(SYMBOL, session, market_price - adjusted_sl, accepted=retry_result.retcode == mt5.TRADE_RETCODE_DONE)
+            stop_model.record_submission(retries=1)
             if retry_result and retry_result.retcode == mt5.TRADE_RETCODE_DONE:
                 print(f"Successfully moved SL with adjusted value {adjusted_sl} for position {ticket}")
-                return True
+                return adjusted_sl
         
-        return False
+        return None
+
+# --- Helper: Fallback for a bracket leg rejected with invalid stops ---
+def send_leg_with_stop_fallback(request, result, current_price, digits):
+    """Open a rejected leg without SL/TP and add them afterwards.
+    Returns the result for the open position, or the original result if the leg could not be opened with stops."""
+    if result is None or result.retcode != 10016:
+        return result
+    
+    request_no_sl = request.copy()
+    request_no_sl.pop('sl', None)
+    request_no_sl.pop('tp', None)
+    print(f"Trying alternative method for {request['comment']}: Open position without SL/TP first")
+    alt_result = mt5.order_send(request_no_sl)
+    if not is_done(alt_result):
+        return result
+    
+    print(f"Position {alt_result.order} opened without SL/TP. Adding SL/TP...")
+    # Add SL/TP in a separate request
+    modify_request = {
+        "action": mt5.TRADE_ACTION_SLTP,
+        "position": alt_result.order,
+        "symbol": SYMBOL,
+        "sl": request['sl'],
+        "tp": request['tp'],
+    }
+    modify_result = mt5.order_send(modify_request)
+    if is_done(modify_result):
+        print(f"Successfully added SL/TP to position {alt_result.order}")
+        return alt_result
+    print(f"Failed to add SL/TP: {modify_result.retcode if modify_result else 'None'} {modify_result.comment if modify_result else ''}")
+    
+    # Try again with a larger stop distance
+    if SYMBOL.startswith("XAU"):
+        larger_sl = current_price - 5.0 if request['type'] == mt5.ORDER_TYPE_BUY else current_price + 5.0
+        modify_request["sl"] = round(larger_sl, digits)
+        print(f"Trying position {alt_result.order} with much larger SL: {modify_request['sl']}")
+        modify_result = mt5.order_send(modify_request)
+        if is_done(modify_result):
+            print(f"Successfully added SL/TP to position {alt_result.order} with larger distance")
+            return alt_result
+    
+    # Never leave an unprotected position behind: close it and report the leg as failed
+    print(f"Closing unprotected position {alt_result.order}")
+    mt5.Close(SYMBOL, ticket=alt_result.order)
+    return result
 
 # --- Helper: Calculate position size for 1% risk ---
 def calculate_lot_size(entry, sl, balance, risk_pct):
@@ -256,8 +457,11 @@ def calculate_lot_size(entry, sl, balance, risk_pct):
     return lot_size
 
 # --- Helper: Determine trend direction (simple MA or price action) ---
-def get_trend_direction():
-    h1_df = get_rates(SYMBOL, RANGE_TIMEFRAME, TREND_LOOKBACK, 1)
+def get_trend_direction(bars=None):
+    if bars is not None:
+        h1_df = bars.frame(RANGE_TIMEFRAME, TREND_LOOKBACK, 1)
+    else:
+        h1_df = get_rates(SYMBOL, RANGE_TIMEFRAME, TREND_LOOKBACK, 1)
     if h1_df is None or len(h1_df) < TREND_MA_PERIOD:
         return None
     ma = h1_df['close'].rolling(TREND_MA_PERIOD).mean()
@@ -283,85 +487,49 @@ def is_in_premium_discount_zone(candle, trend, h1_df):
         return candle['high'] > mid
     return False
 
-# --- Monitor trade exits and log to journal ---
-def monitor_trade_exits():
-    """Background thread: Monitor open positions and log exits to journal, including max profit/loss and intelligent profit lock exits."""
-    import openpyxl
-    import time
-    max_pnl_tracker = {}  # ticket: {max_profit, max_loss, profit_lock_triggered}
-    profit_lock_rr = 1.0  # Activate profit lock after 1R is reached
-    profit_lock_drawdown_pct = 0.4  # Exit if profit pulls back 40% from max
-    while True:
-        positions = mt5.positions_get(symbol=SYMBOL)
-        # Update max profit/loss for open positions
-        if positions:
-            for pos in positions:
-                ticket = pos.ticket
-                entry_price = pos.price_open
-                lot = pos.volume
-                direction = 'BUY' if pos.type == mt5.ORDER_TYPE_BUY else 'SELL'
-                sl = pos.sl
-                # Calculate 1R (risk per trade)
-                risk = abs(entry_price - sl) * lot * (mt5.symbol_info(SYMBOL).trade_contract_size if mt5.symbol_info(SYMBOL) else 100)
-                # Calculate current floating PnL
-                current_price = mt5.symbol_info_tick(SYMBOL).ask if direction == 'BUY' else mt5.symbol_info_tick(SYMBOL).bid
-                contract_size = mt5.symbol_info(SYMBOL).trade_contract_size if mt5.symbol_info(SYMBOL) else 100
-                floating_pnl = (current_price - entry_price) * lot * contract_size if direction == 'BUY' else (entry_price - current_price) * lot * contract_size
-                # Track max profit/loss
-                if ticket not in max_pnl_tracker:
-                    max_pnl_tracker[ticket] = {'max_profit': floating_pnl, 'max_loss': floating_pnl, 'profit_lock_triggered': False, 'max_pnl_seen': floating_pnl}
-                else:
-                    max_pnl_tracker[ticket]['max_profit'] = max(max_pnl_tracker[ticket]['max_profit'], floating_pnl)
-                    max_pnl_tracker[ticket]['max_loss'] = min(max_pnl_tracker[ticket]['max_loss'], floating_pnl)
-                    max_pnl_tracker[ticket]['max_pnl_seen'] = max(max_pnl_tracker[ticket]['max_pnl_seen'], floating_pnl)
-                # Intelligent profit lock exit
-                max_pnl = max_pnl_tracker[ticket]['max_pnl_seen']
-                if not max_pnl_tracker[ticket]['profit_lock_triggered'] and max_pnl >= profit_lock_rr * risk:
-                    max_pnl_tracker[ticket]['profit_lock_triggered'] = True
-                    log_msg = f"Profit lock activated for ticket {ticket}: max_pnl={max_pnl:.2f}, risk={risk:.2f}"
-                    print(log_msg)
-                if max_pnl_tracker[ticket]['profit_lock_triggered']:
-                    lock_level = max_pnl - profit_lock_drawdown_pct * (max_pnl - 0)
-                    if floating_pnl < lock_level:
-                        # Close the position to lock in profit
-                        close_result = mt5.Close(ticket)
-                        log_msg = f"Profit lock exit for ticket {ticket}: floating_pnl={floating_pnl:.2f}, lock_level={lock_level:.2f}"
-                        print(log_msg)
-                        # Log exit to journal (handled by normal exit logic below)
-        # Check for closed positions
-        all_tickets = set(max_pnl_tracker.keys())
-        open_tickets = set([p.ticket for p in positions]) if positions else set()
-        closed_tickets = all_tickets - open_tickets
-        for closed_ticket in closed_tickets:
-            try:
-                # Find last deal for this ticket
-                history = mt5.history_deals_get(datetime.now() - timedelta(days=5), datetime.now())
-                for deal in history or []:
-                    if deal.position_id == closed_ticket and deal.entry == mt5.DEAL_ENTRY_OUT:
-                        exit_price = deal.price
-                        profit = deal.profit
-                        exit_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(deal.time))
-                        tracker = max_pnl_tracker[closed_ticket]
-                        entry_price = None
-                        lot = None
-                        direction = None
-                        for pos in positions or []:
-                            if pos.ticket == closed_ticket:
-                                entry_price = pos.price_open
-                                lot = pos.volume
-                                direction = 'BUY' if pos.type == mt5.ORDER_TYPE_BUY else 'SELL'
-                        if entry_price is None or lot is None or direction is None:
-                            continue
-                        contract_size = mt5.symbol_info(SYMBOL).trade_contract_size if mt5.symbol_info(SYMBOL) else 100
-                        pnl_pct = (profit / (entry_price * lot * contract_size)) * 100 if entry_price and lot else 0
-                        log_trade(closed_ticket, exit_time, SYMBOL, direction, entry_price, '', '', lot, '', '', 'CLOSED', exit_price, profit, pnl_pct, tracker['max_profit'], tracker['max_loss'], 'Closed by TP/SL/manual')
-                        del max_pnl_tracker[closed_ticket]
-            except Exception as e:
-                print(f"Error logging trade exit for ticket {closed_ticket}: {e}")
-        time.sleep(30)  # Check every 30 seconds
+# --- Position supervision callbacks ---
+def journal_closed_position(ticket, tracker):
+    """Log the exit of a closed position to the journal. Returns False if its exit deal is not in history yet."""
+    deal_mirror.sync()
+    deal = deal_mirror.exit_deal(ticket)
+    entry = deal_mirror.entry(ticket)
+    if deal is None or entry is None:
+        return False
+    exit_time = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(deal.time))
+    spec = broker.symbol_spec()
+    contract_size = spec.trade_contract_size if spec else 100
+    pnl_pct = (deal.profit / (entry.price_open * entry.volume * contract_size)) * 100 if entry.price_open and entry.volume else 0
+    log_trade(ticket, exit_time, SYMBOL, entry.direction, entry.price_open, entry.sl, entry.tp, entry.volume, '', '', 'CLOSED', deal.price, deal.profit, pnl_pct, tracker['max_profit'], tracker['max_loss'], 'Closed by TP/SL/manual')
+    deal_time = datetime.fromtimestamp(deal.time, timezone.utc)
+    store_event('fills', ticket=deal.ticket, position_id=ticket, order_ticket=deal.order, time=deal_time,
+                symbol=SYMBOL, direction='SELL' if entry.direction == 'BUY' else 'BUY', entry='OUT',
+                volume=deal.volume, price=deal.price, profit=deal.profit,
+                commission=deal.commission, swap=deal.swap)
+    store_event('closes', position_id=ticket, deal_ticket=deal.ticket, time=deal_time, symbol=SYMBOL, direction=entry.direction,
+                entry_time=datetime.fromtimestamp(entry.time, timezone.utc) if entry.time else None,
+                entry_price=entry.price_open, exit_price=deal.price, volume=entry.volume, sl=entry.sl, tp=entry.tp,
+                profit=deal.profit, pnl_pct=pnl_pct, max_profit=tracker['max_profit'], max_loss=tracker['max_loss'],
+                reason=deal.comment or 'TP/SL/manual')
+    portfolio_risk.on_close(ACCOUNT, ticket)
+    deal_mirror.forget(ticket)
+    return True
+
+def move_managed_sl(ticket, price):
+    """Supervisor callback: returns the SL actually applied (may differ from `price`), or None"""
+    applied = move_sl_to_breakeven(ticket, price)
+    if applied is not None:
+        print(f"{datetime.now()} Moved SL of position {ticket} to {applied}")
+        log_decision("INFO", "supervisor", "SL moved", ticket=ticket, price=applied, requested=price)
+        store_event('position_updates', position_id=ticket, time=get_broker_time(), symbol=SYMBOL, sl=applied, reason='SL moved')
+        portfolio_risk.on_stop_moved(ACCOUNT, ticket, applied)
+    return applied
+
+def release_trade_lock(reason):
+    global TRADE_LOCK
+    TRADE_LOCK = False
+    print(f"{datetime.now()} Trade lock released - {reason}")
 
-# --- Main CRT Strategy Loop ---
-print("Starting advanced CRT strategy on live Exness demo...")
+# --- Main CRT Strategy Loop state ---
 last_trade_time = None
 
 # Initialize last trade day
@@ -369,707 +537,688 @@ last_trade_day = None
 trades_today = 0
 
 # --- Prevent duplicate trades on restart by saving and checking the last trade signal (entry candle time) in a file ---
-import os
 LAST_SIGNAL_FILE = "crt_last_signal.txt"
-
-# Load last signal date from file (ensure it's always defined)
-last_signal_date = None
-if os.path.exists(LAST_SIGNAL_FILE):
-    with open(LAST_SIGNAL_FILE, "r") as f:
-        last_signal_date = f.read().strip()
+last_signal_date = None  # Loaded from LAST_SIGNAL_FILE by initialize()
 
 # Example session-specific news windows (customize as needed)
-SESSION_NEWS_WINDOWS.update({
+NEWS_WINDOWS_BY_SESSION = {
     'London': 45,  # Block 45 min before/after news during London
     'NY': 60,      # Block 60 min before/after news during NY
-})
+}
 
-if __name__ == "__main__":
-    threading.Thread(target=monitor_trade_exits, daemon=True).start()
-    while True:
-        broker_now = get_broker_time()
-        broker_day = broker_now.date()
-        symbol_details = get_symbol_details()
-        min_stop = symbol_details["adjusted_min_stop"] if symbol_details else 3.0
-        
-        # Daily trade tracking
-        if last_trade_day != broker_day:
-            trades_today = 0
-            last_trade_day = broker_day
-            TRADE_LOCK = False  # Reset trade lock at the start of each new broker day
-            # Clear last signal file and in-memory variable to allow new trade for the new day
-            with open(LAST_SIGNAL_FILE, "w") as f:
-                f.write("")
-            last_signal_date = ""
-            print(f"\n{broker_now} New trading day started. Trade count reset to 0/3. Trade lock released. Duplicate signal reset.")
-        
-        # Clear display of current trading status
-        print(f"\n{broker_now} === SEQUENTIAL TRADING STATUS ===")
-        print(f"Trade lock active: {TRADE_LOCK}")
-        print(f"Trades taken today: {trades_today}/3")
-        print(f"Current positions: {len(mt5.positions_get(symbol=SYMBOL) or [])}")
-        
-        if trades_today >= 3:
-            print(f"{broker_now} Max 3 trades reached for {broker_day}. Not taking any more trades today.")
-            with open("crt_skip_log.txt", "a") as f:
-                f.write(f"{broker_now} SKIP: Max 3 trades reached for the day\n")
-            time.sleep(60)
-            continue
-        # Check if any positions are currently open - only take a new trade if no positions are open
-        current_positions = mt5.positions_get(symbol=SYMBOL)
-        if current_positions and len(current_positions) > 0:
-            print(f"{broker_now} Positions already open. Waiting for them to close before taking a new trade.")
-            with open("crt_skip_log.txt", "a") as f:
-                f.write(f"{broker_now} SKIP: Waiting for open positions to close\n")
-                # Reset trade lock if positions are detected but lock is false
-            # This ensures proper sequential trading
-            if not TRADE_LOCK:
-                print(f"{broker_now} Detected open positions but trade lock was False. Resetting lock.")
-                TRADE_LOCK = True
-                
-            time.sleep(60)
-            continue
-        if broker_now.hour not in SESSION_HOURS:
-            print(f"{broker_now} Not in CRT session hours (Market Watch time). Waiting...")
-            with open("crt_skip_log.txt", "a") as f:
-                f.write(f"{broker_now} SKIP: Not in CRT session hours\n")
-            time.sleep(60)
-            continue
-        # Determine session name (example logic, customize as needed)
-        session_name = 'Other'
-        if 7 <= broker_now.hour < 15:
-            session_name = 'London'
-        elif 15 <= broker_now.hour < 22:
-            session_name = 'NY'
-        # Use advanced news filter with session-specific window
-        if is_news_blocking(session_name=session_name):
-            print(f"Skipping trading due to high-impact news event (session: {session_name}).")
-            with open("crt_skip_log.txt", "a") as f:
-                f.write(f"{broker_now} SKIP: High-impact news event (session: {session_name})\n")
-            time.sleep(1800)
-            continue
-        # --- Trend context ---
-        trend = get_trend_direction()
-        if trend is None:
-            print(f"{broker_now} No trend detected. Skipping.")
-            with open("crt_skip_log.txt", "a") as f:
-                f.write(f"{broker_now} SKIP: No trend detected\n")
-            time.sleep(60)
-            continue
-        h1_df = get_rates(SYMBOL, RANGE_TIMEFRAME, 30, 1)
-        if h1_df is None:
-            print("No H1 data. Waiting...")
-            with open("crt_skip_log.txt", "a") as f:
-                f.write(f"{broker_now} SKIP: No H1 data\n")
-            time.sleep(10)
-            continue
-        # --- CRT pattern detection ---
-        entry_found = False
-        crt_candle_idx = None
-        if STRICT_CRT_MODE:
-            # Strict: power-of-three pattern
-            range_candle = h1_df.iloc[0]
-            sweep_candle = h1_df.iloc[1]
-            confirm_candle = h1_df.iloc[2]
-            crt_high = range_candle['high']
-            crt_low = range_candle['low']
+# --- Lazy initialization: everything that touches the terminal or the disk ---
+def initialize(symbol=None):
+    """Connect to the terminal, resolve the symbol and build the live components.
+    Safe to call more than once. Returns False if the terminal connection failed."""
+    global SYMBOL, tick_pump, broker, deal_mirror, stop_model, bar_builder, supervisor
+    global last_signal_date, decision_log, trade_store, news_refresher, portfolio_risk, ACCOUNT, _initialized
+    if _initialized:
+        return True
+    if connect() is None:
+        return False
+    SYMBOL = symbol or detect_gold_symbol()
+
+    tick_pump = TickPump(SYMBOL, poll_interval=TICK_POLL_INTERVAL, api=gateway)
+    broker = BrokerState(SYMBOL, api=mt5, spec_ttl=SYMBOL_SPEC_TTL, tick_source=get_tick)
+    deal_mirror = DealMirror(api=mt5, clock=get_broker_time)
+    # Seeded with the $1.00 minimum stop tested on Exness gold
+    stop_model = StopDistanceModel(default_min_stop={SYMBOL: 1.0} if SYMBOL.startswith("XAU") else {})
+
+    # Widest lookback each timeframe needs over all stages
+    bar_builder = BarSnapshotBuilder(SYMBOL, api=mt5)
+    bar_builder.require(RANGE_TIMEFRAME, TREND_LOOKBACK, shift=1)  # Trend
+    bar_builder.require(RANGE_TIMEFRAME, RANGE_BARS, shift=1)      # CRT range
+    bar_builder.require(RANGE_TIMEFRAME, ATR_PERIOD + 10, shift=0) # ATR
+    bar_builder.require(ENTRY_TIMEFRAME, ENTRY_BARS, shift=1)      # FVG entry
+
+    supervisor = PositionSupervisor(
+        SYMBOL, broker, tick_pump, api=mt5,
+        refresh_seconds=POSITION_REFRESH_SECONDS,
+        move_sl=move_managed_sl,
+        on_positions=deal_mirror.track_positions,
+        on_position_closed=journal_closed_position,
+        on_trade_completed=lambda trade: release_trade_lock("both positions closed"),
+    )
+
+    ensure_journal().start()
+    decision_log = DecisionLog()
+    decision_log.start()
+    trade_store = TradeStore(source='live')
+    trade_store.start()
+    # Load last signal date from file (ensure it's always defined)
+    last_signal_date = None
+    if os.path.exists(LAST_SIGNAL_FILE):
+        with open(LAST_SIGNAL_FILE, "r") as f:
+            last_signal_date = f.read().strip()
+    SESSION_NEWS_WINDOWS.update(NEWS_WINDOWS_BY_SESSION)
+    load_calendar()  # Calendar stored by the last refresh, until the news task refreshes it
+    news_refresher = NewsRefresher(interval=NEWS_REFRESH_SECONDS, retry_seconds=NEWS_RETRY_SECONDS, max_backoff=NEWS_MAX_BACKOFF)
+    portfolio_risk = PortfolioRisk()
+    spec = broker.symbol_spec()
+    portfolio_risk.add_symbol(SYMBOL, spec.trade_contract_size if spec else 100)
+    account = mt5.account_info()
+    ACCOUNT = account.login if account else None
+    sync_portfolio()
+    _initialized = True
+    return True
+
+# --- One pass of the CRT strategy ---
+def strategy_cycle():
+    """Run one pass of the strategy (status, filters, signal, order placement).
+    Returns the number of seconds to wait before the next pass."""
+    profiling = profiler.begin_iteration()
+    try:
+        with latency.span("cycle"):
+            return _strategy_cycle()
+    finally:
+        if profiling:
+            profiler.end_iteration()
+
+def _strategy_cycle():
+    global TRADE_LOCK, trades_today, last_trade_day, last_signal_date, last_trade_time
+    with latency.span("snapshot"):
+        snapshot = broker.begin_cycle()
+    broker_now = get_broker_time()
+    broker_day = broker_now.date()
+    session_name = get_session_name(broker_now.hour)
+    symbol_details = get_symbol_details()
+    min_stop = symbol_details["adjusted_min_stop"] if symbol_details else 3.0
+    
+    # Daily trade tracking
+    if last_trade_day != broker_day:
+        trades_today = 0
+        last_trade_day = broker_day
+        TRADE_LOCK = False  # Reset trade lock at the start of each new broker day
+        # Clear last signal file and in-memory variable to allow new trade for the new day
+        with open(LAST_SIGNAL_FILE, "w") as f:
+            f.write("")
+        last_signal_date = ""
+        print(f"\n{broker_now} New trading day started. Trade count reset to 0/3. Trade lock released. Duplicate signal reset.")
+    
+    # Clear display of current trading status
+    print(f"\n{broker_now} === SEQUENTIAL TRADING STATUS ===")
+    print(f"Trade lock active: {TRADE_LOCK}")
+    print(f"Trades taken today: {trades_today}/3")
+    print(f"Current positions: {len(snapshot.positions)}")
+    cycle_metrics = broker.cycle_metrics()
+    print(f"IPC calls last cycle: {cycle_metrics['total_calls']} {cycle_metrics['calls']}")
+    gateway_metrics = gateway.metrics()
+    print(f"MT5 gateway: {gateway_metrics['submitted']} requests, {gateway_metrics['coalesced']} coalesced, queue depth {gateway_metrics['queue_depth']}")
+    stop_stats = stop_model.summary()
+    print(f"Stop model: min stop {min_stop:.2f} ({session_name}) | retry rate {stop_stats['retry_rate']:.1%} over {stop_stats['submissions']} submissions")
+    
+    if trades_today >= 3:
+        print(f"{broker_now} Max 3 trades reached for {broker_day}. Not taking any more trades today.")
+        log_decision("SKIP", "limits", "Max 3 trades reached for the day", broker_now, trades_today=trades_today)
+        return 60
+    # Check if any positions are currently open - only take a new trade if no positions are open
+    current_positions = snapshot.positions
+    if current_positions and len(current_positions) > 0:
+        print(f"{broker_now} Positions already open. Waiting for them to close before taking a new trade.")
+        log_decision("SKIP", "limits", "Waiting for open positions to close", broker_now, positions=len(current_positions))
+        # Reset trade lock if positions are detected but lock is false
+        # This ensures proper sequential trading
+        if not TRADE_LOCK:
+            print(f"{broker_now} Detected open positions but trade lock was False. Resetting lock.")
+            TRADE_LOCK = True
+            
+        return 60
+    if broker_now.hour not in SESSION_HOURS:
+        print(f"{broker_now} Not in CRT session hours (Market Watch time). Waiting...")
+        log_decision("SKIP", "session", "Not in CRT session hours", broker_now, hour=broker_now.hour)
+        return 60
+    # Use advanced news filter with session-specific window
+    with latency.span("news_check"):
+        news_blocked = is_news_blocking(session_name=session_name, max_cache_age=NEWS_CACHE_MAX_AGE, fail_safe=NEWS_FAIL_SAFE)
+    if news_blocked:
+        blackout_end = news_blackout_until(session_name)
+        if blackout_end is None:
+            status = news_calendar_status()
+            print(f"Skipping trading: news calendar unknown (session: {session_name}).")
+            log_decision("SKIP", "news", "News calendar unavailable", broker_now, session=session_name,
+                         age=status['age'], failures=status['failures'], error=status['last_error'])
+            return 300
+        print(f"Skipping trading due to high-impact news event (session: {session_name}).")
+        log_decision("SKIP", "news", "High-impact news event", broker_now, session=session_name,
+                     until=datetime.fromtimestamp(blackout_end, timezone.utc))
+        # Check again once the blackout is over instead of a fixed 30 minutes
+        return min(1800, max(60, blackout_end - time.time() + 1))
+    # --- Trend context ---
+    # One copy_rates_from_pos per timeframe for the whole cycle
+    with latency.span("bars"):
+        bars = bar_builder.build()
+    with latency.span("trend"):
+        trend = get_trend_direction(bars)
+    if trend is None:
+        print(f"{broker_now} No trend detected. Skipping.")
+        log_decision("SKIP", "trend", "No trend detected", broker_now)
+        return 60
+    h1_df = bars.frame(RANGE_TIMEFRAME, RANGE_BARS, 1)
+    if h1_df is None:
+        print("No H1 data. Waiting...")
+        log_decision("SKIP", "data", "No H1 data", broker_now, timeframe=RANGE_TIMEFRAME)
+        return 10
+    # --- CRT pattern detection ---
+    scan_started = latency.now()
+    entry_found = False
+    crt_candle_idx = None
+    if STRICT_CRT_MODE:
+        # Strict: power-of-three pattern
+        range_candle = h1_df.iloc[0]
+        sweep_candle = h1_df.iloc[1]
+        confirm_candle = h1_df.iloc[2]
+        crt_high = range_candle['high']
+        crt_low = range_candle['low']
+        # Log CRT range
+        print(f"{broker_now} CRT Range (Strict): High={crt_high}, Low={crt_low}")
+        log_decision("INFO", "range", "CRT range (strict)", broker_now, high=crt_high, low=crt_low, candle=range_candle.name)
+        sweeped_high = sweep_candle['high'] > crt_high
+        sweeped_low = sweep_candle['low'] < crt_low
+        confirm_in_range = (crt_low < confirm_candle['close'] < crt_high)
+        # Log sweep detection
+        if sweeped_high or sweeped_low:
+            sweep_dir = 'HIGH' if sweeped_high else 'LOW'
+            sweep_price = sweep_candle['high'] if sweeped_high else sweep_candle['low']
+            print(f"{broker_now} Sweep detected ({sweep_dir}) at {sweep_candle.name} price={sweep_price}")
+            log_decision("INFO", "sweep", "Sweep detected", broker_now, side=sweep_dir, candle=sweep_candle.name, price=sweep_price)
+        if not ((sweeped_high or sweeped_low) and confirm_in_range):
+            print(f"{broker_now} No CRT power-of-three pattern.")
+            log_decision("SKIP", "pattern", "No CRT power-of-three pattern", broker_now)
+            latency.observe("range_scan", scan_started)
+            return 60
+        direction = 'SELL' if sweeped_high else 'BUY'
+        crt_candle_idx = 0
+        entry_found = True
+    else:
+        # Flexible: any sweep and close back inside range, trend-aware, premium/discount filter
+        for i in range(1, len(h1_df)):
+            prev = h1_df.iloc[i-1]
+            curr = h1_df.iloc[i]
+            crt_high = prev['high']
+            crt_low = prev['low']
             # Log CRT range
-            log_msg = f"{broker_now} CRT Range (Strict): High={crt_high}, Low={crt_low}"
-            print(log_msg)
-            with open("crt_skip_log.txt", "a") as f:
-                f.write(log_msg + "\n")
-            sweeped_high = sweep_candle['high'] > crt_high
-            sweeped_low = sweep_candle['low'] < crt_low
-            confirm_in_range = (crt_low < confirm_candle['close'] < crt_high)
-            # Log sweep detection
-            if sweeped_high or sweeped_low:
-                sweep_dir = 'HIGH' if sweeped_high else 'LOW'
-                sweep_price = sweep_candle['high'] if sweeped_high else sweep_candle['low']
-                log_msg = f"{broker_now} Sweep detected ({sweep_dir}) at {sweep_candle.name} price={sweep_price}"
-                print(log_msg)
-                with open("crt_skip_log.txt", "a") as f:
-                    f.write(log_msg + "\n")
-            if not ((sweeped_high or sweeped_low) and confirm_in_range):
-                print(f"{broker_now} No CRT power-of-three pattern.")
-                with open("crt_skip_log.txt", "a") as f:
-                    f.write(f"{broker_now} SKIP: No CRT power-of-three pattern\n")
-                time.sleep(60)
-                continue
-            direction = 'SELL' if sweeped_high else 'BUY'
-            crt_candle_idx = 0
-            entry_found = True
+            print(f"{broker_now} CRT Range (Flexible): High={crt_high}, Low={crt_low}")
+            log_decision("INFO", "range", "CRT range (flexible)", broker_now, high=crt_high, low=crt_low, candle=prev.name)
+            # For uptrend, look for bearish candle sweep below low and close back in range
+            if trend == 'UP' and prev['close'] < prev['open']:
+                if curr['low'] < crt_low and crt_low < curr['close'] < crt_high:
+                    if is_in_premium_discount_zone(prev, trend, h1_df):
+                        print(f"{broker_now} Sweep detected (LOW) at {curr.name} price={curr['low']} (UP trend)")
+                        log_decision("INFO", "sweep", "Sweep detected", broker_now, side="LOW", candle=curr.name, price=curr['low'], trend=trend)
+                        direction = 'BUY'
+                        crt_candle_idx = i-1
+                        entry_found = True
+                        break
+            # For downtrend, look for bullish candle sweep above high and close back in range
+            if trend == 'DOWN' and prev['close'] > prev['open']:
+                if curr['high'] > crt_high and crt_low < curr['close'] < crt_high:
+                    if is_in_premium_discount_zone(prev, trend, h1_df):
+                        print(f"{broker_now} Sweep detected (HIGH) at {curr.name} price={curr['high']} (DOWN trend)")
+                        log_decision("INFO", "sweep", "Sweep detected", broker_now, side="HIGH", candle=curr.name, price=curr['high'], trend=trend)
+                        direction = 'SELL'
+                        crt_candle_idx = i-1
+                        entry_found = True
+                        break
+        if not entry_found:
+            print(f"{broker_now} No flexible CRT sweep/close-in-range pattern.")
+            log_decision("SKIP", "pattern", "No flexible CRT sweep/close-in-range pattern", broker_now, trend=trend)
+            latency.observe("range_scan", scan_started)
+            return 60
+    latency.observe("range_scan", scan_started)
+    # --- Lower timeframe entry (FVG, refined: closest to sweep) ---
+    m5_df = bars.frame(ENTRY_TIMEFRAME, ENTRY_BARS, 1)
+    if m5_df is None:
+        print("No M5 data. Waiting...")
+        log_decision("SKIP", "data", "No M5 data", broker_now, timeframe=ENTRY_TIMEFRAME)
+        return 10
+    scan_started = latency.now()
+    entry_candle = None
+    fvg_candidates = []
+    sweep_time = None
+    if crt_candle_idx is not None:
+        sweep_time = h1_df.iloc[crt_candle_idx+1].name  # time of sweep candle
+    print(f"{broker_now} Switching to {ENTRY_TIMEFRAME} for FVG refinement after sweep at {sweep_time}")
+    log_decision("INFO", "entry", "FVG refinement", broker_now, timeframe=ENTRY_TIMEFRAME, sweep_time=sweep_time, direction=direction)
+    if direction == 'BUY':
+        # Look for all bullish FVGs (gap between previous high and current low) after the sweep
+        for i in range(1, len(m5_df)):
+            if m5_df.iloc[i]['low'] > m5_df.iloc[i-1]['high']:
+                if sweep_time is None or m5_df.index[i] >= sweep_time:
+                    fvg_candidates.append(m5_df.iloc[i])
+        if fvg_candidates:
+            entry_candle = fvg_candidates[0]
+            print(f"{broker_now} FVG selected for entry (BUY) at {entry_candle.name} price={entry_candle['low']}")
+            log_decision("INFO", "entry", "FVG selected", broker_now, direction="BUY", candle=entry_candle.name, price=entry_candle['low'])
         else:
-            # Flexible: any sweep and close back inside range, trend-aware, premium/discount filter
-            for i in range(1, len(h1_df)):
-                prev = h1_df.iloc[i-1]
-                curr = h1_df.iloc[i]
-                crt_high = prev['high']
-                crt_low = prev['low']
-                # Log CRT range
-                log_msg = f"{broker_now} CRT Range (Flexible): High={crt_high}, Low={crt_low}"
-                print(log_msg)
-                with open("crt_skip_log.txt", "a") as f:
-                    f.write(log_msg + "\n")
-                # For uptrend, look for bearish candle sweep below low and close back in range
-                if trend == 'UP' and prev['close'] < prev['open']:
-                    if curr['low'] < crt_low and crt_low < curr['close'] < crt_high:
-                        if is_in_premium_discount_zone(prev, trend, h1_df):
-                            log_msg = f"{broker_now} Sweep detected (LOW) at {curr.name} price={curr['low']} (UP trend)"
-                            print(log_msg)
-                            with open("crt_skip_log.txt", "a") as f:
-                                f.write(log_msg + "\n")
-                            direction = 'BUY'
-                            crt_candle_idx = i-1
-                            entry_found = True
-                            break
-                # For downtrend, look for bullish candle sweep above high and close back in range
-                if trend == 'DOWN' and prev['close'] > prev['open']:
-                    if curr['high'] > crt_high and crt_low < curr['close'] < crt_high:
-                        if is_in_premium_discount_zone(prev, trend, h1_df):
-                            log_msg = f"{broker_now} Sweep detected (HIGH) at {curr.name} price={curr['high']} (DOWN trend)"
-                            print(log_msg)
-                            with open("crt_skip_log.txt", "a") as f:
-                                f.write(log_msg + "\n")
-                            direction = 'SELL'
-                            crt_candle_idx = i-1
-                            entry_found = True
-                            break
-            if not entry_found:
-                print(f"{broker_now} No flexible CRT sweep/close-in-range pattern.")
-                with open("crt_skip_log.txt", "a") as f:
-                    f.write(f"{broker_now} SKIP: No flexible CRT sweep/close-in-range pattern\n")
-                time.sleep(60)
-                continue
-        # --- Lower timeframe entry (FVG, refined: closest to sweep) ---
-        m5_df = get_rates(SYMBOL, ENTRY_TIMEFRAME, 20, 1)
-        if m5_df is None:
-            print("No M5 data. Waiting...")
-            with open("crt_skip_log.txt", "a") as f:
-                f.write(f"{broker_now} SKIP: No M5 data\n")
-            time.sleep(10)
-            continue
-        entry_candle = None
-        fvg_candidates = []
-        sweep_time = None
-        if crt_candle_idx is not None:
-            sweep_time = h1_df.iloc[crt_candle_idx+1].name  # time of sweep candle
-        log_msg = f"{broker_now} Switching to {ENTRY_TIMEFRAME} for FVG refinement after sweep at {sweep_time}"
-        print(log_msg)
-        with open("crt_skip_log.txt", "a") as f:
-            f.write(log_msg + "\n")
-        if direction == 'BUY':
-            # Look for all bullish FVGs (gap between previous high and current low) after the sweep
-            for i in range(1, len(m5_df)):
-                if m5_df.iloc[i]['low'] > m5_df.iloc[i-1]['high']:
-                    if sweep_time is None or m5_df.index[i] >= sweep_time:
-                        fvg_candidates.append(m5_df.iloc[i])
-            if fvg_candidates:
-                entry_candle = fvg_candidates[0]
-                log_msg = f"{broker_now} FVG selected for entry (BUY) at {entry_candle.name} price={entry_candle['low']}"
-                print(log_msg)
-                with open("crt_skip_log.txt", "a") as f:
-                    f.write(log_msg + "\n")
-            else:
-                entry_candle = m5_df.iloc[-1]  # fallback: use last candle
-                log_msg = f"{broker_now} No FVG found after sweep, fallback to last M5 candle at {entry_candle.name}"
-                print(log_msg)
-                with open("crt_skip_log.txt", "a") as f:
-                    f.write(log_msg + "\n")
-            price = mt5.symbol_info_tick(SYMBOL).ask
+            entry_candle = m5_df.iloc[-1]  # fallback: use last candle
+            print(f"{broker_now} No FVG found after sweep, fallback to last M5 candle at {entry_candle.name}")
+            log_decision("INFO", "entry", "No FVG after sweep, using last candle", broker_now, direction=direction, candle=entry_candle.name)
+        price = get_tick().ask
+    else:
+        # Look for all bearish FVGs (gap between previous low and current high) after the sweep
+        for i in range(1, len(m5_df)):
+            if m5_df.iloc[i]['high'] < m5_df.iloc[i-1]['low']:
+                if sweep_time is None or m5_df.index[i] >= sweep_time:
+                    fvg_candidates.append(m5_df.iloc[i])
+        if fvg_candidates:
+            entry_candle = fvg_candidates[0]
+            print(f"{broker_now} FVG selected for entry (SELL) at {entry_candle.name} price={entry_candle['high']}")
+            log_decision("INFO", "entry", "FVG selected", broker_now, direction="SELL", candle=entry_candle.name, price=entry_candle['high'])
         else:
-            # Look for all bearish FVGs (gap between previous low and current high) after the sweep
-            for i in range(1, len(m5_df)):
-                if m5_df.iloc[i]['high'] < m5_df.iloc[i-1]['low']:
-                    if sweep_time is None or m5_df.index[i] >= sweep_time:
-                        fvg_candidates.append(m5_df.iloc[i])
-            if fvg_candidates:
-                entry_candle = fvg_candidates[0]
-                log_msg = f"{broker_now} FVG selected for entry (SELL) at {entry_candle.name} price={entry_candle['high']}"
-                print(log_msg)
-                with open("crt_skip_log.txt", "a") as f:
-                    f.write(log_msg + "\n")
-            else:
-                entry_candle = m5_df.iloc[-1]  # fallback: use last candle
-                log_msg = f"{broker_now} No FVG found after sweep, fallback to last M5 candle at {entry_candle.name}"
-                print(log_msg)
-                with open("crt_skip_log.txt", "a") as f:
-                    f.write(log_msg + "\n")
-            price = mt5.symbol_info_tick(SYMBOL).bid
-        # --- After entry_candle is found and before trade logic ---
-        if entry_candle is None:
-            print(f"{broker_now} No CRT entry signal.")
-            with open("crt_skip_log.txt", "a") as f:
-                f.write(f"{broker_now} SKIP: No CRT entry signal\n")
-            time.sleep(60)
-            continue
-        # Prevent duplicate trades on same daily candle (across restarts)
-        entry_date = str(entry_candle.name)[:10]  # YYYY-MM-DD
-        today = str(broker_now.date())
-        if last_signal_date == today:
-            print(f"{broker_now} Duplicate CRT signal detected for {today}. Skipping trade.")
-            with open("crt_skip_log.txt", "a") as f:
-                f.write(f"{broker_now} SKIP: Duplicate CRT signal detected for {today}\n")
-            time.sleep(60)
-            continue
-        # Save new signal date after trade is placed
-        last_trade_time = entry_candle.name
-        with open(LAST_SIGNAL_FILE, "w") as f:
-            f.write(today)
+            entry_candle = m5_df.iloc[-1]  # fallback: use last candle
+            print(f"{broker_now} No FVG found after sweep, fallback to last M5 candle at {entry_candle.name}")
+            log_decision("INFO", "entry", "No FVG after sweep, using last candle", broker_now, direction=direction, candle=entry_candle.name)
+        price = get_tick().bid
+    latency.observe("fvg_scan", scan_started)
+    # --- After entry_candle is found and before trade logic ---
+    if entry_candle is None:
+        print(f"{broker_now} No CRT entry signal.")
+        log_decision("SKIP", "entry", "No CRT entry signal", broker_now)
+        return 60
+    # Prevent duplicate trades on same daily candle (across restarts)
+    entry_date = str(entry_candle.name)[:10]  # YYYY-MM-DD
+    today = str(broker_now.date())
+    if last_signal_date == today:
+        print(f"{broker_now} Duplicate CRT signal detected for {today}. Skipping trade.")
+        log_decision("SKIP", "signal", "Duplicate CRT signal", broker_now, day=today)
+        return 60
+    # Save new signal date after trade is placed
+    last_trade_time = entry_candle.name
+    with open(LAST_SIGNAL_FILE, "w") as f:
+        f.write(today)
+    
+    # --- SL/TP and R:R Calculation with ATR-based dynamic stops ---
+    spec = broker.symbol_spec()
+    if spec is None:
+        print("Failed to get symbol info")
+        return 60
+    
+    # Get stop level in points and convert to price units
+    stops_level = spec.trade_stops_level
+    point = spec.point
+    digits = spec.digits
+    
+    print(f"Symbol info: trade_stops_level={stops_level}, point={point}, digits={digits}")
+    
+    # Calculate ATR for dynamic stop-loss based on market volatility
+    # For XAUUSDm, this will give appropriate stop distance based on current market conditions
+    with latency.span("atr"):
+        atr_value = calculate_atr(SYMBOL, RANGE_TIMEFRAME, period=ATR_PERIOD, bars=bars)
+    if atr_value is None:
+        print("Failed to calculate ATR, using fixed buffer")
+        atr_value = SL_BUFFER
+    else:
+        print(f"ATR value for {SYMBOL} on {RANGE_TIMEFRAME} timeframe: {atr_value:.2f}")
+    
+    # For gold specifically, ensure minimum stop distance is adequate
+    # Gold is typically quoted with 2 decimal places (e.g., 1945.00)
+    if SYMBOL.startswith("XAU"):
+        # Use 1.2x ATR or minimum buffer, whichever is larger (reduced multiplier from 1.5x)
+        dynamic_sl_buffer = max(atr_value * 1.2, MIN_SL_DISTANCE)
+        # Use a fixed minimum SL distance for gold that we know works
+        min_stop_price = MIN_SL_DISTANCE
+    else:
+        dynamic_sl_buffer = max(atr_value * 1.2, SL_BUFFER)  # Reduced multiplier from 1.5x
+        min_stop_price = stops_level * point
+        if min_stop_price < 0.0001:
+            min_stop_price = MIN_SL_DISTANCE
+    
+    print(f"Symbol {SYMBOL} | Using dynamic SL buffer: {dynamic_sl_buffer:.2f} | Min stop in price: {min_stop_price:.2f}")
+    
+    if direction == 'BUY':
+        # Calculate preferred SL based on entry candle and ATR
+        preferred_sl = entry_candle['low'] - dynamic_sl_buffer
+        
+        # Enforce minimum broker stop distance
+        required_sl = price - min_stop_price
         
-        # --- SL/TP and R:R Calculation with ATR-based dynamic stops ---
-        symbol_info = mt5.symbol_info(SYMBOL)
-        if symbol_info is None:
-            print("Failed to get symbol info")
-            time.sleep(60)
-            continue
+        # Use the lower (further from price) of the two values for safety
+        sl = min(preferred_sl, required_sl)
+        sl = round(sl, digits)
+        # Calculate take profits - more conservative to prevent frequent SL hits
+        # Use closer targets for higher profitability rate (0.65:1 and 1.3:1)
+        tp1 = round(price + (dynamic_sl_buffer * 0.65), digits)  # 0.65:1 R:R for first target (closer)
+        tp2 = round(price + (dynamic_sl_buffer * 1.3), digits)  # 1.3:1 R:R for second target (closer)
         
-        # Get stop level in points and convert to price units
-        # Access properties via the _asdict() method which is the proper way to access named tuple attributes
-        symbol_dict = symbol_info._asdict()
+        # Calculate risk and reward
+        risk = abs(price - sl)
+        rr1 = abs(tp1 - price) / risk if risk > 0 else 0
+        rr2 = abs(tp2 - price) / risk if risk > 0 else 0
+    else:  # SELL
+        # Calculate preferred SL based on entry candle and ATR
+        preferred_sl = entry_candle['high'] + dynamic_sl_buffer
         
-        # Get the trade_stops_level from the dictionary
-        stops_level = symbol_dict.get('trade_stops_level', 0)
-        point = symbol_dict.get('point', 0.001)
-        digits = symbol_dict.get('digits', 3)
+        # Enforce minimum broker stop distance
+        required_sl = price + min_stop_price
         
-        print(f"Symbol info: trade_stops_level={stops_level}, point={point}, digits={digits}")
+        # Use the higher (further from price) of the two values for safety
+        sl = max(preferred_sl, required_sl)
+        sl = round(sl, digits)
+        # Calculate take profits - more conservative to prevent frequent SL hits
+        tp1 = round(price - (dynamic_sl_buffer * 0.65), digits)  # 0.65:1 R:R for first target (closer)
+        tp2 = round(price - (dynamic_sl_buffer * 1.3), digits)  # 1.3:1 R:R for second target (closer)
         
-        # Calculate ATR for dynamic stop-loss based on market volatility
-        # For XAUUSDm, this will give appropriate stop distance based on current market conditions
-        atr_value = calculate_atr(SYMBOL, RANGE_TIMEFRAME, period=14)
-        if atr_value is None:
-            print("Failed to calculate ATR, using fixed buffer")
-            atr_value = SL_BUFFER
-        else:
-            print(f"ATR value for {SYMBOL} on {RANGE_TIMEFRAME} timeframe: {atr_value:.2f}")
+        # Calculate risk and reward
+        risk = abs(price - sl)
+        rr1 = abs(price - tp1) / risk if risk > 0 else 0
+        rr2 = abs(price - tp2) / risk if risk > 0 else 0
         
-        # For gold specifically, ensure minimum stop distance is adequate
-        # Gold is typically quoted with 2 decimal places (e.g., 1945.00)
+    # Add detailed debugging to diagnose stop level issues
+    print(f"Order details: {direction} | price={price} | sl={sl} | preferred_sl={preferred_sl if direction=='BUY' else preferred_sl} | required_sl={required_sl if direction=='BUY' else required_sl}")
+    print(f"Order validation: SL distance={abs(price-sl):.2f} | Min required={min_stop_price:.2f} | Valid={abs(price-sl) >= min_stop_price}")
+    # Double-check SL validity before sending order
+    if direction == 'BUY' and price - sl < min_stop_price:
+        # Recalculate SL with a small safety buffer for gold
         if SYMBOL.startswith("XAU"):
-            # Use 1.2x ATR or minimum buffer, whichever is larger (reduced multiplier from 1.5x)
-            dynamic_sl_buffer = max(atr_value * 1.2, MIN_SL_DISTANCE)
-            # Use a fixed minimum SL distance for gold that we know works
-            min_stop_price = MIN_SL_DISTANCE
+            sl = price - min_stop  # Learned minimum SL distance for gold
         else:
-            dynamic_sl_buffer = max(atr_value * 1.2, SL_BUFFER)  # Reduced multiplier from 1.5x
-            min_stop_price = stops_level * point
-            if min_stop_price < 0.0001:
-                min_stop_price = MIN_SL_DISTANCE
-        
-        print(f"Symbol {SYMBOL} | Using dynamic SL buffer: {dynamic_sl_buffer:.2f} | Min stop in price: {min_stop_price:.2f}")
-        
-        if direction == 'BUY':
-            # Calculate preferred SL based on entry candle and ATR
-            preferred_sl = entry_candle['low'] - dynamic_sl_buffer
-            
-            # Enforce minimum broker stop distance
-            required_sl = price - min_stop_price
-            
-            # Use the lower (further from price) of the two values for safety
-            sl = min(preferred_sl, required_sl)
-            sl = round(sl, digits)
-            # Calculate take profits - more conservative to prevent frequent SL hits
-            # Use closer targets for higher profitability rate (0.65:1 and 1.3:1)
-            tp1 = round(price + (dynamic_sl_buffer * 0.65), digits)  # 0.65:1 R:R for first target (closer)
-            tp2 = round(price + (dynamic_sl_buffer * 1.3), digits)  # 1.3:1 R:R for second target (closer)
-            
-            # Calculate risk and reward
-            risk = abs(price - sl)
-            rr1 = abs(tp1 - price) / risk if risk > 0 else 0
-            rr2 = abs(tp2 - price) / risk if risk > 0 else 0
-        else:  # SELL
-            # Calculate preferred SL based on entry candle and ATR
-            preferred_sl = entry_candle['high'] + dynamic_sl_buffer
-            
-            # Enforce minimum broker stop distance
-            required_sl = price + min_stop_price
-            
-            # Use the higher (further from price) of the two values for safety
-            sl = max(preferred_sl, required_sl)
-            sl = round(sl, digits)
-            # Calculate take profits - more conservative to prevent frequent SL hits
-            tp1 = round(price - (dynamic_sl_buffer * 0.65), digits)  # 0.65:1 R:R for first target (closer)
-            tp2 = round(price - (dynamic_sl_buffer * 1.3), digits)  # 1.3:1 R:R for second target (closer)
-            
-            # Calculate risk and reward
-            risk = abs(price - sl)
-            rr1 = abs(price - tp1) / risk if risk > 0 else 0
-            rr2 = abs(price - tp2) / risk if risk > 0 else 0
-            
-        # Add detailed debugging to diagnose stop level issues
-        print(f"Order details: {direction} | price={price} | sl={sl} | preferred_sl={preferred_sl if direction=='BUY' else preferred_sl} | required_sl={required_sl if direction=='BUY' else required_sl}")
-        print(f"Order validation: SL distance={abs(price-sl):.2f} | Min required={min_stop_price:.2f} | Valid={abs(price-sl) >= min_stop_price}")
-        # Double-check SL validity before sending order
-        if direction == 'BUY' and price - sl < min_stop_price:
-            # Recalculate SL with a small safety buffer for gold
-            if SYMBOL.startswith("XAU"):
-                sl = price - 1.0  # $1.00 minimum SL distance for gold
-            else:
-                sl = price - (min_stop_price * 1.1)  # Add 10% safety margin
-            sl = round(sl, digits)
-            print(f"⚠️ Buy SL too close! Adjusted to: {sl}, distance: {price-sl:.2f}")
-        elif direction == 'SELL' and sl - price < min_stop_price:
-            # Recalculate SL with a small safety buffer for gold
-            if SYMBOL.startswith("XAU"):
-                sl = price + 1.0  # $1.00 minimum SL distance for gold
-            else:
-                sl = price + (min_stop_price * 1.1)  # Add 10% safety margin
-            sl = round(sl, digits)
-            print(f"⚠️ Sell SL too close! Adjusted to: {sl}, distance: {sl-price:.2f}")
-            
-        # Recalculate risk and R:R after any SL adjustments
-        risk = abs(price - sl)
-        if direction == 'BUY':
-            rr1 = abs(tp1 - price) / risk if risk > 0 else 0
-            rr2 = abs(tp2 - price) / risk if risk > 0 else 0
+            sl = price - (min_stop_price * 1.1)  # Add 10% safety margin
+        sl = round(sl, digits)
+        print(f"⚠️ Buy SL too close! Adjusted to: {sl}, distance: {price-sl:.2f}")
+    elif direction == 'SELL' and sl - price < min_stop_price:
+        # Recalculate SL with a small safety buffer for gold
+        if SYMBOL.startswith("XAU"):
+            sl = price + min_stop  # Learned minimum SL distance for gold
         else:
-            rr1 = abs(price - tp1) / risk if risk > 0 else 0
-            rr2 = abs(price - tp2) / risk if risk > 0 else 0
-        # --- Dynamic lot size for 1% risk per trade ---    account = mt5.account_info()
-        balance = account.balance if account else 10000
+            sl = price + (min_stop_price * 1.1)  # Add 10% safety margin
+        sl = round(sl, digits)
+        print(f"⚠️ Sell SL too close! Adjusted to: {sl}, distance: {sl-price:.2f}")
         
-        # Get symbol info and safely access trade_contract_size through dictionary
-        symbol_info_obj = mt5.symbol_info(SYMBOL)
-        if symbol_info_obj:
-            symbol_info_dict = symbol_info_obj._asdict()
-            contract_size = symbol_info_dict.get('trade_contract_size', 100)
-        else:
-            contract_size = 100
-        max_risk = balance * RISK_PER_TRADE
-        # For gold, pip value is usually $1 per lot per $1 move, but use contract_size for safety
-        lot_size = max_risk / (risk * contract_size) if risk > 0 else 0.01
-        lot_size = max(lot_size, 0.01)  # enforce broker minimum
-        half_lot = round(lot_size / 2, 2)
-        # Only trade if R:R to at least one TP is MIN_RR+
-        if max(rr1, rr2) < MIN_RR:
-            print(f"{broker_now} R:R too low (TP1: {rr1:.2f}, TP2: {rr2:.2f}). Skipping trade.")
-            with open("crt_skip_log.txt", "a") as f:
-                f.write(f"{broker_now} SKIP: R:R too low (TP1: {rr1:.2f}, TP2: {rr2:.2f})\n")
-            time.sleep(60)
-            continue    # Check if trade lock is active
-        if TRADE_LOCK:
-            print(f"{broker_now} Trading lock active. Skipping signal.")
-            with open("crt_skip_log.txt", "a") as f:
-                f.write(f"{broker_now} SKIP: Trading lock active\n")
-            time.sleep(60)
-            continue
-            
-        # Activate the trade lock to prevent duplicate entries
-        TRADE_LOCK = True
+    # Recalculate risk and R:R after any SL adjustments
+    risk = abs(price - sl)
+    if direction == 'BUY':
+        rr1 = abs(tp1 - price) / risk if risk > 0 else 0
+        rr2 = abs(tp2 - price) / risk if risk > 0 else 0
+    else:
+        rr1 = abs(price - tp1) / risk if risk > 0 else 0
+        rr2 = abs(price - tp2) / risk if risk > 0 else 0
+    # --- Dynamic lot size for 1% risk per trade ---
+    account = broker.account()
+    balance = account.balance if account else 10000
+    
+    # Contract size from the cached symbol spec
+    contract_size = spec.trade_contract_size
+    max_risk = balance * RISK_PER_TRADE
+    # For gold, pip value is usually $1 per lot per $1 move, but use contract_size for safety
+    lot_size = max_risk / (risk * contract_size) if risk > 0 else 0.01
+    lot_size = max(lot_size, 0.01)  # enforce broker minimum
+    half_lot = round(lot_size / 2, 2)
+    # Only trade if R:R to at least one TP is MIN_RR+
+    if max(rr1, rr2) < MIN_RR:
+        print(f"{broker_now} R:R too low (TP1: {rr1:.2f}, TP2: {rr2:.2f}). Skipping trade.")
+        log_decision("SKIP", "risk", "R:R too low", broker_now, rr1=round(rr1, 2), rr2=round(rr2, 2))
+        return 60
+    if TRADE_LOCK:
+        print(f"{broker_now} Trading lock active. Skipping signal.")
+        log_decision("SKIP", "limits", "Trading lock active", broker_now)
+        return 60
         
-        # Use the already calculated dynamic SL distance that considers ATR
-        # We've already calculated this in the previous section
-        min_stop_price = MIN_SL_DISTANCE
+    # Activate the trade lock to prevent duplicate entries
+    TRADE_LOCK = True
+    
+    # Use the already calculated dynamic SL distance that considers ATR
+    # We've already calculated this in the previous section
+    min_stop_price = MIN_SL_DISTANCE
 
-        print(f"Using minimum SL distance of {min_stop_price:.2f} for {SYMBOL}")
-        
-        # Get current exact price
-        current_tick = mt5.symbol_info_tick(SYMBOL)
-        if current_tick is None:
-            print("Failed to get current price tick")
-            TRADE_LOCK = False  # Release lock
-            time.sleep(10)
-            continue
-        
-        # Use the exact current price with zero slippage for more accurate SL calculation
-        if direction == 'BUY':
-            current_price = current_tick.ask
-            # Set SL at a safe distance - fixed value for gold
-            sl = current_price - min_stop_price
-            sl = round(sl, digits)
-            print(f"Setting BUY SL at {min_stop_price:.2f} distance: price={current_price}, sl={sl}")
-        else:  # SELL
-            current_price = current_tick.bid
-            # Set SL at a safe distance - fixed value for gold
-            sl = current_price + min_stop_price
-            sl = round(sl, digits)
-            print(f"Setting SELL SL at {min_stop_price:.2f} distance: price={current_price}, sl={sl}")
-        
-        # Place order (split into two positions for partial TP)
-        # First position: TP1 (mid-range)
-        request1 = {
-            "action": mt5.TRADE_ACTION_DEAL,
-            "symbol": SYMBOL,
-            "volume": half_lot,
-            "type": mt5.ORDER_TYPE_SELL if direction == 'SELL' else mt5.ORDER_TYPE_BUY,
-            "price": current_price,  # Use exact current price instead of calculated price
-            "sl": sl,
-            "tp": tp1,
-            "deviation": 20,
-            "magic": 123456,
-            "comment": "CRT advanced TP1",
-            "type_time": mt5.ORDER_TIME_GTC,
-            "type_filling": mt5.ORDER_FILLING_IOC,
-        }
-        
-        # Second position: TP2 (full range)
-        request2 = {
-            "action": mt5.TRADE_ACTION_DEAL,
-            "symbol": SYMBOL,
-            "volume": half_lot,
-            "type": mt5.ORDER_TYPE_SELL if direction == 'SELL' else mt5.ORDER_TYPE_BUY,
-            "price": current_price,  # Use exact current price instead of calculated price
-            "sl": sl,
-            "tp": tp2,
-            "deviation": 20,
-            "magic": 123457,
-            "comment": "CRT advanced TP2",
-            "type_time": mt5.ORDER_TIME_GTC,
-            "type_filling": mt5.ORDER_FILLING_IOC,
-        }
+    print(f"Using minimum SL distance of {min_stop_price:.2f} for {SYMBOL}")
+    
+    # Get current exact price
+    current_tick = get_tick()
+    if current_tick is None:
+        print("Failed to get current price tick")
+        TRADE_LOCK = False  # Release lock
+        return 10
+    
+    # Use the exact current price with zero slippage for more accurate SL calculation
+    if direction == 'BUY':
+        current_price = current_tick.ask
+        # Set SL at a safe distance - fixed value for gold
+        sl = current_price - min_stop_price
+        sl = round(sl, digits)
+        print(f"Setting BUY SL at {min_stop_price:.2f} distance: price={current_price}, sl={sl}")
+    else:  # SELL
+        current_price = current_tick.bid
+        # Set SL at a safe distance - fixed value for gold
+        sl = current_price + min_stop_price
+        sl = round(sl, digits)
+        print(f"Setting SELL SL at {min_stop_price:.2f} distance: price={current_price}, sl={sl}")
+    
+    # Never submit a stop closer than the learned broker minimum
+    safe_sl = stop_model.safe_sl(SYMBOL, session_name, direction, current_price, sl, digits)
+    if safe_sl != sl:
+        print(f"SL {sl} is closer than the learned minimum stop, using {safe_sl}")
+        sl = safe_sl
+    
+    # Place order (split into two positions for partial TP)
+    # First position: TP1 (mid-range), second position: TP2 (full range)
+    request1, request2 = build_bracket_requests(mt5, SYMBOL, direction, half_lot, current_price, sl, tp1, tp2)
+    
+    # Calculate final risk-reward after all adjustments
+    risk = abs(current_price - sl)
+    if direction == 'BUY':
+        rr1 = abs(tp1 - current_price) / risk if risk > 0 else 0
+        rr2 = abs(tp2 - current_price) / risk if risk > 0 else 0
+    else:
+        rr1 = abs(current_price - tp1) / risk if risk > 0 else 0
+        rr2 = abs(current_price - tp2) / risk if risk > 0 else 0
+    
+    # Check R:R one last time
+    if max(rr1, rr2) < MIN_RR:
+        print(f"{broker_now} Final R:R too low after SL adjustments (TP1: {rr1:.2f}, TP2: {rr2:.2f}). Skipping trade.")
+        log_decision("SKIP", "risk", "Final R:R too low after SL adjustments", broker_now, rr1=round(rr1, 2), rr2=round(rr2, 2))
+        return 60
+    
+    # Portfolio limits over every symbol of the account, for the whole bracket
+    if account is not None:
+        portfolio_risk.set_equity(ACCOUNT, account.equity)
+    with latency.span("portfolio_check"):
+        risk_check = portfolio_risk.check(ACCOUNT, SYMBOL, direction, half_lot * 2, current_price, sl)
+    if not risk_check.ok:
+        print(f"{broker_now} Portfolio limit reached ({risk_check.reason}): open risk {risk_check.open_risk:.2f}, "
+              f"correlated risk {risk_check.correlated_risk:.2f}, margin {risk_check.margin:.2f}. Skipping trade.")
+        log_decision("SKIP", "portfolio", "Portfolio limit reached", broker_now, limit=risk_check.reason,
+                     open_risk=round(risk_check.open_risk, 2), correlated_risk=round(risk_check.correlated_risk, 2),
+                     margin=round(risk_check.margin, 2), positions=risk_check.positions)
+        TRADE_LOCK = False
+        return 60
+    
+    store_event('signals', time=broker_now, symbol=SYMBOL, direction=direction, entry_price=current_price,
+                sl=sl, tp1=tp1, tp2=tp2, rr1=rr1, rr2=rr2, crt_high=crt_high, crt_low=crt_low,
+                comment=f"entry candle {entry_candle.name}")
+    
+    # Pre-flight both legs with order_check, then send them back-to-back.
+    # Journaling and any per-leg fallback only happen after both sends returned.
+    leg_fallback = lambda leg, request, result: send_leg_with_stop_fallback(request, result, current_price, digits)
+    print(f"Sending bracket: {direction} | Price: {current_price} | SL: {sl} | TP1: {tp1} | TP2: {tp2} | SL Distance: {abs(current_price-sl):.2f}")
+    with latency.span("order_send"):
+        bracket = submit_bracket(mt5, request1, request2, leg_fallback=leg_fallback, on_partial=BRACKET_ON_PARTIAL)
+    retries = record_stop_outcomes(bracket, current_price, session_name)
+    
+    if bracket.status == CHECK_FAILED and 10016 in bracket.check_retcodes():  # Invalid stops error
+        print(f"⚠️ INVALID STOPS reported by order_check:")
+        print(f"  Symbol: {SYMBOL}")
+        print(f"  Direction: {direction}")
+        print(f"  Price: {current_price}")
+        print(f"  SL: {sl} (distance: {abs(current_price-sl):.2f})")
+        print(f"  Min required: {min_stop_price:.2f}")
+        print(f"  Point value: {symbol_details['point'] if symbol_details else 'unknown'}")
+        print(f"  Stops level: {symbol_details['stops_level'] if symbol_details else 'unknown'}")
+        # The broker rejected our stops: re-read the symbol spec on the next lookup
+        broker.invalidate_spec()
         
-        # Calculate final risk-reward after all adjustments
-        risk = abs(current_price - sl)
-        if direction == 'BUY':
-            rr1 = abs(tp1 - current_price) / risk if risk > 0 else 0
-            rr2 = abs(tp2 - current_price) / risk if risk > 0 else 0
-        else:
-            rr1 = abs(current_price - tp1) / risk if risk > 0 else 0
-            rr2 = abs(current_price - tp2) / risk if risk > 0 else 0
+        # Exness sometimes requires larger stop-loss for XAUUSDm
+        # Instead of trying multiple values, immediately use a large enough value
+        if SYMBOL.startswith("XAU"):
+            # Use a fixed SL distance that we know works with Exness
+            safe_distance = MIN_SL_DISTANCE * 1.1  # 10% larger than our minimum (reduced from 20%)
+            if direction == 'BUY':
+                sl = round(current_price - safe_distance, digits)
+            else:
+                sl = round(current_price + safe_distance, digits)
+            print(f"Using safe SL distance of {safe_distance:.2f} → SL: {sl}")
+            request1["sl"] = sl
+            request2["sl"] = sl
         
-        # Check R:R one last time
-        if max(rr1, rr2) < MIN_RR:
-            print(f"{broker_now} Final R:R too low after SL adjustments (TP1: {rr1:.2f}, TP2: {rr2:.2f}). Skipping trade.")
-            with open("crt_skip_log.txt", "a") as f:
-                f.write(f"{broker_now} SKIP: Final R:R too low after SL adjustments (TP1: {rr1:.2f}, TP2: {rr2:.2f})\n")
-            time.sleep(60)
-            continue
+        # Send without a second pre-flight; legs still rejected go through the fallback
+        with latency.span("order_send"):
+            bracket = submit_bracket(mt5, request1, request2, check=False, leg_fallback=leg_fallback, on_partial=BRACKET_ON_PARTIAL)
+        retries += record_stop_outcomes(bracket, current_price, session_name)
+    stop_model.record_submission(retries)
+    
+    result1, result2 = bracket.results
+    skew_msg = f"{broker_now} INFO: Bracket {bracket.status} | checks={bracket.check_retcodes()} sends={bracket.send_retcodes()}"
+    if bracket.time_skew_ms is not None:
+        skew_msg += f" | leg skew {bracket.time_skew_ms:.1f}ms"
+    if bracket.price_skew is not None:
+        skew_msg += f", price skew {bracket.price_skew:.{digits}f}"
+    print(skew_msg)
+    log_decision("INFO", "order", f"Bracket {bracket.status}", broker_now,
+                 direction=direction, price=current_price, sl=sl, tp1=tp1, tp2=tp2,
+                 checks=bracket.check_retcodes(), sends=bracket.send_retcodes(),
+                 time_skew_ms=bracket.time_skew_ms, price_skew=bracket.price_skew)
+    
+    for leg, (result, request, tp) in enumerate(zip(bracket.results, (request1, request2), (tp1, tp2))):
+        store_event('orders', ticket=result.order if result else None, time=broker_now, symbol=SYMBOL,
+                    direction=direction, leg=leg + 1, volume=request['volume'], price=(result.price if result else None) or current_price,
+                    sl=request['sl'], tp=tp, retcode=result.retcode if result else None,
+                    status='OPEN' if is_done(result) and bracket.closed_leg != leg else 'FAILED', comment=request['comment'])
+    
+    for leg, (result, request) in enumerate(zip(bracket.results, (request1, request2))):
+        if is_done(result) and bracket.closed_leg != leg:
+            portfolio_risk.on_fill(ACCOUNT, result.order, SYMBOL, direction, request['volume'], result.price or current_price, request['sl'])
+    
+    # Journal the legs that are open now that both sends are done
+    if is_done(result1) and bracket.closed_leg != 0:
+        print(f"{entry_candle.name} {direction} TP1 order placed at {result1.price or current_price} | SL: {sl} | TP: {tp1} | RR1: {rr1:.2f}")
+        log_trade(result1.order, str(broker_now), SYMBOL, direction, result1.price or current_price, sl, tp1, half_lot, rr1, rr2, "OPEN", "", "", "", "", "", request1['comment'])
+    if is_done(result2) and bracket.closed_leg != 1:
+        print(f"{entry_candle.name} {direction} TP2 order placed at {result2.price or current_price} | SL: {sl} | TP: {tp2} | RR2: {rr2:.2f}")
+        log_trade(result2.order, str(broker_now), SYMBOL, direction, result2.price or current_price, sl, tp2, half_lot, rr1, rr2, "OPEN", "", "", "", "", "", request2['comment'])
+    
+    if bracket.status == FILLED:
+        trades_today += 1
         
-        # Send first order
-        print(f"Sending order 1: {direction} | Price: {current_price} | SL: {sl} | TP: {tp1} | SL Distance: {abs(current_price-sl):.2f}")
-        result1 = mt5.order_send(request1)
-        if result1 is None:
-            print("Error: Order 1 returned None")
-            time.sleep(60)
-            continue
-            
-        if result1.retcode == 10016:  # Invalid stops error
-            print(f"⚠️ INVALID STOPS ERROR for order 1:")
-            print(f"  Symbol: {SYMBOL}")
-            print(f"  Direction: {direction}")
-            print(f"  Price: {current_price}")
-            print(f"  SL: {sl} (distance: {abs(current_price-sl):.2f})")
-            print(f"  Min required: {min_stop_price:.2f}")
-            print(f"  Point value: {symbol_details['point'] if symbol_details else 'unknown'}")
-            print(f"  Stops level: {symbol_details['stops_level'] if symbol_details else 'unknown'}")
-            
-            # Exness sometimes requires larger stop-loss for XAUUSDm
-            # Instead of trying multiple values, immediately use a large enough value
-            if SYMBOL.startswith("XAU"):
-                # Use a fixed SL distance that we know works with Exness
-                safe_distance = MIN_SL_DISTANCE * 1.1  # 10% larger than our minimum (reduced from 20%)
-                
-                if direction == 'BUY':
-                    new_sl = round(current_price - safe_distance, digits)
-                else:
-                    new_sl = round(current_price + safe_distance, digits)
-                    
-                print(f"Using safe SL distance of {safe_distance:.2f} → SL: {new_sl}")
-                
-                # Update request with new SL
-                request1_retry = request1.copy()
-                request1_retry["sl"] = new_sl
-                retry_result1 = mt5.order_send(request1_retry)
-                
-                if retry_result1 and retry_result1.retcode == mt5.TRADE_RETCODE_DONE:
-                    print(f"SUCCESS with safe SL distance!")
-                    result1 = retry_result1  # Use the successful result
-                    sl = new_sl  # Update SL for second order
-            
-            # If still failed, try alternative: first open without SL, then modify
-            if result1.retcode == 10016:
-                request1_no_sl = request1.copy()
-                request1_no_sl.pop('sl', None)
-                request1_no_sl.pop('tp', None)
-                print("Trying alternative method: Open position without SL/TP first")
-                alt_result1 = mt5.order_send(request1_no_sl)
-                
-                if alt_result1 and alt_result1.retcode == mt5.TRADE_RETCODE_DONE:
-                    print(f"Position opened without SL/TP. Adding SL/TP...")
-                    # Add SL/TP in a separate request
-                    modify_request = {
-                        "action": mt5.TRADE_ACTION_SLTP,
-                        "position": alt_result1.order,
-                        "symbol": SYMBOL,
-                        "sl": sl,
-                        "tp": tp1,
-                    }
-                    modify_result = mt5.order_send(modify_request)
-                    if modify_result.retcode == mt5.TRADE_RETCODE_DONE:
-                        print(f"Successfully added SL/TP")
-                        result1 = alt_result1  # Consider it successful
-                    else:
-                        print(f"Failed to add SL/TP: {modify_result.retcode} {modify_result.comment}")
-                        # Try again with a larger stop distance
-                        if SYMBOL.startswith("XAU"):
-                            larger_sl = current_price - 5.0 if direction == 'BUY' else current_price + 5.0
-                            larger_sl = round(larger_sl, digits)
-                            print(f"Trying with much larger SL: {larger_sl}")
-                            modify_result = mt5.order_send(modify_request)
-                            if modify_result.retcode == mt5.TRADE_RETCODE_DONE:
-                                print(f"Successfully added SL/TP with larger distance")
-                                result1 = alt_result1  # Consider it successful
+        # Trade successfully placed - set cooldown time
+        print(f"Setting trade cooldown for {COOLDOWN_MINUTES} minutes")
+        # Keep the lock for an extra minute on top of the cooldown to ensure no duplicate trades
+        supervisor.schedule((COOLDOWN_MINUTES + 1) * 60, release_trade_lock, f"{COOLDOWN_MINUTES} min cooldown over")
+    else:
+        for leg, result in enumerate(bracket.results):
+            if not is_done(result):
+                print(f"Order {leg + 1} failed: {result.retcode if result else 'None'} {result.comment if result else 'No result'}")
+        TRADE_LOCK = False  # Release lock on failure
         
-        # If first order succeeded, try the second
-        if result1.retcode == mt5.TRADE_RETCODE_DONE:
-            print(f"{entry_candle.name} {direction} TP1 order placed at {current_price} | SL: {sl} | TP: {tp1} | RR1: {rr1:.2f}")
-            log_trade(result1.order, str(broker_now), SYMBOL, direction, current_price, sl, tp1, half_lot, rr1, rr2, "OPEN", "", "", "", "", "", request1['comment'])
-            
-            # Send second order
-            print(f"Sending order 2: {direction} | Price: {current_price} | SL: {sl} | TP: {tp2} | SL Distance: {abs(current_price-sl):.2f}")
-            result2 = mt5.order_send(request2)
-            
-            if result2 and result2.retcode == 10016:  # Invalid stops error for second order
-                print(f"⚠️ INVALID STOPS ERROR for order 2:")
-                
-                # For XAUUSDm, use the same safe SL distance that worked for order 1
-                if SYMBOL.startswith("XAU"):
-                    # Use the same safe SL value that worked for order 1
-                    print(f"Using same safe SL for order 2: {sl}")
-                    
-                    # Update request with new SL (which should now be the successful SL from order 1)
-                    request2_retry = request2.copy()
-                    retry_result2 = mt5.order_send(request2_retry)
-                    
-                    if retry_result2 and retry_result2.retcode == mt5.TRADE_RETCODE_DONE:
-                        print(f"SUCCESS with safe SL for order 2!")
-                        result2 = retry_result2  # Use the successful result
-                
-                # If still failed, try alternative for second order
-                if result2.retcode == 10016:
-                    request2_no_sl = request2.copy()
-                    request2_no_sl.pop('sl', None)
-                    request2_no_sl.pop('tp', None)
-                    print("Trying alternative method for order 2: Open position without SL/TP first")
-                    alt_result2 = mt5.order_send(request2_no_sl)
-                    
-                    if alt_result2 and alt_result2.retcode == mt5.TRADE_RETCODE_DONE:
-                        print(f"Position 2 opened without SL/TP. Adding SL/TP...")
-                        # Add SL/TP in a separate request
-                        modify_request = {
-                            "action": mt5.TRADE_ACTION_SLTP,
-                            "position": alt_result2.order,
-                            "symbol": SYMBOL,
-                            "sl": sl,
-                            "tp": tp2,
-                        }
-                        modify_result = mt5.order_send(modify_request)
-                        if modify_result.retcode == mt5.TRADE_RETCODE_DONE:
-                            print(f"Successfully added SL/TP to position 2")
-                            result2 = alt_result2  # Consider it successful
-                        else:
-                            print(f"Failed to add SL/TP to position 2: {modify_result.retcode} {modify_result.comment}")
-                            
-                            # Try again with a larger stop distance
-                            if SYMBOL.startswith("XAU"):
-                                larger_sl = current_price - 5.0 if direction == 'BUY' else current_price + 5.0
-                                larger_sl = round(larger_sl, digits)
-                                modify_request["sl"] = larger_sl
-                                print(f"Trying position 2 with much larger SL: {larger_sl}")
-                                modify_result = mt5.order_send(modify_request)
-                                if modify_result.retcode == mt5.TRADE_RETCODE_DONE:
-                                    print(f"Successfully added SL/TP to position 2 with larger distance")
-                                    result2 = alt_result2  # Consider it successful
-            
-            if result2 and result2.retcode == mt5.TRADE_RETCODE_DONE:
-                print(f"{entry_candle.name} {direction} TP2 order placed at {current_price} | SL: {sl} | TP: {tp2} | RR2: {rr2:.2f}")
-                log_trade(result2.order, str(broker_now), SYMBOL, direction, current_price, sl, tp2, half_lot, rr1, rr2, "OPEN", "", "", "", "", "", request2['comment'])
-                trades_today += 1
-                
-                # Trade successfully placed - set cooldown time
-                print(f"Setting trade cooldown for {COOLDOWN_MINUTES} minutes")
-                time.sleep(60)  # Wait a minute before releasing lock to ensure no duplicate trades
-                # Create a background thread to release the trade lock after cooldown
-                from threading import Thread
-                
-                def release_lock_after_cooldown():
-                    global TRADE_LOCK
-                    time.sleep(COOLDOWN_MINUTES * 60)
-                    TRADE_LOCK = False
-                    print(f"Trade lock released after {COOLDOWN_MINUTES} min cooldown")
-                    
-                Thread(target=release_lock_after_cooldown, daemon=True).start()
-            else:
-                print(f"Order 2 failed: {result2.retcode if result2 else 'None'} {result2.comment if result2 else 'No result'}")
-                TRADE_LOCK = False  # Release lock on failure
-        else:
-            print(f"Order 1 failed: {result1.retcode if result1 else 'None'} {result1.comment if result1 else 'No result'}")
-            TRADE_LOCK = False  # Release lock on failure
-            
-        # Monitor for TP1 hit to move SL to breakeven for TP2
-        if result1 and result2 and result1.retcode == mt5.TRADE_RETCODE_DONE and result2.retcode == mt5.TRADE_RETCODE_DONE:
-            print("Both orders placed successfully. Will monitor for TP1 hit to move TP2 to breakeven...")        # Create a background thread to monitor without blocking the main loop
-            from threading import Thread
-            
-            def monitor_tp1():
-                max_checks = 720  # 2 hours max (10 seconds * 720 = 7200 seconds = 2 hours)
-                checks = 0
-                tp1_hit = False
-                entry_price = current_price  # Use the actual entry price
-                trade_completed = False
-                trailing_activated = False
-                trailing_distance = abs(tp2 - entry_price) * 0.5  # Trailing SL at 50% of TP2 distance
-                last_trailing_sl = None
+    # Hand the bracket to the supervisor: TP1 hit moves TP2 to breakeven and starts trailing
+    if bracket.status == FILLED:
+        supervisor.manage_bracket(result1.order, result2.order, direction, current_price, tp2, point, digits)
+        print("Both orders placed successfully. Supervisor will move TP2 to breakeven when TP1 is hit...")
+        print(f"{datetime.now()} Started trade {trades_today}/3 for today")
+    return 60
 
-                while not tp1_hit and checks < max_checks:
-                    time.sleep(10)
-                    checks += 1
-                    try:
-                        pos = mt5.positions_get(ticket=result1.order)
-                        if not pos:
-                            tp1_hit = True
-                            pos2 = mt5.positions_get(ticket=result2.order)
-                            if pos2:
-                                # Move SL to breakeven for TP2
-                                if direction == 'BUY':
-                                    be_level = entry_price + (point * 0.1)
-                                else:
-                                    be_level = entry_price - (point * 0.1)
-                                be_level = round(be_level, digits)
-                                move_sl_to_breakeven(result2.order, be_level)
-                                print(f"{datetime.now()} Moved SL to breakeven ({be_level}) for TP2 position {result2.order}")
-                                with open("crt_skip_log.txt", "a") as f:
-                                    f.write(f"{datetime.now()} INFO: Moved TP2 position {result2.order} SL to breakeven ({be_level})\n")
-                                trailing_activated = True
-                                last_trailing_sl = be_level
-                            else:
-                                print("TP2 position no longer exists - both positions closed")
-                                TRADE_LOCK = False
-                                print(f"{datetime.now()} Trade lock released - both positions closed")
-                                trade_completed = True
-                                print(f"{datetime.now()} Trade completed successfully")
-                        # Trailing stop logic for TP2
-                        if trailing_activated:
-                            pos2 = mt5.positions_get(ticket=result2.order)
-                            if pos2:
-                                current_tp2_price = pos2[0].price_open if hasattr(pos2[0], 'price_open') else entry_price
-                                current_market_price = mt5.symbol_info_tick(SYMBOL).ask if direction == 'BUY' else mt5.symbol_info_tick(SYMBOL).bid
-                                if direction == 'BUY':
-                                    new_trailing_sl = max(last_trailing_sl, current_market_price - trailing_distance)
-                                else:
-                                    new_trailing_sl = min(last_trailing_sl, current_market_price + trailing_distance)
-                                new_trailing_sl = round(new_trailing_sl, digits)
-                                # Only move SL if it locks in more profit
-                                if (direction == 'BUY' and new_trailing_sl > last_trailing_sl) or (direction == 'SELL' and new_trailing_sl < last_trailing_sl):
-                                    move_sl_to_breakeven(result2.order, new_trailing_sl)
-                                    print(f"{datetime.now()} Trailing SL moved to {new_trailing_sl} for TP2 position {result2.order}")
-                                    with open("crt_skip_log.txt", "a") as f:
-                                        f.write(f"{datetime.now()} INFO: Trailing SL moved to {new_trailing_sl} for TP2 position {result2.order}\n")
-                                    last_trailing_sl = new_trailing_sl
-                            else:
-                                trailing_activated = False
-                    except Exception as e:
-                        print(f"Error monitoring TP1/trailing SL: {e}")
-                        # Continue monitoring despite error
-            
-            # Start monitoring thread
-            monitor_thread = Thread(target=monitor_tp1, daemon=True)
-            monitor_thread.start()
-            
-            # Increment trades today count
-            trades_today += 1
-            print(f"{datetime.now()} Started trade {trades_today}/3 for today")
+# --- Latency reporting ---
+metrics_server = None  # MetricsServer, started by run() when METRICS_PORT is set
+
+def print_latency_summary():
+    print(f"{datetime.now()} {latency.summary_line()}")
+
+def start_metrics_server():
+    """Serve the latency histograms (and a few gauges) at http://127.0.0.1:METRICS_PORT/metrics"""
+    global metrics_server
+    if METRICS_PORT is None or metrics_server is not None:
+        return
+    latency.gauge("crt_trades_today", lambda: trades_today, "Trades taken on the current broker day")
+    latency.gauge("crt_open_positions", lambda: portfolio_risk.stats()['positions'], "Open positions of the account")
+    latency.gauge("crt_mt5_queue_depth", lambda: gateway.metrics()['queue_depth'], "Requests waiting in the MT5 gateway queue")
+    metrics_server = MetricsServer(latency, port=METRICS_PORT)
+    try:
+        metrics_server.start()
+    except OSError as e:
+        print(f"Metrics endpoint not started on port {METRICS_PORT}: {e}")
+        metrics_server = None
+        return
+    print(f"Latency metrics at http://127.0.0.1:{metrics_server.port}/metrics")
+
+def stop_metrics_server():
+    global metrics_server
+    if metrics_server is not None:
+        metrics_server.stop()
+        metrics_server = None
+
+# --- Runtimes ---
+def run_threaded():
+    """Blocking loop: strategy on the main thread, tick pump and supervisor on their own threads."""
+    tick_pump.start()
+    supervisor.start()
+    news_refresher.start()
+    reconcile_journal()
+    next_summary = time.monotonic() + LATENCY_SUMMARY_SECONDS
+    next_stop_save = time.monotonic() + STOP_MODEL_SAVE_SECONDS
+    try:
+        while True:
+            time.sleep(strategy_cycle())
+            if time.monotonic() >= next_summary:
+                print_latency_summary()
+                next_summary = time.monotonic() + LATENCY_SUMMARY_SECONDS
+            if time.monotonic() >= next_stop_save:
+                stop_model.flush()
+                next_stop_save = time.monotonic() + STOP_MODEL_SAVE_SECONDS
+    except KeyboardInterrupt:
+        print("Stopping...")
+    finally:
+        # Everything that still calls the terminal or writes records stops before the connection closes
+        news_refresher.stop()
+        tick_pump.stop()
+        supervisor.stop()
+        stop_model.flush()
+        journal.close()
+        export_journal()
+        decision_log.close()
+        trade_store.close()
+        mt5.shutdown()
+        gateway.stop()
+        print_latency_summary()
+
+def run_async():
+    """asyncio runtime: strategy, ticks, supervisor, news refresh and journal export run as separate tasks."""
+    runtime = AsyncRuntime(gateway)
+    runtime.add_tick_task(tick_pump, poll_interval=TICK_POLL_INTERVAL)
+    runtime.add_supervisor(supervisor)
+    # Stale-while-revalidate: run_once() returns the next delay (backoff after failures)
+    runtime.add_periodic("news", news_refresher.run_once, NEWS_REFRESH_SECONDS)
+    runtime.add_periodic("journal_export", export_journal, JOURNAL_EXPORT_SECONDS)
+    runtime.add_periodic("reconcile", reconcile_journal, RECONCILE_SECONDS)
+    runtime.add_periodic("strategy", strategy_cycle, 60)
+    runtime.add_periodic("latency_summary", print_latency_summary, LATENCY_SUMMARY_SECONDS)
+    runtime.add_periodic("stop_model", stop_model.flush, STOP_MODEL_SAVE_SECONDS)
+    runtime.on_shutdown(stop_model.flush)
+    runtime.on_shutdown(journal.close)
+    runtime.on_shutdown(export_journal)
+    runtime.on_shutdown(decision_log.close)
+    runtime.on_shutdown(trade_store.close)
+    runtime.on_shutdown(mt5.shutdown)
+    runtime.on_shutdown(gateway.stop)
+    try:
+        asyncio.run(runtime.run())
+    except KeyboardInterrupt:
+        pass
+    print(f"Runtime stopped. Task stats: {runtime.stats()}")
+    print_latency_summary()
+
+def run():
+    """Initialize everything and trade until interrupted."""
+    if not initialize():
+        return
+    print("Starting advanced CRT strategy on live Exness demo...")
+    start_metrics_server()
+    profiler.install_signal()
+    try:
+        if USE_ASYNC_RUNTIME:
+            run_async()
         else:
-            time.sleep(60)
+            run_threaded()
+    finally:
+        stop_metrics_server()
+        profiler.finish()  # Write a capture that was still running
 
-    mt5.shutdown()
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,225 @@
+import asyncio
+import functools
+import logging
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Virtual seconds per wall-clock second for task delays; the simulator sets it to its
+# speed (mt5_simulator.install(patch_sleep=True)) so the loop runs on simulated time
+_default_speed = 1.0
+
+
+def set_speed(speed):
+    """Scale the task delays of runtimes created afterwards (see AsyncRuntime speed)"""
+    global _default_speed
+    _default_speed = float(speed)
+
+
+class AsyncRuntime:
+    """
+    asyncio runtime for the live trader.
+
+    Every component runs as its own task (strategy cycle, tick polling, position
+    supervisor, news refresh, journal export), so a slow call in one of them never
+    delays the others. Blocking work runs on single-thread executor "lanes" named after
+    the component, and every MetaTrader5 call goes through the MT5 gateway's worker thread.
+
+    Stopping (stop(), SIGINT/SIGTERM or cancelling run()) cancels the tasks, lets any
+    work already running on a lane finish and then runs the shutdown callbacks in
+    registration order.
+    """
+    def __init__(self, gateway, shutdown_timeout=30.0, speed=None):
+        """
+        Parameters:
+        gateway (MT5Gateway): Gateway whose worker thread executes all MT5 calls
+        shutdown_timeout (float): Seconds to wait for running lane work on shutdown
+        speed (float): Task delays (sleep()) are divided by this; default set_speed()'s value, 1.0
+        """
+        self.gateway = gateway
+        self.shutdown_timeout = shutdown_timeout
+        self.speed = float(speed or _default_speed)
+        self.logger = logging.getLogger("crt_trading.async_runtime")
+        self._lanes = {}
+        self._factories = []
+        self._tasks = {}
+        self._shutdown_callbacks = []
+        self._stats = {}
+        self._loop = None
+        self._stopping = None
+        self._tick_event = None
+
+    # --- Executors ---
+    def lane(self, name):
+        """Single-thread executor for blocking work of one component"""
+        executor = self._lanes.get(name)
+        if executor is None:
+            executor = self._lanes[name] = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"crt-{name}")
+        return executor
+
+    async def run_blocking(self, lane, fn, *args, **kwargs):
+        """Run a blocking function on a lane and await its result"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.lane(lane), functools.partial(fn, *args, **kwargs))
+
+    async def mt5(self, method, *args, **kwargs):
+        """Await a MetaTrader5 call executed on the gateway thread"""
+        return await asyncio.wrap_future(self.gateway.submit(method, *args, **kwargs))
+
+    # --- Task registration ---
+    def add_task(self, name, coroutine_function):
+        """Register a coroutine function (no arguments) to run as a task"""
+        self._factories.append((name, coroutine_function))
+        self._stats[name] = {'runs': 0, 'errors': 0, 'last_ms': 0.0, 'max_ms': 0.0}
+
+    def add_periodic(self, name, fn, interval, lane=None):
+        """
+        Run blocking `fn()` on a lane every `interval` seconds.
+        If fn returns a number it is used as the delay before the next run instead.
+        """
+        lane = lane or name
+
+        async def periodic():
+            while not self._stopping.is_set():
+                delay = interval
+                started = time.perf_counter()
+                try:
+                    result = await self.run_blocking(lane, fn)
+                    if isinstance(result, (int, float)):
+                        delay = result
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self._stats[name]['errors'] += 1
+                    self.logger.error(f"Task {name} failed: {e}")
+                self._record(name, started)
+                await self.sleep(delay)
+
+        self.add_task(name, periodic)
+
+    def add_tick_task(self, tick_pump, poll_interval=0.05):
+        """Poll ticks through the gateway and feed them into the tick pump"""
+        tick_pump.attach()
+
+        async def poll_ticks():
+            try:
+                while not self._stopping.is_set():
+                    started = time.perf_counter()
+                    try:
+                        raw = await self.mt5('symbol_info_tick', tick_pump.symbol)
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        raw = None
+                        tick_pump.errors += 1
+                        self._stats['ticks']['errors'] += 1
+                        self.logger.error(f"Tick poll failed for {tick_pump.symbol}: {e}")
+                    if tick_pump.offer(raw):
+                        self._tick_event.set()
+                    self._record('ticks', started)
+                    await asyncio.sleep(max(0.0, poll_interval - (time.perf_counter() - started)))
+            finally:
+                tick_pump.detach()
+
+        self.add_task('ticks', poll_ticks)
+
+    def add_supervisor(self, supervisor):
+        """Run the position supervisor's passes on its own lane, woken by tick changes"""
+        async def supervise():
+            while not self._stopping.is_set():
+                started = time.perf_counter()
+                timeout = supervisor.refresh_seconds
+                try:
+                    tick, timeout = await self.run_blocking('supervisor', supervisor.step)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self._stats['supervisor']['errors'] += 1
+                    self.logger.error(f"Task supervisor failed: {e}")
+                self._record('supervisor', started)
+                await self.wait_for_tick(timeout)
+
+        self.add_task('supervisor', supervise)
+
+    def on_shutdown(self, callback):
+        """Register a blocking callback to run after all tasks have stopped"""
+        self._shutdown_callbacks.append(callback)
+
+    # --- Waiting helpers ---
+    async def sleep(self, seconds):
+        """Sleep `seconds` (divided by speed), returning early when the runtime is stopping"""
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=max(0.0, seconds) / self.speed)
+        except asyncio.TimeoutError:
+            pass
+
+    async def wait_for_tick(self, timeout):
+        """Wait until the tick task published a new tick (or `timeout`, divided by speed)"""
+        try:
+            await asyncio.wait_for(self._tick_event.wait(), timeout=max(0.0, timeout) / self.speed)
+        except asyncio.TimeoutError:
+            pass
+        self._tick_event.clear()
+
+    # --- Lifecycle ---
+    def stop(self):
+        """Request shutdown (safe to call from any thread)"""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._stopping.set)
+
+    async def run(self):
+        """Run all registered tasks until stop() is called or a signal arrives"""
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        self._tick_event = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self._loop.add_signal_handler(sig, self._stopping.set)
+            except (NotImplementedError, RuntimeError, ValueError):
+                pass  # Windows: Ctrl+C cancels run() instead
+
+        for name, factory in self._factories:
+            self._tasks[name] = asyncio.create_task(factory(), name=name)
+        self.logger.info(f"Async runtime started with tasks: {', '.join(self._tasks)}")
+        try:
+            await self._stopping.wait()
+        finally:
+            await self._shutdown()
+
+    async def _shutdown(self):
+        self.logger.info("Async runtime shutting down")
+        self._stopping.set()
+        loop = asyncio.get_running_loop()
+
+        # Stop the components; work already running on their lanes (e.g. an order
+        # being sent) is allowed to finish
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        for name, executor in self._lanes.items():
+            try:
+                await asyncio.wait_for(loop.run_in_executor(None, functools.partial(executor.shutdown, wait=True)),
+                                       timeout=self.shutdown_timeout)
+            except asyncio.TimeoutError:
+                self.logger.warning(f"Work on lane {name} still running after {self.shutdown_timeout}s")
+
+        for callback in self._shutdown_callbacks:
+            try:
+                callback()
+            except Exception as e:
+                self.logger.error(f"Shutdown callback {getattr(callback, '__name__', callback)} failed: {e}")
+        self._tasks = {}
+        self._lanes = {}
+        self._loop = None
+
+    # --- Metrics ---
+    def _record(self, name, started):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        stats = self._stats[name]
+        stats['runs'] += 1
+        stats['last_ms'] = elapsed_ms
+        stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+
+    def stats(self):
+        """Per-task run counts and durations of the last / slowest run"""
+        return {name: dict(s) for name, s in self._stats.items()}
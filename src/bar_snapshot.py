@@ -0,0 +1,108 @@
+import time
+import logging
+
+import MetaTrader5 as mt5
+
+
+class BarSnapshot:
+    """
+    Bars of several timeframes fetched once for one strategy cycle.
+
+    Consumers ask for (timeframe, count, shift) exactly like copy_rates_from_pos and
+    get a slice of the single array fetched for that timeframe: numpy slices for
+    rates(), row slices of one shared DataFrame for frame(). Nothing is copied.
+    """
+    def __init__(self, symbol, arrays, start_pos, taken_at=None):
+        """
+        Parameters:
+        arrays (dict): timeframe -> structured array from copy_rates_from_pos (oldest first)
+        start_pos (dict): timeframe -> shift of the newest bar in the array
+        """
+        self.symbol = symbol
+        self.arrays = arrays
+        self.start_pos = start_pos
+        self.taken_at = taken_at or time.time()
+        self._frames = {}
+
+    def _bounds(self, timeframe, count, shift):
+        rates = self.arrays.get(timeframe)
+        if rates is None:
+            return None
+        offset = shift - self.start_pos[timeframe]
+        if offset < 0:
+            raise ValueError(f"Shift {shift} is newer than the snapshot for timeframe {timeframe} (starts at {self.start_pos[timeframe]})")
+        end = len(rates) - offset
+        start = end - count
+        if start < 0:
+            return None
+        return start, end
+
+    def rates(self, timeframe, count, shift=0):
+        """Structured array view of `count` bars ending `shift` bars back, or None if not enough bars"""
+        bounds = self._bounds(timeframe, count, shift)
+        if bounds is None:
+            return None
+        return self.arrays[timeframe][bounds[0]:bounds[1]]
+
+    def frame(self, timeframe, count, shift=0):
+        """Same bars as rates() as a time-indexed DataFrame (row slice of one per-timeframe frame)"""
+        bounds = self._bounds(timeframe, count, shift)
+        if bounds is None:
+            return None
+        df = self._frames.get(timeframe)
+        if df is None:
+            import pandas as pd
+            df = pd.DataFrame(self.arrays[timeframe])
+            df['time'] = pd.to_datetime(df['time'], unit='s')
+            df.set_index('time', inplace=True)
+            self._frames[timeframe] = df
+        return df.iloc[bounds[0]:bounds[1]]
+
+
+class BarSnapshotBuilder:
+    """
+    Collects the bar requirements of every strategy stage and fetches each timeframe
+    once per cycle with the widest lookback any stage needs.
+
+    Example:
+        builder = BarSnapshotBuilder("XAUUSDm")
+        builder.require(mt5.TIMEFRAME_D1, 20, shift=1)   # trend
+        builder.require(mt5.TIMEFRAME_D1, 24, shift=0)   # ATR
+        bars = builder.build()                           # one copy_rates_from_pos for D1
+        trend_df = bars.frame(mt5.TIMEFRAME_D1, 20, shift=1)
+    """
+    def __init__(self, symbol, api=None):
+        self.symbol = symbol
+        self.api = api or mt5
+        self.logger = logging.getLogger("crt_trading.bar_snapshot")
+        self._needs = {}  # timeframe -> (newest shift, oldest shift + 1)
+        self.fetches = 0
+
+    def require(self, timeframe, count, shift=0):
+        """Declare that a stage reads `count` bars of `timeframe` starting `shift` bars back"""
+        first, last = self._needs.get(timeframe, (shift, shift + count))
+        self._needs[timeframe] = (min(first, shift), max(last, shift + count))
+        return self
+
+    def requirements(self):
+        """timeframe -> (start_pos, count) that build() will request"""
+        return {tf: (first, last - first) for tf, (first, last) in self._needs.items()}
+
+    def build(self):
+        """
+        Fetch every required timeframe once.
+
+        Returns:
+        BarSnapshot: Timeframes whose fetch failed are missing (frame()/rates() return None)
+        """
+        arrays = {}
+        start_pos = {}
+        for timeframe, (first, count) in self.requirements().items():
+            rates = self.api.copy_rates_from_pos(self.symbol, timeframe, first, count)
+            self.fetches += 1
+            start_pos[timeframe] = first
+            if rates is None or len(rates) == 0:
+                self.logger.warning(f"No bars for {self.symbol} timeframe {timeframe}: {self.api.last_error()}")
+                continue
+            arrays[timeframe] = rates
+        return BarSnapshot(self.symbol, arrays, start_pos)
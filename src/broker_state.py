@@ -0,0 +1,188 @@
+import threading
+import time
+import logging
+from collections import namedtuple
+
+import MetaTrader5 as mt5
+
+# Static contract specification of a symbol. These values only change when the
+# broker edits the instrument, so they are cached with a long TTL.
+SymbolSpec = namedtuple("SymbolSpec", [
+    "name", "point", "digits", "trade_contract_size", "trade_stops_level",
+    "volume_min", "volume_step", "volume_max", "fetched_at"
+])
+
+# Per-cycle view of the account shared by every consumer in one pass of the loop
+BrokerSnapshot = namedtuple("BrokerSnapshot", ["taken_at", "account", "positions", "tick"])
+
+
+class CallCounter:
+    """
+    Transparent proxy around the MetaTrader5 module that counts every API call.
+    Constants (TIMEFRAME_*, ORDER_TYPE_*, ...) are passed through untouched.
+    """
+    def __init__(self, api):
+        self._api = api
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._wrapped = {}
+
+    def __getattr__(self, name):
+        attr = getattr(self._api, name)
+        if not callable(attr) or isinstance(attr, type):
+            return attr
+        wrapped = self._wrapped.get(name)
+        if wrapped is None:
+            def wrapped(*args, **kwargs):
+                with self._lock:
+                    self._counts[name] = self._counts.get(name, 0) + 1
+                return attr(*args, **kwargs)
+            self._wrapped[name] = wrapped
+        return wrapped
+
+    def counts(self, reset=False):
+        """Return a copy of the call counts, optionally resetting them"""
+        with self._lock:
+            counts = dict(self._counts)
+            if reset:
+                self._counts = {}
+        return counts
+
+
+class BrokerState:
+    """
+    Broker-state snapshot layer for the live trader.
+
+    - Symbol specs are cached for `spec_ttl` seconds and dropped on error.
+    - Account, positions and tick are fetched once per cycle by begin_cycle()
+      and shared by every consumer until the next cycle.
+    - IPC calls made between two begin_cycle() calls are exposed as a metric.
+    """
+    def __init__(self, symbol, api=None, spec_ttl=3600, tick_source=None):
+        self.symbol = symbol
+        api = api or mt5
+        self.api = api if isinstance(api, CallCounter) else CallCounter(api)
+        self.spec_ttl = spec_ttl
+        self.tick_source = tick_source
+        self.logger = logging.getLogger("crt_trading.broker_state")
+
+        self._specs = {}
+        self._spec_lock = threading.Lock()
+        self.snapshot = None
+        self.cycles = 0
+        self.last_cycle_calls = {}
+        self.spec_hits = 0
+        self.spec_misses = 0
+
+    # --- Symbol specs ---
+    def symbol_spec(self, symbol=None):
+        """
+        Return the cached SymbolSpec for a symbol, fetching it when missing or expired.
+
+        Returns:
+        SymbolSpec: Spec or None if the terminal does not know the symbol
+        """
+        symbol = symbol or self.symbol
+        spec = self._specs.get(symbol)
+        if spec is not None and time.monotonic() - spec.fetched_at < self.spec_ttl:
+            self.spec_hits += 1
+            return spec
+
+        self.spec_misses += 1
+        info = self.api.symbol_info(symbol)
+        if info is None:
+            self.logger.error(f"Failed to get symbol info for {symbol}")
+            self.invalidate_spec(symbol)
+            return None
+
+        info_dict = info._asdict()
+        spec = SymbolSpec(
+            name=info_dict.get("name", symbol),
+            point=info_dict.get("point", 0.001),
+            digits=info_dict.get("digits", 3),
+            trade_contract_size=info_dict.get("trade_contract_size", 100.0),
+            trade_stops_level=info_dict.get("trade_stops_level", 0),
+            volume_min=info_dict.get("volume_min", 0.01),
+            volume_step=info_dict.get("volume_step", 0.01),
+            volume_max=info_dict.get("volume_max", 100.0),
+            fetched_at=time.monotonic(),
+        )
+        with self._spec_lock:
+            self._specs[symbol] = spec
+        return spec
+
+    def invalidate_spec(self, symbol=None):
+        """Drop a cached spec (or all of them) so the next lookup hits the terminal"""
+        with self._spec_lock:
+            if symbol is None:
+                self._specs.clear()
+            else:
+                self._specs.pop(symbol, None)
+
+    # --- Per-cycle snapshot ---
+    def begin_cycle(self):
+        """
+        Start a new loop cycle: record the IPC calls of the previous cycle and fetch
+        account, positions and tick once for everyone to share.
+        """
+        self.last_cycle_calls = self.api.counts(reset=True)
+        self.cycles += 1
+        return self.refresh()
+
+    def refresh(self):
+        """
+        Fetch account, positions and tick and publish them as the current snapshot.
+        If positions_get() fails (None) the previous positions and their timestamp are
+        kept: a failed call must not read as "no positions".
+        """
+        account = self.api.account_info()
+        positions = self.api.positions_get(symbol=self.symbol)
+        tick = self.tick_source() if self.tick_source else self.api.symbol_info_tick(self.symbol)
+        taken_at = time.monotonic()
+        if positions is None:
+            self.logger.warning(f"positions_get failed ({self.api.last_error()}); keeping the previous positions")
+            previous = self.snapshot
+            taken_at, positions = (previous.taken_at, previous.positions) if previous else (float("-inf"), ())
+        self.snapshot = BrokerSnapshot(
+            taken_at=taken_at,
+            account=account,
+            positions=tuple(positions),
+            tick=tick,
+        )
+        return self.snapshot
+
+    def positions(self, max_age=None):
+        """
+        Return the open positions of the current snapshot, refreshing them first if the
+        snapshot is older than `max_age` seconds.
+
+        Returns:
+        tuple: Positions, or None if a refresh was needed and positions_get() failed
+               (the snapshot is left as it was)
+        """
+        snapshot = self.snapshot
+        if snapshot is None or (max_age is not None and time.monotonic() - snapshot.taken_at > max_age):
+            positions = self.api.positions_get(symbol=self.symbol)
+            if positions is None:
+                self.logger.warning(f"positions_get failed ({self.api.last_error()})")
+                return None
+            previous = snapshot or BrokerSnapshot(None, None, (), None)
+            snapshot = previous._replace(taken_at=time.monotonic(), positions=tuple(positions))
+            self.snapshot = snapshot
+        return snapshot.positions
+
+    def account(self):
+        """Account info from the current snapshot"""
+        if self.snapshot is None or self.snapshot.account is None:
+            return self.api.account_info()
+        return self.snapshot.account
+
+    def cycle_metrics(self):
+        """IPC call counts of the last completed cycle plus spec cache counters"""
+        return {
+            'cycle': self.cycles,
+            'calls': dict(self.last_cycle_calls),
+            'total_calls': sum(self.last_cycle_calls.values()),
+            'spec_hits': self.spec_hits,
+            'spec_misses': self.spec_misses,
+        }
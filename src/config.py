@@ -33,6 +33,14 @@ INITIAL_CAPITAL = 10000.0  # Starting capital in USD
 RISK_PER_TRADE = 0.01  # Risk 1% of capital per trade
 MAX_POSITIONS = 1  # Maximum number of open positions at a time
 
+# Portfolio limits over all symbols of an account (see src/portfolio_risk.py).
+# Risk and margin limits are fractions of account equity; None disables a limit.
+PORTFOLIO_MAX_POSITIONS = 4          # Open positions per account (a CRT bracket is two)
+PORTFOLIO_MAX_OPEN_RISK = 0.03       # Money at risk to the stops (net per symbol, summed)
+PORTFOLIO_MAX_CORRELATED_RISK = 0.025  # sqrt(r' C r) of the signed risk per symbol
+PORTFOLIO_MAX_MARGIN = 0.5           # Used margin
+PORTFOLIO_MAX_SYMBOL_LOTS = None     # Net lots of one symbol over all accounts
+
 # Timeframes
 SETUP_TIMEFRAME = "1H"  # For CRT range detection
 EXECUTION_TIMEFRAME = "5min"  # For entry signals
@@ -46,6 +54,29 @@ SLIPPAGE = 0.1  # Slippage in pips for trade execution
 PLOT_CHARTS = True
 SAVE_CHARTS = True
 
+# Learned broker stop distances (see src/stop_model.py)
+STOP_MODEL_FILE = LOGS_DIR / "stop_model.json"
+
+# Per-server symbol catalogs (see src/symbol_catalog.py)
+SYMBOL_CATALOG_DIR = LOGS_DIR / "symbol_catalog"
+
+# Structured strategy decision log (see src/decision_log.py)
+DECISION_LOG_DIR = LOGS_DIR / "decisions"
+
+# SQLite store of signals, orders, fills, position updates and closes (see src/trade_store.py)
+TRADE_STORE_FILE = LOGS_DIR / "trades.db"
+
+# Deal-history cursor of the journal reconciliation (see src/journal_reconcile.py)
+RECONCILE_CURSOR_FILE = LOGS_DIR / "reconcile_cursor.json"
+
+# Prefetched high-impact news calendar (see src/news_filter.py)
+NEWS_CALENDAR_FILE = LOGS_DIR / "news_calendar.json"
+NEWS_HISTORY_FILE = DATA_DIR / "news_calendar.csv"  # Historical calendar used by backtests
+
+# On-demand profiling of the live loop (see src/profiling.py): touch the flag file to start a capture
+PROFILE_FLAG_FILE = LOGS_DIR / "profile.flag"
+PROFILE_OUTPUT_DIR = LOGS_DIR / "profiles"
+
 # Logging configuration
 LOG_FILE_PATH = LOGS_DIR / "trade_journal.csv"
 LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
\ No newline at end of file
@@ -77,7 +77,7 @@ class DataHandler:
         print("Resampling data to 1H and 5min timeframes...")
         
         # Resample to 1-hour timeframe
-        self.data_1h = self.raw_data.resample('1H').agg({
+        self.data_1h = self.raw_data.resample('1h').agg({
             'open': 'first',
             'high': 'max',
             'low': 'min',
@@ -135,7 +135,7 @@ class DataHandler:
     def _align_timeframes(self):
         """Associate each 5-minute candle with its corresponding 1-hour CRT range"""
         # Create hour reference for each 5-minute candle
-        self.data_5m['hour_ref'] = self.data_5m.index.floor('1H')
+        self.data_5m['hour_ref'] = self.data_5m.index.floor('1h')
         
         # Forward fill 1H data to match with 5min data
         hour_data = self.data_1h.copy()
@@ -153,6 +153,25 @@ class DataHandler:
         # Forward fill CRT levels
         self.data_5m[['crt_high', 'crt_low', 'crt_mid']] = self.data_5m[['crt_high', 'crt_low', 'crt_mid']].ffill()
         
+    def add_news_blackout(self, calendar_path=None, session_windows=None):
+        """
+        Mark bars inside a high-impact news blackout ('news_blackout' column on the 1H and 5min data),
+        using the historical calendar and the same per-session windows as the live news filter.
+        Returns the number of blocked 5min bars, or None if there is no calendar file.
+        """
+        from src import news_filter
+        if self.data_5m is None:
+            self.prepare_data_for_strategy()
+        path = calendar_path or config.NEWS_HISTORY_FILE
+        try:
+            events = news_filter.load_historical_calendar(path)
+        except FileNotFoundError:
+            self.logger.warning(f"No historical news calendar at {path}; news blackout not applied")
+            return None
+        for df, bar_seconds in ((self.data_1h, 3600), (self.data_5m, 300)):
+            df['news_blackout'] = news_filter.news_blackout_mask(df.index, events, bar_seconds=bar_seconds, windows=session_windows)
+        return int(self.data_5m['news_blackout'].sum())
+        
     def get_forward_testing_data(self):
         """Prepare data for forward testing simulation"""
         if self.data_5m is None:
@@ -0,0 +1,138 @@
+import threading
+import logging
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+import MetaTrader5 as mt5
+
+# Entry details captured while a position is still open
+PositionEntry = namedtuple("PositionEntry", ["ticket", "symbol", "direction", "price_open", "volume", "sl", "tp", "time", "magic"])
+
+
+class DealMirror:
+    """
+    Local mirror of the account deal history.
+
+    Only deals newer than the high-water mark (latest deal time seen, minus a small
+    overlap for deals that arrive late) are requested on each sync. Deals are indexed
+    by position_id, so finding the exit of a closed position is a dictionary lookup.
+    Entry details are remembered while positions are open, because they are gone from
+    positions_get() once the position is closed.
+    """
+    def __init__(self, api=None, lookback_days=5, overlap_seconds=300, clock=None):
+        """
+        Parameters:
+        api: MetaTrader5 module or gateway
+        lookback_days (int): History loaded on the first sync
+        overlap_seconds (int): Re-request this much history before the high-water mark
+        clock (callable): Returns the current broker time as a datetime (defaults to UTC now)
+        """
+        self.api = api or mt5
+        self.lookback_days = lookback_days
+        self.overlap_seconds = overlap_seconds
+        self.clock = clock or (lambda: datetime.now(timezone.utc))
+        self.logger = logging.getLogger("crt_trading.deal_mirror")
+        self._lock = threading.Lock()
+        self.high_water_mark = None  # epoch seconds of the newest deal seen
+        self._seen = set()           # deal tickets already indexed
+        self._by_position = {}       # position_id -> [deal, ...]
+        self._exits = {}             # position_id -> closing deal
+        self._entries = {}           # position ticket -> PositionEntry
+        self.syncs = 0
+        self.deals_fetched = 0
+
+    def sync(self):
+        """
+        Fetch deals added since the last sync.
+
+        Returns:
+        list: Newly indexed deals (empty if nothing new or the request failed)
+        """
+        now = self.clock()
+        if self.high_water_mark is None:
+            date_from = now - timedelta(days=self.lookback_days)
+        else:
+            date_from = datetime.fromtimestamp(self.high_water_mark - self.overlap_seconds, timezone.utc)
+        # Broker server time can run ahead of the local clock, so leave room on the upper end
+        deals = self.api.history_deals_get(date_from, now + timedelta(days=1))
+        self.syncs += 1
+        if deals is None:
+            self.logger.warning(f"history_deals_get failed during sync: {self.api.last_error()}")
+            return []
+
+        new_deals = []
+        with self._lock:
+            for deal in deals:
+                if deal.ticket in self._seen:
+                    continue
+                self._seen.add(deal.ticket)
+                new_deals.append(deal)
+                self._by_position.setdefault(deal.position_id, []).append(deal)
+                if deal.entry == self.api.DEAL_ENTRY_OUT:
+                    self._exits[deal.position_id] = deal
+                if self.high_water_mark is None or deal.time > self.high_water_mark:
+                    self.high_water_mark = deal.time
+            self.deals_fetched += len(deals)
+        return new_deals
+
+    def track_positions(self, positions):
+        """Capture entry details of currently open positions"""
+        with self._lock:
+            for pos in positions or []:
+                if pos.ticket in self._entries:
+                    # SL/TP can be modified while the position is open
+                    self._entries[pos.ticket] = self._entries[pos.ticket]._replace(sl=pos.sl, tp=pos.tp)
+                    continue
+                self._entries[pos.ticket] = PositionEntry(
+                    ticket=pos.ticket,
+                    symbol=pos.symbol,
+                    direction='BUY' if pos.type == self.api.ORDER_TYPE_BUY else 'SELL',
+                    price_open=pos.price_open,
+                    volume=pos.volume,
+                    sl=pos.sl,
+                    tp=pos.tp,
+                    time=pos.time,
+                    magic=pos.magic,
+                )
+
+    def exit_deal(self, position_id):
+        """Closing deal of a position, or None if it has not been seen yet"""
+        return self._exits.get(position_id)
+
+    def entry(self, position_id):
+        """Entry details captured for a position, or None"""
+        entry = self._entries.get(position_id)
+        if entry is not None:
+            return entry
+        # Position opened and closed between two position refreshes: use the entry deal
+        for deal in self._by_position.get(position_id, ()):
+            if deal.entry == self.api.DEAL_ENTRY_IN:
+                return PositionEntry(
+                    ticket=position_id,
+                    symbol=deal.symbol,
+                    direction='BUY' if deal.type == self.api.ORDER_TYPE_BUY else 'SELL',
+                    price_open=deal.price,
+                    volume=deal.volume,
+                    sl=None,
+                    tp=None,
+                    time=deal.time,
+                    magic=deal.magic,
+                )
+        return None
+
+    def deals(self, position_id):
+        return list(self._by_position.get(position_id, ()))
+
+    def forget(self, position_id):
+        """Drop the entry details of a position that has been fully handled"""
+        with self._lock:
+            self._entries.pop(position_id, None)
+
+    def stats(self):
+        return {
+            'syncs': self.syncs,
+            'deals_fetched': self.deals_fetched,
+            'deals_indexed': len(self._seen),
+            'positions': len(self._by_position),
+            'high_water_mark': self.high_water_mark,
+        }
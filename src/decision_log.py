@@ -0,0 +1,298 @@
+"""
+Structured log of the strategy's decisions (skips, ranges, sweeps, entries, orders).
+
+Records are buffered in memory and written by a background thread as tab-separated
+lines:
+
+    timestamp <TAB> level <TAB> stage <TAB> reason <TAB> {json fields}
+
+Timestamps are UTC without an offset ("2025-06-01 13:45:00"), the same clock as the
+broker's server time. The first four columns can be split without parsing JSON, which keeps queries over
+months of logs fast. The current file is rotated and gzip-compressed when it reaches
+max_bytes.
+
+Query from the command line:
+    python -m src.decision_log count --level SKIP --by reason --per day
+    python -m src.decision_log show --stage sweep --since 2025-06-01 --limit 50
+"""
+import argparse
+import glob
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+import logging
+from collections import Counter, deque
+from datetime import datetime, timezone
+
+from src import config
+
+SUFFIX = ".tsv"
+
+
+def _clean(text):
+    return str(text).replace("\t", " ").replace("\n", " ")
+
+
+def format_record(ts, level, stage, reason, fields):
+    """One log line (with trailing newline) for a record"""
+    if isinstance(ts, datetime):
+        if ts.tzinfo is not None:
+            ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+        ts = ts.isoformat(sep=" ", timespec="seconds")
+    payload = json.dumps(fields, default=str, separators=(",", ":")) if fields else "{}"
+    return f"{_clean(ts)}\t{_clean(level)}\t{_clean(stage)}\t{_clean(reason)}\t{payload}\n"
+
+
+class DecisionLog:
+    """
+    Buffered writer for decision records.
+
+    record() only appends to a bounded in-memory ring buffer; a background thread
+    writes the buffer in one batch every flush_interval seconds (or sooner when the
+    buffer is half full). If the writer falls behind, the oldest buffered records are
+    dropped and counted rather than blocking the strategy.
+    """
+    def __init__(self, directory=None, name="decisions", capacity=10000, flush_interval=1.0,
+                 max_bytes=10 * 1024 * 1024, compress=True):
+        """
+        Parameters:
+        directory: Where log files are kept (default config.DECISION_LOG_DIR)
+        name (str): Base file name; the current file is <name>.tsv
+        capacity (int): Ring buffer size in records
+        flush_interval (float): Maximum seconds a record waits in the buffer
+        max_bytes (int): Rotate the current file once it is this large
+        compress (bool): gzip rotated files
+        """
+        self.directory = str(directory or config.DECISION_LOG_DIR)
+        self.name = name
+        self.path = os.path.join(self.directory, name + SUFFIX)
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.logger = logging.getLogger("crt_trading.decision_log")
+        self._buffer = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._file = None
+        self.records = 0
+        self.dropped = 0
+        self.batches = 0
+        self.rotations = 0
+
+    # --- Recording ---
+    def record(self, level, stage, reason, ts=None, **fields):
+        """
+        Buffer one decision.
+
+        Parameters:
+        level (str): SKIP, INFO, ...
+        stage (str): Strategy stage (limits, session, news, trend, range, sweep, entry, risk, order, ...)
+        reason (str): Fixed description of the decision (values go into fields)
+        ts: Timestamp of the decision (datetime or string), default now; naive datetimes are taken as UTC
+        fields: Typed values such as prices, tickets, ratios
+        """
+        entry = (ts if ts is not None else datetime.now(timezone.utc), level, stage, reason, fields)
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append(entry)
+            self.records += 1
+            wake = len(self._buffer) * 2 >= self._buffer.maxlen
+        if self._thread is None:
+            self.flush()
+        elif wake:
+            self._wake.set()
+
+    # --- Writing ---
+    def start(self):
+        """Write from a background thread from now on"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="crt-decision-log", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._flush_safely()
+        self._flush_safely()
+
+    def _flush_safely(self):
+        try:
+            self.flush()
+        except Exception as e:
+            self.logger.error(f"Decision log flush failed: {e}")
+
+    def flush(self):
+        """Write all buffered records in one batch"""
+        with self._lock:
+            if not self._buffer:
+                return
+            batch = list(self._buffer)
+            self._buffer.clear()
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write("".join(format_record(*entry) for entry in batch))
+        self._file.flush()
+        self.batches += 1
+        if self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        with open(self.path, "r", encoding="utf-8") as f:
+            first_ts = f.readline().split("\t", 1)[0]
+        stamp = first_ts.replace("-", "").replace(":", "").replace(" ", "T") or time.strftime("%Y%m%dT%H%M%S")
+        rotated = os.path.join(self.directory, f"{self.name}-{stamp}{SUFFIX}")
+        n = 1
+        while os.path.exists(rotated) or os.path.exists(rotated + ".gz"):
+            rotated = os.path.join(self.directory, f"{self.name}-{stamp}.{n}{SUFFIX}")
+            n += 1
+        os.replace(self.path, rotated)
+        if self.compress:
+            with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(rotated)
+        self.rotations += 1
+
+    def close(self):
+        """Stop the writer and write everything still buffered"""
+        if self._thread is not None:
+            self._stop_event.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def stats(self):
+        return {
+            'records': self.records,
+            'buffered': len(self._buffer),
+            'dropped': self.dropped,
+            'batches': self.batches,
+            'rotations': self.rotations,
+        }
+
+
+# --- Reading ---
+def _rotated_start(path, name):
+    """(first timestamp, collision counter) of a rotated file: <name>-<stamp>[.<n>].tsv[.gz]"""
+    rest = os.path.basename(path)[len(name) + 1:]
+    if rest.endswith(".gz"):
+        rest = rest[:-3]
+    stamp, _, counter = rest[:-len(SUFFIX)].partition(".")
+    return stamp, int(counter) if counter.isdigit() else 0
+
+
+def log_files(directory=None, name="decisions", since=None):
+    """
+    Log files oldest first (rotated files, then the current one).
+    Rotated files that end before `since` (a 'YYYY-MM-DD...' string) are skipped.
+    """
+    directory = str(directory or config.DECISION_LOG_DIR)
+    rotated = sorted(glob.glob(os.path.join(directory, f"{name}-*{SUFFIX}*")), key=lambda f: _rotated_start(f, name))
+    current = os.path.join(directory, name + SUFFIX)
+    files = rotated + ([current] if os.path.exists(current) else [])
+    if since:
+        # A file ends where the next one starts (records at that second can be in either);
+        # file names carry their first timestamp
+        compact = since.replace("-", "").replace(":", "").replace(" ", "T")
+        starts = [_rotated_start(f, name)[0] for f in rotated]
+        files = [f for i, f in enumerate(rotated) if i + 1 >= len(starts) or starts[i + 1] >= compact] + files[len(rotated):]
+    return files
+
+
+def iter_lines(directory=None, name="decisions", since=None, until=None):
+    """Yield (ts, level, stage, reason, fields_json) for every record in range"""
+    for path in log_files(directory, name, since):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                parts = line.rstrip("\n").split("\t", 4)
+                if len(parts) < 5:
+                    continue
+                ts = parts[0]
+                if since and ts < since:
+                    continue
+                if until and ts >= until:
+                    continue
+                yield parts
+
+
+def iter_records(directory=None, name="decisions", since=None, until=None, level=None, stage=None, reason=None):
+    """Yield records as dicts with the JSON fields decoded"""
+    for ts, lvl, stg, rsn, payload in iter_lines(directory, name, since, until):
+        if (level and lvl != level) or (stage and stg != stage) or (reason and rsn != reason):
+            continue
+        record = {'ts': ts, 'level': lvl, 'stage': stg, 'reason': rsn}
+        record.update(json.loads(payload))
+        yield record
+
+
+def count(directory=None, name="decisions", by="reason", per="day", since=None, until=None, level=None, stage=None):
+    """
+    Count records grouped by a column and period without decoding the JSON fields.
+
+    Parameters:
+    by (str): level, stage or reason
+    per (str): day, month, hour or None (whole range)
+
+    Returns:
+    Counter: (period, value) -> count
+    """
+    column = {'level': 1, 'stage': 2, 'reason': 3}[by]
+    width = {'month': 7, 'day': 10, 'hour': 13, None: 0}[per]
+    counts = Counter()
+    for parts in iter_lines(directory, name, since, until):
+        if (level and parts[1] != level) or (stage and parts[2] != stage):
+            continue
+        counts[(parts[0][:width], parts[column])] += 1
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the strategy decision log")
+    parser.add_argument("--dir", default=None, help="Log directory (default logs/decisions)")
+    parser.add_argument("--since", help="First timestamp, e.g. 2025-06-01")
+    parser.add_argument("--until", help="End timestamp (exclusive)")
+    parser.add_argument("--level", help="Only this level, e.g. SKIP")
+    parser.add_argument("--stage", help="Only this stage, e.g. sweep")
+    commands = parser.add_subparsers(dest="command", required=True)
+    count_parser = commands.add_parser("count", help="Count records per period")
+    count_parser.add_argument("--by", choices=["level", "stage", "reason"], default="reason")
+    count_parser.add_argument("--per", choices=["month", "day", "hour", "all"], default="day")
+    show_parser = commands.add_parser("show", help="Print matching records")
+    show_parser.add_argument("--reason")
+    show_parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    if args.command == "count":
+        per = None if args.per == "all" else args.per
+        counts = count(args.dir, by=args.by, per=per, since=args.since, until=args.until,
+                       level=args.level, stage=args.stage)
+        for (period, value), n in sorted(counts.items()):
+            print(f"{period or 'all':<13} {n:>8}  {value}")
+        print(f"{sum(counts.values())} records in {time.perf_counter() - started:.2f}s")
+    else:
+        records = iter_records(args.dir, since=args.since, until=args.until, level=args.level,
+                               stage=args.stage, reason=args.reason)
+        recent = deque(records, maxlen=args.limit)
+        for record in recent:
+            print(json.dumps(record, default=str))
+
+
+if __name__ == "__main__":
+    main()
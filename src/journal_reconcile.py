@@ -0,0 +1,260 @@
+"""
+Fill holes in the trade journal from the MT5 deal history.
+
+Journal rows marked OPEN without a CLOSED row for the same position get their exit
+(price, profit, PnL%) from the closing deal, and MaxProfit/MaxLoss from M1 bars
+between entry and exit when the terminal still has them. Deals and orders are read
+from a stored cursor forward in bounded chunks, so a nightly run only requests
+the deals added since the last run.
+
+Usage:
+    python -m src.journal_reconcile [--journal trade_journal.csv] [--days 90] [--chunk-days 7]
+"""
+import argparse
+import json
+import os
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+
+import MetaTrader5 as mt5
+
+from src import config
+from src.trade_journal import TradeJournal, JOURNAL_HEADERS
+
+_COL = {name: i for i, name in enumerate(JOURNAL_HEADERS)}
+
+
+def _number(text):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return None
+
+
+def _ticket(text):
+    try:
+        return int(float(text))
+    except (TypeError, ValueError):
+        return None
+
+
+class JournalReconciler:
+    """
+    Incremental, idempotent journal reconciliation.
+
+    A position is matched to a journal row by ticket, either directly (position ticket
+    = opening order ticket on MT5) or through the order -> position_id map built from
+    the history orders and deals. A position that already has a CLOSED row is never
+    written again, and the cursor only moves past a chunk once the chunk is done, so
+    rerunning after an interruption is safe.
+    """
+    def __init__(self, journal, api=None, store=None, cursor_file=None, chunk_days=7,
+                 initial_days=90, overlap_seconds=300, excursions=True):
+        """
+        Parameters:
+        journal (TradeJournal): Journal to read and append CLOSED rows to
+        api: MetaTrader5 module or gateway
+        store (TradeStore): Optional trade store that also receives the fills and closes
+        cursor_file: Where the cursor is kept (default config.RECONCILE_CURSOR_FILE)
+        chunk_days (int): Size of each history request
+        initial_days (int): How far back the first run starts
+        overlap_seconds (int): Re-read this much history before the cursor (late deals)
+        excursions (bool): Compute MaxProfit/MaxLoss from M1 bars
+        """
+        self.journal = journal
+        self.api = api or mt5
+        self.store = store
+        self.cursor_file = str(cursor_file or config.RECONCILE_CURSOR_FILE)
+        self.chunk = timedelta(days=chunk_days)
+        self.initial_days = initial_days
+        self.overlap_seconds = overlap_seconds
+        self.excursions = excursions
+        self.logger = logging.getLogger("crt_trading.journal_reconcile")
+        self._contract_sizes = {}
+
+    # --- Cursor ---
+    def _server(self):
+        account = self.api.account_info()
+        return account.server if account is not None else "default"
+
+    def _load_cursors(self):
+        if not os.path.exists(self.cursor_file):
+            return {}
+        try:
+            with open(self.cursor_file, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Could not read reconcile cursor {self.cursor_file}: {e}")
+            return {}
+
+    def _save_cursor(self, server, cursor):
+        cursors = self._load_cursors()
+        cursors[server] = cursor
+        tmp_path = f"{self.cursor_file}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(cursors, f, indent=2)
+        os.replace(tmp_path, self.cursor_file)
+
+    # --- Journal state ---
+    def _journal_state(self):
+        """OPEN rows without a CLOSED row (ticket -> row) and the set of closed tickets"""
+        opened, closed = {}, set()
+        for row in self.journal.rows():
+            if len(row) < len(JOURNAL_HEADERS):
+                continue
+            ticket = _ticket(row[_COL['Ticket']])
+            if ticket is None:
+                continue
+            status = row[_COL['Status']]
+            if status == 'CLOSED':
+                closed.add(ticket)
+            elif status == 'OPEN':
+                opened[ticket] = row
+        return {t: r for t, r in opened.items() if t not in closed}, closed
+
+    # --- Reconciliation ---
+    def run(self, until=None):
+        """
+        Reconcile everything from the stored cursor up to `until` (default: now).
+
+        Returns:
+        dict: chunks requested, deals read, rows filled, positions already closed
+        """
+        started = time.perf_counter()
+        server = self._server()
+        now = until or datetime.now(timezone.utc)
+        cursor = self._load_cursors().get(server)
+        if cursor is None:
+            chunk_start = now - timedelta(days=self.initial_days)
+        else:
+            chunk_start = datetime.fromtimestamp(cursor - self.overlap_seconds, timezone.utc)
+
+        open_rows, closed = self._journal_state()
+        order_to_position = {}
+        summary = {'chunks': 0, 'deals': 0, 'filled': 0, 'already_closed': 0, 'unmatched_open': 0}
+        # Broker server time can run ahead of UTC: the last chunk reaches one day past now
+        end = now + timedelta(days=1)
+        while chunk_start < end:
+            chunk_end = min(chunk_start + self.chunk, end)
+            deals = self.api.history_deals_get(chunk_start, chunk_end)
+            orders = self.api.history_orders_get(chunk_start, chunk_end)
+            summary['chunks'] += 1
+            if deals is None:
+                self.logger.error(f"history_deals_get failed for {chunk_start} - {chunk_end}: {self.api.last_error()}")
+                break
+            summary['deals'] += len(deals)
+            for order in orders or ():
+                if order.position_id:
+                    order_to_position[order.ticket] = order.position_id
+            entries = {}
+            for deal in deals:
+                order_to_position.setdefault(deal.order, deal.position_id)
+                if deal.entry == self.api.DEAL_ENTRY_IN:
+                    entries[deal.position_id] = deal
+            position_rows = {order_to_position.get(t, t): (t, row) for t, row in open_rows.items()}
+            for deal in deals:
+                if deal.entry != self.api.DEAL_ENTRY_OUT or deal.position_id not in position_rows:
+                    continue
+                ticket, row = position_rows[deal.position_id]
+                if ticket in closed or deal.position_id in closed:
+                    summary['already_closed'] += 1
+                    continue
+                self._fill(ticket, row, deal, entries.get(deal.position_id))
+                closed.add(ticket)
+                open_rows.pop(ticket, None)
+                summary['filled'] += 1
+            # Only move the cursor past a chunk that was fully processed
+            self._save_cursor(server, min(chunk_end, now).timestamp())
+            chunk_start = chunk_end
+        summary['unmatched_open'] = len(open_rows)
+        summary['seconds'] = round(time.perf_counter() - started, 3)
+        self.logger.info(f"Journal reconciliation: {summary}")
+        return summary
+
+    def _fill(self, ticket, row, deal, entry_deal):
+        symbol = row[_COL['Symbol']] or deal.symbol
+        direction = row[_COL['Direction']]
+        entry_price = _number(row[_COL['EntryPrice']]) or (entry_deal.price if entry_deal else None)
+        volume = _number(row[_COL['LotSize']]) or deal.volume
+        contract_size = self._contract_size(symbol)
+        pnl_pct = (deal.profit / (entry_price * volume * contract_size)) * 100 if entry_price and volume else ''
+        entry_time = entry_deal.time if entry_deal else None
+        max_profit, max_loss = self._excursion(symbol, direction, entry_price, volume, contract_size, entry_time, deal.time)
+        exit_time = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(deal.time))
+        self.journal.append([
+            ticket, exit_time, symbol, direction, row[_COL['EntryPrice']], row[_COL['SL']], row[_COL['TP']],
+            row[_COL['LotSize']], row[_COL['RR1']], row[_COL['RR2']], 'CLOSED', deal.price, deal.profit, pnl_pct,
+            max_profit, max_loss, 'Reconciled from deal history',
+        ])
+        if self.store is not None:
+            deal_time = datetime.fromtimestamp(deal.time, timezone.utc)
+            self.store.add('fills', ticket=deal.ticket, position_id=deal.position_id, order_ticket=deal.order,
+                           time=deal_time, symbol=symbol, direction='SELL' if direction == 'BUY' else 'BUY',
+                           entry='OUT', volume=deal.volume, price=deal.price, profit=deal.profit,
+                           commission=deal.commission, swap=deal.swap)
+            self.store.add('closes', position_id=deal.position_id, deal_ticket=deal.ticket, time=deal_time, symbol=symbol, direction=direction,
+                           entry_time=datetime.fromtimestamp(entry_time, timezone.utc) if entry_time else None,
+                           entry_price=entry_price, exit_price=deal.price, volume=volume,
+                           sl=_number(row[_COL['SL']]), tp=_number(row[_COL['TP']]), profit=deal.profit,
+                           pnl_pct=pnl_pct if pnl_pct != '' else None,
+                           max_profit=max_profit if max_profit != '' else None,
+                           max_loss=max_loss if max_loss != '' else None, reason='reconciled')
+
+    def _contract_size(self, symbol):
+        size = self._contract_sizes.get(symbol)
+        if size is None:
+            info = self.api.symbol_info(symbol)
+            size = self._contract_sizes[symbol] = info.trade_contract_size if info else 100
+        return size
+
+    def _excursion(self, symbol, direction, entry_price, volume, contract_size, entry_time, exit_time):
+        """Best and worst floating P&L between entry and exit from M1 bars ('' when unknown)"""
+        if not self.excursions or entry_time is None or not entry_price or not volume:
+            return '', ''
+        rates = self.api.copy_rates_range(
+            symbol, self.api.TIMEFRAME_M1,
+            datetime.fromtimestamp(entry_time, timezone.utc), datetime.fromtimestamp(exit_time, timezone.utc),
+        )
+        if rates is None or len(rates) == 0:
+            return '', ''
+        value = volume * contract_size
+        if direction == 'BUY':
+            best, worst = rates['high'].max() - entry_price, rates['low'].min() - entry_price
+        else:
+            best, worst = entry_price - rates['low'].min(), entry_price - rates['high'].max()
+        return round(float(best * value), 2), round(float(worst * value), 2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fill missing exits in the trade journal from MT5 deal history")
+    parser.add_argument("--journal", default="trade_journal.csv")
+    parser.add_argument("--days", type=int, default=90, help="History to scan on the first run")
+    parser.add_argument("--chunk-days", type=int, default=7)
+    parser.add_argument("--no-excursions", action="store_true", help="Skip MaxProfit/MaxLoss from M1 bars")
+    parser.add_argument("--store", action="store_true", help="Also write fills and closes to the trade store")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format=config.LOG_FORMAT)
+    if not mt5.initialize():
+        print(f"MT5 initialize failed: {mt5.last_error()}")
+        return 1
+    journal = TradeJournal(args.journal, JOURNAL_HEADERS)
+    store = None
+    if args.store:
+        from src.trade_store import TradeStore
+        store = TradeStore(source='live')
+    try:
+        reconciler = JournalReconciler(journal, store=store, chunk_days=args.chunk_days,
+                                       initial_days=args.days, excursions=not args.no_excursions)
+        print(reconciler.run())
+    finally:
+        journal.close()
+        if store is not None:
+            store.close()
+        mt5.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
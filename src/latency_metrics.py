@@ -0,0 +1,345 @@
+"""
+Latency histograms for the live trader and a local Prometheus text endpoint.
+
+Stages are timed with spans that record integer nanoseconds into HDR-style
+histograms (log-linear buckets, under 1.6% relative error from 1 ns to about 36
+minutes). A span costs two to three microseconds: two perf_counter_ns() calls, a
+bit_length() bucket index and a locked increment.
+
+    from src import latency_metrics
+    with latency_metrics.span("bars"):
+        bars = bar_builder.build()
+
+    started = latency_metrics.now()
+    ...
+    latency_metrics.observe("fvg_scan", started)
+
+Components time themselves into the process-wide registry (get_registry());
+MetricsServer serves it at http://127.0.0.1:<port>/metrics and summary_line() gives
+a one-line p50/p99/max overview for the console.
+"""
+import threading
+import time
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SUB_BUCKET_BITS = 7                      # 128 linear sub-buckets per power of two
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+HALF_SUB_BUCKETS = SUB_BUCKETS >> 1
+MAX_SHIFT = 34                           # Values up to 2**41 ns (about 36 minutes)
+BUCKETS = SUB_BUCKETS + MAX_SHIFT * HALF_SUB_BUCKETS
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+STAGE_METRIC = "crt_stage_seconds"
+
+
+def _bucket(value):
+    if value < SUB_BUCKETS:
+        return value if value > 0 else 0
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    if shift > MAX_SHIFT:
+        return BUCKETS - 1
+    return SUB_BUCKETS + (shift - 1) * HALF_SUB_BUCKETS + (value >> shift) - HALF_SUB_BUCKETS
+
+
+def _bucket_upper(index):
+    """Highest value (ns) that falls into a bucket"""
+    if index < SUB_BUCKETS:
+        return index
+    shift = (index - SUB_BUCKETS) // HALF_SUB_BUCKETS + 1
+    mantissa = (index - SUB_BUCKETS) % HALF_SUB_BUCKETS + HALF_SUB_BUCKETS
+    return ((mantissa + 1) << shift) - 1
+
+
+class HdrHistogram:
+    """
+    Log-linear latency histogram over integer nanoseconds.
+    Recording is O(1) and thread-safe; percentiles walk the buckets.
+    """
+    __slots__ = ("counts", "count", "total", "min", "max", "_lock")
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self._lock = threading.Lock()
+
+    def record_ns(self, nanoseconds):
+        # _bucket() inlined: this is on every span
+        if nanoseconds < SUB_BUCKETS:
+            index = nanoseconds if nanoseconds > 0 else 0
+        else:
+            shift = nanoseconds.bit_length() - SUB_BUCKET_BITS
+            index = (SUB_BUCKETS + (shift - 1) * HALF_SUB_BUCKETS + (nanoseconds >> shift) - HALF_SUB_BUCKETS
+                     if shift <= MAX_SHIFT else BUCKETS - 1)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += nanoseconds
+            if nanoseconds > self.max:
+                self.max = nanoseconds
+            if self.min is None or nanoseconds < self.min:
+                self.min = nanoseconds
+
+    def record(self, seconds):
+        self.record_ns(int(seconds * 1e9))
+
+    def percentile(self, pct):
+        """Upper bound of the bucket holding the pct-th percentile, in seconds"""
+        return self.quantiles([pct / 100.0])[0]
+
+    def quantiles(self, quantiles):
+        """Several quantiles (0..1, ascending) in one pass over the buckets, in seconds"""
+        with self._lock:
+            count, largest = self.count, self.max
+            if count == 0:
+                return [0.0] * len(quantiles)
+            # Only the buckets between the smallest and largest value can be non-empty
+            first = _bucket(self.min)
+            counts = self.counts[first:_bucket(largest) + 1]
+        results = []
+        targets = [max(1, int(round(count * q))) for q in quantiles]
+        seen, t = 0, 0
+        for index, c in enumerate(counts, first):
+            if not c:
+                continue
+            seen += c
+            while t < len(targets) and seen >= targets[t]:
+                results.append(min(_bucket_upper(index), largest) / 1e9)
+                t += 1
+            if t == len(targets):
+                break
+        while len(results) < len(quantiles):
+            results.append(largest / 1e9)
+        return results
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * BUCKETS
+            self.count = 0
+            self.total = 0
+            self.min = None
+            self.max = 0
+
+    def summary(self):
+        p50, p90, p99 = self.quantiles([0.5, 0.9, 0.99])
+        return {
+            'count': self.count,
+            'mean_ms': (self.total / self.count / 1e6) if self.count else 0.0,
+            'p50_ms': p50 * 1000,
+            'p90_ms': p90 * 1000,
+            'p99_ms': p99 * 1000,
+            'max_ms': self.max / 1e6,
+        }
+
+
+class _Span:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.record_ns(time.perf_counter_ns() - self.started)
+        return False
+
+
+class LatencyRegistry:
+    """
+    Named histograms (metric name + labels) and gauges, exported in the Prometheus
+    text exposition format. Histograms are exported as summaries (quantiles, _sum, _count).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}   # (metric, labels) -> HdrHistogram
+        self._stages = {}       # stage name -> HdrHistogram of STAGE_METRIC
+        self._help = {STAGE_METRIC: "Latency of live trader stages"}
+        self._gauges = {}       # metric -> (help, fn)
+
+    # --- Histograms ---
+    def histogram(self, metric, help_text=None, **labels):
+        """Histogram for a metric and label set, created on first use"""
+        key = (metric, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = HdrHistogram()
+                    if help_text:
+                        self._help[metric] = help_text
+        return histogram
+
+    def stage(self, name):
+        histogram = self._stages.get(name)
+        if histogram is None:
+            histogram = self._stages[name] = self.histogram(STAGE_METRIC, stage=name)
+        return histogram
+
+    @staticmethod
+    def now():
+        """Start time for observe()"""
+        return time.perf_counter_ns()
+
+    def span(self, name):
+        """Context manager timing one run of a stage"""
+        return _Span(self.stage(name))
+
+    def observe(self, name, started_ns):
+        """Record a stage that started at `started_ns` (from now()) and ends now"""
+        self.stage(name).record_ns(time.perf_counter_ns() - started_ns)
+
+    def timed(self, name, fn):
+        """Wrap `fn` so every call is recorded as stage `name`"""
+        stage = self.stage(name)
+
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                stage.record_ns(time.perf_counter_ns() - started)
+        wrapper.__name__ = getattr(fn, "__name__", name)
+        return wrapper
+
+    # --- Gauges ---
+    def gauge(self, metric, fn, help_text=""):
+        """Export fn() (a number, or a {label value: number} dict labelled 'name') as a gauge"""
+        self._gauges[metric] = (help_text, fn)
+
+    # --- Export ---
+    def exposition(self):
+        """All metrics in the Prometheus text format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+        previous = None
+        for (metric, labels), histogram in histograms:
+            if metric != previous:
+                lines.append(f"# HELP {metric} {self._help.get(metric, metric)}")
+                lines.append(f"# TYPE {metric} summary")
+                previous = metric
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+            for q, value in zip(QUANTILES, histogram.quantiles(QUANTILES)):
+                lines.append(f'{metric}{{{label_text}{"," if label_text else ""}quantile="{q}"}} {value:.9g}')
+            suffix = f"{{{label_text}}}" if label_text else ""
+            lines.append(f"{metric}_sum{suffix} {histogram.total / 1e9:.9g}")
+            lines.append(f"{metric}_count{suffix} {histogram.count}")
+        for metric, (help_text, fn) in sorted(self._gauges.items()):
+            try:
+                value = fn()
+            except Exception:
+                continue
+            lines.append(f"# HELP {metric} {help_text or metric}")
+            lines.append(f"# TYPE {metric} gauge")
+            if isinstance(value, dict):
+                for name, v in sorted(value.items()):
+                    lines.append(f'{metric}{{name="{_escape(name)}"}} {float(v):.9g}')
+            elif value is not None:
+                lines.append(f"{metric} {float(value):.9g}")
+        return "\n".join(lines) + "\n"
+
+    def summary_line(self, stages=None):
+        """'stage p50/p99/max ms' for every stage that ran, slowest p99 first"""
+        items = [(name, h) for name, h in self._stages.items() if h.count and (stages is None or name in stages)]
+        parts = []
+        for name, histogram in items:
+            p50, p99 = histogram.quantiles([0.5, 0.99])
+            parts.append((p99, f"{name} {p50 * 1000:.1f}/{p99 * 1000:.1f}/{histogram.max / 1e6:.1f}"))
+        parts.sort(key=lambda p: -p[0])
+        return "Latency p50/p99/max ms: " + (" | ".join(text for _, text in parts) if parts else "no samples")
+
+    def stats(self):
+        """Summary per stage"""
+        return {name: h.summary() for name, h in self._stages.items()}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsServer:
+    """
+    Serves a registry's exposition at /metrics on a local port from a daemon thread.
+
+    Example:
+        server = MetricsServer(get_registry(), port=9108)
+        server.start()   # curl http://127.0.0.1:9108/metrics
+    """
+    def __init__(self, registry, host="127.0.0.1", port=9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.logger = logging.getLogger("crt_trading.latency_metrics")
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        if self._server is not None:
+            return
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.exposition().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="crt-metrics", daemon=True)
+        self._thread.start()
+        self.logger.info(f"Metrics at http://{self.host}:{self.port}/metrics")
+
+    def stop(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = None
+        self._thread = None
+
+
+_registry = LatencyRegistry()
+
+
+def get_registry():
+    """The process-wide registry"""
+    return _registry
+
+
+def now():
+    """Start time for observe()"""
+    return time.perf_counter_ns()
+
+
+def span(name):
+    """Time a stage in the process-wide registry (context manager)"""
+    return _registry.span(name)
+
+
+def observe(name, started_ns):
+    """Record a stage of the process-wide registry that started at `started_ns`"""
+    _registry.observe(name, started_ns)
+
+
+def timed(name, fn):
+    """Wrap `fn` so every call is a stage of the process-wide registry"""
+    return _registry.timed(name, fn)
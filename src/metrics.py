@@ -0,0 +1,346 @@
+"""
+Performance metrics over trade ledgers.
+
+compute_metrics() evaluates everything in one vectorized pass over plain arrays
+(P&L, entry/exit times, R:R). MetricsAccumulator keeps the same statistics
+incrementally (Welford for the return moments, running equity peak for drawdown)
+so the live dashboard and long sweeps never recompute from scratch.
+metrics_by_run() computes them for many sweep runs at once from flat arrays.
+
+Definitions (shared by all three):
+- returns: per-trade return pnl / equity before the trade
+- sharpe / sortino: mean return over its (downside) deviation, annualized with the
+  number of trades per year over the ledger span (unannualized if span is unknown)
+- max_drawdown: largest peak-to-trough drop of the equity curve (initial capital + cumulative P&L)
+- exposure: total time in positions / span (average number of open positions)
+- time_in_market: time with at least one open position / span
+"""
+import math
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+SECONDS_PER_YEAR = 365.25 * 24 * 3600
+
+METRIC_KEYS = [
+    'total_trades', 'win_rate', 'avg_win', 'avg_loss', 'largest_win', 'largest_loss', 'profit_factor',
+    'total_pnl', 'total_pnl_pct', 'avg_rr', 'max_drawdown', 'max_drawdown_pct', 'sharpe', 'sortino',
+    'exposure', 'time_in_market',
+]
+
+
+def to_seconds(times):
+    """Timestamps (datetime64, pandas, datetime objects or numbers) as float epoch seconds"""
+    if times is None:
+        return None
+    arr = np.asarray(times)
+    if np.issubdtype(arr.dtype, np.datetime64):
+        return arr.astype("datetime64[ns]").astype(np.int64) / 1e9
+    if arr.dtype == object:
+        import pandas as pd
+        return pd.to_datetime(arr).values.astype("datetime64[ns]").astype(np.int64) / 1e9
+    return arr.astype(float)
+
+
+def _empty():
+    result = {key: 0 for key in METRIC_KEYS}
+    result['total_trades'] = 0
+    return result
+
+
+def _ratios(mean, std, downside, n, span):
+    sharpe = mean / std if std > 0 else 0.0
+    sortino = mean / downside if downside > 0 else 0.0
+    if span and span > 0:
+        scale = math.sqrt(n / (span / SECONDS_PER_YEAR))
+        sharpe *= scale
+        sortino *= scale
+    return sharpe, sortino
+
+
+def compute_metrics(pnl, initial_capital, entry_times=None, exit_times=None, rr=None):
+    """
+    All metrics of one ledger in a single vectorized pass.
+
+    Parameters:
+    pnl: P&L per trade in account currency, in exit order
+    initial_capital (float): Equity before the first trade
+    entry_times, exit_times: Per-trade times (optional; needed for exposure, time in
+                             market and annualization)
+    rr: Per-trade reward:risk (optional)
+
+    Returns:
+    dict: METRIC_KEYS (win_rate, total_pnl_pct, max_drawdown_pct, exposure and
+          time_in_market in percent)
+    """
+    pnl = np.asarray(pnl, dtype=float)
+    n = len(pnl)
+    if n == 0:
+        return _empty()
+    wins = pnl > 0
+    n_wins = int(np.count_nonzero(wins))
+    gross_profit = float(pnl[wins].sum()) if n_wins else 0.0
+    gross_loss = float(pnl[~wins].sum()) if n_wins < n else 0.0
+
+    equity = initial_capital + np.cumsum(pnl)
+    before = np.concatenate(([initial_capital], equity[:-1]))
+    peak = np.maximum.accumulate(np.concatenate(([initial_capital], equity)))[1:]
+    drawdown = peak - equity
+    drawdown_pct = np.divide(drawdown, peak, out=np.zeros_like(drawdown), where=peak != 0) * 100
+    returns = pnl / np.where(before != 0, before, np.nan)
+    returns = returns[~np.isnan(returns)]
+
+    span = None
+    exposure = time_in_market = 0.0
+    if entry_times is not None and exit_times is not None:
+        entries = to_seconds(entry_times)
+        exits = to_seconds(exit_times)
+        span = float(exits.max() - entries.min())
+        if span > 0:
+            exposure = float((exits - entries).sum()) / span * 100
+            # Union of [entry, exit] intervals: sort by entry, a new block starts where
+            # the entry is after every exit so far
+            order = np.argsort(entries, kind="stable")
+            e, x = entries[order], exits[order]
+            reach = np.maximum.accumulate(x)
+            starts = np.concatenate(([True], e[1:] > reach[:-1]))
+            block_start = e[starts]
+            block_end = np.maximum.reduceat(x, np.flatnonzero(starts))
+            time_in_market = float((block_end - block_start).sum()) / span * 100
+
+    std = float(returns.std(ddof=1)) if len(returns) > 1 else 0.0
+    downside = float(np.sqrt(np.mean(np.minimum(returns, 0.0) ** 2))) if len(returns) else 0.0
+    sharpe, sortino = _ratios(float(returns.mean()) if len(returns) else 0.0, std, downside, n, span)
+
+    total_pnl = float(equity[-1] - initial_capital)
+    return {
+        'total_trades': n,
+        'win_rate': n_wins / n * 100,
+        'avg_win': gross_profit / n_wins if n_wins else 0,
+        'avg_loss': gross_loss / (n - n_wins) if n_wins < n else 0,
+        'largest_win': float(pnl.max()) if n_wins else 0,
+        'largest_loss': float(pnl.min()) if n_wins < n else 0,
+        'profit_factor': gross_profit / abs(gross_loss) if gross_loss else 0,
+        'total_pnl': total_pnl,
+        'total_pnl_pct': total_pnl / initial_capital * 100,
+        'avg_rr': float(np.nanmean(np.asarray(rr, dtype=float))) if rr is not None and len(rr) else 0,
+        'max_drawdown': float(drawdown.max()),
+        'max_drawdown_pct': float(drawdown_pct.max()),
+        'sharpe': sharpe,
+        'sortino': sortino,
+        'exposure': exposure,
+        'time_in_market': time_in_market,
+    }
+
+
+class MetricsAccumulator:
+    """
+    Streaming version of compute_metrics(), O(1) per trade.
+
+    Trades must be added in exit order (the order they close), which is what both the
+    live trader and the backtester produce. Time in market keeps the covered time as
+    disjoint intervals; a new trade merges the intervals it overlaps at the tail, so it
+    stays exact with overlapping positions at amortized O(1) per trade.
+    """
+    def __init__(self, initial_capital):
+        self.initial_capital = initial_capital
+        self.equity = initial_capital
+        self.peak = initial_capital
+        self.max_drawdown = 0.0
+        self.max_drawdown_pct = 0.0
+        self.n = 0
+        self.wins = 0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self.largest_win = 0.0
+        self.largest_loss = 0.0
+        self.rr_sum = 0.0
+        self.rr_count = 0
+        # Welford moments of per-trade returns, plus the downside second moment
+        self.ret_n = 0
+        self.ret_mean = 0.0
+        self.ret_m2 = 0.0
+        self.downside_sq = 0.0
+        # Time coverage
+        self.first_entry = None
+        self.last_exit = None
+        self.in_position = 0.0
+        self.covered = 0.0
+        self._block_starts = []
+        self._block_ends = []
+
+    def update(self, pnl, entry_time=None, exit_time=None, rr=None):
+        """Add one closed trade (times as epoch seconds or anything to_seconds() accepts)"""
+        pnl = float(pnl)
+        before = self.equity
+        self.n += 1
+        if pnl > 0:
+            self.wins += 1
+            self.gross_profit += pnl
+            self.largest_win = max(self.largest_win, pnl)
+        else:
+            self.gross_loss += pnl
+            self.largest_loss = min(self.largest_loss, pnl)
+        if rr is not None and not math.isnan(rr):
+            self.rr_sum += rr
+            self.rr_count += 1
+
+        self.equity += pnl
+        if self.equity > self.peak:
+            self.peak = self.equity
+        drawdown = self.peak - self.equity
+        self.max_drawdown = max(self.max_drawdown, drawdown)
+        if self.peak:
+            self.max_drawdown_pct = max(self.max_drawdown_pct, drawdown / self.peak * 100)
+
+        if before != 0:
+            r = pnl / before
+            self.ret_n += 1
+            delta = r - self.ret_mean
+            self.ret_mean += delta / self.ret_n
+            self.ret_m2 += delta * (r - self.ret_mean)
+            if r < 0:
+                self.downside_sq += r * r
+
+        if entry_time is not None and exit_time is not None:
+            entry, exit_ = (float(t) if isinstance(t, (int, float)) else float(to_seconds([t])[0])
+                            for t in (entry_time, exit_time))
+            self.first_entry = entry if self.first_entry is None else min(self.first_entry, entry)
+            self.last_exit = exit_ if self.last_exit is None else max(self.last_exit, exit_)
+            self.in_position += exit_ - entry
+            self._cover(entry, exit_)
+
+    def _cover(self, entry, exit_):
+        """Add [entry, exit_] to the covered intervals and the covered time"""
+        starts, ends = self._block_starts, self._block_ends
+        first = bisect_left(ends, entry)
+        last = bisect_right(starts, exit_)
+        if first < last:
+            start, end = min(entry, starts[first]), max(exit_, ends[last - 1])
+            already = sum(ends[k] - starts[k] for k in range(first, last))
+        else:
+            start, end, already = entry, exit_, 0.0
+        self.covered += (end - start) - already
+        starts[first:last] = [start]
+        ends[first:last] = [end]
+
+    def update_many(self, pnl, entry_times=None, exit_times=None, rr=None):
+        """Add a batch of trades (arrays in exit order)"""
+        entries = to_seconds(entry_times) if entry_times is not None else None
+        exits = to_seconds(exit_times) if exit_times is not None else None
+        rr = np.asarray(rr, dtype=float) if rr is not None else None
+        for i, value in enumerate(np.asarray(pnl, dtype=float)):
+            self.update(value,
+                        entries[i] if entries is not None else None,
+                        exits[i] if exits is not None else None,
+                        rr[i] if rr is not None else None)
+
+    def result(self):
+        """Current metrics, same keys and units as compute_metrics()"""
+        if self.n == 0:
+            return _empty()
+        losses = self.n - self.wins
+        span = (self.last_exit - self.first_entry) if self.first_entry is not None else None
+        std = math.sqrt(self.ret_m2 / (self.ret_n - 1)) if self.ret_n > 1 else 0.0
+        downside = math.sqrt(self.downside_sq / self.ret_n) if self.ret_n else 0.0
+        sharpe, sortino = _ratios(self.ret_mean, std, downside, self.n, span)
+        total_pnl = self.equity - self.initial_capital
+        return {
+            'total_trades': self.n,
+            'win_rate': self.wins / self.n * 100,
+            'avg_win': self.gross_profit / self.wins if self.wins else 0,
+            'avg_loss': self.gross_loss / losses if losses else 0,
+            'largest_win': self.largest_win if self.wins else 0,
+            'largest_loss': self.largest_loss if losses else 0,
+            'profit_factor': self.gross_profit / abs(self.gross_loss) if self.gross_loss else 0,
+            'total_pnl': total_pnl,
+            'total_pnl_pct': total_pnl / self.initial_capital * 100,
+            'avg_rr': self.rr_sum / self.rr_count if self.rr_count else 0,
+            'max_drawdown': self.max_drawdown,
+            'max_drawdown_pct': self.max_drawdown_pct,
+            'sharpe': sharpe,
+            'sortino': sortino,
+            'exposure': self.in_position / span * 100 if span else 0.0,
+            'time_in_market': self.covered / span * 100 if span else 0.0,
+        }
+
+
+def metrics_by_run(run_ids, pnl, initial_capital, entry_times=None, exit_times=None):
+    """
+    Core metrics for many runs at once (parameter sweeps) from flat arrays, without
+    a DataFrame per run. Rows must be grouped by run and in exit order within a run.
+
+    Returns:
+    dict: 'run' (unique run ids) plus one array per metric: total_trades, win_rate,
+          total_pnl, profit_factor, max_drawdown, max_drawdown_pct, sharpe, sortino,
+          time_in_market (percent)
+    """
+    run_ids = np.asarray(run_ids)
+    pnl = np.asarray(pnl, dtype=float)
+    if len(pnl) == 0:
+        return {'run': run_ids[:0]}
+    starts = np.flatnonzero(np.concatenate(([True], run_ids[1:] != run_ids[:-1])))
+    counts = np.diff(np.append(starts, len(pnl)))
+    group = np.repeat(np.arange(len(starts)), counts)
+
+    wins = pnl > 0
+    n_wins = np.add.reduceat(wins.astype(np.int64), starts)
+    gross_profit = np.add.reduceat(np.where(wins, pnl, 0.0), starts)
+    gross_loss = -np.add.reduceat(np.where(wins, 0.0, pnl), starts)
+    total_pnl = np.add.reduceat(pnl, starts)
+
+    # Equity curve per run: cumulative sum restarted at each run
+    cum = np.cumsum(pnl)
+    offset = np.repeat(np.concatenate(([0.0], cum[starts[1:] - 1])), counts)
+    equity = initial_capital + cum - offset
+    before = equity - pnl
+    # Running peak per run: lift each run above all previous ones so a single
+    # maximum.accumulate never carries a peak across runs
+    lift = np.repeat(np.arange(len(starts)) * (np.abs(equity).max() + abs(initial_capital) + 1) * 2, counts)
+    peak = np.maximum(np.maximum.accumulate(equity + lift) - lift, initial_capital)
+    drawdown = peak - equity
+    max_dd = np.maximum.reduceat(drawdown, starts)
+    dd_pct = np.maximum.reduceat(np.divide(drawdown, peak, out=np.zeros_like(drawdown), where=peak != 0), starts) * 100
+
+    returns = np.divide(pnl, before, out=np.zeros_like(pnl), where=before != 0)
+    mean = np.add.reduceat(returns, starts) / counts
+    centered = returns - mean[group]
+    var = np.add.reduceat(centered ** 2, starts) / np.maximum(counts - 1, 1)
+    std = np.sqrt(var)
+    downside = np.sqrt(np.add.reduceat(np.minimum(returns, 0.0) ** 2, starts) / counts)
+    sharpe = np.divide(mean, std, out=np.zeros_like(mean), where=std > 0)
+    sortino = np.divide(mean, downside, out=np.zeros_like(mean), where=downside > 0)
+
+    result = {
+        'run': run_ids[starts],
+        'total_trades': counts,
+        'win_rate': n_wins / counts * 100,
+        'total_pnl': total_pnl,
+        'profit_factor': np.divide(gross_profit, gross_loss, out=np.zeros_like(gross_profit), where=gross_loss > 0),
+        'max_drawdown': max_dd,
+        'max_drawdown_pct': dd_pct,
+    }
+    time_in_market = np.zeros(len(starts))
+    if entry_times is not None and exit_times is not None:
+        entries = to_seconds(entry_times)
+        exits = to_seconds(exit_times)
+        span = np.maximum.reduceat(exits, starts) - np.minimum.reduceat(entries, starts)
+        years = span / SECONDS_PER_YEAR
+        scale = np.sqrt(np.divide(counts, years, out=np.zeros_like(years), where=years > 0))
+        sharpe = np.where(years > 0, sharpe * scale, sharpe)
+        sortino = np.where(years > 0, sortino * scale, sortino)
+        # Union of intervals per run: order by (run, entry), new block where the entry
+        # is past the run's furthest exit so far (exits lifted per run like the equity)
+        order = np.lexsort((entries, group))
+        g, e, x = group[order], entries[order], exits[order]
+        time_lift = (g.astype(float)) * (np.abs(exits).max() + 1) * 2
+        reach = np.maximum.accumulate(x + time_lift) - time_lift
+        new_block = np.concatenate(([True], (e[1:] > reach[:-1]) | (g[1:] != g[:-1])))
+        block_starts = np.flatnonzero(new_block)
+        block_len = np.maximum.reduceat(x, block_starts) - e[block_starts]
+        covered = np.bincount(g[block_starts], weights=block_len, minlength=len(starts))
+        time_in_market = np.divide(covered, span, out=np.zeros_like(covered), where=span > 0) * 100
+    result['sharpe'] = sharpe
+    result['sortino'] = sortino
+    result['time_in_market'] = time_in_market
+    return result
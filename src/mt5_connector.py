@@ -4,17 +4,20 @@ import time
 from datetime import datetime, timedelta
 import MetaTrader5 as mt5
 import logging
+from src.mt5_gateway import get_gateway
 
 class MT5Connector:
     """
     Class to handle connection to MetaTrader 5 terminal and data retrieval
     """
-    def __init__(self, login=None, password=None, server=None):
+    def __init__(self, login=None, password=None, server=None, gateway=None):
         self.login = login
         self.password = password
         self.server = server
         self.connected = False
         self.logger = logging.getLogger("crt_trading.mt5_connector")
+        # All terminal calls go through the shared gateway thread
+        self.mt5 = gateway or get_gateway(mt5)
         
     def connect(self, max_retries=3, retry_delay=2):
         """
@@ -32,12 +35,12 @@ class MT5Connector:
             self.logger.info(f"MT5 connection attempt {attempt}/{max_retries}...")
             
             # Check if MT5 is already initialized
-            if mt5.terminal_info() is not None:
+            if self.mt5.terminal_info() is not None:
                 self.logger.info("MT5 is already initialized")
             else:
                 # Initialize MT5 connection
-                if not mt5.initialize():
-                    error_code = mt5.last_error()
+                if not self.mt5.initialize():
+                    error_code = self.mt5.last_error()
                     self.logger.error(f"MT5 initialization failed, error code: {error_code}")
                     
                     if error_code[0] == -10005:  # IPC timeout
@@ -54,43 +57,43 @@ class MT5Connector:
             
             # Log in to the trading account
             if self.login and self.password and self.server:
-                login_result = mt5.login(
+                login_result = self.mt5.login(
                     login=self.login,
                     password=self.password,
                     server=self.server
                 )
                 
                 if not login_result:
-                    error_code = mt5.last_error()
+                    error_code = self.mt5.last_error()
                     self.logger.error(f"MT5 login failed, error code: {error_code}")
                     
                     if attempt < max_retries:
-                        mt5.shutdown()
+                        self.mt5.shutdown()
                         self.logger.info(f"Retrying in {retry_delay} seconds...")
                         import time
                         time.sleep(retry_delay)
                         continue
                     else:
-                        mt5.shutdown()
+                        self.mt5.shutdown()
                         self.logger.error("Maximum retries reached. Could not login to MT5.")
                         return False
                     
                 self.logger.info(f"MT5 login successful for account #{self.login}")
             
             # Check connection status
-            account_info = mt5.account_info()
+            account_info = self.mt5.account_info()
             if account_info is None:
-                error_code = mt5.last_error()
+                error_code = self.mt5.last_error()
                 self.logger.error(f"No account info, error code: {error_code}")
                 
                 if attempt < max_retries:
-                    mt5.shutdown()
+                    self.mt5.shutdown()
                     self.logger.info(f"Retrying in {retry_delay} seconds...")
                     import time
                     time.sleep(retry_delay)
                     continue
                 else:
-                    mt5.shutdown()
+                    self.mt5.shutdown()
                     self.logger.error("Maximum retries reached. Could not get account info.")
                     return False
                 
@@ -103,7 +106,7 @@ class MT5Connector:
         
     def disconnect(self):
         """Close connection to MT5 terminal"""
-        mt5.shutdown()
+        self.mt5.shutdown()
         self.connected = False
         self.logger.info("Disconnected from MT5")
         
@@ -112,9 +115,9 @@ class MT5Connector:
         if not self.connected and not self.connect():
             return None
             
-        account_info = mt5.account_info()
+        account_info = self.mt5.account_info()
         if account_info is None:
-            self.logger.error(f"Failed to get account info, error code: {mt5.last_error()}")
+            self.logger.error(f"Failed to get account info, error code: {self.mt5.last_error()}")
             return None
             
         # Convert to dictionary
@@ -150,13 +153,13 @@ class MT5Connector:
             
         # Convert timeframe string to MT5 timeframe constant
         tf_mapping = {
-            "1m": mt5.TIMEFRAME_M1,
-            "5m": mt5.TIMEFRAME_M5, 
-            "15m": mt5.TIMEFRAME_M15,
-            "30m": mt5.TIMEFRAME_M30,
-            "1h": mt5.TIMEFRAME_H1,
-            "4h": mt5.TIMEFRAME_H4,
-            "1d": mt5.TIMEFRAME_D1
+            "1m": self.mt5.TIMEFRAME_M1,
+            "5m": self.mt5.TIMEFRAME_M5, 
+            "15m": self.mt5.TIMEFRAME_M15,
+            "30m": self.mt5.TIMEFRAME_M30,
+            "1h": self.mt5.TIMEFRAME_H1,
+            "4h": self.mt5.TIMEFRAME_H4,
+            "1d": self.mt5.TIMEFRAME_D1
         }
         
         if timeframe.lower() not in tf_mapping:
@@ -166,24 +169,24 @@ class MT5Connector:
         mt5_timeframe = tf_mapping[timeframe.lower()]
         
         # Get symbol info
-        symbol_info = mt5.symbol_info(symbol)
+        symbol_info = self.mt5.symbol_info(symbol)
         if symbol_info is None:
             self.logger.error(f"Symbol {symbol} not found, trying to enable it")
             # Try to enable the symbol
-            if not mt5.symbol_select(symbol, True):
+            if not self.mt5.symbol_select(symbol, True):
                 self.logger.error(f"Failed to enable symbol {symbol}")
                 return None
         
         # Get rates based on parameters
         if start_time and end_time:
             # Get rates within time range
-            rates = mt5.copy_rates_range(symbol, mt5_timeframe, start_time, end_time)
+            rates = self.mt5.copy_rates_range(symbol, mt5_timeframe, start_time, end_time)
         else:
             # Get latest N rates
-            rates = mt5.copy_rates_from_pos(symbol, mt5_timeframe, 0, count)
+            rates = self.mt5.copy_rates_from_pos(symbol, mt5_timeframe, 0, count)
             
         if rates is None or len(rates) == 0:
-            self.logger.error(f"Failed to get rates for {symbol}, error code: {mt5.last_error()}")
+            self.logger.error(f"Failed to get rates for {symbol}, error code: {self.mt5.last_error()}")
             return None
               # Convert to DataFrame
         rates_df = pd.DataFrame(rates)
@@ -205,7 +208,7 @@ class MT5Connector:
         if not self.connected and not self.connect():
             return None
             
-        symbol_info = mt5.symbol_info(symbol)
+        symbol_info = self.mt5.symbol_info(symbol)
         if symbol_info is None:
             self.logger.error(f"Symbol {symbol} not found")
             return None
@@ -237,7 +240,7 @@ class MT5Connector:
         if not self.connected and not self.connect():
             return None
               # Check symbol
-        symbol_info = mt5.symbol_info(symbol)
+        symbol_info = self.mt5.symbol_info(symbol)
         if symbol_info is None:
             self.logger.error(f"Symbol {symbol} not found")
             return None
@@ -249,11 +252,11 @@ class MT5Connector:
         price = symbol_dict.get('ask', 0) if order_type.upper() == "BUY" else symbol_dict.get('bid', 0)
         
         # Define order type
-        mt5_order_type = mt5.ORDER_TYPE_BUY if order_type.upper() == "BUY" else mt5.ORDER_TYPE_SELL
+        mt5_order_type = self.mt5.ORDER_TYPE_BUY if order_type.upper() == "BUY" else self.mt5.ORDER_TYPE_SELL
         
         # Prepare request structure
         request = {
-            "action": mt5.TRADE_ACTION_DEAL,
+            "action": self.mt5.TRADE_ACTION_DEAL,
             "symbol": symbol,
             "volume": volume,
             "type": mt5_order_type,
@@ -261,8 +264,8 @@ class MT5Connector:
             "deviation": 20,  # max price deviation in points
             "magic": 12345,   # magic number to identify trades
             "comment": comment,
-            "type_time": mt5.ORDER_TIME_GTC,  # good till canceled
-            "type_filling": mt5.ORDER_FILLING_FOK,  # fill or kill
+            "type_time": self.mt5.ORDER_TIME_GTC,  # good till canceled
+            "type_filling": self.mt5.ORDER_FILLING_FOK,  # fill or kill
         }
         
         # Add SL/TP if provided
@@ -272,9 +275,9 @@ class MT5Connector:
             request["tp"] = tp
             
         # Send order
-        result = mt5.order_send(request)
+        result = self.mt5.order_send(request)
         
-        if result.retcode != mt5.TRADE_RETCODE_DONE:
+        if result.retcode != self.mt5.TRADE_RETCODE_DONE:
             self.logger.error(f"Order failed, retcode: {result.retcode}, {result.comment}")
             return None
             
@@ -295,7 +298,7 @@ class MT5Connector:
             return False
             
         # Get position info
-        position = mt5.positions_get(ticket=ticket)
+        position = self.mt5.positions_get(ticket=ticket)
         if position is None or len(position) == 0:
             self.logger.error(f"Position with ticket {ticket} not found")
             return False
@@ -304,23 +307,23 @@ class MT5Connector:
         
         # Prepare close request
         request = {
-            "action": mt5.TRADE_ACTION_DEAL,
+            "action": self.mt5.TRADE_ACTION_DEAL,
             "position": position.ticket,
             "symbol": position.symbol,
             "volume": position.volume,
-            "type": mt5.ORDER_TYPE_BUY if position.type == 1 else mt5.ORDER_TYPE_SELL,  # Opposite direction
-            "price": mt5.symbol_info_tick(position.symbol).ask if position.type == 1 else mt5.symbol_info_tick(position.symbol).bid,
+            "type": self.mt5.ORDER_TYPE_BUY if position.type == 1 else self.mt5.ORDER_TYPE_SELL,  # Opposite direction
+            "price": self.mt5.symbol_info_tick(position.symbol).ask if position.type == 1 else self.mt5.symbol_info_tick(position.symbol).bid,
             "deviation": 20,
             "magic": 12345,
             "comment": "CRT Close",
-            "type_time": mt5.ORDER_TIME_GTC,
-            "type_filling": mt5.ORDER_FILLING_FOK,
+            "type_time": self.mt5.ORDER_TIME_GTC,
+            "type_filling": self.mt5.ORDER_FILLING_FOK,
         }
         
         # Send request
-        result = mt5.order_send(request)
+        result = self.mt5.order_send(request)
         
-        if result.retcode != mt5.TRADE_RETCODE_DONE:
+        if result.retcode != self.mt5.TRADE_RETCODE_DONE:
             self.logger.error(f"Close position failed, retcode: {result.retcode}, {result.comment}")
             return False
             
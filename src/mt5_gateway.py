@@ -0,0 +1,233 @@
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from enum import IntEnum
+
+import MetaTrader5 as mt5
+
+from src.latency_metrics import get_registry
+
+
+class Priority(IntEnum):
+    """Lower value is served first"""
+    ORDER = 0
+    POSITIONS = 1
+    TICK = 2
+    RATES = 3
+    HISTORY = 4
+    OTHER = 5
+
+
+# Priority of each MetaTrader5 function; anything not listed runs as OTHER
+METHOD_PRIORITY = {
+    'order_send': Priority.ORDER,
+    'order_check': Priority.ORDER,
+    'Close': Priority.ORDER,
+    'positions_get': Priority.POSITIONS,
+    'positions_total': Priority.POSITIONS,
+    'orders_get': Priority.POSITIONS,
+    'account_info': Priority.POSITIONS,
+    'symbol_info_tick': Priority.TICK,
+    'symbol_info': Priority.TICK,
+    'copy_rates_from_pos': Priority.RATES,
+    'copy_rates_from': Priority.RATES,
+    'copy_rates_range': Priority.RATES,
+    'copy_ticks_from': Priority.RATES,
+    'copy_ticks_range': Priority.RATES,
+    'history_deals_get': Priority.HISTORY,
+    'history_orders_get': Priority.HISTORY,
+    'symbols_get': Priority.HISTORY,
+}
+
+# Read-only calls: identical requests waiting in the queue at the same time share one terminal call.
+# last_error() is not one of them: it reports the error of the caller's previous call, not shared state.
+COALESCABLE = {
+    'positions_get', 'positions_total', 'orders_get', 'account_info', 'terminal_info',
+    'symbol_info_tick', 'symbol_info', 'symbols_get',
+    'copy_rates_from_pos', 'copy_rates_from', 'copy_rates_range',
+    'copy_ticks_from', 'copy_ticks_range',
+    'history_deals_get', 'history_orders_get',
+}
+
+
+class _Request:
+    __slots__ = ('method', 'args', 'kwargs', 'future', 'key', 'enqueued')
+
+    def __init__(self, method, args, kwargs, key):
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.key = key
+        self.enqueued = time.perf_counter()
+
+
+class MT5Gateway:
+    """
+    Owns the MetaTrader5 terminal connection on a single worker thread.
+
+    Every call is queued by priority (order sends first, history last), identical
+    read requests waiting at the same time are coalesced into one terminal call,
+    and per-function latency histograms are recorded in the latency registry
+    (exported as crt_mt5_call_seconds and crt_mt5_queue_wait_seconds).
+
+    The gateway mirrors the MetaTrader5 module: constants are passed through and
+    functions are executed on the worker thread, so it can be used wherever the
+    module was used (`mt5 = MT5Gateway(mt5)`).
+    """
+    def __init__(self, api=None, name="mt5-gateway", registry=None):
+        self._api = api or mt5
+        self._name = name
+        self._registry = registry or get_registry()
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._proxies = {}
+        self._latency = {}
+        self._wait = {}
+        self.submitted = 0
+        self.coalesced = 0
+        self.logger = logging.getLogger("crt_trading.mt5_gateway")
+
+    # --- Lifecycle ---
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return self
+            self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+            self._thread.start()
+        self.logger.info("MT5 gateway thread started")
+        return self
+
+    def stop(self, timeout=5.0):
+        """Stop the worker after the requests already queued"""
+        if not self.running:
+            return
+        self._queue.put((Priority.OTHER + 1, next(self._seq), None))
+        self._thread.join(timeout)
+        self._thread = None
+
+    # --- Requests ---
+    def submit(self, method, *args, priority=None, **kwargs):
+        """
+        Queue a terminal call and return a concurrent.futures.Future for its result.
+
+        Parameters:
+        method (str): MetaTrader5 function name (e.g. "copy_rates_from_pos")
+        priority (Priority): Override the default priority of the function
+        """
+        if not self.running:
+            self.start()
+        if priority is None:
+            priority = METHOD_PRIORITY.get(method, Priority.OTHER)
+
+        key = None
+        if method in COALESCABLE:
+            try:
+                key = (method, args, tuple(sorted(kwargs.items())))
+                hash(key)
+            except TypeError:
+                key = None
+
+        with self._lock:
+            self.submitted += 1
+            if key is not None:
+                pending = self._pending.get(key)
+                if pending is not None:
+                    self.coalesced += 1
+                    return pending.future
+            request = _Request(method, args, kwargs, key)
+            if key is not None:
+                self._pending[key] = request
+        self._queue.put((priority, next(self._seq), request))
+        return request.future
+
+    def call(self, method, *args, timeout=None, **kwargs):
+        """Run a terminal call through the gateway and wait for the result"""
+        if threading.current_thread() is self._thread:
+            # Re-entrant call from the worker itself: run inline to avoid a deadlock
+            return getattr(self._api, method)(*args, **kwargs)
+        return self.submit(method, *args, **kwargs).result(timeout)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        attr = getattr(self._api, name)
+        if not callable(attr) or isinstance(attr, type):
+            return attr
+        proxy = self._proxies.get(name)
+        if proxy is None:
+            def proxy(*args, **kwargs):
+                return self.call(name, *args, **kwargs)
+            proxy.__name__ = name
+            self._proxies[name] = proxy
+        return proxy
+
+    # --- Metrics ---
+    def metrics(self):
+        """Per-function latency (terminal time) and queue wait summaries"""
+        with self._lock:
+            latency = {m: h.summary() for m, h in self._latency.items()}
+            wait = {m: h.summary() for m, h in self._wait.items()}
+        return {
+            'submitted': self.submitted,
+            'coalesced': self.coalesced,
+            'queue_depth': self._queue.qsize(),
+            'latency': latency,
+            'queue_wait': wait,
+        }
+
+    # --- Worker ---
+    def _run(self):
+        while True:
+            _, _, request = self._queue.get()
+            if request is None:
+                break
+            if request.key is not None:
+                with self._lock:
+                    if self._pending.get(request.key) is request:
+                        del self._pending[request.key]
+            if not request.future.set_running_or_notify_cancel():
+                continue
+
+            started = time.perf_counter()
+            try:
+                result = getattr(self._api, request.method)(*request.args, **request.kwargs)
+            except BaseException as e:
+                request.future.set_exception(e)
+            else:
+                request.future.set_result(result)
+            finished = time.perf_counter()
+
+            with self._lock:
+                hist = self._latency.get(request.method)
+                if hist is None:
+                    hist = self._latency[request.method] = self._registry.histogram(
+                        "crt_mt5_call_seconds", "MetaTrader 5 terminal call time", method=request.method)
+                    self._wait[request.method] = self._registry.histogram(
+                        "crt_mt5_queue_wait_seconds", "Time MetaTrader 5 calls waited in the gateway queue",
+                        method=request.method)
+            hist.record(finished - started)
+            self._wait[request.method].record(started - request.enqueued)
+
+
+_default_gateway = None
+_default_lock = threading.Lock()
+
+
+def get_gateway(api=None):
+    """Return the process-wide gateway, creating it on first use"""
+    global _default_gateway
+    with _default_lock:
+        if _default_gateway is None:
+            _default_gateway = MT5Gateway(api)
+        return _default_gateway
@@ -0,0 +1,805 @@
+"""
+Local MetaTrader5 simulator.
+
+Implements the subset of the MetaTrader5 Python API used by this project on top of
+historical OHLCV (or tick) data replayed with a virtual clock, so the live code can
+be run and profiled on machines without a terminal.
+
+Usage as a drop-in module:
+
+    from src import mt5_simulator
+    mt5_simulator.install(data_file="data/gold_ohlcv.csv", speed=1000)
+    import MetaTrader5 as mt5   # now the simulator
+
+Or run an unmodified script against it:
+
+    python -m src.mt5_simulator exness_crt_trader.py --speed 1000
+"""
+import os
+import sys
+import time
+import random
+import threading
+import argparse
+import runpy
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+# --- MetaTrader5 constants ---
+TIMEFRAME_M1 = 1
+TIMEFRAME_M5 = 5
+TIMEFRAME_M15 = 15
+TIMEFRAME_M30 = 30
+TIMEFRAME_H1 = 16385
+TIMEFRAME_H4 = 16388
+TIMEFRAME_D1 = 16408
+TIMEFRAME_W1 = 32769
+
+TIMEFRAME_SECONDS = {
+    TIMEFRAME_M1: 60,
+    TIMEFRAME_M5: 300,
+    TIMEFRAME_M15: 900,
+    TIMEFRAME_M30: 1800,
+    TIMEFRAME_H1: 3600,
+    TIMEFRAME_H4: 14400,
+    TIMEFRAME_D1: 86400,
+    TIMEFRAME_W1: 604800,
+}
+
+ORDER_TYPE_BUY = 0
+ORDER_TYPE_SELL = 1
+POSITION_TYPE_BUY = 0
+POSITION_TYPE_SELL = 1
+
+TRADE_ACTION_DEAL = 1
+TRADE_ACTION_SLTP = 6
+
+ORDER_TIME_GTC = 0
+ORDER_FILLING_FOK = 0
+ORDER_FILLING_IOC = 1
+ORDER_FILLING_RETURN = 2
+
+DEAL_TYPE_BUY = 0
+DEAL_TYPE_SELL = 1
+DEAL_ENTRY_IN = 0
+DEAL_ENTRY_OUT = 1
+DEAL_REASON_CLIENT = 0
+DEAL_REASON_EXPERT = 3
+DEAL_REASON_SL = 4
+DEAL_REASON_TP = 5
+
+TRADE_RETCODE_DONE = 10009
+TRADE_RETCODE_INVALID = 10013
+TRADE_RETCODE_INVALID_VOLUME = 10014
+TRADE_RETCODE_INVALID_STOPS = 10016
+TRADE_RETCODE_MARKET_CLOSED = 10018
+TRADE_RETCODE_NO_MONEY = 10019
+TRADE_RETCODE_POSITION_CLOSED = 10036
+
+RES_S_OK = 1
+RES_E_INVALID_PARAMS = -2
+RES_E_NOT_FOUND = -4
+RES_E_INTERNAL_FAIL_INIT = -10005
+
+# --- MetaTrader5 result structures ---
+SymbolInfo = namedtuple("SymbolInfo", [
+    "name", "path", "description", "currency_base", "currency_profit", "visible",
+    "point", "digits", "spread", "trade_contract_size", "trade_stops_level", "trade_freeze_level",
+    "volume_min", "volume_step", "volume_max", "bid", "ask", "time"
+])
+Tick = namedtuple("Tick", ["time", "bid", "ask", "last", "volume", "time_msc", "flags", "volume_real"])
+AccountInfo = namedtuple("AccountInfo", [
+    "login", "server", "name", "company", "currency", "leverage",
+    "balance", "equity", "profit", "margin", "margin_free", "margin_level"
+])
+TerminalInfo = namedtuple("TerminalInfo", ["connected", "trade_allowed", "name", "path", "company"])
+TradePosition = namedtuple("TradePosition", [
+    "ticket", "time", "time_msc", "type", "magic", "identifier", "reason", "volume",
+    "price_open", "sl", "tp", "price_current", "swap", "profit", "symbol", "comment"
+])
+TradeDeal = namedtuple("TradeDeal", [
+    "ticket", "order", "time", "time_msc", "type", "entry", "magic", "position_id", "reason",
+    "volume", "price", "commission", "swap", "profit", "fee", "symbol", "comment"
+])
+TradeOrder = namedtuple("TradeOrder", [
+    "ticket", "time_setup", "time_done", "type", "magic", "position_id", "volume_initial",
+    "price_open", "sl", "tp", "state", "symbol", "comment"
+])
+OrderSendResult = namedtuple("OrderSendResult", [
+    "retcode", "deal", "order", "volume", "price", "bid", "ask", "comment", "request_id", "retcode_external", "request"
+])
+OrderCheckResult = namedtuple("OrderCheckResult", [
+    "retcode", "balance", "equity", "profit", "margin", "margin_free", "margin_level", "comment", "request"
+])
+
+RATES_DTYPE = np.dtype([
+    ('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+    ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8')
+])
+
+
+def _to_epoch(value):
+    """Convert a datetime (naive = UTC), pandas Timestamp or number to epoch seconds"""
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return float(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    stamp = pd.Timestamp(value)
+    if stamp.tzinfo is None:
+        stamp = stamp.tz_localize('UTC')
+    return stamp.timestamp()
+
+
+class VirtualClock:
+    """Simulated server time running `speed` times faster than the wall clock"""
+    def __init__(self, start, speed=1.0):
+        self.start = float(start)
+        self.speed = float(speed)
+        self._wall0 = time.monotonic()
+        self._offset = 0.0
+
+    def now(self):
+        return self.start + (time.monotonic() - self._wall0) * self.speed + self._offset
+
+    def advance(self, seconds):
+        """Jump the virtual clock forward without waiting"""
+        self._offset += seconds
+
+    def sleep(self, seconds):
+        """Sleep for `seconds` of virtual time"""
+        if seconds > 0:
+            _real_sleep(seconds / self.speed)
+
+
+_real_sleep = time.sleep
+
+
+class MarketData:
+    """
+    Replayable price history for one symbol.
+    Base bars come from an OHLCV CSV (DataHandler format) or are built from a tick CSV
+    with time/bid/ask columns. Higher timeframes are aggregated from the base bars.
+    """
+    def __init__(self, data_file=None, tick_file=None):
+        if tick_file:
+            ticks = pd.read_csv(tick_file)
+            if ticks['time'].dtype == object:
+                t = pd.to_datetime(ticks['time']).to_numpy().astype('datetime64[ms]').astype(np.int64) / 1000.0
+            else:
+                t = ticks['time'].to_numpy()
+            self.tick_times = np.asarray(t, dtype=np.float64)
+            self.tick_bid = ticks['bid'].to_numpy(dtype=np.float64)
+            self.tick_ask = ticks['ask'].to_numpy(dtype=np.float64)
+            self._bars_from_ticks()
+        else:
+            df = pd.read_csv(data_file)
+            stamps = pd.to_datetime(df['timestamp'])
+            self.times = stamps.to_numpy().astype('datetime64[s]').astype(np.int64)
+            self.open = df['open'].to_numpy(dtype=np.float64)
+            self.high = df['high'].to_numpy(dtype=np.float64)
+            self.low = df['low'].to_numpy(dtype=np.float64)
+            self.close = df['close'].to_numpy(dtype=np.float64)
+            self.volume = df['volume'].to_numpy(dtype=np.int64) if 'volume' in df else np.zeros(len(df), np.int64)
+            self.tick_times = None
+        order = np.argsort(self.times, kind='stable')
+        for name in ('times', 'open', 'high', 'low', 'close', 'volume'):
+            setattr(self, name, getattr(self, name)[order])
+        self.bar_seconds = int(np.median(np.diff(self.times))) if len(self.times) > 1 else 60
+        self._tf_cache = {}
+
+    def _bars_from_ticks(self):
+        buckets = (self.tick_times // 60).astype(np.int64) * 60
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        mid = (self.tick_bid + self.tick_ask) / 2
+        self.times = buckets[starts]
+        self.open = mid[starts]
+        self.high = np.maximum.reduceat(mid, starts)
+        self.low = np.minimum.reduceat(mid, starts)
+        self.close = mid[np.r_[starts[1:] - 1, len(mid) - 1]]
+        self.volume = np.diff(np.r_[starts, len(mid)])
+
+    @property
+    def first_time(self):
+        return float(self.times[0])
+
+    @property
+    def last_time(self):
+        return float(self.times[-1] + self.bar_seconds)
+
+    def price_at(self, t):
+        """Mid price at virtual time t, walking open -> low/high -> close inside each bar"""
+        if self.tick_times is not None:
+            i = int(np.searchsorted(self.tick_times, t, side='right')) - 1
+            i = min(max(i, 0), len(self.tick_times) - 1)
+            return (self.tick_bid[i] + self.tick_ask[i]) / 2
+        i = int(np.searchsorted(self.times, t, side='right')) - 1
+        if i < 0:
+            return self.open[0]
+        if i >= len(self.times) - 1 and t >= self.times[-1] + self.bar_seconds:
+            return self.close[-1]
+        frac = min((t - self.times[i]) / self.bar_seconds, 1.0)  # Gaps (weekends) hold the close
+        path = self._path(i)
+        seg = min(int(frac * 3), 2)
+        local = frac * 3 - seg
+        return path[seg] + (path[seg + 1] - path[seg]) * local
+
+    def _path(self, i):
+        """Price path of bar i: open -> low/high -> close at 0, 1/3, 2/3 and 1 of the bar"""
+        o, h, l, c = self.open[i], self.high[i], self.low[i], self.close[i]
+        return (o, l, h, c) if c >= o else (o, h, l, c)
+
+    def extremes(self, t0, t1):
+        """Lowest and highest mid price on the price path between two virtual times"""
+        prices = [self.price_at(t0), self.price_at(t1)]
+        if self.tick_times is not None:
+            i0 = int(np.searchsorted(self.tick_times, t0, side='right'))
+            i1 = int(np.searchsorted(self.tick_times, t1, side='right'))
+            if i1 > i0:
+                mid = (self.tick_bid[i0:i1] + self.tick_ask[i0:i1]) / 2
+                prices += [float(mid.min()), float(mid.max())]
+            return min(prices), max(prices)
+        # Bars entirely inside the window contribute their low and high
+        first = int(np.searchsorted(self.times, t0, side='left'))
+        last = int(np.searchsorted(self.times, t1 - self.bar_seconds, side='right'))
+        if last > first:
+            prices += [float(self.low[first:last].min()), float(self.high[first:last].max())]
+        # The bars the window starts and ends in only contribute the path points inside it
+        for i in {int(np.searchsorted(self.times, t, side='right')) - 1 for t in (t0, t1)}:
+            if 0 <= i < len(self.times) and not first <= i < last:
+                path = self._path(i)
+                for k in (1, 2):
+                    if t0 < self.times[i] + k * self.bar_seconds / 3 < t1:
+                        prices.append(path[k])
+        return min(prices), max(prices)
+
+    def timeframe(self, timeframe):
+        """Aggregated bars (time, open, high, low, close, volume) for a timeframe"""
+        cached = self._tf_cache.get(timeframe)
+        if cached is not None:
+            return cached
+        seconds = TIMEFRAME_SECONDS[timeframe]
+        if seconds <= self.bar_seconds:
+            bars = (self.times, self.open, self.high, self.low, self.close, self.volume)
+        else:
+            buckets = (self.times // seconds) * seconds
+            starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+            ends = np.r_[starts[1:], len(buckets)] - 1
+            bars = (
+                buckets[starts],
+                self.open[starts],
+                np.maximum.reduceat(self.high, starts),
+                np.minimum.reduceat(self.low, starts),
+                self.close[ends],
+                np.add.reduceat(self.volume, starts),
+            )
+        self._tf_cache[timeframe] = bars
+        return bars
+
+
+class Simulator:
+    """
+    Simulated terminal for one symbol: virtual clock, market data, account,
+    positions and deal history.
+    """
+    def __init__(self, data_file=None, tick_file=None, symbol="XAUUSDm", speed=1.0, start=None,
+                 warmup=0.5, balance=10000.0, leverage=200, point=0.001, digits=3,
+                 contract_size=100.0, spread_points=160, stops_level=500,
+                 volume_min=0.01, volume_step=0.01, volume_max=200.0,
+                 latency=0.0, latency_jitter=0.0, call_latency=None, seed=None,
+                 server="Simulator-MT5", login=10000001):
+        if data_file is None and tick_file is None:
+            from src import config
+            data_file = config.DATA_FILE
+        self.data = MarketData(data_file=data_file, tick_file=tick_file)
+        if start is None:
+            start = self.data.first_time + (self.data.last_time - self.data.first_time) * warmup
+        self.clock = VirtualClock(_to_epoch(start), speed)
+        self.symbol = symbol
+        self.point = point
+        self.digits = digits
+        self.contract_size = contract_size
+        self.spread_points = spread_points
+        self.stops_level = stops_level
+        self.volume_min = volume_min
+        self.volume_step = volume_step
+        self.volume_max = volume_max
+        self.leverage = leverage
+        self.server = server
+        self.login_id = login
+        self.balance = float(balance)
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.call_latency = call_latency or {}
+        self.rng = random.Random(seed)
+
+        self.initialized = False
+        self.error = (RES_S_OK, "Success")
+        self.positions = {}
+        self.deals = []
+        self.orders = []
+        self._next_ticket = 1000000
+        self._last_check = self.clock.now()
+        self._lock = threading.RLock()
+        self.calls = {}
+
+    # --- Helpers ---
+    def _ticket(self):
+        self._next_ticket += 1
+        return self._next_ticket
+
+    def _enter(self, name):
+        """Per-call bookkeeping: injected latency, call counts and SL/TP processing"""
+        delay = self.call_latency.get(name, self.latency)
+        if self.latency_jitter:
+            delay += self.rng.uniform(0, self.latency_jitter)
+        if delay > 0:
+            _real_sleep(delay)
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self._process_stops()
+
+    def _quote(self, t=None):
+        t = self.clock.now() if t is None else t
+        bid = round(float(self.data.price_at(t)), self.digits)
+        ask = round(bid + self.spread_points * self.point, self.digits)
+        return t, bid, ask
+
+    def _check_symbol(self, symbol):
+        if symbol != self.symbol:
+            self.error = (RES_E_NOT_FOUND, f"Terminal: Symbol {symbol} not found")
+            return False
+        return True
+
+    def _position_tuple(self, p, bid, ask):
+        current = bid if p['type'] == POSITION_TYPE_BUY else ask
+        return TradePosition(
+            ticket=p['ticket'], time=int(p['time']), time_msc=int(p['time'] * 1000), type=p['type'],
+            magic=p['magic'], identifier=p['ticket'], reason=DEAL_REASON_EXPERT, volume=p['volume'],
+            price_open=p['price_open'], sl=p['sl'], tp=p['tp'], price_current=current, swap=0.0,
+            profit=round(self._profit(p, current), 2), symbol=p['symbol'], comment=p['comment'],
+        )
+
+    def _profit(self, p, price):
+        direction = 1 if p['type'] == POSITION_TYPE_BUY else -1
+        return (price - p['price_open']) * direction * p['volume'] * self.contract_size
+
+    def _stops_valid(self, order_type, sl, tp, bid, ask):
+        """MT5 rule: stops must be on the right side and at least stops_level points from the close price"""
+        min_dist = self.stops_level * self.point
+        if order_type == ORDER_TYPE_BUY:
+            if sl and sl > bid - min_dist:
+                return False
+            if tp and tp < bid + min_dist:
+                return False
+        else:
+            if sl and sl < ask + min_dist:
+                return False
+            if tp and tp > ask - min_dist:
+                return False
+        return True
+
+    def _close(self, p, price, t, reason, comment=""):
+        profit = round(self._profit(p, price), 2)
+        self.balance += profit
+        del self.positions[p['ticket']]
+        order = self._ticket()
+        self.deals.append(TradeDeal(
+            ticket=self._ticket(), order=order, time=int(t), time_msc=int(t * 1000),
+            type=DEAL_TYPE_SELL if p['type'] == POSITION_TYPE_BUY else DEAL_TYPE_BUY,
+            entry=DEAL_ENTRY_OUT, magic=p['magic'], position_id=p['ticket'], reason=reason,
+            volume=p['volume'], price=price, commission=0.0, swap=0.0, profit=profit, fee=0.0,
+            symbol=p['symbol'], comment=comment or p['comment'],
+        ))
+        return order
+
+    def _process_stops(self):
+        """Close positions whose SL or TP was touched since the last check"""
+        now = self.clock.now()
+        with self._lock:
+            if not self.positions:
+                self._last_check = now
+                return
+            spread = self.spread_points * self.point
+            windows = {}
+            for p in list(self.positions.values()):
+                # Only price action after the position was opened can hit its stops
+                start = max(self._last_check, p['time'])
+                if start not in windows:
+                    windows[start] = self.data.extremes(start, now)
+                low, high = windows[start]
+                if p['type'] == POSITION_TYPE_BUY:
+                    if p['sl'] and low <= p['sl']:
+                        self._close(p, p['sl'], now, DEAL_REASON_SL, "[sl]")
+                    elif p['tp'] and high >= p['tp']:
+                        self._close(p, p['tp'], now, DEAL_REASON_TP, "[tp]")
+                else:
+                    if p['sl'] and high + spread >= p['sl']:
+                        self._close(p, p['sl'], now, DEAL_REASON_SL, "[sl]")
+                    elif p['tp'] and low + spread <= p['tp']:
+                        self._close(p, p['tp'], now, DEAL_REASON_TP, "[tp]")
+            self._last_check = now
+
+    def _result(self, retcode, request, comment, deal=0, order=0, volume=0.0, price=0.0, bid=0.0, ask=0.0):
+        return OrderSendResult(retcode, deal, order, volume, price, bid, ask, comment, 0, 0, request)
+
+    # --- Terminal / account ---
+    def initialize(self, path=None, **kwargs):
+        self._enter('initialize')
+        self.initialized = True
+        self.error = (RES_S_OK, "Success")
+        return True
+
+    def login(self, login=None, password=None, server=None, **kwargs):
+        self._enter('login')
+        return self.initialized
+
+    def shutdown(self):
+        self.initialized = False
+        return True
+
+    def last_error(self):
+        return self.error
+
+    def version(self):
+        return (500, 4000, "simulator")
+
+    def terminal_info(self):
+        if not self.initialized:
+            return None
+        return TerminalInfo(True, True, "MetaTrader 5 Simulator", "", "Simulator")
+
+    def account_info(self):
+        self._enter('account_info')
+        if not self.initialized:
+            return None
+        _, bid, ask = self._quote()
+        return self._account(bid, ask)
+
+    def _account(self, bid, ask):
+        with self._lock:
+            profit = sum(self._profit(p, bid if p['type'] == POSITION_TYPE_BUY else ask) for p in self.positions.values())
+            margin = sum(p['volume'] * self.contract_size * p['price_open'] / self.leverage for p in self.positions.values())
+        equity = self.balance + profit
+        return AccountInfo(
+            login=self.login_id, server=self.server, name="Simulated Account", company="Simulator",
+            currency="USD", leverage=self.leverage, balance=round(self.balance, 2), equity=round(equity, 2),
+            profit=round(profit, 2), margin=round(margin, 2), margin_free=round(equity - margin, 2),
+            margin_level=(equity / margin * 100) if margin else 0.0,
+        )
+
+    # --- Symbols and prices ---
+    def symbol_info(self, symbol):
+        self._enter('symbol_info')
+        if not self._check_symbol(symbol):
+            return None
+        t, bid, ask = self._quote()
+        return SymbolInfo(
+            name=self.symbol, path=f"Metals\\{self.symbol}", description="Gold vs US Dollar",
+            currency_base="XAU", currency_profit="USD", visible=True, point=self.point, digits=self.digits,
+            spread=self.spread_points, trade_contract_size=self.contract_size, trade_stops_level=self.stops_level,
+            trade_freeze_level=0, volume_min=self.volume_min, volume_step=self.volume_step,
+            volume_max=self.volume_max, bid=bid, ask=ask, time=int(t),
+        )
+
+    def symbols_get(self, group=None):
+        self._enter('symbols_get')
+        info = self.symbol_info(self.symbol)
+        return (info,)
+
+    def symbol_select(self, symbol, enable=True):
+        self._enter('symbol_select')
+        return self._check_symbol(symbol)
+
+    def symbol_info_tick(self, symbol):
+        self._enter('symbol_info_tick')
+        if not self._check_symbol(symbol):
+            return None
+        t, bid, ask = self._quote()
+        return Tick(time=int(t), bid=bid, ask=ask, last=0.0, volume=0, time_msc=int(t * 1000), flags=6, volume_real=0.0)
+
+    def _rates(self, timeframe, lo, hi, now):
+        """Structured rates array for aggregated bar indices [lo, hi], with the forming bar cut at `now`"""
+        times, o, h, l, c, v = self.data.timeframe(timeframe)
+        out = np.zeros(hi - lo + 1, dtype=RATES_DTYPE)
+        out['time'] = times[lo:hi + 1]
+        out['open'] = o[lo:hi + 1]
+        out['high'] = h[lo:hi + 1]
+        out['low'] = l[lo:hi + 1]
+        out['close'] = c[lo:hi + 1]
+        out['tick_volume'] = v[lo:hi + 1]
+        out['spread'] = self.spread_points
+
+        seconds = TIMEFRAME_SECONDS[timeframe]
+        if len(out) and out['time'][-1] + seconds > now:
+            # Forming bar: only base bars that already closed plus the current price
+            base = self.data
+            b0 = int(np.searchsorted(base.times, out['time'][-1], side='left'))
+            b1 = int(np.searchsorted(base.times, now - base.bar_seconds, side='right'))
+            price = round(base.price_at(now), self.digits)
+            if b1 > b0:
+                out['open'][-1] = base.open[b0]
+                out['high'][-1] = max(base.high[b0:b1].max(), price)
+                out['low'][-1] = min(base.low[b0:b1].min(), price)
+                out['tick_volume'][-1] = base.volume[b0:b1].sum()
+            else:
+                out['open'][-1] = out['high'][-1] = out['low'][-1] = price
+                out['tick_volume'][-1] = 1
+            out['close'][-1] = price
+        return out
+
+    def copy_rates_from_pos(self, symbol, timeframe, start_pos, count):
+        self._enter('copy_rates_from_pos')
+        if not self._check_symbol(symbol) or timeframe not in TIMEFRAME_SECONDS:
+            return None
+        now = self.clock.now()
+        times = self.data.timeframe(timeframe)[0]
+        current = int(np.searchsorted(times, now, side='right')) - 1
+        hi = current - start_pos
+        if hi < 0:
+            return np.zeros(0, dtype=RATES_DTYPE)
+        lo = max(0, hi - count + 1)
+        return self._rates(timeframe, lo, hi, now)
+
+    def copy_rates_from(self, symbol, timeframe, date_from, count):
+        self._enter('copy_rates_from')
+        if not self._check_symbol(symbol) or timeframe not in TIMEFRAME_SECONDS:
+            return None
+        now = self.clock.now()
+        times = self.data.timeframe(timeframe)[0]
+        hi = int(np.searchsorted(times, min(_to_epoch(date_from), now), side='right')) - 1
+        if hi < 0:
+            return np.zeros(0, dtype=RATES_DTYPE)
+        return self._rates(timeframe, max(0, hi - count + 1), hi, now)
+
+    def copy_rates_range(self, symbol, timeframe, date_from, date_to):
+        self._enter('copy_rates_range')
+        if not self._check_symbol(symbol) or timeframe not in TIMEFRAME_SECONDS:
+            return None
+        now = self.clock.now()
+        times = self.data.timeframe(timeframe)[0]
+        lo = int(np.searchsorted(times, _to_epoch(date_from), side='left'))
+        hi = int(np.searchsorted(times, min(_to_epoch(date_to), now), side='right')) - 1
+        if hi < lo:
+            return np.zeros(0, dtype=RATES_DTYPE)
+        return self._rates(timeframe, lo, hi, now)
+
+    # --- Trading ---
+    def _validate(self, request, bid, ask):
+        """Common request validation for order_send/order_check; returns (retcode, comment)"""
+        if request.get('symbol', self.symbol) != self.symbol:
+            return TRADE_RETCODE_INVALID, "Invalid request"
+        action = request.get('action')
+        if action == TRADE_ACTION_SLTP:
+            p = self.positions.get(request.get('position'))
+            if p is None:
+                return TRADE_RETCODE_POSITION_CLOSED, "Position doesn't exist"
+            if not self._stops_valid(p['type'], request.get('sl'), request.get('tp'), bid, ask):
+                return TRADE_RETCODE_INVALID_STOPS, "Invalid stops"
+            return TRADE_RETCODE_DONE, "Request executed"
+        if action != TRADE_ACTION_DEAL:
+            return TRADE_RETCODE_INVALID, "Invalid request"
+        volume = request.get('volume', 0)
+        steps = round((volume - self.volume_min) / self.volume_step, 6) if volume else -1
+        if volume < self.volume_min or volume > self.volume_max or abs(steps - round(steps)) > 1e-6:
+            return TRADE_RETCODE_INVALID_VOLUME, "Invalid volume"
+        if request.get('position'):
+            if request['position'] not in self.positions:
+                return TRADE_RETCODE_POSITION_CLOSED, "Position doesn't exist"
+            return TRADE_RETCODE_DONE, "Request executed"
+        order_type = request.get('type')
+        if order_type not in (ORDER_TYPE_BUY, ORDER_TYPE_SELL):
+            return TRADE_RETCODE_INVALID, "Invalid request"
+        if not self._stops_valid(order_type, request.get('sl'), request.get('tp'), bid, ask):
+            return TRADE_RETCODE_INVALID_STOPS, "Invalid stops"
+        price = ask if order_type == ORDER_TYPE_BUY else bid
+        margin = volume * self.contract_size * price / self.leverage
+        if margin > self.balance:
+            return TRADE_RETCODE_NO_MONEY, "No money"
+        return TRADE_RETCODE_DONE, "Request executed"
+
+    def order_check(self, request):
+        self._enter('order_check')
+        t, bid, ask = self._quote()
+        with self._lock:
+            retcode, comment = self._validate(request, bid, ask)
+            account = self._account(bid, ask)
+        if retcode == TRADE_RETCODE_DONE:
+            retcode, comment = 0, "Done"
+        price = ask if request.get('type') == ORDER_TYPE_BUY else bid
+        margin = request.get('volume', 0) * self.contract_size * price / self.leverage
+        return OrderCheckResult(
+            retcode=retcode, balance=account.balance, equity=account.equity, profit=account.profit,
+            margin=round(account.margin + margin, 2), margin_free=round(account.margin_free - margin, 2),
+            margin_level=account.margin_level, comment=comment, request=request,
+        )
+
+    def order_send(self, request):
+        self._enter('order_send')
+        t, bid, ask = self._quote()
+        with self._lock:
+            retcode, comment = self._validate(request, bid, ask)
+            if retcode != TRADE_RETCODE_DONE:
+                return self._result(retcode, request, comment, bid=bid, ask=ask)
+
+            if request['action'] == TRADE_ACTION_SLTP:
+                p = self.positions[request['position']]
+                p['sl'] = request.get('sl') or 0.0
+                p['tp'] = request.get('tp') or 0.0
+                return self._result(TRADE_RETCODE_DONE, request, comment, bid=bid, ask=ask)
+
+            if request.get('position'):
+                p = self.positions[request['position']]
+                price = bid if p['type'] == POSITION_TYPE_BUY else ask
+                order = self._close(p, price, t, DEAL_REASON_EXPERT, request.get('comment', ''))
+                return self._result(TRADE_RETCODE_DONE, request, comment, deal=self.deals[-1].ticket,
+                                    order=order, volume=p['volume'], price=price, bid=bid, ask=ask)
+
+            order_type = request['type']
+            price = ask if order_type == ORDER_TYPE_BUY else bid
+            ticket = self._ticket()
+            self.positions[ticket] = {
+                'ticket': ticket, 'time': t, 'type': order_type, 'magic': request.get('magic', 0),
+                'volume': request['volume'], 'price_open': price, 'sl': request.get('sl') or 0.0,
+                'tp': request.get('tp') or 0.0, 'symbol': self.symbol, 'comment': request.get('comment', ''),
+            }
+            self.orders.append(TradeOrder(
+                ticket=ticket, time_setup=int(t), time_done=int(t), type=order_type,
+                magic=request.get('magic', 0), position_id=ticket, volume_initial=request['volume'],
+                price_open=price, sl=request.get('sl') or 0.0, tp=request.get('tp') or 0.0,
+                state=4, symbol=self.symbol, comment=request.get('comment', ''),
+            ))
+            deal = self._ticket()
+            self.deals.append(TradeDeal(
+                ticket=deal, order=ticket, time=int(t), time_msc=int(t * 1000),
+                type=DEAL_TYPE_BUY if order_type == ORDER_TYPE_BUY else DEAL_TYPE_SELL,
+                entry=DEAL_ENTRY_IN, magic=request.get('magic', 0), position_id=ticket,
+                reason=DEAL_REASON_EXPERT, volume=request['volume'], price=price, commission=0.0,
+                swap=0.0, profit=0.0, fee=0.0, symbol=self.symbol, comment=request.get('comment', ''),
+            ))
+            return self._result(TRADE_RETCODE_DONE, request, comment, deal=deal, order=ticket,
+                                volume=request['volume'], price=price, bid=bid, ask=ask)
+
+    def Close(self, symbol, ticket=None, comment=None, deviation=None):
+        """Close a position. Accepts Close(symbol, ticket=...) like MT5 or Close(ticket)"""
+        if isinstance(symbol, (int, np.integer)) and ticket is None:
+            symbol, ticket = self.symbol, int(symbol)
+        with self._lock:
+            targets = [p for p in self.positions.values()
+                       if p['symbol'] == symbol and (ticket is None or p['ticket'] == ticket)]
+        if not targets:
+            self._enter('Close')
+            return False
+        ok = True
+        for p in targets:
+            result = self.order_send({
+                'action': TRADE_ACTION_DEAL, 'symbol': p['symbol'], 'volume': p['volume'],
+                'type': ORDER_TYPE_SELL if p['type'] == POSITION_TYPE_BUY else ORDER_TYPE_BUY,
+                'position': p['ticket'], 'comment': comment or "Close",
+            })
+            ok = ok and result.retcode == TRADE_RETCODE_DONE
+        return ok
+
+    def positions_get(self, symbol=None, group=None, ticket=None):
+        self._enter('positions_get')
+        _, bid, ask = self._quote()
+        with self._lock:
+            result = tuple(
+                self._position_tuple(p, bid, ask) for p in self.positions.values()
+                if (symbol is None or p['symbol'] == symbol) and (ticket is None or p['ticket'] == ticket)
+            )
+        return result
+
+    def positions_total(self):
+        self._enter('positions_total')
+        return len(self.positions)
+
+    def history_deals_get(self, date_from=None, date_to=None, group=None, ticket=None, position=None):
+        self._enter('history_deals_get')
+        with self._lock:
+            deals = list(self.deals)
+        if ticket is not None:
+            return tuple(d for d in deals if d.order == ticket)
+        if position is not None:
+            return tuple(d for d in deals if d.position_id == position)
+        t0 = _to_epoch(date_from) if date_from is not None else float('-inf')
+        t1 = _to_epoch(date_to) if date_to is not None else float('inf')
+        return tuple(d for d in deals if t0 <= d.time <= t1)
+
+    def history_orders_get(self, date_from=None, date_to=None, group=None, ticket=None, position=None):
+        self._enter('history_orders_get')
+        with self._lock:
+            orders = list(self.orders)
+        if ticket is not None:
+            return tuple(o for o in orders if o.ticket == ticket)
+        if position is not None:
+            return tuple(o for o in orders if o.position_id == position)
+        t0 = _to_epoch(date_from) if date_from is not None else float('-inf')
+        t1 = _to_epoch(date_to) if date_to is not None else float('inf')
+        return tuple(o for o in orders if t0 <= o.time_setup <= t1)
+
+
+# --- Module-level API bound to the active simulator ---
+_sim = None
+
+API_FUNCTIONS = [
+    'initialize', 'login', 'shutdown', 'last_error', 'version', 'terminal_info', 'account_info',
+    'symbol_info', 'symbols_get', 'symbol_select', 'symbol_info_tick',
+    'copy_rates_from_pos', 'copy_rates_from', 'copy_rates_range',
+    'order_check', 'order_send', 'Close', 'positions_get', 'positions_total',
+    'history_deals_get', 'history_orders_get',
+]
+
+
+def configure(**kwargs):
+    """Create a new active simulator (see Simulator for the options) and return it"""
+    global _sim
+    _sim = Simulator(**kwargs)
+    return _sim
+
+
+def get_simulator():
+    """Return the active simulator, creating a default one on first use"""
+    if _sim is None:
+        configure()
+    return _sim
+
+
+def _make_api_function(name):
+    def api_function(*args, **kwargs):
+        return getattr(get_simulator(), name)(*args, **kwargs)
+    api_function.__name__ = name
+    return api_function
+
+
+for _name in API_FUNCTIONS:
+    globals()[_name] = _make_api_function(_name)
+
+
+def install(patch_sleep=False, **kwargs):
+    """
+    Register this module as `MetaTrader5` so unmodified code imports the simulator.
+
+    Parameters:
+    patch_sleep (bool): Replace time.sleep with a virtual-clock sleep and scale the async
+                        runtime's task delays, so loops that wait in real seconds run at
+                        the simulator speed
+    **kwargs: Simulator options
+    """
+    sim = configure(**kwargs) if kwargs or _sim is None else _sim
+    sys.modules['MetaTrader5'] = sys.modules[__name__]
+    if patch_sleep:
+        time.sleep = sim.clock.sleep
+        from src import async_runtime
+        async_runtime.set_speed(sim.clock.speed)
+    return sim
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a script against the local MT5 simulator")
+    parser.add_argument("script", help="Python script to run (e.g. exness_crt_trader.py)")
+    parser.add_argument("--data", default=None, help="OHLCV CSV to replay (default: config.DATA_FILE)")
+    parser.add_argument("--ticks", default=None, help="Tick CSV (time,bid,ask) to replay instead of bars")
+    parser.add_argument("--symbol", default="XAUUSDm")
+    parser.add_argument("--speed", type=float, default=1000.0, help="Virtual seconds per wall-clock second")
+    parser.add_argument("--start", default=None, help="Virtual start time (default: middle of the data)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Injected seconds per API call")
+    parser.add_argument("--stops-level", type=int, default=500, help="Minimum stop distance in points")
+    parser.add_argument("--balance", type=float, default=10000.0)
+    args, script_args = parser.parse_known_args(argv)
+
+    install(
+        patch_sleep=True, data_file=args.data, tick_file=args.ticks, symbol=args.symbol,
+        speed=args.speed, start=args.start, latency=args.latency,
+        stops_level=args.stops_level, balance=args.balance,
+    )
+    sys.argv = [args.script] + script_args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args.script)))
+    runpy.run_path(args.script, run_name="__main__")
+
+
+if __name__ == "__main__":
+    main()
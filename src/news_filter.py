@@ -1,6 +1,16 @@
-import requests
+import os
+import csv
+import json
+import time
+import random
+import threading
+import calendar
+from bisect import bisect_left, bisect_right
 from datetime import datetime, timedelta
 
+from src import config
+from src import latency_metrics
+
 # Trading Economics free API endpoint
 API_URL = "https://api.tradingeconomics.com/calendar"
 API_KEY = "guest:guest"  # Free public key
@@ -19,47 +29,424 @@ SESSION_NEWS_WINDOWS = {
     # Example: 'London': 45, 'NY': 60
 }
 
-def get_upcoming_high_impact_news():
-    now = datetime.utcnow()
-    window_start = now - timedelta(minutes=NEWS_WINDOW_MINUTES)
-    window_end = now + timedelta(minutes=NEWS_WINDOW_MINUTES)
+# Session of a broker (UTC+0) hour, shared by the live trader and backtests: [start, end) hours
+SESSION_HOURS = {
+    'London': (7, 15),
+    'NY': (15, 22),
+}
+
+# Days of calendar fetched ahead by refresh_news_cache() and kept in CALENDAR_FILE
+CALENDAR_PREFETCH_DAYS = 7
+CALENDAR_FILE = config.NEWS_CALENDAR_FILE
+# Historical calendar for backtests (CSV: date, country, event, impact); refreshes append to it
+HISTORY_FILE = config.NEWS_HISTORY_FILE
+HISTORY_FIELDS = ["date", "country", "event", "impact"]
+
+EVENT_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+# Prefetched calendar: high-impact events plus one blackout index per window width
+_calendar = {'events': None, 'fetched_at': None, 'start': None, 'end': None, 'indexes': {}, 'failures': 0, 'last_error': None}
+_calendar_lock = threading.Lock()
+_http_session = None
+
+
+def _http():
+    """Keep-alive HTTP session reused by every calendar request"""
+    global _http_session
+    if _http_session is None:
+        import requests  # Deferred: only needed when the calendar is actually fetched
+        _http_session = requests.Session()
+    return _http_session
+
+
+def event_timestamp(event):
+    """Event time (UTC) as epoch seconds, or None if the date cannot be parsed"""
+    try:
+        return calendar.timegm(time.strptime(event["date"][:19], EVENT_TIME_FORMAT))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def is_high_impact(event):
+    if event.get("country") not in RELEVANT_COUNTRIES:
+        return False
+    return event.get("impact", "") == "High" or any(k in event.get("event", "") for k in HIGH_IMPACT_KEYWORDS)
+
+
+def fetch_calendar(start, end, timeout=10, url=None):
+    """
+    High-impact events between two UTC datetimes from the calendar API (or `url`).
+    Raises on HTTP/network errors.
+    """
     params = {
         "c": API_KEY,
-        "d1": window_start.strftime("%Y-%m-%dT%H:%M"),
-        "d2": window_end.strftime("%Y-%m-%dT%H:%M"),
+        "d1": start.strftime("%Y-%m-%dT%H:%M"),
+        "d2": end.strftime("%Y-%m-%dT%H:%M"),
     }
+    resp = _http().get(url or API_URL, params=params, timeout=timeout)
+    resp.raise_for_status()
+    return [e for e in resp.json() if is_high_impact(e) and event_timestamp(e) is not None]
+
+
+class BlackoutIndex:
+    """
+    Sorted blackout windows [event - window, event + window] of one window width.
+
+    All windows have the same width, so sorting by start also sorts by end and the
+    events blocking a moment t are one contiguous slice found with two bisects.
+    """
+    def __init__(self, events, window_minutes):
+        self.window_minutes = window_minutes
+        width = window_minutes * 60
+        timed = sorted(((event_timestamp(e), e) for e in events), key=lambda item: item[0])
+        timed = [(ts, e) for ts, e in timed if ts is not None]
+        self.events = [e for _, e in timed]
+        self.starts = [ts - width for ts, _ in timed]
+        self.ends = [ts + width for ts, _ in timed]
+
+    def blocking(self, t):
+        """Events whose blackout window contains epoch time t (O(log n))"""
+        return self.events[bisect_left(self.ends, t):bisect_right(self.starts, t)]
+
+    def __len__(self):
+        return len(self.events)
+
+
+def session_for_hour(hour):
+    """Session name of a broker hour ('Other' outside SESSION_HOURS)"""
+    for name, (start, end) in SESSION_HOURS.items():
+        if start <= hour < end:
+            return name
+    return 'Other'
+
+
+def _session_window(session_name):
+    if session_name and session_name in SESSION_NEWS_WINDOWS:
+        return SESSION_NEWS_WINDOWS[session_name]
+    return NEWS_WINDOW_MINUTES
+
+
+def _install_calendar(events, fetched_at, start, end):
+    """Compile blackout indexes for every configured window and swap them in"""
+    windows = {NEWS_WINDOW_MINUTES, *SESSION_NEWS_WINDOWS.values()}
+    indexes = {w: BlackoutIndex(events, w) for w in windows}
+    with _calendar_lock:
+        _calendar.update(events=events, fetched_at=fetched_at, start=start, end=end, indexes=indexes, failures=0, last_error=None)
+
+
+def _save_calendar(events, fetched_at, start, end):
+    state = {'fetched_at': fetched_at, 'start': start, 'end': end, 'events': events}
+    tmp_path = f"{CALENDAR_FILE}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, CALENDAR_FILE)
+
+
+def load_calendar():
+    """Load the calendar stored by the last refresh (e.g. after a restart). Returns True if loaded."""
+    if not os.path.exists(CALENDAR_FILE):
+        return False
+    try:
+        with open(CALENDAR_FILE, "r") as f:
+            state = json.load(f)
+        _install_calendar(state['events'], state['fetched_at'], state['start'], state['end'])
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Could not load news calendar {CALENDAR_FILE}: {e}")
+        return False
+    return True
+
+
+def refresh_news_cache(days=None, url=None, timeout=10):
+    """
+    Prefetch the high-impact calendar from now - 1 day to now + `days` (default
+    CALENDAR_PREFETCH_DAYS), store it in CALENDAR_FILE and compile the blackout indexes.
+    Called by NewsRefresher in the background; this is the only place that talks to the API.
+
+    Returns:
+    list: The events, or None if the request failed (the previous calendar is kept)
+    """
+    days = CALENDAR_PREFETCH_DAYS if days is None else days
+    now = datetime.utcnow()
+    start, end = now - timedelta(days=1), now + timedelta(days=days)
     try:
-        resp = requests.get(API_URL, params=params, timeout=10)
-        events = resp.json() if resp.status_code == 200 else []
+        with latency_metrics.span("news_http"):
+            events = fetch_calendar(start, end, timeout=timeout, url=url)
+    except Exception as e:
+        print(f"News API error: {e}")
+        with _calendar_lock:
+            _calendar['failures'] += 1
+            _calendar['last_error'] = str(e)
+        return None
+    fetched_at = time.time()
+    start_ts, end_ts = calendar.timegm(start.timetuple()), calendar.timegm(end.timetuple())
+    _install_calendar(events, fetched_at, start_ts, end_ts)
+    try:
+        _save_calendar(events, fetched_at, start_ts, end_ts)
+        archive_events(events)
+    except OSError as e:
+        print(f"Could not save news calendar {CALENDAR_FILE}: {e}")
+    return events
+
+
+def _blackout_events(window, max_age, now_ts):
+    """Events blocking now from the prefetched calendar, or None if it is missing, stale or does not cover now"""
+    with _calendar_lock:
+        fetched_at = _calendar['fetched_at']
+        start, end = _calendar['start'], _calendar['end']
+        index = _calendar['indexes'].get(window)
+        events = _calendar['events']
+    if fetched_at is None or not (start <= now_ts - window * 60 and now_ts + window * 60 <= end):
+        return None
+    if max_age is not None and time.time() - fetched_at > max_age:
+        return None
+    if index is None:
+        # Window configured after the last refresh: compile it once
+        index = BlackoutIndex(events, window)
+        with _calendar_lock:
+            _calendar['indexes'][window] = index
+    return index.blocking(now_ts)
+
+
+def get_upcoming_high_impact_news(window_minutes=None):
+    """High-impact events within +/- window_minutes of now, queried from the API directly"""
+    if window_minutes is None:
+        window_minutes = NEWS_WINDOW_MINUTES
+    now = datetime.utcnow()
+    try:
+        events = fetch_calendar(now - timedelta(minutes=window_minutes), now + timedelta(minutes=window_minutes))
     except Exception as e:
         print(f"News API error: {e}")
         return []
-    high_impact_events = []
-    for event in events:
-        if event.get("country") in RELEVANT_COUNTRIES:
-            if event.get("impact", "") == "High" or any(k in event.get("event", "") for k in HIGH_IMPACT_KEYWORDS):
-                # Check time window
-                try:
-                    event_time = datetime.strptime(event["date"], "%Y-%m-%dT%H:%M:%S")
-                except Exception:
-                    continue
-                if window_start <= event_time <= window_end:
-                    high_impact_events.append(event)
-    return high_impact_events
-
-def is_news_blocking(session_name=None):
+    return BlackoutIndex(events, window_minutes).blocking(calendar.timegm(now.timetuple()))
+
+
+def news_calendar_status(now_ts=None):
+    """
+    Freshness of the prefetched calendar, for fail-safe policies.
+
+    Returns:
+    dict: age (seconds since the last good refresh, None if never), covers_now,
+          events, failures (consecutive failed refreshes) and last_error
+    """
+    now_ts = time.time() if now_ts is None else now_ts
+    with _calendar_lock:
+        fetched_at = _calendar['fetched_at']
+        return {
+            'age': None if fetched_at is None else now_ts - fetched_at,
+            'covers_now': fetched_at is not None and _calendar['start'] <= now_ts <= _calendar['end'],
+            'events': len(_calendar['events'] or ()),
+            'failures': _calendar['failures'],
+            'last_error': _calendar['last_error'],
+        }
+
+
+def news_blackout_until(session_name=None, now_ts=None):
+    """Epoch time at which the current blackout of the session ends, or None if not blocked"""
+    window = _session_window(session_name)
+    now_ts = time.time() if now_ts is None else now_ts
+    events = _blackout_events(window, None, now_ts)
+    if not events:
+        return None
+    return max(event_timestamp(e) for e in events) + window * 60
+
+
+def is_news_blocking(session_name=None, max_cache_age=None, fail_safe=False):
     """
     Returns True if there is high-impact news within the window for the current or given session.
+
+    Never waits on HTTP: the answer comes from the last good prefetched calendar (a
+    bisect in the session's blackout index), which NewsRefresher keeps up to date in
+    the background.
+
+    Parameters:
+    session_name (str): Session whose window in SESSION_NEWS_WINDOWS applies
+    max_cache_age (float): Calendar age in seconds after which it counts as unknown (None = any age)
+    fail_safe (bool): Answer when the calendar is unknown (missing, stale or not covering now):
+                      True blocks trading, False allows it
     """
-    global NEWS_WINDOW_MINUTES
-    window = NEWS_WINDOW_MINUTES
-    if session_name and session_name in SESSION_NEWS_WINDOWS:
-        window = SESSION_NEWS_WINDOWS[session_name]
-    NEWS_WINDOW_MINUTES = window
-    events = get_upcoming_high_impact_news()
+    window = _session_window(session_name)
+    events = _blackout_events(window, max_cache_age, time.time())
+    if events is None:
+        status = news_calendar_status()
+        print(f"News calendar unavailable or stale (age: {status['age']}, failures: {status['failures']}) - "
+              f"{'blocking' if fail_safe else 'allowing'} trading")
+        return fail_safe
     if events:
         print("High-impact news detected:")
         for e in events:
             print(f"{e['date']} | {e['country']} | {e['event']} | Impact: {e.get('impact', '')}")
         return True
     return False
+
+
+class NewsRefresher:
+    """
+    Stale-while-revalidate refresher for the news calendar.
+
+    Readers always use the last good calendar; refreshes happen here, in the
+    background. After a failure the next attempt is delayed exponentially (with
+    jitter) from retry_seconds up to max_backoff; a success returns to the normal
+    interval. Run it with start() on its own thread, or call run_once() from a
+    scheduler: it returns the delay until the next attempt.
+    """
+    def __init__(self, interval=3600, retry_seconds=30, max_backoff=1800, url=None, timeout=10, days=None):
+        """
+        Parameters:
+        interval (float): Seconds between refreshes while the API is healthy
+        retry_seconds (float): First retry delay after a failure
+        max_backoff (float): Longest retry delay
+        url (str): Calendar endpoint (default API_URL; a local stub server in tests)
+        timeout (float): HTTP timeout per request
+        days (int): Days to prefetch (default CALENDAR_PREFETCH_DAYS)
+        """
+        self.interval = interval
+        self.retry_seconds = retry_seconds
+        self.max_backoff = max_backoff
+        self.url = url
+        self.timeout = timeout
+        self.days = days
+        self._failures = 0
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.refreshes = 0
+        self.errors = 0
+
+    def next_delay(self):
+        if self._failures == 0:
+            return self.interval
+        backoff = self.retry_seconds * 2 ** (self._failures - 1) * random.uniform(0.8, 1.2)
+        return min(self.max_backoff, backoff)
+
+    def run_once(self):
+        """Refresh once. Returns seconds until the next attempt."""
+        if refresh_news_cache(days=self.days, url=self.url, timeout=self.timeout) is None:
+            self._failures += 1
+            self.errors += 1
+        else:
+            self._failures = 0
+            self.refreshes += 1
+        return self.next_delay()
+
+    def request_refresh(self):
+        """Wake the background thread for an immediate refresh"""
+        self._wake.set()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="crt-news", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            delay = self.run_once()
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.timeout + 1)
+            self._thread = None
+
+    def stats(self):
+        return {'refreshes': self.refreshes, 'errors': self.errors, 'failures': self._failures,
+                'next_delay': round(self.next_delay(), 1)}
+
+
+# --- Historical calendar and blackout masks for backtests ---
+def archive_events(events, path=None):
+    """
+    Append events not yet in the historical calendar (keyed by date, country, event).
+
+    Returns:
+    int: Number of events added
+    """
+    path = str(path or HISTORY_FILE)
+    known = set()
+    exists = os.path.exists(path)
+    if exists:
+        with open(path, "r", newline="", encoding="utf-8") as f:
+            known = {(r["date"], r["country"], r["event"]) for r in csv.DictReader(f)}
+    new = [e for e in events if (e.get("date", "")[:19], e.get("country", ""), e.get("event", "")) not in known]
+    if not new:
+        return 0
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=HISTORY_FIELDS, extrasaction="ignore")
+        if not exists:
+            writer.writeheader()
+        for e in sorted(new, key=lambda e: e.get("date", "")):
+            writer.writerow({**e, "date": e.get("date", "")[:19]})
+    return len(new)
+
+
+def load_historical_calendar(path=None):
+    """
+    High-impact event times from a historical calendar file.
+
+    The file is a CSV with date (UTC, %Y-%m-%dT%H:%M:%S), country, event and impact
+    columns, or a JSON list of API events. The same high-impact filter as the live
+    calendar is applied.
+
+    Returns:
+    numpy.ndarray: Sorted event times as int64 epoch seconds
+    """
+    import numpy as np
+    path = str(path or HISTORY_FILE)
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        if path.endswith(".json"):
+            events = json.load(f)
+            events = events.get("events", []) if isinstance(events, dict) else events
+        else:
+            events = list(csv.DictReader(f))
+    times = [event_timestamp(e) for e in events if is_high_impact(e)]
+    return np.unique(np.array([t for t in times if t is not None], dtype=np.int64))
+
+
+def news_blackout_mask(bar_times, event_times, bar_seconds=0, session_of=session_for_hour, windows=None,
+                       utc_offset_hours=0):
+    """
+    Boolean mask of bars that overlap a news blackout, the way the live filter decides.
+
+    A bar [t, t + bar_seconds] is blocked if any event lies within
+    [t - w, t + bar_seconds + w], where w is the news window of the bar's session.
+    Two searchsorted calls over the sorted event times answer this for all bars at
+    once (O(n log m)): a decade of M5 bars, about a million, takes tens of milliseconds.
+
+    Parameters:
+    bar_times: Bar open times (DatetimeIndex, datetime64 array or epoch seconds)
+    event_times: Sorted int64 epoch seconds (see load_historical_calendar())
+    bar_seconds (int): Bar length; 0 checks only the bar open time
+    session_of (callable): hour -> session name, or None to use NEWS_WINDOW_MINUTES everywhere
+    windows (dict): session -> window minutes (default SESSION_NEWS_WINDOWS)
+    utc_offset_hours (float): Offset of the bar times from UTC (broker time zone)
+
+    Returns:
+    numpy.ndarray: bool per bar
+    """
+    import numpy as np
+    times = np.asarray(bar_times)
+    if np.issubdtype(times.dtype, np.datetime64):
+        times = times.astype("datetime64[s]").astype(np.int64)
+    else:
+        times = times.astype(np.int64)
+    times = times - int(utc_offset_hours * 3600)
+    events = np.asarray(event_times, dtype=np.int64)
+    if len(events) == 0:
+        return np.zeros(len(times), dtype=bool)
+
+    windows = SESSION_NEWS_WINDOWS if windows is None else windows
+    if session_of is None:
+        width = np.full(len(times), NEWS_WINDOW_MINUTES * 60, dtype=np.int64)
+    else:
+        # Window per broker hour, then one table lookup per bar
+        per_hour = np.array([windows.get(session_of(h), NEWS_WINDOW_MINUTES) * 60 for h in range(24)], dtype=np.int64)
+        hours = ((times + int(utc_offset_hours * 3600)) // 3600) % 24
+        width = per_hour[hours]
+
+    first = np.searchsorted(events, times - width, side="left")
+    last = np.searchsorted(events, times + bar_seconds + width, side="right")
+    return last > first
@@ -0,0 +1,168 @@
+import time
+import logging
+
+import MetaTrader5 as mt5
+
+logger = logging.getLogger("crt_trading.order_bracket")
+
+# Bracket outcomes
+FILLED = "FILLED"              # Both legs open
+PARTIAL = "PARTIAL"            # One leg open, the other rejected (kept open)
+FLATTENED = "FLATTENED"        # One leg filled, the other rejected, filled leg closed again
+REJECTED = "REJECTED"          # Neither leg filled
+CHECK_FAILED = "CHECK_FAILED"  # order_check rejected a leg, nothing was sent
+
+
+class BracketResult:
+    """Outcome of a two-leg bracket submission"""
+    def __init__(self, status, requests, results=None, checks=None):
+        self.status = status
+        self.requests = requests
+        self.results = results or [None, None]
+        # Send results before any leg fallback replaced them
+        self.first_results = list(self.results)
+        self.checks = checks or [None, None]
+        self.time_skew_ms = None
+        self.price_skew = None
+        self.closed_leg = None
+
+    @property
+    def filled(self):
+        """Indices of legs that are open at the broker"""
+        return [i for i, r in enumerate(self.results) if is_done(r) and i != self.closed_leg]
+
+    def check_retcodes(self):
+        return [c.retcode if c is not None else None for c in self.checks]
+
+    def send_retcodes(self):
+        return [r.retcode if r is not None else None for r in self.results]
+
+    def __repr__(self):
+        return (f"BracketResult(status={self.status}, checks={self.check_retcodes()}, "
+                f"sends={self.send_retcodes()}, time_skew_ms={self.time_skew_ms}, price_skew={self.price_skew})")
+
+
+def is_done(result, api=mt5):
+    return result is not None and result.retcode == api.TRADE_RETCODE_DONE
+
+
+def build_bracket_requests(api, symbol, direction, volume, price, sl, tp1, tp2,
+                           magics=(123456, 123457), comments=("CRT advanced TP1", "CRT advanced TP2"),
+                           deviation=20):
+    """
+    Build the two market requests of a TP1/TP2 bracket (same entry, volume and SL).
+
+    Returns:
+    tuple: (request1, request2)
+    """
+    requests = []
+    for tp, magic, comment in zip((tp1, tp2), magics, comments):
+        requests.append({
+            "action": api.TRADE_ACTION_DEAL,
+            "symbol": symbol,
+            "volume": volume,
+            "type": api.ORDER_TYPE_SELL if direction == 'SELL' else api.ORDER_TYPE_BUY,
+            "price": price,
+            "sl": sl,
+            "tp": tp,
+            "deviation": deviation,
+            "magic": magic,
+            "comment": comment,
+            "type_time": api.ORDER_TIME_GTC,
+            "type_filling": api.ORDER_FILLING_IOC,
+        })
+    return tuple(requests)
+
+
+def preflight(api, requests):
+    """
+    Validate every request with order_check without sending anything.
+
+    Returns:
+    tuple: (ok, checks) where checks holds one order_check result per request
+    """
+    checks = [api.order_check(r) for r in requests]
+    # order_check reports success with retcode 0 (some builds use TRADE_RETCODE_DONE)
+    ok = all(c is not None and c.retcode in (0, api.TRADE_RETCODE_DONE) for c in checks)
+    return ok, checks
+
+
+def submit_bracket(api, request1, request2, check=True, leg_fallback=None, on_partial="keep"):
+    """
+    Submit both legs of a bracket back-to-back.
+
+    Nothing else (journaling, printing, retries) happens between the two sends. Legs
+    that fail are handed to `leg_fallback` only after both sends returned.
+
+    Parameters:
+    api: MetaTrader5 module or gateway
+    request1, request2 (dict): Leg requests from build_bracket_requests()
+    check (bool): Run order_check on both legs first and send nothing if either fails
+    leg_fallback (callable): fallback(leg_index, request, result) -> result for a failed leg
+    on_partial (str): "keep" leaves a lone filled leg open, "close" flattens it
+
+    Returns:
+    BracketResult
+    """
+    requests = [request1, request2]
+    checks = [None, None]
+    if check:
+        ok, checks = preflight(api, requests)
+        if not ok:
+            logger.warning(f"Bracket pre-flight failed: {[c.retcode if c else None for c in checks]}")
+            return BracketResult(CHECK_FAILED, requests, checks=checks)
+
+    sent1 = time.perf_counter()
+    result1 = api.order_send(request1)
+    sent2 = time.perf_counter()
+    result2 = api.order_send(request2)
+
+    bracket = BracketResult(None, requests, [result1, result2], checks)
+    bracket.time_skew_ms = (sent2 - sent1) * 1000
+    if is_done(result1, api) and is_done(result2, api):
+        bracket.price_skew = result2.price - result1.price
+
+    # Deterministic failure handling, after both legs went out
+    if leg_fallback is not None:
+        for i in (0, 1):
+            if not is_done(bracket.results[i], api):
+                bracket.results[i] = leg_fallback(i, requests[i], bracket.results[i])
+
+    done = [is_done(r, api) for r in bracket.results]
+    if all(done):
+        bracket.status = FILLED
+        if bracket.price_skew is None:
+            bracket.price_skew = bracket.results[1].price - bracket.results[0].price
+    elif not any(done):
+        bracket.status = REJECTED
+    elif on_partial == "close":
+        leg = done.index(True)
+        if close_leg(api, requests[leg], bracket.results[leg]):
+            bracket.closed_leg = leg
+            bracket.status = FLATTENED
+        else:
+            bracket.status = PARTIAL
+    else:
+        bracket.status = PARTIAL
+    return bracket
+
+
+def close_leg(api, request, result):
+    """Close a filled leg at market"""
+    close_request = {
+        "action": api.TRADE_ACTION_DEAL,
+        "symbol": request["symbol"],
+        "volume": request["volume"],
+        "type": api.ORDER_TYPE_BUY if request["type"] == api.ORDER_TYPE_SELL else api.ORDER_TYPE_SELL,
+        "position": result.order,
+        "deviation": request.get("deviation", 20),
+        "magic": request.get("magic", 0),
+        "comment": "CRT bracket flatten",
+        "type_time": api.ORDER_TIME_GTC,
+        "type_filling": api.ORDER_FILLING_IOC,
+    }
+    close_result = api.order_send(close_request)
+    if is_done(close_result, api):
+        return True
+    logger.error(f"Failed to flatten bracket leg {result.order}: {close_result.retcode if close_result else 'None'}")
+    return False
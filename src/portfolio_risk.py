@@ -0,0 +1,280 @@
+import threading
+import logging
+from collections import namedtuple
+
+import numpy as np
+
+from src import config
+
+# Result of a pre-trade check. `reason` is None when the order is allowed; the
+# values are what the portfolio would look like for that account with the order.
+RiskCheck = namedtuple("RiskCheck", [
+    "ok", "reason", "positions", "open_risk", "correlated_risk", "margin", "symbol_lots"
+])
+
+
+class PortfolioRisk:
+    """
+    Aggregate exposure, margin and correlated risk across symbols and accounts.
+
+    State is held as symbols x accounts matrices (net lots, signed money at risk to the
+    stop, margin, open positions) and updated incrementally on every fill, stop move and
+    close. The correlated risk of an account is sqrt(r' C r) for its signed risk vector r
+    and the symbol correlation matrix C; C r and r' C r are kept up to date per account,
+    so check() is a handful of scalar lookups (a few microseconds) whatever the number
+    of symbols. The same engine is used by the live trader and the backtester
+    (RiskManager(portfolio=...)).
+
+    Limits are fractions of account equity, except max_positions (per account) and
+    max_symbol_lots (net lots of one symbol over all accounts). None disables a limit.
+
+    Example:
+        portfolio = PortfolioRisk()
+        portfolio.add_account(12345, equity=10000, leverage=200)
+        portfolio.add_symbol("XAUUSDm", contract_size=100)
+        check = portfolio.check(12345, "XAUUSDm", "BUY", 0.1, 2000.0, 1985.0)
+        if check.ok:
+            portfolio.on_fill(12345, ticket, "XAUUSDm", "BUY", 0.1, 2000.0, 1985.0)
+    """
+    def __init__(self, max_positions=config.PORTFOLIO_MAX_POSITIONS,
+                 max_open_risk=config.PORTFOLIO_MAX_OPEN_RISK,
+                 max_correlated_risk=config.PORTFOLIO_MAX_CORRELATED_RISK,
+                 max_margin=config.PORTFOLIO_MAX_MARGIN,
+                 max_symbol_lots=config.PORTFOLIO_MAX_SYMBOL_LOTS):
+        self.max_positions = max_positions
+        self.max_open_risk = max_open_risk
+        self.max_correlated_risk = max_correlated_risk
+        self.max_margin = max_margin
+        self.max_symbol_lots = max_symbol_lots
+        self.logger = logging.getLogger("crt_trading.portfolio_risk")
+        self._lock = threading.Lock()
+        self.symbols = {}
+        self.accounts = {}
+        self.contract_size = np.zeros(0)
+        self.equity = np.zeros(0)
+        self.leverage = np.zeros(0)
+        self.correlation = np.zeros((0, 0))
+        self.lots = np.zeros((0, 0))
+        self.risk = np.zeros((0, 0))
+        self.margin = np.zeros((0, 0))
+        self.count = np.zeros((0, 0), dtype=np.int64)
+        self._corr_risk = np.zeros((0, 0))   # C @ risk
+        self._quad = np.zeros(0)             # r' C r per account
+        # Running totals so check() needs no reductions
+        self._account_positions = np.zeros(0, dtype=np.int64)
+        self._account_risk = np.zeros(0)     # sum of |risk| over symbols
+        self._account_margin = np.zeros(0)
+        self._symbol_lots = np.zeros(0)      # net lots over accounts
+        self._positions = {}
+        self.checks = 0
+        self.rejections = {}
+
+    # --- Universe ---
+    def add_symbol(self, symbol, contract_size=100):
+        """Register a symbol (uncorrelated with the others until set_correlation())"""
+        with self._lock:
+            if symbol in self.symbols:
+                self.contract_size[self.symbols[symbol]] = contract_size
+                return self.symbols[symbol]
+            index = self.symbols[symbol] = len(self.symbols)
+            self.contract_size = np.append(self.contract_size, float(contract_size))
+            self._symbol_lots = np.append(self._symbol_lots, 0.0)
+            correlation = np.eye(index + 1)
+            correlation[:index, :index] = self.correlation
+            self.correlation = correlation
+            for name in ("lots", "risk", "margin", "count", "_corr_risk"):
+                matrix = getattr(self, name)
+                setattr(self, name, np.vstack([matrix, np.zeros((1, matrix.shape[1]), dtype=matrix.dtype)]))
+            return index
+
+    def add_account(self, account, equity, leverage=100):
+        """Register an account (or update its equity and leverage)"""
+        with self._lock:
+            if account in self.accounts:
+                index = self.accounts[account]
+                self.equity[index] = equity
+                self.leverage[index] = leverage or 1
+                return index
+            index = self.accounts[account] = len(self.accounts)
+            self.equity = np.append(self.equity, float(equity))
+            self.leverage = np.append(self.leverage, float(leverage or 1))
+            self._quad = np.append(self._quad, 0.0)
+            self._account_positions = np.append(self._account_positions, 0)
+            self._account_risk = np.append(self._account_risk, 0.0)
+            self._account_margin = np.append(self._account_margin, 0.0)
+            for name in ("lots", "risk", "margin", "count", "_corr_risk"):
+                matrix = getattr(self, name)
+                setattr(self, name, np.hstack([matrix, np.zeros((matrix.shape[0], 1), dtype=matrix.dtype)]))
+            return index
+
+    def set_equity(self, account, equity):
+        self.equity[self.accounts[account]] = equity
+
+    def set_correlation(self, symbol_a, symbol_b, rho):
+        """Set the correlation of two registered symbols (symmetric)"""
+        with self._lock:
+            a, b = self.symbols[symbol_a], self.symbols[symbol_b]
+            self.correlation[a, b] = self.correlation[b, a] = rho
+            self._recompute()
+
+    def _recompute(self):
+        """Rebuild every derived total from the matrices"""
+        self._corr_risk = self.correlation @ self.risk
+        self._quad = np.einsum("sa,sa->a", self.risk, self._corr_risk)
+        self._account_positions = self.count.sum(axis=0)
+        self._account_risk = np.abs(self.risk).sum(axis=0)
+        self._account_margin = self.margin.sum(axis=0)
+        self._symbol_lots = self.lots.sum(axis=1)
+
+    # --- Incremental updates ---
+    def _apply(self, s, a, lots, risk, margin, count):
+        self.lots[s, a] += lots
+        self._symbol_lots[s] += lots
+        self.margin[s, a] += margin
+        self._account_margin[a] += margin
+        self.count[s, a] += count
+        self._account_positions[a] += count
+        if risk:
+            # r' C r after r[s] += d: + 2 d (C r)[s] + d^2 C[s, s]
+            self._quad[a] += 2 * risk * self._corr_risk[s, a] + risk * risk * self.correlation[s, s]
+            self._corr_risk[:, a] += risk * self.correlation[:, s]
+            old = self.risk[s, a]
+            self.risk[s, a] = old + risk
+            self._account_risk[a] += abs(old + risk) - abs(old)
+
+    def _position_values(self, s, a, direction, volume, price, sl):
+        sign = 1.0 if direction in ('BUY', 'LONG') else -1.0
+        contract = float(self.contract_size[s])
+        if sl:
+            # A stop beyond the entry locks in profit: no risk left
+            at_risk = max(0.0, (price - sl) * sign) * volume * contract
+        else:
+            at_risk = price * volume * contract
+        margin = volume * contract * price / float(self.leverage[a])
+        return sign * volume, sign * at_risk, margin
+
+    def on_fill(self, account, position_id, symbol, direction, volume, price, sl=None):
+        """Add an opened position (registers the symbol with the default contract size if needed)"""
+        if symbol not in self.symbols:
+            self.add_symbol(symbol)
+        with self._lock:
+            key = (account, position_id)
+            if key in self._positions:
+                return
+            s, a = self.symbols[symbol], self.accounts[account]
+            lots, risk, margin = self._position_values(s, a, direction, volume, price, sl)
+            self._positions[key] = [s, a, direction, volume, price, lots, risk, margin]
+            self._apply(s, a, lots, risk, margin, 1)
+
+    def on_stop_moved(self, account, position_id, sl):
+        """Recompute the risk of a position after its stop loss moved"""
+        with self._lock:
+            position = self._positions.get((account, position_id))
+            if position is None:
+                return
+            s, a, direction, volume, price, lots, risk, margin = position
+            _, new_risk, _ = self._position_values(s, a, direction, volume, price, sl)
+            self._apply(s, a, 0.0, new_risk - risk, 0.0, 0)
+            position[6] = new_risk
+
+    def on_close(self, account, position_id, volume=None):
+        """Remove a closed position, or the closed part of it when `volume` is a partial close"""
+        with self._lock:
+            key = (account, position_id)
+            position = self._positions.get(key)
+            if position is None:
+                return
+            s, a, direction, open_volume, price, lots, risk, margin = position
+            fraction = 1.0 if volume is None or volume >= open_volume else volume / open_volume
+            self._apply(s, a, -lots * fraction, -risk * fraction, -margin * fraction, -1 if fraction == 1.0 else 0)
+            if fraction == 1.0:
+                del self._positions[key]
+            else:
+                position[3:] = [open_volume - volume, price, lots * (1 - fraction), risk * (1 - fraction), margin * (1 - fraction)]
+
+    def sync(self, account, positions):
+        """
+        Rebuild one account from the broker's open positions (positions_get() results,
+        all symbols), e.g. at startup or after a reconnect.
+
+        Returns:
+        bool: False if `positions` is None (the terminal call failed); the current
+              state is kept rather than treated as "no positions"
+        """
+        if positions is None:
+            self.logger.warning(f"No positions from the terminal for account {account}; keeping the current exposure")
+            return False
+        a = self.accounts[account]
+        with self._lock:
+            for key in [k for k in self._positions if k[0] == account]:
+                del self._positions[key]
+            for name in ("lots", "risk", "margin", "count"):
+                getattr(self, name)[:, a] = 0
+            self._recompute()
+        for position in positions:
+            direction = 'BUY' if position.type == 0 else 'SELL'
+            self.on_fill(account, position.ticket, position.symbol, direction, position.volume,
+                         position.price_open, position.sl)
+        return True
+
+    # --- Pre-trade check ---
+    def check(self, account, symbol, direction, volume, price, sl=None):
+        """
+        Would this order keep the account (and the portfolio) within every limit?
+
+        Returns:
+        RiskCheck: ok, the first limit hit (None if ok) and the resulting values
+        """
+        if symbol not in self.symbols:
+            self.add_symbol(symbol)
+        with self._lock:
+            self.checks += 1
+            s, a = self.symbols[symbol], self.accounts[account]
+            lots, risk, margin = self._position_values(s, a, direction, volume, price, sl)
+            equity = float(self.equity[a])
+            positions = int(self._account_positions[a]) + 1
+            current = float(self.risk[s, a])
+            open_risk = float(self._account_risk[a]) + abs(current + risk) - abs(current)
+            quad = float(self._quad[a] + 2 * risk * self._corr_risk[s, a] + risk * risk * self.correlation[s, s])
+            correlated_risk = max(quad, 0.0) ** 0.5
+            total_margin = float(self._account_margin[a]) + margin
+            symbol_lots = float(self._symbol_lots[s]) + lots
+
+            reason = None
+            if self.max_positions is not None and positions > self.max_positions:
+                reason = "max positions"
+            elif self.max_open_risk is not None and open_risk > self.max_open_risk * equity:
+                reason = "open risk"
+            elif self.max_correlated_risk is not None and correlated_risk > self.max_correlated_risk * equity:
+                reason = "correlated risk"
+            elif self.max_margin is not None and total_margin > self.max_margin * equity:
+                reason = "margin"
+            elif self.max_symbol_lots is not None and abs(symbol_lots) > self.max_symbol_lots:
+                reason = "symbol lots"
+            if reason is not None:
+                self.rejections[reason] = self.rejections.get(reason, 0) + 1
+        return RiskCheck(reason is None, reason, positions, open_risk, correlated_risk, total_margin, symbol_lots)
+
+    # --- Reporting ---
+    def exposure(self):
+        """Net lots, risk and margin per symbol (summed over accounts) and per account"""
+        with self._lock:
+            return {
+                'by_symbol': {name: {'lots': float(self.lots[i].sum()), 'risk': float(self.risk[i].sum()),
+                                     'margin': float(self.margin[i].sum()), 'positions': int(self.count[i].sum())}
+                              for name, i in self.symbols.items()},
+                'by_account': {name: {'open_risk': float(self._account_risk[j]),
+                                      'correlated_risk': float(np.sqrt(max(self._quad[j], 0.0))),
+                                      'margin': float(self.margin[:, j].sum()), 'positions': int(self.count[:, j].sum()),
+                                      'equity': float(self.equity[j])}
+                               for name, j in self.accounts.items()},
+            }
+
+    def stats(self):
+        return {
+            'symbols': len(self.symbols),
+            'accounts': len(self.accounts),
+            'positions': len(self._positions),
+            'checks': self.checks,
+            'rejections': dict(self.rejections),
+        }
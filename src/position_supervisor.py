@@ -0,0 +1,414 @@
+import itertools
+import math
+import threading
+import time
+import logging
+
+import MetaTrader5 as mt5
+
+from src import latency_metrics
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel.
+
+    Timers are dropped into one of `slots` buckets by their deadline; advancing the
+    wheel only looks at the buckets passed since the last advance, so scheduling,
+    cancelling and expiring are all O(1) per timer regardless of how many are pending.
+    """
+    def __init__(self, tick_seconds=1.0, slots=512, clock=time.monotonic):
+        self.tick_seconds = tick_seconds
+        self.slots = [dict() for _ in range(slots)]
+        self.clock = clock
+        self._ids = itertools.count(1)
+        self._where = {}  # timer id -> (slot index, deadline tick)
+        self._current = int(clock() // tick_seconds)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._where)
+
+    def schedule(self, delay, callback, *args):
+        """
+        Run `callback(*args)` once `delay` seconds have passed.
+
+        Returns:
+        int: Timer id for cancel()
+        """
+        with self._lock:
+            deadline_tick = math.ceil((self.clock() + max(0.0, delay)) / self.tick_seconds)
+            deadline_tick = max(deadline_tick, self._current + 1)
+            timer_id = next(self._ids)
+            slot = deadline_tick % len(self.slots)
+            self.slots[slot][timer_id] = (deadline_tick, callback, args)
+            self._where[timer_id] = (slot, deadline_tick)
+            return timer_id
+
+    def cancel(self, timer_id):
+        with self._lock:
+            where = self._where.pop(timer_id, None)
+            if where is not None:
+                self.slots[where[0]].pop(timer_id, None)
+                return True
+            return False
+
+    def next_deadline(self):
+        """Seconds until the earliest pending timer is due, or None if nothing is scheduled"""
+        with self._lock:
+            if not self._where:
+                return None
+            earliest = min(deadline for _, deadline in self._where.values())
+        return max(0.0, earliest * self.tick_seconds - self.clock())
+
+    def advance(self):
+        """
+        Expire every timer whose deadline has passed and run its callback.
+
+        Returns:
+        int: Number of timers fired
+        """
+        due = []
+        with self._lock:
+            now_tick = int(self.clock() // self.tick_seconds)
+            # Never walk more than one revolution: every slot has been visited by then
+            start = max(self._current + 1, now_tick - len(self.slots) + 1)
+            for t in range(start, now_tick + 1):
+                bucket = self.slots[t % len(self.slots)]
+                for timer_id in [i for i, (deadline, _, _) in bucket.items() if deadline <= now_tick]:
+                    _, callback, args = bucket.pop(timer_id)
+                    self._where.pop(timer_id, None)
+                    due.append((callback, args))
+            self._current = max(self._current, now_tick)
+        for callback, args in due:
+            callback(*args)
+        return len(due)
+
+
+class ManagedTrade:
+    """A TP1/TP2 bracket under supervision and the state of its rules"""
+    def __init__(self, tp1_ticket, tp2_ticket, direction, entry_price, tp2, point, digits, trailing_distance):
+        self.tp1_ticket = tp1_ticket
+        self.tp2_ticket = tp2_ticket
+        self.direction = direction
+        self.entry_price = entry_price
+        self.tp2 = tp2
+        self.point = point
+        self.digits = digits
+        self.trailing_distance = trailing_distance
+        self.breakeven_done = False
+        self.trailing_sl = None
+        self.last_sl_move = None  # Supervisor clock time of the last trailing SL modification
+        self.watch_timer = None
+        self.expired = False
+
+
+class PositionSupervisor:
+    """
+    One thread supervising every open position.
+
+    Positions are re-read on a slow cadence (or immediately when price crosses a
+    managed SL/TP) and all rules are evaluated in a single pass per tick change:
+
+    - profit lock: once floating PnL reaches `profit_lock_rr` x risk, close the position
+      when it gives back `profit_lock_drawdown_pct` of the best PnL seen
+    - TP1 -> breakeven: when the TP1 leg of a bracket is gone, move the TP2 leg to breakeven
+    - trailing: afterwards trail the TP2 leg `trailing_fraction` of its TP distance behind price,
+      in steps of at least `trail_step_fraction` of that distance and at most one
+      modification per `trail_min_interval` seconds
+    - timeouts (bracket watch expiry, trade cooldown) run on a timer wheel
+
+    Side effects are delegated to the callbacks passed in, so the supervisor does not
+    depend on the trading script.
+    """
+    def __init__(self, symbol, broker, tick_pump, api=None, refresh_seconds=30,
+                 profit_lock_rr=1.0, profit_lock_drawdown_pct=0.4, trailing_fraction=0.5,
+                 trail_step_fraction=0.1, trail_min_interval=10.0, watch_seconds=7200, move_sl=None, on_positions=None, on_position_closed=None,
+                 on_trade_completed=None, clock=time.monotonic):
+        """
+        Parameters:
+        symbol (str): Symbol whose positions are supervised
+        broker (BrokerState): Source of positions and symbol specs
+        tick_pump (TickPump): Source of ticks and tick-change notifications
+        api: MetaTrader5 module or gateway (used for Close)
+        refresh_seconds (float): Maximum age of the positions list
+        trail_step_fraction (float): Smallest trailing SL improvement, as a fraction of the trailing distance
+        trail_min_interval (float): Minimum seconds between trailing SL modifications of a position
+        watch_seconds (float): How long a bracket is watched for TP1 before its rules are dropped
+        move_sl (callable): move_sl(ticket, price) -> the SL actually applied, or None if not moved
+        on_positions (callable): on_positions(positions) after every positions refresh
+        on_position_closed (callable): on_position_closed(ticket, tracker) -> bool, True once handled
+        on_trade_completed (callable): on_trade_completed(trade) when both legs of a bracket are closed
+        """
+        self.symbol = symbol
+        self.broker = broker
+        self.tick_pump = tick_pump
+        self.api = api or mt5
+        self.refresh_seconds = refresh_seconds
+        self.profit_lock_rr = profit_lock_rr
+        self.profit_lock_drawdown_pct = profit_lock_drawdown_pct
+        self.trailing_fraction = trailing_fraction
+        self.trail_step_fraction = trail_step_fraction
+        self.trail_min_interval = trail_min_interval
+        self.watch_seconds = watch_seconds
+        self.move_sl = move_sl
+        self.on_positions = on_positions
+        self.on_position_closed = on_position_closed
+        self.on_trade_completed = on_trade_completed
+        self.clock = clock
+        self.wheel = TimerWheel(clock=clock)
+        self.logger = logging.getLogger("crt_trading.position_supervisor")
+
+        self._lock = threading.Lock()
+        self._trades = {}         # tp1 ticket -> ManagedTrade
+        self._trackers = {}       # ticket -> PnL tracker
+        self._positions = []
+        self._last_refresh = None
+        self._force_refresh = True
+        self._stop = threading.Event()
+        self._thread = None
+        self.passes = 0
+
+    # --- Registration ---
+    def manage_bracket(self, tp1_ticket, tp2_ticket, direction, entry_price, tp2, point, digits):
+        """Put a freshly filled TP1/TP2 bracket under supervision"""
+        trade = ManagedTrade(
+            tp1_ticket, tp2_ticket, direction, entry_price, tp2, point, digits,
+            trailing_distance=abs(tp2 - entry_price) * self.trailing_fraction,
+        )
+        trade.watch_timer = self.wheel.schedule(self.watch_seconds, self._expire_watch, trade)
+        with self._lock:
+            self._trades[tp1_ticket] = trade
+            self._force_refresh = True
+        return trade
+
+    def schedule(self, delay, callback, *args):
+        """Run a callback on the supervisor thread after `delay` seconds"""
+        return self.wheel.schedule(delay, callback, *args)
+
+    def cancel(self, timer_id):
+        return self.wheel.cancel(timer_id)
+
+    def _expire_watch(self, trade):
+        if not trade.breakeven_done:
+            self.logger.info(f"Stopped watching bracket {trade.tp1_ticket}/{trade.tp2_ticket} for TP1 after {self.watch_seconds}s")
+            trade.expired = True
+            with self._lock:
+                self._trades.pop(trade.tp1_ticket, None)
+
+    # --- Lifecycle ---
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="position-supervisor", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'passes': self.passes,
+                'managed_trades': len(self._trades),
+                'tracked_positions': len(self._trackers),
+                'timers': len(self.wheel),
+            }
+
+    # --- Loop ---
+    def _run(self):
+        while not self._stop.is_set():
+            tick, timeout = self.step()
+            self.tick_pump.wait_for_change(tick.seq if tick is not None else None, timeout=timeout)
+
+    def step(self):
+        """
+        Fire due timers and evaluate all rules once.
+
+        Returns:
+        tuple: (tick, timeout) - the tick used and how long the caller may wait for the
+               next price change before the next step is due
+        """
+        tick = None
+        started = latency_metrics.now()
+        try:
+            self.wheel.advance()
+            tick = self.run_once()
+        except Exception as e:
+            self.logger.error(f"Position supervisor pass failed: {e}")
+        latency_metrics.observe("supervisor_step", started)
+        timeout = self.refresh_seconds
+        if self._last_refresh is not None:
+            timeout = max(0.0, self.refresh_seconds - (self.clock() - self._last_refresh))
+        next_timer = self.wheel.next_deadline()
+        if next_timer is not None:
+            timeout = min(timeout, max(next_timer, 0.05))
+        return tick, timeout
+
+    def run_once(self):
+        """Evaluate all rules once. Returns the tick used."""
+        self.passes += 1
+        tick = self.tick_pump.get_tick()
+        refreshed = self._maybe_refresh(tick)
+        positions = self._positions
+        if tick is None:
+            return tick
+
+        spec = self.broker.symbol_spec()
+        contract_size = spec.trade_contract_size if spec else 100
+        for pos in positions:
+            self._profit_lock(pos, tick, contract_size)
+
+        if refreshed:
+            open_tickets = {p.ticket for p in positions}
+            self._bracket_rules(open_tickets)
+            self._handle_closed(open_tickets)
+        self._trail(tick)
+        return tick
+
+    def _maybe_refresh(self, tick):
+        now = self.clock()
+        due = self._force_refresh or self._last_refresh is None or now - self._last_refresh >= self.refresh_seconds
+        crossed = not due and tick is not None and self._price_crossed_stop(tick)
+        if not (due or crossed):
+            return False
+        # A crossed SL/TP needs the terminal's view now, not a cached snapshot
+        fresh = self._force_refresh or crossed
+        positions = self.broker.positions(max_age=0 if fresh else self.refresh_seconds)
+        if positions is None:
+            # The terminal call failed: "no positions" would complete every bracket.
+            # Keep the last list and try again on the next pass.
+            return False
+        self._positions = [p for p in positions if p.symbol == self.symbol]
+        self._last_refresh = now
+        self._force_refresh = False
+        if self.on_positions is not None:
+            self.on_positions(self._positions)
+        return True
+
+    def _price_crossed_stop(self, tick):
+        """True if price touched the SL or TP of a known position, so it is probably closed"""
+        for pos in self._positions:
+            price = tick.bid if pos.type == self.api.ORDER_TYPE_BUY else tick.ask
+            if pos.type == self.api.ORDER_TYPE_BUY:
+                if (pos.tp and price >= pos.tp) or (pos.sl and price <= pos.sl):
+                    return True
+            else:
+                if (pos.tp and price <= pos.tp) or (pos.sl and price >= pos.sl):
+                    return True
+        return False
+
+    # --- Rules ---
+    def _profit_lock(self, pos, tick, contract_size):
+        direction = 'BUY' if pos.type == self.api.ORDER_TYPE_BUY else 'SELL'
+        risk = abs(pos.price_open - pos.sl) * pos.volume * contract_size
+        current_price = tick.ask if direction == 'BUY' else tick.bid
+        if direction == 'BUY':
+            floating_pnl = (current_price - pos.price_open) * pos.volume * contract_size
+        else:
+            floating_pnl = (pos.price_open - current_price) * pos.volume * contract_size
+
+        tracker = self._trackers.get(pos.ticket)
+        if tracker is None:
+            tracker = self._trackers[pos.ticket] = {
+                'max_profit': floating_pnl, 'max_loss': floating_pnl,
+                'profit_lock_triggered': False, 'max_pnl_seen': floating_pnl, 'exit_sent': False,
+            }
+        else:
+            tracker['max_profit'] = max(tracker['max_profit'], floating_pnl)
+            tracker['max_loss'] = min(tracker['max_loss'], floating_pnl)
+            tracker['max_pnl_seen'] = max(tracker['max_pnl_seen'], floating_pnl)
+
+        max_pnl = tracker['max_pnl_seen']
+        if not tracker['profit_lock_triggered'] and max_pnl >= self.profit_lock_rr * risk:
+            tracker['profit_lock_triggered'] = True
+            print(f"Profit lock activated for ticket {pos.ticket}: max_pnl={max_pnl:.2f}, risk={risk:.2f}")
+        if tracker['profit_lock_triggered'] and not tracker['exit_sent']:
+            lock_level = max_pnl - self.profit_lock_drawdown_pct * max_pnl
+            if floating_pnl < lock_level:
+                self.api.Close(self.symbol, ticket=pos.ticket)
+                tracker['exit_sent'] = True
+                self._force_refresh = True
+                print(f"Profit lock exit for ticket {pos.ticket}: floating_pnl={floating_pnl:.2f}, lock_level={lock_level:.2f}")
+
+    def _bracket_rules(self, open_tickets):
+        with self._lock:
+            trades = list(self._trades.values())
+        for trade in trades:
+            if trade.breakeven_done:
+                if trade.tp2_ticket not in open_tickets:
+                    self._complete(trade)
+                continue
+            if trade.tp1_ticket in open_tickets:
+                continue
+            if trade.tp2_ticket in open_tickets:
+                # TP1 is gone: protect the runner at breakeven and start trailing
+                offset = trade.point * 0.1
+                be_level = trade.entry_price + offset if trade.direction == 'BUY' else trade.entry_price - offset
+                be_level = round(be_level, trade.digits)
+                applied = be_level if self.move_sl is None else self.move_sl(trade.tp2_ticket, be_level)
+                if applied is None:
+                    # Retried on the next positions refresh
+                    continue
+                print(f"Moved SL to breakeven ({applied}) for TP2 position {trade.tp2_ticket}")
+                trade.breakeven_done = True
+                trade.trailing_sl = applied
+                trade.last_sl_move = self.clock()
+                self.wheel.cancel(trade.watch_timer)
+            else:
+                print("TP2 position no longer exists - both positions closed")
+                self._complete(trade)
+
+    def _trail(self, tick):
+        with self._lock:
+            trades = [t for t in self._trades.values() if t.breakeven_done]
+        open_tickets = {p.ticket for p in self._positions}
+        now = self.clock()
+        for trade in trades:
+            if trade.tp2_ticket not in open_tickets:
+                continue
+            if trade.last_sl_move is not None and now - trade.last_sl_move < self.trail_min_interval:
+                continue
+            market_price = tick.ask if trade.direction == 'BUY' else tick.bid
+            if trade.direction == 'BUY':
+                new_sl = max(trade.trailing_sl, market_price - trade.trailing_distance)
+            else:
+                new_sl = min(trade.trailing_sl, market_price + trade.trailing_distance)
+            new_sl = round(new_sl, trade.digits)
+            # Only move SL if it locks in at least one step more profit
+            improvement = new_sl - trade.trailing_sl if trade.direction == 'BUY' else trade.trailing_sl - new_sl
+            if improvement < max(trade.trailing_distance * self.trail_step_fraction, trade.point):
+                continue
+            trade.last_sl_move = now
+            applied = new_sl if self.move_sl is None else self.move_sl(trade.tp2_ticket, new_sl)
+            if applied is not None:
+                print(f"Trailing SL moved to {applied} for TP2 position {trade.tp2_ticket}")
+                trade.trailing_sl = applied
+
+    def _complete(self, trade):
+        with self._lock:
+            self._trades.pop(trade.tp1_ticket, None)
+        self.wheel.cancel(trade.watch_timer)
+        if self.on_trade_completed is not None:
+            self.on_trade_completed(trade)
+
+    def _handle_closed(self, open_tickets):
+        for ticket in [t for t in self._trackers if t not in open_tickets]:
+            handled = True
+            if self.on_position_closed is not None:
+                try:
+                    handled = self.on_position_closed(ticket, self._trackers[ticket])
+                except Exception as e:
+                    print(f"Error logging trade exit for ticket {ticket}: {e}")
+                    handled = False
+            if handled:
+                del self._trackers[ticket]
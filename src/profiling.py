@@ -0,0 +1,312 @@
+"""
+On-demand profiling of the live loop, without restarting under a profiler.
+
+A capture is requested by creating the flag file (config.PROFILE_FLAG_FILE) or by
+sending SIGUSR1 (POSIX only). It starts at the next main-loop iteration and covers
+the next N iterations, or a fixed number of seconds. The flag file may hold
+key=value settings:
+
+    echo "iterations=5" > logs/profile.flag
+    echo "seconds=120 interval=0.002" > logs/profile.flag
+    echo "iterations=3 cprofile=1" > logs/profile.flag    # plus deterministic cProfile of the loop thread
+    kill -USR1 <pid>                                      # default: 3 iterations
+
+While capturing, a sampler thread reads the stacks of every thread (main loop,
+supervisor, tick pump, news refresh, gateway, ...) with sys._current_frames().
+In iteration mode it only samples while an iteration runs, so the sleeps between
+iterations do not drown the profile. Each capture is written to its own
+directory under config.PROFILE_OUTPUT_DIR:
+
+    stacks.collapsed   one "thread;outer;...;inner count" line per stack (flamegraph.pl,
+                       speedscope, inferno)
+    summary.txt        samples per thread and the top-N frames by self and total samples
+    loop.pstats        cProfile of the loop thread, if requested (python -m pstats)
+
+When no capture is running there is no sampler thread and no profile hook;
+begin_iteration() costs one stat() of the flag file.
+"""
+import cProfile
+import io
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+import logging
+from collections import Counter
+from datetime import datetime
+
+from src import config
+
+
+def _frame_name(code):
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)})"
+
+
+def parse_settings(text):
+    """'iterations=5 seconds=30 interval=0.002 cprofile=1' -> dict (unknown keys ignored)"""
+    settings = {}
+    for item in text.replace(",", " ").split():
+        key, _, value = item.partition("=")
+        key = key.strip().lower()
+        try:
+            if key in ("iterations", "top"):
+                settings[key] = int(value)
+            elif key in ("seconds", "interval"):
+                settings[key] = float(value)
+            elif key == "cprofile":
+                settings[key] = value.strip().lower() in ("1", "true", "yes", "")
+        except ValueError:
+            continue
+    return settings
+
+
+def top_frames(stacks, top=25):
+    """
+    Frames with the most samples.
+
+    Parameters:
+    stacks (dict): collapsed stack ("thread;outer;...;inner") -> samples
+
+    Returns:
+    tuple: (self, total) lists of (frame, samples); self counts the innermost frame
+           only, total counts every stack a frame appears in (once per stack)
+    """
+    own, total = Counter(), Counter()
+    for stack, samples in stacks.items():
+        frames = stack.split(";")[1:]
+        if not frames:
+            continue
+        own[frames[-1]] += samples
+        for frame in set(frames):
+            total[frame] += samples
+    return own.most_common(top), total.most_common(top)
+
+
+class OnDemandProfiler:
+    """
+    Captures the next N loop iterations (or a time window) when asked to.
+
+    The loop brackets each iteration with begin_iteration() / end_iteration();
+    begin_iteration() notices a pending request (flag file or signal) and starts the
+    capture, end_iteration() finishes it after the requested number of iterations.
+
+    Example:
+        profiler = OnDemandProfiler()
+        profiler.install_signal()
+        while True:
+            profiling = profiler.begin_iteration()
+            try:
+                delay = strategy_cycle()
+            finally:
+                if profiling:
+                    profiler.end_iteration()
+            time.sleep(delay)
+    """
+    def __init__(self, flag_file=None, output_dir=None, iterations=3, interval=0.005, top=25):
+        """
+        Parameters:
+        flag_file: File whose existence requests a capture (default config.PROFILE_FLAG_FILE)
+        output_dir: Parent directory of the capture directories (default config.PROFILE_OUTPUT_DIR)
+        iterations (int): Iterations captured when the request does not say
+        interval (float): Seconds between stack samples
+        top (int): Frames listed in summary.txt
+        """
+        self.flag_file = str(flag_file or config.PROFILE_FLAG_FILE)
+        self.output_dir = str(output_dir or config.PROFILE_OUTPUT_DIR)
+        self.iterations = iterations
+        self.interval = interval
+        self.top = top
+        self.logger = logging.getLogger("crt_trading.profiling")
+        self._lock = threading.Lock()
+        self._requested = None   # Settings of a pending request
+        self._capture = None     # Settings of the running capture
+        self._remaining = 0
+        self._deadline = None
+        self._stacks = Counter()
+        self._samples = 0
+        self._started = None
+        self._sampling = threading.Event()   # Set while samples should be taken
+        self._stop = threading.Event()
+        self._thread = None
+        self._cprofile = None
+        self.captures = 0
+        self.last_output = None
+
+    # --- Requests ---
+    @property
+    def active(self):
+        return self._capture is not None
+
+    def request(self, iterations=None, seconds=None, interval=None, cprofile=False):
+        """Ask for a capture starting at the next iteration"""
+        settings = {'cprofile': cprofile}
+        if iterations is not None:
+            settings['iterations'] = iterations
+        if seconds is not None:
+            settings['seconds'] = seconds
+        if interval is not None:
+            settings['interval'] = interval
+        self._requested = settings
+
+    def install_signal(self, signum=None):
+        """Request a capture on SIGUSR1 (or `signum`); only possible on the main thread"""
+        signum = signum or getattr(signal, "SIGUSR1", None)
+        if signum is None or threading.current_thread() is not threading.main_thread():
+            return False
+        signal.signal(signum, lambda *_: self.request())
+        return True
+
+    def _check_flag(self):
+        if self._requested is not None or not os.path.exists(self.flag_file):
+            return
+        try:
+            with open(self.flag_file) as f:
+                text = f.read()
+            os.remove(self.flag_file)
+        except OSError as e:
+            self.logger.error(f"Could not read profile flag {self.flag_file}: {e}")
+            return
+        self._requested = parse_settings(text)
+
+    # --- Loop hooks ---
+    def begin_iteration(self):
+        """
+        Called at the start of every iteration. Starts a pending capture.
+
+        Returns:
+        bool: True if this iteration is being captured (call end_iteration() after it)
+        """
+        if self._capture is None:
+            self._check_flag()
+            if self._requested is None:
+                return False
+            self._start(self._requested)
+            self._requested = None
+        if self._deadline is None:
+            self._sampling.set()
+            if self._cprofile is not None:
+                self._cprofile.enable()
+        return True
+
+    def end_iteration(self):
+        """Called after a captured iteration; finishes the capture after the last one"""
+        if self._capture is None or self._deadline is not None:
+            return
+        self._sampling.clear()
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        self._remaining -= 1
+        if self._remaining <= 0:
+            self.finish()
+
+    # --- Capture ---
+    def _start(self, settings):
+        self._capture = settings
+        self._stacks = Counter()
+        self._samples = 0
+        self._started = time.time()
+        self._remaining = settings.get('iterations') or self.iterations
+        self._deadline = time.monotonic() + settings['seconds'] if settings.get('seconds') else None
+        self._cprofile = cProfile.Profile() if settings.get('cprofile') else None
+        self._stop.clear()
+        if self._deadline is not None:
+            # Time window: sample all the time, the loop's iterations don't matter
+            self._sampling.set()
+        self._thread = threading.Thread(target=self._run, args=(settings.get('interval') or self.interval,),
+                                        name="crt-profiler", daemon=True)
+        self._thread.start()
+        window = f"{settings['seconds']:g} s" if self._deadline is not None else f"{self._remaining} iterations"
+        self.logger.info(f"Profiling the next {window}")
+
+    def _run(self, interval):
+        own = threading.get_ident()
+        while not self._stop.is_set():
+            if self._deadline is not None and time.monotonic() >= self._deadline:
+                break
+            if not self._sampling.wait(0.5):
+                continue
+            names = {t.ident: t.name for t in threading.enumerate()}
+            with self._lock:
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    frames = []
+                    while frame is not None:
+                        frames.append(_frame_name(frame.f_code))
+                        frame = frame.f_back
+                    frames.append(names.get(ident, str(ident)).replace(";", ":"))
+                    self._stacks[";".join(reversed(frames))] += 1
+                self._samples += 1
+            time.sleep(interval)
+        if self._deadline is not None:
+            threading.Thread(target=self.finish, name="crt-profiler-writer", daemon=True).start()
+
+    def finish(self):
+        """Stop the running capture and write its files. Returns the capture directory."""
+        with self._lock:
+            if self._capture is None:
+                return None
+            capture, self._capture = self._capture, None
+        self._sampling.clear()
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        self._deadline = None
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        try:
+            path = self._write(capture)
+        except OSError as e:
+            self.logger.error(f"Could not write profile: {e}")
+            path = None
+        self._cprofile = None
+        self.captures += 1
+        self.last_output = path
+        if path:
+            self.logger.info(f"Profile written to {path}")
+        return path
+
+    def _write(self, capture):
+        directory = os.path.join(self.output_dir, datetime.fromtimestamp(self._started).strftime("%Y%m%d-%H%M%S"))
+        os.makedirs(directory, exist_ok=True)
+        stacks = dict(self._stacks)
+        with open(os.path.join(directory, "stacks.collapsed"), "w") as f:
+            for stack, samples in sorted(stacks.items()):
+                f.write(f"{stack} {samples}\n")
+
+        by_thread = Counter()
+        for stack, samples in stacks.items():
+            by_thread[stack.split(";", 1)[0]] += samples
+        own, total = top_frames(stacks, capture.get('top') or self.top)
+        all_samples = sum(stacks.values()) or 1
+        lines = [
+            f"Capture started {datetime.fromtimestamp(self._started).isoformat(sep=' ', timespec='seconds')}, "
+            f"{time.time() - self._started:.1f} s, {self._samples} sampling passes, settings {capture}",
+            "",
+            "Samples per thread:",
+        ]
+        lines += [f"  {samples:8d}  {samples / all_samples:6.1%}  {thread}" for thread, samples in by_thread.most_common()]
+        lines += ["", "Top frames by self samples:"]
+        lines += [f"  {samples:8d}  {samples / all_samples:6.1%}  {frame}" for frame, samples in own]
+        lines += ["", "Top frames by total samples:"]
+        lines += [f"  {samples:8d}  {samples / all_samples:6.1%}  {frame}" for frame, samples in total]
+        if self._cprofile is not None:
+            self._cprofile.dump_stats(os.path.join(directory, "loop.pstats"))
+            out = io.StringIO()
+            pstats.Stats(self._cprofile, stream=out).sort_stats("cumulative").print_stats(capture.get('top') or self.top)
+            lines += ["", "cProfile of the loop thread (cumulative):", out.getvalue()]
+        with open(os.path.join(directory, "summary.txt"), "w") as f:
+            f.write("\n".join(lines) + "\n")
+        return directory
+
+    def stats(self):
+        return {
+            'active': self.active,
+            'pending': self._requested is not None,
+            'captures': self.captures,
+            'last_output': self.last_output,
+        }
@@ -1,18 +1,47 @@
 import pandas as pd
 import numpy as np
 from src import config
+from src.metrics import MetricsAccumulator
+
+TRADE_HISTORY_COLUMNS = [
+    'entry_time', 'exit_time', 'direction', 'entry_price', 'exit_price',
+    'stop_loss', 'take_profit', 'size', 'pnl', 'pnl_pct', 'rr', 'outcome'
+]
 
 class RiskManager:
-    def __init__(self, initial_capital=config.INITIAL_CAPITAL, risk_per_trade=config.RISK_PER_TRADE):
+    def __init__(self, initial_capital=config.INITIAL_CAPITAL, risk_per_trade=config.RISK_PER_TRADE, store=None, symbol="XAUUSD",
+                 portfolio=None, account="backtest"):
+        """
+        Parameters:
+        store (TradeStore): Optional trade store (src/trade_store.py) that receives
+                            signals and closed trades, e.g. TradeStore(source="backtest")
+        symbol (str): Symbol recorded in the store and the portfolio
+        portfolio (PortfolioRisk): Optional portfolio risk engine (src/portfolio_risk.py)
+                                   that checks every new position against the portfolio limits
+        account: Account of this backtest in the portfolio
+        """
+        self.store = store
+        self.symbol = symbol
+        self.portfolio = portfolio
+        self.account = account
+        self._next_position_id = 1
+        if portfolio is not None:
+            portfolio.add_account(account, initial_capital)
+            if symbol not in portfolio.symbols:
+                portfolio.add_symbol(symbol, config.GOLD_PER_LOT)
         self.initial_capital = initial_capital
         self.current_capital = initial_capital
         self.risk_per_trade = risk_per_trade
         self.trades = []
         self.open_positions = []
-        self.trade_history = pd.DataFrame(columns=[
-            'entry_time', 'exit_time', 'direction', 'entry_price', 'exit_price', 
-            'stop_loss', 'take_profit', 'size', 'pnl', 'pnl_pct', 'rr', 'outcome'
-        ])
+        self.trade_records = []
+        # Updated on every close, so metrics never rescan the history
+        self.metrics = MetricsAccumulator(initial_capital)
+
+    @property
+    def trade_history(self):
+        """Closed trades as a DataFrame (built on demand from trade_records)"""
+        return pd.DataFrame(self.trade_records, columns=TRADE_HISTORY_COLUMNS)
         
     def calculate_position_size(self, entry_price, stop_loss):
         """Calculate position size based on risk parameters"""
@@ -57,8 +86,16 @@ class RiskManager:
             print(f"[{timestamp}] Invalid position size calculated: {size}. Skipping trade.")
             return None
         
+        if self.portfolio is not None:
+            check = self.portfolio.check(self.account, self.symbol, signal['direction'], size,
+                                         signal['entry_price'], signal['stop_loss'])
+            if not check.ok:
+                print(f"[{timestamp}] Portfolio limit reached ({check.reason}). Skipping trade.")
+                return None
+        
         # Create position object
         position = {
+            'id': self._next_position_id,
             'entry_time': timestamp,
             'direction': signal['direction'],
             'entry_price': signal['entry_price'],
@@ -77,6 +114,15 @@ class RiskManager:
         }
         
         self.open_positions.append(position)
+        self._next_position_id += 1
+        if self.portfolio is not None:
+            self.portfolio.on_fill(self.account, position['id'], self.symbol, position['direction'], size,
+                                   position['entry_price'], position['stop_loss'])
+        if self.store is not None:
+            self.store.add('signals', time=timestamp, symbol=self.symbol, direction=position['direction'],
+                           entry_price=position['entry_price'], sl=position['stop_loss'], tp1=position['tp1'],
+                           tp2=position['tp2'], rr1=position['rr1'], rr2=position['rr2'],
+                           crt_high=position['crt_high'], crt_low=position['crt_low'])
         
         # Calculate and display trade info
         risk_amount = self.current_capital * self.risk_per_trade
@@ -103,6 +149,8 @@ class RiskManager:
                    (position['direction'] == 'SHORT' and current_price <= position['tp1']):
                     position['hit_tp1'] = True
                     position['stop_loss'] = position['entry_price']
+                    if self.portfolio is not None:
+                        self.portfolio.on_stop_moved(self.account, position['id'], position['stop_loss'])
                     print(f"[{timestamp}] TP1 hit, moved SL to breakeven for {position['direction']} trade")
         
         return self.open_positions
@@ -183,6 +231,9 @@ class RiskManager:
         
         # Update account capital
         self.current_capital += position['pnl']
+        if self.portfolio is not None:
+            self.portfolio.on_close(self.account, position['id'])
+            self.portfolio.set_equity(self.account, self.current_capital)
         
         # Add to trade history
         trade_record = {
@@ -200,10 +251,16 @@ class RiskManager:
             'outcome': 'win' if position['pnl'] > 0 else 'loss'
         }
         
-        self.trade_history = pd.concat([
-            self.trade_history, 
-            pd.DataFrame([trade_record])
-        ])
+        if self.store is not None:
+            self.store.add('closes', time=position['exit_time'], symbol=self.symbol, direction=position['direction'],
+                           entry_time=position['entry_time'], entry_price=position['entry_price'],
+                           exit_price=position['exit_price'], volume=position['size'],
+                           sl=position['original_stop_loss'], tp=position['tp2'], profit=position['pnl'],
+                           pnl_pct=position['pnl_pct'], reason=position['exit_reason'])
+        
+        self.trade_records.append(trade_record)
+        self.metrics.update(position['pnl'], _seconds(position['entry_time']), _seconds(position['exit_time']),
+                            position['rr2'])
         
         # Print trade summary
         print(f"[{position['exit_time']}] CLOSED {position['direction']} position: " +
@@ -217,45 +274,16 @@ class RiskManager:
         return position
     
     def get_performance_metrics(self):
-        """Calculate and return performance metrics"""
-        if len(self.trade_history) == 0:
-            return {
-                'total_trades': 0,
-                'win_rate': 0,
-                'avg_win': 0,
-                'avg_loss': 0,
-                'largest_win': 0,
-                'largest_loss': 0,
-                'profit_factor': 0,
-                'total_pnl': 0,
-                'total_pnl_pct': 0,
-                'avg_rr': 0
-            }
-            
-        wins = self.trade_history[self.trade_history['pnl'] > 0]
-        losses = self.trade_history[self.trade_history['pnl'] <= 0]
-        
-        win_rate = len(wins) / len(self.trade_history) if len(self.trade_history) > 0 else 0
-        avg_win = wins['pnl'].mean() if len(wins) > 0 else 0
-        avg_loss = losses['pnl'].mean() if len(losses) > 0 else 0
-        largest_win = wins['pnl'].max() if len(wins) > 0 else 0
-        largest_loss = losses['pnl'].min() if len(losses) > 0 else 0
-        
-        total_profit = wins['pnl'].sum() if len(wins) > 0 else 0
-        total_loss = abs(losses['pnl'].sum()) if len(losses) > 0 else 0
-        profit_factor = total_profit / total_loss if total_loss > 0 else 0
-        
-        metrics = {
-            'total_trades': len(self.trade_history),
-            'win_rate': win_rate * 100,
-            'avg_win': avg_win,
-            'avg_loss': avg_loss,
-            'largest_win': largest_win,
-            'largest_loss': largest_loss,
-            'profit_factor': profit_factor,
-            'total_pnl': self.current_capital - self.initial_capital,
-            'total_pnl_pct': (self.current_capital - self.initial_capital) / self.initial_capital * 100,
-            'avg_rr': self.trade_history['rr'].mean()
-        }
-        
-        return metrics
\ No newline at end of file
+        """
+        Calculate and return performance metrics (see src/metrics.py): the basic trade
+        statistics plus max drawdown, Sharpe, Sortino, exposure and time in market.
+        Maintained incrementally, so this is O(1) however long the backtest.
+        """
+        return self.metrics.result()
+
+
+def _seconds(timestamp):
+    """Epoch seconds of a pandas Timestamp or datetime; anything else is left to MetricsAccumulator"""
+    if hasattr(timestamp, "timestamp"):
+        return timestamp.timestamp()
+    return timestamp
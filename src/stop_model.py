@@ -0,0 +1,174 @@
+import json
+import os
+import threading
+import time
+import logging
+
+from src import config
+
+
+class StopDistanceModel:
+    """
+    Learned minimum stop distance (in price units) per symbol and trading session.
+
+    Every broker answer narrows the interval the real minimum lies in:
+    a rejected distance (retcode 10016) is a lower bound, an accepted one an upper
+    bound. The reported trade_stops_level is used as an additional lower bound.
+    State is persisted to JSON so the first submission after a restart is already right.
+    Observations only mark the model dirty; flush() writes it (periodically and on
+    shutdown), so recording an order outcome never waits on the disk.
+    """
+    def __init__(self, path=None, safety_margin=0.1, default_min_stop=None):
+        self.path = path or config.STOP_MODEL_FILE
+        self.safety_margin = safety_margin
+        self.default_min_stop = default_min_stop or {}
+        self.logger = logging.getLogger("crt_trading.stop_model")
+        self._lock = threading.Lock()
+        self.entries = {}
+        self.stats = {'submissions': 0, 'first_try_ok': 0, 'retries': 0}
+        self.dirty = False
+        self.load()
+
+    @staticmethod
+    def _key(symbol, session):
+        return f"{symbol}|{session or 'Other'}"
+
+    def _entry(self, symbol, session):
+        key = self._key(symbol, session)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = {
+                'max_rejected': 0.0,
+                'min_accepted': None,
+                'stops_level_price': 0.0,
+                'accepts': 0,
+                'rejects': 0,
+                'updated': None,
+            }
+        return entry
+
+    # --- Persistence ---
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                state = json.load(f)
+            self.entries = state.get('entries', {})
+            self.stats.update(state.get('stats', {}))
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Could not load stop model from {self.path}: {e}")
+
+    def save(self):
+        """Write the model atomically (temp file + rename)"""
+        with self._lock:
+            state = {'entries': self.entries, 'stats': self.stats}
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(state, f, indent=2)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                self.logger.error(f"Could not save stop model to {self.path}: {e}")
+                return False
+            self.dirty = False
+            return True
+
+    def flush(self):
+        """Save the model if anything changed since the last save"""
+        if self.dirty:
+            self.save()
+
+    # --- Observations ---
+    def observe_stops_level(self, symbol, session, stops_level, point):
+        """Feed the broker-reported trade_stops_level (points) into the model"""
+        level_price = stops_level * point
+        with self._lock:
+            entry = self._entry(symbol, session)
+            if entry['stops_level_price'] != level_price:
+                entry['stops_level_price'] = level_price
+                entry['updated'] = time.time()
+                self.dirty = True
+
+    def record(self, symbol, session, distance, accepted, save=False):
+        """
+        Record a broker answer for a stop placed `distance` price units from the market.
+
+        Parameters:
+        accepted (bool): True if the stop was accepted, False on retcode 10016
+        save (bool): Write the model now instead of on the next flush()
+        """
+        distance = abs(distance)
+        with self._lock:
+            entry = self._entry(symbol, session)
+            if accepted:
+                entry['accepts'] += 1
+                if entry['min_accepted'] is None or distance < entry['min_accepted']:
+                    entry['min_accepted'] = distance
+            else:
+                entry['rejects'] += 1
+                entry['max_rejected'] = max(entry['max_rejected'], distance)
+                # The broker widened its requirement: previous accepts no longer hold
+                if entry['min_accepted'] is not None and entry['min_accepted'] <= distance:
+                    entry['min_accepted'] = None
+            entry['updated'] = time.time()
+            self.dirty = True
+        if save:
+            self.save()
+
+    def record_submission(self, retries):
+        """Count one order submission and how many extra round trips it needed"""
+        with self._lock:
+            self.stats['submissions'] += 1
+            self.stats['retries'] += retries
+            if retries == 0:
+                self.stats['first_try_ok'] += 1
+            self.dirty = True
+
+    # --- Queries ---
+    def min_distance(self, symbol, session=None):
+        """
+        Smallest stop distance expected to be accepted.
+
+        Returns the largest known lower bound plus the safety margin (never below the
+        seeded default), capped at the smallest accepted distance: an accepted distance
+        only shows the real minimum is no larger, it is not the minimum itself.
+        """
+        with self._lock:
+            entry = self.entries.get(self._key(symbol, session))
+            if entry is None and session is not None:
+                # Fall back to what we learned for the symbol in any session
+                candidates = [e for k, e in self.entries.items() if k.startswith(f"{symbol}|")]
+                entry = max(candidates, key=lambda e: e['max_rejected'], default=None)
+            default = self.default_min_stop.get(symbol, 0.0)
+            if entry is None:
+                return default
+            lower = max(entry['max_rejected'], entry['stops_level_price'])
+            estimate = max(lower * (1 + self.safety_margin), default)
+            if entry['min_accepted'] is not None:
+                return min(entry['min_accepted'], estimate)
+            return estimate
+
+    def safe_sl(self, symbol, session, direction, price, sl, digits):
+        """Push `sl` away from `price` if it is closer than the learned minimum"""
+        min_dist = self.min_distance(symbol, session)
+        if direction == 'BUY' and price - sl < min_dist:
+            return round(price - min_dist, digits)
+        if direction == 'SELL' and sl - price < min_dist:
+            return round(price + min_dist, digits)
+        return sl
+
+    def retry_rate(self):
+        """Fraction of submissions that needed at least one retry"""
+        submissions = self.stats['submissions']
+        if submissions == 0:
+            return 0.0
+        return 1 - self.stats['first_try_ok'] / submissions
+
+    def summary(self):
+        return {
+            'submissions': self.stats['submissions'],
+            'first_try_ok': self.stats['first_try_ok'],
+            'retries': self.stats['retries'],
+            'retry_rate': self.retry_rate(),
+        }
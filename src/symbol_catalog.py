@@ -0,0 +1,234 @@
+import json
+import os
+import re
+import time
+import threading
+import logging
+from collections import namedtuple
+
+import MetaTrader5 as mt5
+
+from src import config
+
+SymbolEntry = namedtuple("SymbolEntry", [
+    "name", "base", "quote", "suffix", "path", "description", "visible",
+    "point", "digits", "trade_contract_size", "trade_stops_level",
+    "volume_min", "volume_step", "volume_max",
+])
+
+# Instrument names brokers use instead of the ISO-style code
+ALIASES = {
+    'GOLD': 'XAU',
+    'SILVER': 'XAG',
+    'PLATINUM': 'XPT',
+    'PALLADIUM': 'XPD',
+}
+
+# Preferred gold names, in the order detect_gold_symbol() used to probe them
+GOLD_CANDIDATES = [
+    'XAUUSDm', 'XAUUSD', 'GOLD', 'XAUUSD.', 'XAUUSDz', 'XAUUSDmicro', 'XAUUSDpro', 'XAUUSDc',
+    'XAUUSD.x', 'XAUUSD.a', 'XAUUSD.r', 'XAUUSD.s',
+]
+
+_PAIR_RE = re.compile(r'^([A-Z]{3})([A-Z]{3})(.*)$')
+
+
+def parse_symbol(name, currency_base=None, currency_profit=None):
+    """
+    Split a broker symbol name into (base, quote, suffix).
+
+    The broker's currency_base/currency_profit are used when given; otherwise the name
+    is parsed as six letters plus a suffix ("XAUUSDm" -> XAU, USD, "m").
+    """
+    upper = name.upper()
+    for alias, code in ALIASES.items():
+        if upper.startswith(alias):
+            base = currency_base or code
+            quote = currency_profit or 'USD'
+            return base.upper(), quote.upper(), name[len(alias):]
+    match = _PAIR_RE.match(upper)
+    if match:
+        base, quote = match.group(1), match.group(2)
+        suffix = name[6:]
+    else:
+        base, quote, suffix = upper, '', ''
+    if currency_base:
+        base = currency_base.upper()
+    if currency_profit:
+        quote = currency_profit.upper()
+    return base, quote, suffix
+
+
+class SymbolCatalog:
+    """
+    All symbols of one trade server with their specs, indexed by (base, quote).
+
+    The catalog is built with a single symbols_get() call, persisted per server and
+    reloaded from disk on the next start, so resolving an instrument is a dictionary
+    lookup. It is only rebuilt when the account is on a different server (or the file
+    is older than max_age).
+    """
+    def __init__(self, api=None, directory=None, max_age=None):
+        """
+        Parameters:
+        api: MetaTrader5 module or gateway
+        directory: Where catalogs are stored (default config.SYMBOL_CATALOG_DIR)
+        max_age (float): Rebuild a stored catalog older than this many seconds (None = never)
+        """
+        self.api = api or mt5
+        self.directory = directory or config.SYMBOL_CATALOG_DIR
+        self.max_age = max_age
+        self.logger = logging.getLogger("crt_trading.symbol_catalog")
+        self._lock = threading.Lock()
+        self.server = None
+        self.built_at = None
+        self.by_name = {}
+        self.by_pair = {}
+        self.refreshes = 0
+
+    # --- Persistence ---
+    def _file(self, server):
+        safe = re.sub(r'[^A-Za-z0-9_.-]+', '_', server)
+        return os.path.join(self.directory, f"{safe}.json")
+
+    def load(self, server):
+        """Load the stored catalog of a server. Returns False if there is none."""
+        path = self._file(server)
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, "r") as f:
+                state = json.load(f)
+            entries = [SymbolEntry(**e) for e in state['symbols']]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.logger.error(f"Could not load symbol catalog {path}: {e}")
+            return False
+        self._index(server, entries, state.get('built_at'))
+        return True
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._file(self.server)
+        state = {
+            'server': self.server,
+            'built_at': self.built_at,
+            'symbols': [e._asdict() for e in self.by_name.values()],
+        }
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self.logger.error(f"Could not save symbol catalog {path}: {e}")
+
+    # --- Building ---
+    def current_server(self):
+        account = self.api.account_info()
+        return account.server if account is not None else None
+
+    def ensure(self, server=None):
+        """
+        Make sure the catalog matches the connected server: keep it if it does,
+        otherwise load it from disk, otherwise rebuild it from the terminal.
+        Returns True if a catalog is available.
+        """
+        server = server or self.current_server()
+        if server is None:
+            self.logger.error("Cannot build symbol catalog: no account/server information")
+            return bool(self.by_name)
+        if server == self.server and not self._expired():
+            return True
+        if self.load(server) and not self._expired():
+            return True
+        return self.refresh(server)
+
+    def _expired(self):
+        return self.max_age is not None and (self.built_at is None or time.time() - self.built_at > self.max_age)
+
+    def refresh(self, server=None):
+        """Rebuild the catalog with one symbols_get() call and store it"""
+        server = server or self.current_server()
+        symbols = self.api.symbols_get()
+        self.refreshes += 1
+        if symbols is None:
+            self.logger.error(f"symbols_get failed: {self.api.last_error()}")
+            return False
+        entries = []
+        for info in symbols:
+            base, quote, suffix = parse_symbol(
+                info.name, getattr(info, 'currency_base', None), getattr(info, 'currency_profit', None)
+            )
+            entries.append(SymbolEntry(
+                name=info.name,
+                base=base,
+                quote=quote,
+                suffix=suffix,
+                path=getattr(info, 'path', ''),
+                description=getattr(info, 'description', ''),
+                visible=bool(getattr(info, 'visible', True)),
+                point=info.point,
+                digits=info.digits,
+                trade_contract_size=info.trade_contract_size,
+                trade_stops_level=info.trade_stops_level,
+                volume_min=info.volume_min,
+                volume_step=info.volume_step,
+                volume_max=info.volume_max,
+            ))
+        self._index(server or 'unknown', entries, time.time())
+        self.save()
+        self.logger.info(f"Symbol catalog for {self.server}: {len(entries)} symbols")
+        return True
+
+    def _index(self, server, entries, built_at):
+        by_name = {}
+        by_pair = {}
+        for entry in entries:
+            by_name[entry.name] = entry
+            by_pair.setdefault((entry.base, entry.quote), []).append(entry)
+        with self._lock:
+            self.server = server
+            self.built_at = built_at
+            self.by_name = by_name
+            self.by_pair = by_pair
+
+    # --- Lookups ---
+    def get(self, name):
+        """Catalog entry (specs) of an exact symbol name, or None"""
+        return self.by_name.get(name)
+
+    def candidates(self, base, quote='USD'):
+        """All symbols trading base/quote on this server (any suffix)"""
+        base = ALIASES.get(base.upper(), base.upper())
+        return list(self.by_pair.get((base, quote.upper()), ()))
+
+    def resolve(self, base, quote='USD', prefer=None):
+        """
+        Symbol name for base/quote on this server, or None.
+
+        Parameters:
+        prefer (list): Names to pick first, in order (e.g. GOLD_CANDIDATES). Otherwise
+                       visible symbols win, then the shortest suffix.
+        """
+        matches = self.candidates(base, quote)
+        if not matches:
+            return None
+        if prefer:
+            names = {m.name for m in matches}
+            for name in prefer:
+                if name in names:
+                    return name
+        matches.sort(key=lambda m: (not m.visible, len(m.suffix), m.name))
+        return matches[0].name
+
+    def resolve_gold(self):
+        return self.resolve('XAU', 'USD', prefer=GOLD_CANDIDATES)
+
+    def stats(self):
+        return {
+            'server': self.server,
+            'symbols': len(self.by_name),
+            'pairs': len(self.by_pair),
+            'built_at': self.built_at,
+            'refreshes': self.refreshes,
+        }
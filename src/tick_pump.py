@@ -0,0 +1,201 @@
+import threading
+import time
+import queue
+import logging
+from collections import namedtuple
+
+import MetaTrader5 as mt5
+
+# Immutable tick record handed to consumers. Attribute names match the MT5 tick
+# so callers can use it wherever they used mt5.symbol_info_tick() before.
+TickSnapshot = namedtuple("TickSnapshot", ["bid", "ask", "last", "time", "time_msc", "seq", "received"])
+
+
+class TickPump:
+    """
+    Single background poller for mt5.symbol_info_tick() that publishes only changed ticks.
+
+    Consumers either read the latest-value slot (latest()/get_tick()), block until the
+    price changes (wait_for_change()) or drain a bounded queue from subscribe().
+    """
+    def __init__(self, symbol, poll_interval=0.05, api=None):
+        self.symbol = symbol
+        self.poll_interval = poll_interval
+        self.api = api or mt5
+        self.logger = logging.getLogger("crt_trading.tick_pump")
+
+        # Latest-value slot: the reference is swapped in one assignment and the
+        # tuple is never mutated, so readers need no lock.
+        self._latest = None
+        self._seq = 0
+        self._subscribers = []
+        self._sub_lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._driven = False  # polled by an external loop (see attach())
+
+        # Counters
+        self.polls = 0
+        self.published = 0
+        self.unchanged = 0
+        self.errors = 0
+        self.fallback_calls = 0
+
+    @property
+    def running(self):
+        return self._driven or (self._thread is not None and self._thread.is_alive())
+
+    def attach(self):
+        """
+        Mark the pump as driven by an external poller (e.g. an asyncio task) that
+        feeds it through offer() instead of running the polling thread.
+        """
+        self._stop_event.clear()
+        self._driven = True
+        return self
+
+    def detach(self):
+        self._driven = False
+        self._stop_event.set()
+        with self._changed:
+            self._changed.notify_all()
+
+    def start(self):
+        """Start the polling thread (no-op if already running)"""
+        if self.running:
+            return self
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"tick-pump-{self.symbol}", daemon=True)
+        self._thread.start()
+        self.logger.info(f"Tick pump started for {self.symbol} every {self.poll_interval * 1000:.0f}ms")
+        return self
+
+    def stop(self, timeout=2.0):
+        """Stop the polling thread and wake up any waiting consumers"""
+        self._stop_event.set()
+        with self._changed:
+            self._changed.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def latest(self):
+        """Return the most recent TickSnapshot or None if nothing was published yet"""
+        return self._latest
+
+    def get_tick(self):
+        """
+        Return the latest tick, falling back to a direct terminal call while the pump
+        is not running or has not seen a tick yet.
+        """
+        tick = self._latest
+        if tick is not None and self.running:
+            return tick
+        self.fallback_calls += 1
+        raw = self.api.symbol_info_tick(self.symbol)
+        if raw is None:
+            return tick
+        return self._snapshot(raw, self._seq)
+
+    def wait_for_change(self, seq=None, timeout=None):
+        """
+        Block until a tick newer than `seq` is published or `timeout` seconds pass.
+
+        Returns:
+        TickSnapshot: The latest tick (may be unchanged on timeout)
+        """
+        if seq is None:
+            seq = self._seq
+        with self._changed:
+            self._changed.wait_for(lambda: self._seq != seq or self._stop_event.is_set(), timeout)
+        return self._latest
+
+    def subscribe(self, maxsize=1):
+        """
+        Register a bounded queue that receives every published tick.
+        When the queue is full the oldest tick is dropped, so slow consumers only ever
+        see the freshest prices.
+        """
+        q = queue.Queue(maxsize=maxsize)
+        with self._sub_lock:
+            self._subscribers = self._subscribers + [q]
+        return q
+
+    def unsubscribe(self, q):
+        with self._sub_lock:
+            self._subscribers = [s for s in self._subscribers if s is not q]
+
+    def stats(self):
+        """Return polling counters as a dictionary"""
+        return {
+            'polls': self.polls,
+            'published': self.published,
+            'unchanged': self.unchanged,
+            'errors': self.errors,
+            'fallback_calls': self.fallback_calls,
+            'subscribers': len(self._subscribers),
+        }
+
+    def _snapshot(self, raw, seq):
+        return TickSnapshot(
+            bid=raw.bid,
+            ask=raw.ask,
+            last=getattr(raw, 'last', 0.0),
+            time=raw.time,
+            time_msc=getattr(raw, 'time_msc', raw.time * 1000),
+            seq=seq,
+            received=time.monotonic(),
+        )
+
+    def offer(self, raw):
+        """
+        Hand one polled tick to the pump. It is published only if it differs from the
+        latest one. Returns True if it was published.
+        """
+        self.polls += 1
+        if raw is None:
+            return False
+        prev = self._latest
+        if prev is not None and prev.bid == raw.bid and prev.ask == raw.ask \
+                and prev.time_msc == getattr(raw, 'time_msc', raw.time * 1000):
+            self.unchanged += 1
+            return False
+        self._publish(raw)
+        return True
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            try:
+                raw = self.api.symbol_info_tick(self.symbol)
+            except Exception as e:
+                raw = None
+                self.errors += 1
+                self.logger.error(f"Tick poll failed for {self.symbol}: {e}")
+            self.offer(raw)
+
+            elapsed = time.monotonic() - started
+            self._stop_event.wait(max(0.0, self.poll_interval - elapsed))
+
+    def _publish(self, raw):
+        snapshot = self._snapshot(raw, self._seq + 1)
+        self._latest = snapshot
+        self.published += 1
+
+        for q in self._subscribers:
+            try:
+                q.put_nowait(snapshot)
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    pass
+                try:
+                    q.put_nowait(snapshot)
+                except queue.Full:
+                    pass
+
+        with self._changed:
+            self._seq = snapshot.seq
+            self._changed.notify_all()
@@ -0,0 +1,229 @@
+import csv
+import io
+import os
+import queue
+import threading
+import time
+import logging
+
+# Columns of the live trader's journal
+JOURNAL_HEADERS = [
+    "Ticket", "DateTime", "Symbol", "Direction", "EntryPrice", "SL", "TP", "LotSize", "RR1", "RR2", "Status", "ExitPrice", "Profit", "PnL%", "MaxProfit", "MaxLoss", "Comment"
+]
+
+
+class TradeJournal:
+    """
+    Append-only CSV trade journal.
+
+    Every row is one line appended to a file that stays open, so a write costs the
+    same at row 10 as at row 100,000. With start() rows are handed to a background
+    writer thread and append() only enqueues; without it append() writes inline.
+
+    Crash safety:
+    - a row is formatted completely and written with a single write() of one line,
+      then flushed (and fsync'ed when fsync=True) before the writer takes the next batch
+    - a line torn by a crash mid-write is cut off when the journal is reopened, so
+      the file always ends with a complete row
+    - close() (and stop of the writer) drains every queued row before returning
+
+    The Excel workbook is only an export (export_xlsx()).
+    """
+    def __init__(self, path, headers, fsync=True, batch_size=256):
+        """
+        Parameters:
+        path (str): CSV file to append to (created with a header row if missing)
+        headers (list): Column names
+        fsync (bool): fsync after each written batch so rows survive a power loss
+        batch_size (int): Maximum rows the background writer writes per flush
+        """
+        self.path = str(path)
+        self.headers = list(headers)
+        self.fsync = fsync
+        self.batch_size = batch_size
+        self.logger = logging.getLogger("crt_trading.trade_journal")
+        self._file = None
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+        self.rows_written = 0
+        self.batches = 0
+        self.errors = 0
+        self._open()
+
+    # --- File handling ---
+    def _open(self):
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            self._repair_tail()
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        self._file = open(self.path, "a", newline="", encoding="utf-8")
+        if new_file:
+            self._file.write(self._format(self.headers))
+            self._sync()
+
+    def _repair_tail(self, chunk_size=65536):
+        """
+        Drop a partial last line left by a crash during a write.
+        Scans backwards from the end in chunks until it finds the last newline, so a
+        torn row longer than one chunk is cut off too. Only a file without any complete
+        line (a torn header) is emptied; _open() then writes the header again.
+        """
+        with open(self.path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+            keep, end = 0, size
+            while end > 0:
+                start = max(0, end - chunk_size)
+                f.seek(start)
+                cut = f.read(end - start).rfind(b"\n")
+                if cut >= 0:
+                    keep = start + cut + 1
+                    break
+                end = start
+            self.logger.warning(f"Truncating {size - keep} bytes of a partial row in {self.path}")
+            f.truncate(keep)
+
+    @staticmethod
+    def _format(row):
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerow(row)
+        return buffer.getvalue()
+
+    def _sync(self):
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def _write_batch(self, rows):
+        with self._lock:
+            self._file.write("".join(self._format(row) for row in rows))
+            self._sync()
+            self.rows_written += len(rows)
+            self.batches += 1
+
+    # --- Writing ---
+    def append(self, row):
+        """Add one row (a list in header order). O(1); never reads the file."""
+        if self._thread is not None:
+            self._queue.put(list(row))
+        else:
+            self._write_batch([row])
+
+    def start(self):
+        """Write rows from a background thread from now on"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="crt-journal", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch = []
+            stop = item is None
+            if not stop:
+                batch.append(item)
+            # Take whatever else is already queued
+            while not stop and len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except Exception as e:
+                    self.errors += 1
+                    self.logger.error(f"Journal write failed ({len(batch)} rows lost): {e}")
+            for _ in range(len(batch) + (1 if stop else 0)):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def flush(self):
+        """Block until every row appended so far is on disk"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        """Drain the queue, stop the writer and close the file"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+    # --- Reading / export ---
+    def rows(self):
+        """All journal rows as lists of strings (header excluded)"""
+        self.flush()
+        with open(self.path, "r", newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            return list(reader)
+
+    def import_xlsx(self, xlsx_path):
+        """Append the rows of a legacy Excel journal (used once when switching to CSV)"""
+        import openpyxl
+        wb = openpyxl.load_workbook(xlsx_path, read_only=True)
+        rows = [list(r) for r in wb.active.iter_rows(min_row=2, values_only=True)]
+        wb.close()
+        if rows:
+            self._write_batch(rows)
+        return len(rows)
+
+    def export_xlsx(self, xlsx_path):
+        """
+        Write the whole journal to an Excel workbook (write-only mode, streamed).
+        The workbook is written to a temporary file and renamed into place.
+
+        Returns:
+        int: Number of rows exported
+        """
+        import openpyxl
+        started = time.perf_counter()
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(self.headers)
+        count = 0
+        for row in self.rows():
+            ws.append([_cell(value) for value in row])
+            count += 1
+        tmp_path = f"{xlsx_path}.tmp.xlsx"
+        wb.save(tmp_path)
+        os.replace(tmp_path, xlsx_path)
+        self.logger.info(f"Exported {count} journal rows to {xlsx_path} in {time.perf_counter() - started:.2f}s")
+        return count
+
+    def stats(self):
+        return {
+            'rows_written': self.rows_written,
+            'batches': self.batches,
+            'backlog': self._queue.qsize(),
+            'errors': self.errors,
+        }
+
+
+def _cell(value):
+    """CSV text back to a number where it is one, for the Excel export"""
+    if value == "":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
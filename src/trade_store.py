@@ -0,0 +1,287 @@
+import os
+import queue
+import sqlite3
+import threading
+import logging
+from datetime import datetime, timezone
+
+from src import config
+
+# Columns of each event table (besides the implicit id). `source` is "live" or
+# "backtest" and `run_id` separates backtest runs (and live sessions).
+# Timestamps are stored as UTC ISO text without an offset ("2025-01-02 13:45:00"),
+# so they sort and compare as text; naive datetimes are taken to be UTC already.
+TABLES = {
+    'signals': [
+        "time", "symbol", "direction", "entry_price", "sl", "tp1", "tp2", "rr1", "rr2",
+        "crt_high", "crt_low", "comment", "source", "run_id",
+    ],
+    'orders': [
+        "ticket", "time", "symbol", "direction", "leg", "volume", "price", "sl", "tp",
+        "retcode", "status", "comment", "source", "run_id",
+    ],
+    'fills': [
+        "ticket", "position_id", "order_ticket", "time", "symbol", "direction", "entry",
+        "volume", "price", "profit", "commission", "swap", "source", "run_id",
+    ],
+    'position_updates': [
+        "position_id", "time", "symbol", "sl", "tp", "price", "reason", "source", "run_id",
+    ],
+    'closes': [
+        "position_id", "deal_ticket", "time", "symbol", "direction", "entry_time", "entry_price", "exit_price",
+        "volume", "sl", "tp", "profit", "pnl_pct", "max_profit", "max_loss", "reason", "source", "run_id",
+    ],
+}
+
+_REAL = {
+    "entry_price", "sl", "tp", "tp1", "tp2", "rr1", "rr2", "crt_high", "crt_low", "volume", "price",
+    "profit", "commission", "swap", "exit_price", "pnl_pct", "max_profit", "max_loss",
+}
+_INTEGER = {"ticket", "position_id", "deal_ticket", "order_ticket", "leg", "retcode"}
+
+# Tables whose unique index makes re-inserting the same event a no-op
+_IGNORE_DUPLICATES = {"fills", "closes"}
+
+SCHEMA_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_signals_symbol_time ON signals(symbol, time)",
+    "CREATE INDEX IF NOT EXISTS ix_signals_time ON signals(time)",
+    "CREATE INDEX IF NOT EXISTS ix_orders_ticket ON orders(ticket)",
+    "CREATE INDEX IF NOT EXISTS ix_orders_symbol_time ON orders(symbol, time)",
+    # Deal tickets are unique per source, so re-inserting a deal is a no-op
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_fills_source_ticket ON fills(source, ticket)",
+    "CREATE INDEX IF NOT EXISTS ix_fills_position ON fills(position_id)",
+    "CREATE INDEX IF NOT EXISTS ix_fills_symbol_time ON fills(symbol, time)",
+    "CREATE INDEX IF NOT EXISTS ix_position_updates_position ON position_updates(position_id, time)",
+    # A close is identified by its exit deal: the live trader and the reconciler may both report it
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_closes_position_deal ON closes(position_id, deal_ticket)",
+    "CREATE INDEX IF NOT EXISTS ix_closes_symbol_time ON closes(symbol, time)",
+    "CREATE INDEX IF NOT EXISTS ix_closes_time ON closes(time)",
+]
+
+
+def _column_type(column):
+    if column in _REAL:
+        return "REAL"
+    if column in _INTEGER:
+        return "INTEGER"
+    return "TEXT"
+
+
+def _value(value):
+    """Normalize a value for SQLite (timestamps as UTC ISO text, numpy scalars as Python numbers)"""
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.isoformat(sep=" ")
+    if hasattr(value, "item"):
+        return value.item()
+    if hasattr(value, "isoformat"):
+        return value.isoformat(sep=" ")
+    return str(value)
+
+
+def _where(symbol=None, since=None, until=None, source=None):
+    clauses, params = [], []
+    for column, op, value in (("symbol", "=", symbol), ("time", ">=", since), ("time", "<", until), ("source", "=", source)):
+        if value is not None:
+            clauses.append(f"{column} {op} ?")
+            params.append(_value(value))
+    return (f" WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+
+class TradeStore:
+    """
+    Embedded SQLite store for signals, orders, fills, position updates and closes.
+
+    Inserts are queued and written in batches (one transaction per batch with
+    executemany) by a background writer thread once start() was called, or inline
+    when flush() is called. The database runs in WAL mode, so reports can query it
+    while the trader writes.
+
+    Example:
+        store = TradeStore()
+        store.start()
+        store.add('orders', ticket=123, time=now, symbol="XAUUSDm", direction="BUY", ...)
+        store.query("SELECT symbol, SUM(profit) FROM closes WHERE time >= ? GROUP BY symbol", ("2025-01-01",))
+    """
+    def __init__(self, path=None, source="live", run_id=None, batch_size=500):
+        """
+        Parameters:
+        path: Database file (default config.TRADE_STORE_FILE)
+        source (str): Stored with every row: "live" or "backtest"
+        run_id (str): Stored with every row (default: start time of this store)
+        batch_size (int): Maximum rows per transaction (the writer takes everything queued up to this)
+        """
+        self.path = str(path or config.TRADE_STORE_FILE)
+        self.source = source
+        self.run_id = run_id or datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.batch_size = batch_size
+        self.logger = logging.getLogger("crt_trading.trade_store")
+        self._queue = queue.Queue()
+        self._thread = None
+        self._write_lock = threading.Lock()
+        self._conn = None
+        self.rows_written = 0
+        self.transactions = 0
+        self.errors = 0
+        self._create_schema()
+
+    # --- Connections ---
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _create_schema(self):
+        conn = self._connect()
+        with conn:
+            for table, columns in TABLES.items():
+                definition = ", ".join(f"{c} {_column_type(c)}" for c in columns)
+                conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, {definition})")
+            for statement in SCHEMA_INDEXES:
+                conn.execute(statement)
+        conn.close()
+
+    # --- Writing ---
+    def add(self, table, **row):
+        """
+        Queue one row. `source` and `run_id` default to the store's.
+        Raises ValueError for unknown tables or columns.
+        """
+        columns = TABLES.get(table)
+        if columns is None:
+            raise ValueError(f"Unknown table {table}")
+        unknown = set(row) - set(columns)
+        if unknown:
+            raise ValueError(f"Unknown columns for {table}: {', '.join(sorted(unknown))}")
+        row.setdefault("source", self.source)
+        row.setdefault("run_id", self.run_id)
+        self._queue.put((table, tuple(_value(row.get(c)) for c in columns)))
+        if self._thread is None and self._queue.qsize() >= self.batch_size:
+            self.flush()
+
+    def start(self):
+        """Write queued rows from a background thread"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="crt-trade-store", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            stop = item is None
+            batch = [] if stop else [item]
+            while not stop and len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+            self._write(batch)
+            for _ in range(len(batch) + (1 if stop else 0)):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return batch
+            self._queue.task_done()
+            if item is not None:
+                batch.append(item)
+
+    def _write(self, batch):
+        if not batch:
+            return
+        grouped = {}
+        for table, values in batch:
+            grouped.setdefault(table, []).append(values)
+        with self._write_lock:
+            if self._conn is None:
+                self._conn = self._connect()
+            try:
+                with self._conn:
+                    for table, rows in grouped.items():
+                        columns = TABLES[table]
+                        placeholders = ", ".join("?" for _ in columns)
+                        verb = "INSERT OR IGNORE" if table in _IGNORE_DUPLICATES else "INSERT"
+                        self._conn.executemany(
+                            f"{verb} INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows
+                        )
+                self.rows_written += len(batch)
+                self.transactions += 1
+            except sqlite3.Error as e:
+                self.errors += 1
+                self.logger.error(f"Trade store write failed ({len(batch)} rows lost): {e}")
+
+    def flush(self):
+        """Block until every queued row is committed"""
+        if self._thread is not None:
+            self._queue.join()
+        else:
+            self._write(self._drain())
+
+    def close(self):
+        """Write everything still queued and stop the writer"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self._write(self._drain())
+        with self._write_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # --- Reading ---
+    def query(self, sql, params=()):
+        """Run a read query on its own connection; returns a list of dicts"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            return [dict(r) for r in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def closes(self, symbol=None, since=None, until=None, source=None):
+        """Closed positions, oldest first (uses the symbol/time indexes)"""
+        where, params = _where(symbol, since, until, source)
+        return self.query(f"SELECT * FROM closes{where} ORDER BY time", params)
+
+    def performance(self, symbol=None, since=None, until=None, source=None):
+        """Trade count, win rate and P&L of closed positions, aggregated in SQL"""
+        where, params = _where(symbol, since, until, source)
+        row = self.query(
+            "SELECT COUNT(*) AS trades, SUM(profit > 0) AS wins, SUM(profit) AS total_pnl, "
+            "SUM(CASE WHEN profit > 0 THEN profit ELSE 0 END) AS gross_profit, "
+            "-SUM(CASE WHEN profit <= 0 THEN profit ELSE 0 END) AS gross_loss "
+            f"FROM closes{where}", params
+        )[0]
+        trades = row['trades'] or 0
+        gross_loss = row['gross_loss'] or 0
+        return {
+            'trades': trades,
+            'win_rate': (row['wins'] or 0) / trades * 100 if trades else 0,
+            'total_pnl': row['total_pnl'] or 0,
+            'profit_factor': (row['gross_profit'] or 0) / gross_loss if gross_loss else 0,
+        }
+
+    def stats(self):
+        return {
+            'rows_written': self.rows_written,
+            'transactions': self.transactions,
+            'backlog': self._queue.qsize(),
+            'errors': self.errors,
+        }
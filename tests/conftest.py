@@ -0,0 +1,32 @@
+"""
+Shared fixtures. Tests never talk to a terminal: the local simulator
+(src/mt5_simulator.py) is registered as `MetaTrader5` before any src module imports it.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from src import mt5_simulator  # noqa: E402
+
+mt5_simulator.install()
+
+
+@pytest.fixture(scope="session")
+def synthetic_csv(tmp_path_factory):
+    """Four months of deterministic synthetic 5-minute XAUUSD bars (DataHandler CSV layout)"""
+    from src.synthetic_data import GoldSeriesGenerator
+    directory = tmp_path_factory.mktemp("synthetic")
+    path = directory / "xauusd_m5.csv"
+    GoldSeriesGenerator(seed=11, start="2023-01-02", price=1900.0, timeframe="M5").write(
+        directory / "store", end="2023-05-01", csv_path=path)
+    return str(path)
+
+
+@pytest.fixture
+def simulator(synthetic_csv):
+    """A fresh simulator replaying the synthetic bars from 80% of the way in"""
+    return mt5_simulator.install(data_file=synthetic_csv, warmup=0.8, seed=1)
@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+from src.async_runtime import AsyncRuntime
+
+
+class FlakySupervisor:
+    refresh_seconds = 0.01
+
+    def __init__(self):
+        self.calls = 0
+
+    def step(self):
+        self.calls += 1
+        if self.calls == 1:
+            raise RuntimeError("terminal hiccup")
+        return None, 0.01
+
+
+def run_for(runtime, seconds):
+    async def main():
+        asyncio.get_running_loop().call_later(seconds, runtime.stop)
+        await runtime.run()
+    asyncio.run(main())
+
+
+def test_supervisor_survives_a_failing_step():
+    runtime = AsyncRuntime(gateway=None)
+    supervisor = FlakySupervisor()
+    runtime.add_supervisor(supervisor)
+    run_for(runtime, 0.3)
+    stats = runtime.stats()['supervisor']
+    assert stats['errors'] == 1
+    assert supervisor.calls > 2
+
+
+def test_task_delays_run_at_the_configured_speed():
+    runtime = AsyncRuntime(gateway=None, speed=1000)
+    runs = []
+    runtime.add_periodic("strategy", lambda: runs.append(time.monotonic()) or 60, 60)
+    run_for(runtime, 0.5)
+    # 60 s delays at 1000x are 60 ms of wall-clock time
+    assert len(runs) >= 4
+
+
+class IdleSupervisor:
+    """No open positions: every pass asks to be woken by a tick or in 30 s"""
+    refresh_seconds = 30
+
+    def __init__(self):
+        self.calls = 0
+
+    def step(self):
+        self.calls += 1
+        return None, 30
+
+
+def test_supervisor_tick_timeout_runs_at_the_configured_speed():
+    runtime = AsyncRuntime(gateway=None, speed=1000)
+    supervisor = IdleSupervisor()
+    runtime.add_supervisor(supervisor)
+    run_for(runtime, 0.5)
+    # No ticks arrive: each 30 s wait at 1000x is 30 ms of wall-clock time
+    assert supervisor.calls >= 5
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from src import mt5_simulator
+from src.bar_snapshot import BarSnapshotBuilder
+
+D1, H1, M5 = mt5_simulator.TIMEFRAME_D1, mt5_simulator.TIMEFRAME_H1, mt5_simulator.TIMEFRAME_M5
+
+
+@pytest.fixture
+def simulator(synthetic_csv):
+    """A simulator whose clock only moves when advanced, so direct requests see the snapshot's bars"""
+    return mt5_simulator.install(data_file=synthetic_csv, warmup=0.8, seed=1, speed=0)
+
+
+@pytest.fixture
+def builder(simulator):
+    builder = BarSnapshotBuilder(simulator.symbol, api=mt5_simulator)
+    builder.require(D1, 20, shift=1).require(D1, 24, shift=0).require(H1, 12, shift=3).require(M5, 50)
+    return builder
+
+
+def test_one_fetch_per_timeframe_covering_every_stage(builder, simulator):
+    assert builder.requirements() == {D1: (0, 24), H1: (3, 12), M5: (0, 50)}
+    before = simulator.calls.get('copy_rates_from_pos', 0)
+    builder.build()
+    assert simulator.calls['copy_rates_from_pos'] - before == 3
+    assert builder.fetches == 3
+
+
+def test_slices_match_direct_requests_inside_the_bounds(builder, simulator):
+    bars = builder.build()
+    for timeframe, (first, count) in builder.requirements().items():
+        for shift in range(first, first + count):
+            for n in range(1, first + count - shift + 1):
+                direct = mt5_simulator.copy_rates_from_pos(simulator.symbol, timeframe, shift, n)
+                np.testing.assert_array_equal(bars.rates(timeframe, n, shift), direct)
+        frame = bars.frame(timeframe, count, first)
+        assert list(frame['close']) == list(bars.rates(timeframe, count, first)['close'])
+        assert frame.index[-1].timestamp() == bars.rates(timeframe, 1, first)['time'][0]
+
+
+def test_reads_outside_the_bounds_are_refused(builder):
+    bars = builder.build()
+    assert bars.rates(D1, 25) is None  # Older than anything requested
+    assert bars.frame(H1, 12, shift=4) is None
+    with pytest.raises(ValueError):
+        bars.rates(H1, 1, shift=2)  # Newer than the H1 fetch
+    assert bars.rates(mt5_simulator.TIMEFRAME_M15, 1) is None  # Never required
+
+
+def test_snapshot_does_not_move_with_the_market(builder, simulator):
+    bars = builder.build()
+    last = bars.rates(M5, 1)['time'][0]
+    simulator.clock.advance(3600)
+    assert bars.rates(M5, 1)['time'][0] == last
+    assert builder.build().rates(M5, 1)['time'][0] > last
@@ -0,0 +1,55 @@
+from src import mt5_simulator
+from src.broker_state import BrokerState
+
+
+class FlakyTerminal:
+    """The simulator API, with positions_get() failing (None) while `failing` is set"""
+    def __init__(self):
+        self.failing = False
+
+    def __getattr__(self, name):
+        return getattr(mt5_simulator, name)
+
+    def positions_get(self, **kwargs):
+        return None if self.failing else mt5_simulator.positions_get(**kwargs)
+
+
+def open_position(sim):
+    result = sim.order_send({"action": mt5_simulator.TRADE_ACTION_DEAL, "symbol": sim.symbol, "volume": 0.1,
+                             "type": mt5_simulator.ORDER_TYPE_BUY, "price": sim.symbol_info_tick(sim.symbol).ask})
+    assert result.retcode == mt5_simulator.TRADE_RETCODE_DONE
+    return result.order
+
+
+def test_a_failed_positions_call_keeps_the_previous_snapshot(simulator):
+    simulator.initialize()
+    terminal = FlakyTerminal()
+    broker = BrokerState(simulator.symbol, api=terminal)
+    ticket = open_position(simulator)
+    first = broker.begin_cycle()
+    assert [p.ticket for p in first.positions] == [ticket]
+
+    terminal.failing = True
+    second = broker.begin_cycle()
+    assert second.positions == first.positions
+    assert second.taken_at == first.taken_at  # Not refreshed: the next positions(max_age) reads again
+    assert second.account is not None and second.tick is not None
+    assert broker.positions(max_age=0) is None
+    assert broker.snapshot.positions == first.positions
+
+    terminal.failing = False
+    simulator.Close(simulator.symbol, ticket=ticket)
+    assert broker.positions(max_age=0) == ()
+    assert broker.begin_cycle().taken_at > first.taken_at
+
+
+def test_spec_cache_and_cycle_call_counts(simulator):
+    simulator.initialize()
+    broker = BrokerState(simulator.symbol, api=mt5_simulator)
+    broker.begin_cycle()
+    assert broker.symbol_spec() is broker.symbol_spec()
+    broker.positions()
+    broker.begin_cycle()
+    metrics = broker.cycle_metrics()
+    assert metrics['calls'] == {'positions_get': 1, 'account_info': 1, 'symbol_info_tick': 1, 'symbol_info': 1}
+    assert (metrics['spec_hits'], metrics['spec_misses']) == (1, 1)
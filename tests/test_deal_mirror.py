@@ -0,0 +1,93 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from src import mt5_simulator
+from src.deal_mirror import DealMirror
+
+
+class RecordingTerminal:
+    """The simulator API, recording the history windows DealMirror asks for"""
+    def __init__(self):
+        self.windows = []
+        self.failing = False
+
+    def __getattr__(self, name):
+        return getattr(mt5_simulator, name)
+
+    def history_deals_get(self, date_from, date_to):
+        self.windows.append((date_from.timestamp(), date_to.timestamp()))
+        return None if self.failing else mt5_simulator.history_deals_get(date_from, date_to)
+
+
+def round_trip(sim, minutes_open=30):
+    """Open and close a buy; returns its position ticket"""
+    result = sim.order_send({"action": mt5_simulator.TRADE_ACTION_DEAL, "symbol": sim.symbol, "volume": 0.1,
+                             "type": mt5_simulator.ORDER_TYPE_BUY, "price": sim.symbol_info_tick(sim.symbol).ask})
+    sim.clock.advance(minutes_open * 60)
+    assert sim.Close(sim.symbol, ticket=result.order)
+    return result.order
+
+
+def test_sync_only_requests_deals_after_the_high_water_mark(simulator):
+    terminal = RecordingTerminal()
+    mirror = DealMirror(api=terminal, lookback_days=2, overlap_seconds=300,
+                        clock=lambda: datetime.fromtimestamp(simulator.clock.now(), timezone.utc))
+    old = round_trip(simulator)
+    simulator.clock.advance(3 * 86400)  # Beyond the first-sync lookback
+    first = round_trip(simulator)
+
+    new = mirror.sync()
+    assert {d.position_id for d in new} == {first}
+    assert mirror.exit_deal(old) is None
+    assert mirror.exit_deal(first).entry == mt5_simulator.DEAL_ENTRY_OUT
+    assert mirror.high_water_mark == simulator.deals[-1].time
+    assert terminal.windows[0][0] == pytest.approx(simulator.clock.now() - 2 * 86400, abs=1)
+
+    # Nothing new: the window starts at the mark minus the overlap and nothing is indexed twice
+    assert mirror.sync() == []
+    assert terminal.windows[1][0] == mirror.high_water_mark - 300
+    assert mirror.stats()['deals_indexed'] == 2
+
+    simulator.clock.advance(600)
+    second = round_trip(simulator, minutes_open=5)
+    assert [d.position_id for d in mirror.sync()] == [second, second]
+    assert mirror.high_water_mark == simulator.deals[-1].time
+    entry = mirror.entry(second)
+    assert entry.direction == 'BUY' and entry.sl is None  # From the entry deal: never seen open
+
+
+def test_late_deals_inside_the_overlap_are_picked_up(simulator):
+    mirror = DealMirror(api=mt5_simulator, overlap_seconds=300,
+                        clock=lambda: datetime.fromtimestamp(simulator.clock.now(), timezone.utc))
+    ticket = round_trip(simulator)
+    mirror.sync()
+    mark = mirror.high_water_mark
+    exit_deal = simulator.deals[-1]
+    # Deals stamped before the mark but delivered after the last sync
+    late = exit_deal._replace(ticket=exit_deal.ticket + 100, position_id=ticket + 100, time=mark - 299)
+    too_late = exit_deal._replace(ticket=exit_deal.ticket + 101, position_id=ticket + 101, time=mark - 301)
+    simulator.deals.extend([late, too_late])
+
+    assert [d.ticket for d in mirror.sync()] == [late.ticket]
+    assert mirror.exit_deal(ticket + 100) == late
+    assert mirror.exit_deal(ticket + 101) is None
+    assert mirror.high_water_mark == mark
+
+
+def test_a_failed_sync_keeps_the_high_water_mark(simulator):
+    terminal = RecordingTerminal()
+    mirror = DealMirror(api=terminal, clock=lambda: datetime.fromtimestamp(simulator.clock.now(), timezone.utc))
+    round_trip(simulator)
+    mirror.sync()
+    mark = mirror.high_water_mark
+
+    terminal.failing = True
+    simulator.clock.advance(60)
+    ticket = round_trip(simulator)
+    assert mirror.sync() == []
+    assert mirror.high_water_mark == mark
+
+    terminal.failing = False
+    assert {d.position_id for d in mirror.sync()} == {ticket}
+    assert terminal.windows[-1][0] == terminal.windows[-2][0] == mark - mirror.overlap_seconds
@@ -0,0 +1,57 @@
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src import decision_log
+from src.decision_log import DecisionLog
+
+
+def test_timestamps_share_one_utc_clock(tmp_path):
+    log = DecisionLog(tmp_path)
+    before = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    log.record("INFO", "range", "default clock")
+    log.record("SKIP", "news", "broker time", datetime(2025, 6, 2, 9, 30, tzinfo=timezone.utc), session="London")
+    log.record("SKIP", "news", "other zone", datetime(2025, 6, 2, 11, 45, tzinfo=timezone(timedelta(hours=2))))
+    log.record("SKIP", "trend", "naive", datetime(2025, 6, 2, 10, 0))
+    log.close()
+    records = list(decision_log.iter_records(tmp_path))
+    stamps = [r['ts'] for r in records]
+    assert all(len(ts) == 19 for ts in stamps)
+    assert datetime.fromisoformat(stamps[0]) - before < timedelta(minutes=1)
+    assert stamps[1:] == ["2025-06-02 09:30:00", "2025-06-02 09:45:00", "2025-06-02 10:00:00"]
+    assert records[1]['session'] == "London"
+
+
+def test_count_and_since_filter(tmp_path):
+    log = DecisionLog(tmp_path, max_bytes=200)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    for i in range(48):
+        log.record("SKIP" if i % 3 else "INFO", "session", f"reason {i % 2}", start + timedelta(hours=i), i=i)
+    log.close()
+    assert log.rotations > 0
+    counts = decision_log.count(tmp_path, by="level", per="day", since="2025-01-02")
+    assert counts == {("2025-01-02", "SKIP"): 16, ("2025-01-02", "INFO"): 8}
+    shown = list(decision_log.iter_records(tmp_path, since="2025-01-02 23:00", level="SKIP"))
+    assert [r['i'] for r in shown] == [47]
+    assert json.loads(decision_log.format_record("x", "I", "s", "r", {"a": 1}).split("\t")[4]) == {"a": 1}
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_rotations_within_one_second_read_back_in_order(tmp_path, compress):
+    log = DecisionLog(tmp_path, max_bytes=200, compress=compress)
+    burst = datetime(2025, 1, 1, 12, tzinfo=timezone.utc)
+    for i in range(40):
+        log.record("INFO", "order", "burst", burst, i=i)
+    for i in range(40, 50):
+        log.record("INFO", "order", "later", burst + timedelta(seconds=1 + i), i=i)
+    log.close()
+    assert log.rotations > 3
+    names = [os.path.basename(f) for f in decision_log.log_files(tmp_path)]
+    assert sum(n.startswith("decisions-20250101T120000") for n in names) > 2  # Colliding stamps
+    assert [r['i'] for r in decision_log.iter_records(tmp_path)] == list(range(50))
+    # Files starting exactly at `since` and the one before them can hold records of that second
+    assert [r['i'] for r in decision_log.iter_records(tmp_path, since="2025-01-01 12:00:00")] == list(range(50))
+    assert [r['i'] for r in decision_log.iter_records(tmp_path, since="2025-01-01 12:00:45")] == [44, 45, 46, 47, 48, 49]
+    assert len(decision_log.log_files(tmp_path, since="2025-01-01 12:00:45")) < len(names)
@@ -0,0 +1,76 @@
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src import mt5_simulator
+from src.journal_reconcile import JournalReconciler
+from src.trade_journal import JOURNAL_HEADERS, TradeJournal
+from src.trade_store import TradeStore
+
+
+def open_row(sim, direction="BUY"):
+    tick = sim.symbol_info_tick(sim.symbol)
+    price = tick.ask if direction == "BUY" else tick.bid
+    sign = 1 if direction == "BUY" else -1
+    result = sim.order_send({
+        "action": mt5_simulator.TRADE_ACTION_DEAL, "symbol": sim.symbol, "volume": 0.1,
+        "type": mt5_simulator.ORDER_TYPE_BUY if direction == "BUY" else mt5_simulator.ORDER_TYPE_SELL,
+        "price": price, "sl": round(price - sign * 30, 3), "tp": round(price + sign * 60, 3),
+    })
+    assert result.retcode == mt5_simulator.TRADE_RETCODE_DONE
+    return result.order, [result.order, "2023-04-01 00:00:00", sim.symbol, direction, result.price,
+                          round(price - sign * 30, 3), round(price + sign * 60, 3), 0.1, 2, 2,
+                          "OPEN", "", "", "", "", "", "test"]
+
+
+def closed_tickets(journal):
+    return [int(row[0]) for row in journal.rows() if row[JOURNAL_HEADERS.index("Status")] == "CLOSED"]
+
+
+def test_reconciliation_is_incremental_and_idempotent(simulator, tmp_path):
+    simulator.initialize()
+    journal = TradeJournal(tmp_path / "journal.csv", JOURNAL_HEADERS, fsync=False)
+    store = TradeStore(tmp_path / "trades.db")
+    cursor_file = tmp_path / "cursor.json"
+    missed, live, still_open = (open_row(simulator, d) for d in ("BUY", "SELL", "BUY"))
+    for _, row in (missed, live, still_open):
+        journal.append(row)
+    simulator.clock.advance(1800)
+    simulator.Close(simulator.symbol, ticket=missed[0])
+    simulator.Close(simulator.symbol, ticket=live[0])
+    exit_deal = simulator.history_deals_get(position=live[0])[-1]
+    # The live path already journalled this exit
+    journal.append([live[0], time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(exit_deal.time))] + live[1][2:10]
+                   + ["CLOSED", exit_deal.price, exit_deal.profit, "", "", "", "Closed by TP/SL/manual"])
+    store.add('closes', position_id=live[0], deal_ticket=exit_deal.ticket, time=datetime.fromtimestamp(exit_deal.time, timezone.utc))
+
+    def run():
+        until = datetime.fromtimestamp(simulator.clock.now(), timezone.utc)
+        reconciler = JournalReconciler(journal, api=mt5_simulator, store=store, cursor_file=cursor_file)
+        return reconciler.run(until=until), until
+
+    first, until = run()
+    assert (first['filled'], first['unmatched_open']) == (1, 1)
+    assert first['chunks'] == 13  # 90 days back plus one day ahead, 7 days per request
+    assert closed_tickets(journal) == [live[0], missed[0]]
+    row = journal.rows()[-1]
+    deal = simulator.history_deals_get(position=missed[0])[-1]
+    assert row[1] == time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(deal.time))  # UTC, like the live path
+    assert float(row[JOURNAL_HEADERS.index("ExitPrice")]) == pytest.approx(deal.price)
+    cursor = json.loads(cursor_file.read_text())[simulator.server]
+    assert cursor == pytest.approx(until.timestamp())
+
+    rows = len(journal.rows())
+    simulator.clock.advance(3600)
+    second, until = run()
+    assert second['filled'] == 0 and second['chunks'] == 1
+    assert len(journal.rows()) == rows
+    advanced = json.loads(cursor_file.read_text())[simulator.server]
+    assert advanced == pytest.approx(until.timestamp()) and advanced > cursor
+
+    store.flush()
+    assert sorted(r['position_id'] for r in store.closes()) == sorted([live[0], missed[0]])
+    journal.close()
+    store.close()
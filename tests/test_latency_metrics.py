@@ -0,0 +1,143 @@
+import re
+import urllib.request
+
+import numpy as np
+import pytest
+
+from src import latency_metrics as lm
+from src.latency_metrics import BUCKETS, HdrHistogram, LatencyRegistry, MetricsServer, _bucket, _bucket_upper
+
+
+def test_bucket_bounds_and_relative_error():
+    values = np.unique(np.r_[np.arange(0, 4096), np.logspace(3, 12.3, 20000).astype(np.int64)])
+    previous = -1
+    for v in values.tolist():
+        index = _bucket(v)
+        assert 0 <= index < BUCKETS
+        assert index >= previous  # Monotonic in the value
+        previous = index
+        upper = _bucket_upper(index)
+        lower = _bucket_upper(index - 1) + 1 if index else 0
+        assert lower <= v <= upper
+        if v >= 128:
+            assert (upper - lower + 1) / v <= 1 / 64 + 1e-12
+
+
+def test_values_beyond_the_range_land_in_the_last_bucket():
+    assert _bucket(2 ** 50) == BUCKETS - 1
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_quantiles_match_numpy(seed):
+    rng = np.random.default_rng(seed)
+    values = rng.lognormal(13, 1.5, 50000).astype(np.int64)
+    histogram = HdrHistogram()
+    for v in values.tolist():
+        histogram.record_ns(v)
+    qs = [0.001, 0.5, 0.9, 0.99, 0.999, 1.0]
+    estimated = np.array(histogram.quantiles(qs)) * 1e9
+    exact = np.quantile(values, qs, method="inverted_cdf")
+    assert np.all(estimated >= exact)
+    assert np.allclose(estimated, exact, rtol=1 / 64)
+    assert estimated[-1] == values.max()
+
+
+def test_quantiles_only_walk_the_occupied_range():
+    histogram = HdrHistogram()
+    for v in (5_000_000, 5_000_001, 7_000_000):
+        histogram.record_ns(v)
+    p0, p50, p100 = histogram.quantiles([0.0, 0.5, 1.0])
+    assert p0 * 1e9 >= 5_000_000 and p0 * 1e9 <= 5_000_000 * (1 + 1 / 64)
+    assert p50 * 1e9 <= 5_000_001 * (1 + 1 / 64)
+    assert p100 * 1e9 == 7_000_000
+    histogram.reset()
+    assert histogram.quantiles([0.5]) == [0.0] and histogram.min is None
+    histogram.record(0.002)
+    assert histogram.summary()['max_ms'] == pytest.approx(2.0)
+
+
+
+def full_walk(histogram, quantiles):
+    """quantiles() as it was before ba560f8: a walk over every bucket"""
+    targets = [max(1, int(round(histogram.count * q))) for q in quantiles]
+    results, seen, t = [], 0, 0
+    for index, c in enumerate(histogram.counts):
+        seen += c
+        while t < len(targets) and seen >= targets[t]:
+            results.append(min(_bucket_upper(index), histogram.max) / 1e9)
+            t += 1
+    return results
+
+
+@pytest.mark.parametrize("values", [[0], [0, 127, 128], [1, 2 ** 45], [3_000] * 5 + [2 ** 41 - 1], [12_345_678]])
+def test_occupied_range_walk_matches_a_full_walk(values):
+    histogram = HdrHistogram()
+    for v in values:
+        histogram.record_ns(v)
+    qs = [0.0, 0.25, 0.5, 0.9, 0.99, 1.0]
+    assert histogram.quantiles(qs) == full_walk(histogram, qs)
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?:[^"}]|"(?:[^"\\]|\\.)*")*\})? (\S+)$')
+
+
+def parse_exposition(text):
+    """{(name, frozenset(labels)): value} plus {metric: type}, failing on malformed lines"""
+    samples, types = {}, {}
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            types[name] = kind
+            continue
+        if line.startswith("# HELP ") or not line:
+            continue
+        match = SAMPLE.match(line)
+        assert match, line
+        name, labels, value = match.groups()
+        pairs = frozenset(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', labels or ""))
+        samples[(name, pairs)] = float(value)
+    return samples, types
+
+
+def test_exposition_parses():
+    registry = LatencyRegistry()
+    for ms in (1, 2, 3, 4):
+        registry.stage("bars").record(ms / 1000)
+    registry.histogram("crt_mt5_call_seconds", "MT5 call time", method='order_send').record(0.01)
+    registry.gauge("crt_trades_today", lambda: 2, "Trades today")
+    registry.gauge("crt_by_name", lambda: {'a"b': 1}, "Escaped label")
+    samples, types = parse_exposition(registry.exposition())
+    assert types == {'crt_stage_seconds': 'summary', 'crt_mt5_call_seconds': 'summary',
+                     'crt_trades_today': 'gauge', 'crt_by_name': 'gauge'}
+    stage = frozenset({('stage', 'bars')})
+    assert samples[('crt_stage_seconds_count', stage)] == 4
+    assert samples[('crt_stage_seconds_sum', stage)] == pytest.approx(0.010)
+    assert samples[('crt_stage_seconds', stage | {('quantile', '0.5')})] == pytest.approx(0.002, rel=1 / 64)
+    assert samples[('crt_mt5_call_seconds_count', frozenset({('method', 'order_send')}))] == 1
+    assert samples[('crt_trades_today', frozenset())] == 2
+    assert samples[('crt_by_name', frozenset({('name', 'a\\"b')}))] == 1
+
+
+def test_registry_now_span_and_observe():
+    registry = LatencyRegistry()
+    started = registry.now()
+    with registry.span("a"):
+        pass
+    registry.observe("b", started)
+    wrapped = registry.timed("c", lambda x: x + 1)
+    assert wrapped(1) == 2
+    assert {name: s['count'] for name, s in registry.stats().items()} == {'a': 1, 'b': 1, 'c': 1}
+    assert lm.now() >= started
+
+
+def test_metrics_server_serves_the_exposition():
+    registry = LatencyRegistry()
+    registry.stage("cycle").record(0.001)
+    server = MetricsServer(registry, port=0)
+    server.start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout=5) as response:
+            assert response.headers['Content-Type'].startswith("text/plain; version=0.0.4")
+            samples, _ = parse_exposition(response.read().decode())
+        assert samples[('crt_stage_seconds_count', frozenset({('stage', 'cycle')}))] == 1
+    finally:
+        server.stop()
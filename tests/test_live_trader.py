@@ -0,0 +1,71 @@
+"""The unmodified live loop (exness_crt_trader.py) against the simulator"""
+import pytest
+
+from src import config, mt5_simulator, news_filter
+
+
+@pytest.fixture(scope="module")
+def trader(tmp_path_factory, synthetic_csv):
+    directory = tmp_path_factory.mktemp("live")
+    patch = pytest.MonkeyPatch()
+    for name, value in {
+        'STOP_MODEL_FILE': directory / "stop_model.json",
+        'SYMBOL_CATALOG_DIR': directory / "symbol_catalog",
+        'DECISION_LOG_DIR': directory / "decisions",
+        'TRADE_STORE_FILE': directory / "trades.db",
+        'RECONCILE_CURSOR_FILE': directory / "reconcile_cursor.json",
+        'PROFILE_FLAG_FILE': directory / "profile.flag",
+        'PROFILE_OUTPUT_DIR': directory / "profiles",
+    }.items():
+        patch.setattr(config, name, value)
+    patch.setattr(news_filter, "CALENDAR_FILE", str(directory / "news_calendar.json"))
+    patch.chdir(directory)  # Journal and last-signal files are relative to the working directory
+    mt5_simulator.install(data_file=synthetic_csv, warmup=0.8, seed=1)
+
+    import exness_crt_trader as t
+    patch.setattr(t.symbol_catalog, "directory", directory / "symbol_catalog")
+    patch.setattr(t, "NEWS_FAIL_SAFE", False)
+    patch.setattr(t, "SESSION_HOURS", list(range(24)))
+    assert t.initialize()
+    yield t
+    t.gateway.stop()
+    t.journal.close()
+    t.decision_log.close()
+    t.trade_store.close()
+    patch.undo()
+
+
+def test_strategy_cycle_reaches_the_crt_scan(trader):
+    delay = trader.strategy_cycle()
+    assert isinstance(delay, (int, float)) and delay > 0
+    stages = trader.latency.stats()
+    for stage in ("cycle", "snapshot", "news_check", "bars", "trend", "range_scan"):
+        assert stages[stage]['count'] >= 1, stage
+
+
+def open_position(trader, direction="BUY", sl_distance=20.0):
+    mt5 = trader.mt5
+    tick = mt5.symbol_info_tick(trader.SYMBOL)
+    price = tick.ask if direction == "BUY" else tick.bid
+    sign = 1 if direction == "BUY" else -1
+    result = mt5.order_send({
+        "action": mt5.TRADE_ACTION_DEAL, "symbol": trader.SYMBOL, "volume": 0.1,
+        "type": mt5.ORDER_TYPE_BUY if direction == "BUY" else mt5.ORDER_TYPE_SELL,
+        "price": price, "sl": round(price - sign * sl_distance, 3), "tp": round(price + sign * 50, 3),
+        "deviation": 20, "comment": "test",
+    })
+    assert result.retcode == mt5.TRADE_RETCODE_DONE
+    return result.order, price
+
+
+def test_move_managed_sl_returns_and_logs_the_applied_price(trader, capsys):
+    ticket, entry = open_position(trader)
+    requested = round(entry + 0.0001, 3)  # Breakeven right at the market: widened to the learned minimum
+    applied = trader.move_managed_sl(ticket, requested)
+    broker_sl = trader.mt5.positions_get(ticket=ticket)[0].sl
+    assert applied == pytest.approx(broker_sl)
+    assert applied != requested
+    assert f"Moved SL of position {ticket} to {applied}" in capsys.readouterr().out
+    # A level no better than the current stop is not sent
+    assert trader.move_managed_sl(ticket, round(broker_sl - 5, 3)) is None
+    trader.mt5.Close(trader.SYMBOL, ticket=ticket)
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from src.metrics import METRIC_KEYS, MetricsAccumulator, compute_metrics, metrics_by_run
+
+CAPITAL = 10000.0
+RUN_KEYS = ['total_trades', 'win_rate', 'total_pnl', 'profit_factor', 'max_drawdown', 'max_drawdown_pct',
+            'sharpe', 'sortino', 'time_in_market']
+
+
+def ledger(seed, n=300):
+    """Overlapping trades in exit order: P&L, entry and exit epoch seconds, R:R"""
+    rng = np.random.default_rng(seed)
+    entries = 1.7e9 + np.sort(rng.uniform(0, 90 * 86400, n))
+    exits = entries + rng.exponential(6 * 3600, n)
+    order = np.argsort(exits, kind="stable")
+    pnl = rng.normal(15, 120, n)
+    return pnl, entries[order], exits[order], rng.uniform(1, 3, n)
+
+
+def covered_time(entries, exits):
+    """Length of the union of [entry, exit] intervals, merged the slow obvious way"""
+    total, current_start, current_end = 0.0, None, None
+    for start, end in sorted(zip(entries, exits)):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    return total + (current_end - current_start)
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_one_pass_streaming_and_by_run_agree(seed):
+    pnl, entries, exits, rr = ledger(seed)
+    batch = compute_metrics(pnl, CAPITAL, entries, exits, rr)
+    accumulator = MetricsAccumulator(CAPITAL)
+    accumulator.update_many(pnl, entries, exits, rr)
+    streaming = accumulator.result()
+    for key in METRIC_KEYS:
+        assert streaming[key] == pytest.approx(batch[key], rel=1e-9, abs=1e-9), key
+    by_run = metrics_by_run(np.zeros(len(pnl), dtype=int), pnl, CAPITAL, entries, exits)
+    for key in RUN_KEYS:
+        assert by_run[key][0] == pytest.approx(batch[key], rel=1e-9, abs=1e-9), key
+    span = exits.max() - entries.min()
+    assert batch['time_in_market'] == pytest.approx(covered_time(entries, exits) / span * 100)
+    assert batch['total_pnl'] == pytest.approx(pnl.sum())
+
+
+def test_metrics_by_run_matches_each_run_alone():
+    ledgers = [ledger(seed, n) for seed, n in ((4, 50), (5, 1), (6, 120), (7, 2))]
+    run_ids = np.concatenate([np.full(len(l[0]), f"run-{i}") for i, l in enumerate(ledgers)])
+    pnl, entries, exits = (np.concatenate([l[k] for l in ledgers]) for k in range(3))
+    by_run = metrics_by_run(run_ids, pnl, CAPITAL, entries, exits)
+    assert list(by_run['run']) == ["run-0", "run-1", "run-2", "run-3"]
+    for i, (p, e, x, _) in enumerate(ledgers):
+        alone = compute_metrics(p, CAPITAL, e, x)
+        for key in RUN_KEYS:
+            assert by_run[key][i] == pytest.approx(alone[key], rel=1e-9, abs=1e-9), (i, key)
+
+
+def test_drawdown_of_a_known_curve():
+    pnl = [100, -300, 50, 400, -100]
+    for result in (compute_metrics(pnl, 1000), MetricsAccumulator(1000)):
+        if isinstance(result, MetricsAccumulator):
+            result.update_many(pnl)
+            result = result.result()
+        assert result['max_drawdown'] == pytest.approx(300)
+        assert result['max_drawdown_pct'] == pytest.approx(300 / 1100 * 100)
+        assert result['profit_factor'] == pytest.approx(550 / 400)
+
+
+def test_cover_merges_nested_touching_and_bridging_intervals():
+    accumulator = MetricsAccumulator(CAPITAL)
+    intervals = [(10, 20), (30, 40), (12, 15), (20, 25), (50, 60), (24, 52), (0, 5), (70, 80)]
+    for entry, exit_ in intervals:
+        accumulator.update(1.0, entry, exit_)
+    assert accumulator._block_starts == [0, 10, 70] and accumulator._block_ends == [5, 60, 80]
+    assert accumulator.covered == covered_time(*zip(*intervals)) == 65
+
+
+def test_empty_ledgers():
+    assert compute_metrics([], CAPITAL)['total_trades'] == 0
+    assert MetricsAccumulator(CAPITAL).result() == compute_metrics([], CAPITAL)
+    assert len(metrics_by_run([], [], CAPITAL)['run']) == 0
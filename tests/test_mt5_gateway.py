@@ -0,0 +1,107 @@
+import threading
+
+import MetaTrader5 as mt5
+import pytest
+
+from src.latency_metrics import LatencyRegistry
+from src.mt5_gateway import COALESCABLE, MT5Gateway, Priority
+
+SYMBOL = "XAUUSDm"
+
+
+class GatedTerminal:
+    """Simulator terminal that records calls and can hold the gateway worker on a call"""
+    def __init__(self, api):
+        self.api = api
+        self.calls = []
+        self.holding = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def hold(self):
+        self.release.clear()
+
+    def __getattr__(self, name):
+        attr = getattr(self.api, name)
+        if not callable(attr) or isinstance(attr, type):
+            return attr
+
+        def call(*args, **kwargs):
+            self.calls.append(name)
+            if not self.release.is_set():
+                self.holding.set()
+                self.release.wait(5)
+            return attr(*args, **kwargs)
+        return call
+
+
+@pytest.fixture
+def terminal(simulator):
+    simulator.initialize()
+    return GatedTerminal(simulator)
+
+
+@pytest.fixture
+def gateway(terminal):
+    gw = MT5Gateway(terminal, registry=LatencyRegistry()).start()
+    yield gw
+    terminal.release.set()
+    gw.stop()
+
+
+def block_worker(terminal, gateway):
+    """Park the worker inside a terminal call so later requests wait in the queue"""
+    terminal.hold()
+    blocker = gateway.submit('version', priority=Priority.OTHER)
+    assert terminal.holding.wait(5)
+    return blocker
+
+
+def test_identical_waiting_reads_share_one_terminal_call(terminal, gateway, simulator):
+    simulator.order_send({'action': mt5.TRADE_ACTION_DEAL, 'symbol': SYMBOL, 'volume': 0.1,
+                          'type': mt5.ORDER_TYPE_BUY, 'price': simulator.symbol_info_tick(SYMBOL).ask})
+    blocker = block_worker(terminal, gateway)
+    results = [None] * 8
+
+    def read(i):
+        results[i] = gateway.positions_get(symbol=SYMBOL)
+    threads = [threading.Thread(target=read, args=(i,)) for i in range(len(results))]
+    for t in threads:
+        t.start()
+    while gateway.submitted < len(results) + 1:
+        threading.Event().wait(0.001)
+    terminal.release.set()
+    for t in threads:
+        t.join(5)
+
+    blocker.result(5)
+    assert terminal.calls.count('positions_get') == 1
+    assert gateway.coalesced == len(results) - 1
+    assert all(r is results[0] for r in results) and len(results[0]) == 1
+
+
+def test_last_error_is_never_coalesced(terminal, gateway):
+    assert 'last_error' not in COALESCABLE
+    blocker = block_worker(terminal, gateway)
+    futures = [gateway.submit('last_error') for _ in range(3)]
+    terminal.release.set()
+    blocker.result(5)
+    [f.result(5) for f in futures]
+    assert terminal.calls.count('last_error') == 3
+    assert gateway.coalesced == 0
+
+
+def test_orders_overtake_queued_reads(terminal, gateway, simulator):
+    blocker = block_worker(terminal, gateway)
+    reads = [gateway.submit('copy_rates_from_pos', SYMBOL, mt5.TIMEFRAME_M5, i, 10) for i in range(3)]
+    reads.append(gateway.submit('history_deals_get', 0, 2 ** 31))
+    order = gateway.submit('order_send', {'action': mt5.TRADE_ACTION_DEAL, 'symbol': SYMBOL, 'volume': 0.1,
+                                          'type': mt5.ORDER_TYPE_SELL,
+                                          'price': simulator.symbol_info_tick(SYMBOL).bid})
+    positions = gateway.submit('positions_get')
+    terminal.release.set()
+
+    assert order.result(5).retcode == mt5.TRADE_RETCODE_DONE
+    assert len(positions.result(5)) == 1  # Read after the order it overtook the queue with
+    [f.result(5) for f in reads + [blocker]]
+    assert terminal.calls[1:] == ['order_send', 'positions_get'] + ['copy_rates_from_pos'] * 3 + ['history_deals_get']
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from src import mt5_simulator as s
+
+
+@pytest.fixture
+def dip_then_rally(tmp_path):
+    """Bar 0 dips to 90 in its first third, then rallies to 101 (bullish: open -> low -> high -> close)"""
+    path = tmp_path / "bars.csv"
+    path.write_text(
+        "timestamp,open,high,low,close,volume\n"
+        "2024-01-02 10:00:00,100,101,90,100.5,10\n"
+        "2024-01-02 10:05:00,100.5,102,100,101.5,10\n"
+        "2024-01-02 10:10:00,101.5,103,101,102.5,10\n"
+    )
+    return str(path)
+
+
+def make_simulator(data_file, offset):
+    sim = s.Simulator(data_file=data_file, start="2024-01-02 10:00:00", spread_points=0, stops_level=0)
+    sim.clock.advance(offset)
+    sim.initialize()
+    return sim
+
+
+def test_extremes_follow_the_price_path(dip_then_rally):
+    data = s.Simulator(data_file=dip_then_rally).data
+    t0 = data.first_time
+    for a, b in [(0, 900), (150, 160), (50, 450), (200, 700), (299, 301), (0, 100)]:
+        samples = [data.price_at(t0 + x) for x in np.linspace(a, b, 2001)]
+        low, high = data.extremes(t0 + a, t0 + b)
+        assert low == pytest.approx(min(samples), abs=0.02), (a, b)
+        assert high == pytest.approx(max(samples), abs=0.02), (a, b)
+
+
+def test_stops_ignore_price_action_before_the_entry(dip_then_rally):
+    sim = make_simulator(dip_then_rally, 150)  # After the dip to 90, price ~95.5 and rising
+    result = sim.order_send({"action": s.TRADE_ACTION_DEAL, "symbol": sim.symbol, "volume": 0.1,
+                             "type": s.ORDER_TYPE_BUY, "price": sim.symbol_info_tick(sim.symbol).ask,
+                             "sl": 93.0, "tp": 120.0})
+    assert result.retcode == s.TRADE_RETCODE_DONE
+    sim.clock.advance(10)
+    assert len(sim.positions_get()) == 1
+
+
+def test_stops_still_fill_on_later_price_action(dip_then_rally):
+    sim = make_simulator(dip_then_rally, 150)
+    result = sim.order_send({"action": s.TRADE_ACTION_DEAL, "symbol": sim.symbol, "volume": 0.1,
+                             "type": s.ORDER_TYPE_BUY, "price": sim.symbol_info_tick(sim.symbol).ask,
+                             "sl": 93.0, "tp": 100.8})
+    assert result.retcode == s.TRADE_RETCODE_DONE
+    sim.clock.advance(100)  # Rally through 100.8 at about 10:03:40
+    assert sim.positions_get() == ()
+    deal = sim.history_deals_get(position=result.order)[-1]
+    assert deal.price == pytest.approx(100.8)
+
+
+def test_order_check_is_one_call(dip_then_rally):
+    sim = make_simulator(dip_then_rally, 0)
+    sim.order_check({"action": s.TRADE_ACTION_DEAL, "symbol": sim.symbol, "volume": 0.1,
+                     "type": s.ORDER_TYPE_BUY, "price": 100.0})
+    assert sim.calls.get('order_check') == 1
+    assert 'account_info' not in sim.calls
@@ -0,0 +1,139 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src import news_filter
+
+
+class CalendarStub:
+    """Local calendar API: serves `events` as JSON, or `status` when it is not 200"""
+    def __init__(self):
+        self.events = []
+        self.status = 200
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                body = json.dumps(stub.events).encode() if stub.status == 200 else b"unavailable"
+                self.send_response(stub.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/calendar"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def event(minutes_from_now, name="Non Farm Payrolls", country="United States", impact="High"):
+    moment = datetime.now(timezone.utc) + timedelta(minutes=minutes_from_now)
+    return {"date": moment.strftime(news_filter.EVENT_TIME_FORMAT), "country": country, "event": name, "impact": impact}
+
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    monkeypatch.setattr(news_filter, "CALENDAR_FILE", str(tmp_path / "news_calendar.json"))
+    monkeypatch.setattr(news_filter, "HISTORY_FILE", str(tmp_path / "news_calendar.csv"))
+    monkeypatch.setattr(news_filter, "_calendar", {'events': None, 'fetched_at': None, 'start': None, 'end': None,
+                                                   'indexes': {}, 'failures': 0, 'last_error': None})
+    server = CalendarStub()
+    yield server
+    server.close()
+
+
+def test_refresh_installs_and_stores_the_calendar(stub, tmp_path):
+    stub.events = [event(10), event(12, name="Bank Holiday", impact="Low"), event(-600, country="Brazil")]
+    refresher = news_filter.NewsRefresher(interval=900, url=stub.url, timeout=5)
+    assert refresher.run_once() == 900
+    assert stub.requests == 1
+    assert news_filter.news_calendar_status()['events'] == 1  # Only the relevant high-impact event
+    assert news_filter.is_news_blocking()
+    assert news_filter.news_blackout_until() == pytest.approx(time.time() + 40 * 60, abs=90)
+    assert json.loads((tmp_path / "news_calendar.json").read_text())['events'][0]['event'] == "Non Farm Payrolls"
+    assert "Non Farm Payrolls" in (tmp_path / "news_calendar.csv").read_text()
+
+
+def test_failures_back_off_while_the_stale_calendar_is_served(stub):
+    stub.events = [event(5)]
+    refresher = news_filter.NewsRefresher(interval=900, retry_seconds=30, max_backoff=90, url=stub.url, timeout=5)
+    refresher.run_once()
+    stub.status = 503
+    delays = [refresher.run_once() for _ in range(4)]
+    assert 24 <= delays[0] <= 36 and 48 <= delays[1] <= 72 and delays[2] == delays[3] == 90
+    status = news_filter.news_calendar_status()
+    assert status['failures'] == 4 and "503" in status['last_error']
+    assert news_filter.is_news_blocking(fail_safe=False)  # Last good calendar still answers
+    stub.status = 200
+    assert refresher.run_once() == 900
+    assert refresher.stats()['failures'] == 0 and news_filter.news_calendar_status()['failures'] == 0
+
+
+def test_a_calendar_past_its_maximum_age_falls_back_to_the_fail_safe(stub):
+    stub.events = [event(24 * 60)]  # Nothing near now
+    news_filter.NewsRefresher(url=stub.url, timeout=5).run_once()
+    assert not news_filter.is_news_blocking(max_cache_age=60, fail_safe=True)
+    news_filter._calendar['fetched_at'] -= 120
+    assert news_filter.is_news_blocking(max_cache_age=60, fail_safe=True)
+    assert not news_filter.is_news_blocking(max_cache_age=60, fail_safe=False)
+    assert not news_filter.is_news_blocking(fail_safe=True)  # No maximum age: any age is good
+
+
+def test_background_thread_refreshes_on_request(stub):
+    stub.events = [event(5)]
+    refresher = news_filter.NewsRefresher(interval=3600, url=stub.url, timeout=5)
+    refresher.start()
+    try:
+        deadline = time.time() + 5
+        while refresher.refreshes < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        refresher.request_refresh()
+        while refresher.refreshes < 2 and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        refresher.stop()
+    assert refresher.refreshes == 2 and stub.requests == 2
+
+
+@pytest.mark.parametrize("bar_seconds, utc_offset_hours", [(0, 0), (300, 0), (0, 2)])
+def test_blackout_mask_matches_the_live_check_bar_by_bar(stub, monkeypatch, bar_seconds, utc_offset_hours):
+    import numpy as np
+    monkeypatch.setattr(news_filter, "SESSION_NEWS_WINDOWS", {'London': 45, 'NY': 60})
+    rng = np.random.default_rng(bar_seconds + utc_offset_hours)
+    start = 1_700_000_000 - 1_700_000_000 % 86400
+    random_events = start + rng.integers(0, 5 * 86400, 60)
+    # Overlapping and touching windows: 30 and 60 minutes apart at 02:00 (30 minute window), 90 apart in London (45)
+    crafted = start + 86400 * 6 + np.array([2 * 3600, 2 * 3600 + 1800, 3 * 3600 + 1800, 10 * 3600, 10 * 3600 + 5400])
+    event_times = np.unique(np.concatenate([random_events, crafted]))
+    events = [{"date": time.strftime(news_filter.EVENT_TIME_FORMAT, time.gmtime(int(t))), "country": "United States",
+               "event": "CPI", "impact": "High"} for t in event_times]
+    news_filter._install_calendar(events, time.time(), int(event_times.min()) - 86400, int(event_times.max()) + 86400)
+
+    # Random bars plus bars on and next to every window edge
+    edges = np.array([e + sign * w * 60 + d for e in event_times for w in (30, 45, 60)
+                      for sign in (-1, 1) for d in (-1, 0, 1)])
+    utc = np.unique(np.concatenate([start + rng.integers(0, 7 * 86400, 3000), edges, edges - bar_seconds]))
+    bar_times = utc + utc_offset_hours * 3600
+    mask = news_filter.news_blackout_mask(bar_times, event_times, bar_seconds=bar_seconds,
+                                          utc_offset_hours=utc_offset_hours)
+    for blocked, t, broker_t in zip(mask, utc.tolist(), bar_times.tolist()):
+        session = news_filter.session_for_hour((broker_t // 3600) % 24)
+        # The live filter at the moment of the bar closest to each event: blocked at some point of the bar
+        moments = {min(max(int(e), t), t + bar_seconds) for e in event_times}
+        live = any(news_filter.news_blackout_until(session, now_ts=m) is not None for m in moments)
+        assert blocked == live, (t, session)
+    assert mask.any() and not mask.all()
@@ -0,0 +1,85 @@
+import MetaTrader5 as mt5
+import pytest
+
+from src.order_bracket import (CHECK_FAILED, FILLED, FLATTENED, PARTIAL, REJECTED, build_bracket_requests,
+                               submit_bracket)
+
+SYMBOL = "XAUUSDm"
+
+
+@pytest.fixture
+def market(simulator):
+    simulator.initialize()
+    tick = mt5.symbol_info_tick(SYMBOL)
+    # Stops comfortably outside the simulator's stops level
+    gap = 4 * simulator.stops_level * simulator.point
+    return simulator, tick.ask, gap
+
+
+def bracket(price, gap, tp2=None, direction='BUY', volume=0.1):
+    return build_bracket_requests(mt5, SYMBOL, direction, volume, price, sl=price - gap, tp1=price + gap,
+                                  tp2=price + 2 * gap if tp2 is None else tp2)
+
+
+def test_both_legs_fill(market):
+    simulator, ask, gap = market
+    result = submit_bracket(mt5, *bracket(ask, gap))
+    assert result.status == FILLED
+    assert result.filled == [0, 1]
+    assert [c.retcode for c in result.checks] == [0, 0]
+    assert {p.ticket for p in mt5.positions_get(symbol=SYMBOL)} == {r.order for r in result.results}
+    assert result.price_skew == 0  # Same simulated quote for both sends
+    assert result.time_skew_ms >= 0
+
+
+def test_preflight_failure_sends_nothing(market):
+    simulator, ask, gap = market
+    request1, request2 = bracket(ask, gap, tp2=ask - gap)  # TP below a buy entry
+    result = submit_bracket(mt5, request1, request2)
+    assert result.status == CHECK_FAILED
+    assert result.check_retcodes() == [0, mt5.TRADE_RETCODE_INVALID_STOPS]
+    assert result.results == [None, None]
+    assert mt5.positions_get() == ()
+    assert mt5.history_deals_get(0, 2 ** 31) == ()
+
+
+def test_second_leg_rejected_after_the_first_filled_is_flattened(market):
+    simulator, ask, gap = market
+    request1, request2 = bracket(ask, gap, tp2=ask - gap)
+    result = submit_bracket(mt5, request1, request2, check=False, on_partial="close")
+    assert result.status == FLATTENED
+    assert result.send_retcodes() == [mt5.TRADE_RETCODE_DONE, mt5.TRADE_RETCODE_INVALID_STOPS]
+    assert result.closed_leg == 0 and result.filled == []
+    assert mt5.positions_get() == ()
+    entries = [d.entry for d in mt5.history_deals_get(position=result.results[0].order)]
+    assert entries == [mt5.DEAL_ENTRY_IN, mt5.DEAL_ENTRY_OUT]
+
+
+def test_partial_bracket_is_kept_by_default(market):
+    simulator, ask, gap = market
+    result = submit_bracket(mt5, *bracket(ask, gap, tp2=ask - gap), check=False)
+    assert result.status == PARTIAL
+    assert result.filled == [0]
+    assert len(mt5.positions_get()) == 1
+
+
+def test_leg_fallback_runs_after_both_sends(market):
+    simulator, ask, gap = market
+    request1, request2 = bracket(ask, gap, tp2=ask - gap)
+    sends = []
+
+    def fallback(leg, request, failed):
+        sends.append(len(mt5.positions_get()))
+        return mt5.order_send(dict(request, tp=ask + 2 * gap))
+    result = submit_bracket(mt5, request1, request2, check=False, leg_fallback=fallback)
+    assert result.status == FILLED
+    assert sends == [1]
+    assert result.first_results[1].retcode == mt5.TRADE_RETCODE_INVALID_STOPS
+    assert len(mt5.positions_get()) == 2
+
+
+def test_both_legs_rejected(market):
+    simulator, ask, gap = market
+    result = submit_bracket(mt5, *bracket(ask, gap, volume=0.0001), check=False)
+    assert result.status == REJECTED
+    assert result.send_retcodes() == [mt5.TRADE_RETCODE_INVALID_VOLUME] * 2
@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.portfolio_risk import PortfolioRisk
+
+UNLIMITED = dict(max_positions=None, max_open_risk=None, max_correlated_risk=None, max_margin=None,
+                 max_symbol_lots=None)
+
+
+def portfolio(**limits):
+    settings = dict(UNLIMITED)
+    settings.update(limits)
+    p = PortfolioRisk(**settings)
+    p.add_account(1, equity=10000, leverage=200)
+    p.add_account(2, equity=5000, leverage=100)
+    p.add_symbol("XAUUSDm", contract_size=100)
+    p.add_symbol("XAGUSDm", contract_size=5000)
+    p.add_symbol("EURUSDm", contract_size=100000)
+    return p
+
+
+def derived(p):
+    return {name: getattr(p, name).copy() for name in
+            ("_corr_risk", "_quad", "_account_positions", "_account_risk", "_account_margin", "_symbol_lots")}
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_totals_match_a_full_recompute(seed):
+    rng = np.random.default_rng(seed)
+    p = portfolio()
+    p.set_correlation("XAUUSDm", "XAGUSDm", 0.8)
+    p.set_correlation("XAUUSDm", "EURUSDm", -0.3)
+    prices = {"XAUUSDm": 2000.0, "XAGUSDm": 25.0, "EURUSDm": 1.1}
+    open_positions = []
+    for ticket in range(400):
+        action = rng.random()
+        if action < 0.4 or not open_positions:
+            account, symbol = int(rng.integers(1, 3)), list(prices)[rng.integers(3)]
+            direction = "BUY" if rng.random() < 0.5 else "SELL"
+            price = prices[symbol] * (1 + rng.normal(0, 0.01))
+            sl = None if rng.random() < 0.1 else price * (1 + rng.normal(0, 0.01))
+            p.on_fill(account, ticket, symbol, direction, round(float(rng.uniform(0.01, 2)), 2), price, sl)
+            open_positions.append((account, ticket, symbol))
+        elif action < 0.7:
+            account, position_id, symbol = open_positions[rng.integers(len(open_positions))]
+            p.on_stop_moved(account, position_id, prices[symbol] * (1 + rng.normal(0, 0.01)))
+        elif action < 0.85:
+            account, position_id, _ = open_positions[rng.integers(len(open_positions))]
+            volume = p._positions[(account, position_id)][3]
+            p.on_close(account, position_id, volume * rng.uniform(0.1, 0.9))
+        else:
+            account, position_id, _ = open_positions.pop(rng.integers(len(open_positions)))
+            p.on_close(account, position_id)
+    incremental = derived(p)
+    p._recompute()
+    for name, expected in derived(p).items():
+        np.testing.assert_allclose(incremental[name], expected, rtol=1e-9, atol=1e-6, err_msg=name)
+    assert p.count.sum() == len(open_positions) == len(p._positions)
+
+
+def test_each_limit_rejects_with_its_reason():
+    p = portfolio(max_positions=1)
+    p.on_fill(1, 10, "XAUUSDm", "BUY", 0.1, 2000.0, 1985.0)
+    assert p.check(1, "XAUUSDm", "BUY", 0.1, 2000.0, 1985.0).reason == "max positions"
+    assert p.check(2, "XAUUSDm", "BUY", 0.1, 2000.0, 1985.0).ok  # Per account
+
+    p = portfolio(max_open_risk=0.01)  # 100 on account 1
+    check = p.check(1, "XAUUSDm", "BUY", 0.1, 2000.0, 1985.0)
+    assert check.reason == "open risk" and check.open_risk == pytest.approx(150)
+    assert p.check(1, "XAUUSDm", "BUY", 0.1, 2000.0, 2001.0).ok  # Stop beyond the entry: nothing at risk
+
+    p = portfolio(max_correlated_risk=0.025)  # 250 on account 1
+    p.set_correlation("XAUUSDm", "XAGUSDm", 1.0)
+    p.on_fill(1, 11, "XAUUSDm", "BUY", 0.1, 2000.0, 1985.0)
+    check = p.check(1, "XAGUSDm", "BUY", 0.1, 25.0, 24.7)
+    assert check.reason == "correlated risk" and check.correlated_risk == pytest.approx(300)
+    assert p.check(1, "XAGUSDm", "SELL", 0.1, 25.0, 25.3).ok  # A hedge lowers correlated risk
+
+    p = portfolio(max_margin=0.05)  # 500 on account 1; 1 lot of gold at 1:200 needs 1000
+    assert p.check(1, "XAUUSDm", "BUY", 1.0, 2000.0, 1999.0).reason == "margin"
+    assert p.check(1, "XAUUSDm", "BUY", 0.4, 2000.0, 1999.0).ok
+
+    p = portfolio(max_symbol_lots=0.5)
+    p.on_fill(1, 12, "XAUUSDm", "BUY", 0.3, 2000.0, 1985.0)
+    assert p.check(2, "XAUUSDm", "BUY", 0.3, 2000.0, 1985.0).reason == "symbol lots"
+    assert p.check(2, "XAUUSDm", "SELL", 0.3, 2000.0, 2015.0).ok
+    assert p.stats()['rejections'] == {"symbol lots": 1}
+
+
+def test_sync_keeps_the_exposure_when_positions_are_unknown():
+    p = portfolio(max_positions=1)
+    position = SimpleNamespace(ticket=7, symbol="XAUUSDm", type=0, volume=0.1, price_open=2000.0, sl=1985.0)
+    assert p.sync(1, [position])
+    assert not p.sync(1, None)  # positions_get() failed
+    assert p.check(1, "XAUUSDm", "BUY", 0.1, 2000.0, 1985.0).reason == "max positions"
+    assert p.sync(1, [])
+    assert p.check(1, "XAUUSDm", "BUY", 0.1, 2000.0, 1985.0).ok
@@ -0,0 +1,186 @@
+from collections import namedtuple
+from types import SimpleNamespace
+
+import pytest
+
+from src.position_supervisor import PositionSupervisor, TimerWheel
+
+Position = namedtuple("Position", "ticket symbol type price_open sl tp volume")
+Tick = namedtuple("Tick", "bid ask seq")
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeBroker:
+    """positions() in place of BrokerState; records the max_age of every read"""
+    def __init__(self, positions):
+        self.open = positions
+        self.reads = []
+
+    def positions(self, max_age=None):
+        self.reads.append(max_age)
+        return None if self.open is None else list(self.open)  # None: the terminal call failed
+
+    def symbol_spec(self):
+        return SimpleNamespace(trade_contract_size=100)
+
+
+class FakeTicks:
+    def __init__(self):
+        self.tick = None
+
+    def set(self, bid, spread=0.2):
+        self.tick = Tick(bid, round(bid + spread, 3), (self.tick.seq + 1) if self.tick else 1)
+
+    def get_tick(self):
+        return self.tick
+
+
+API = SimpleNamespace(ORDER_TYPE_BUY=0, ORDER_TYPE_SELL=1, Close=lambda *a, **k: None)
+
+
+# --- TimerWheel ---
+def test_timer_wheel_fires_due_timers_once():
+    clock = Clock(0.0)
+    wheel = TimerWheel(tick_seconds=1.0, slots=8, clock=clock)
+    fired = []
+    wheel.schedule(2.5, fired.append, "a")
+    wheel.schedule(20, fired.append, "b")  # More than one revolution ahead
+    clock.now = 2.0
+    assert wheel.advance() == 0
+    clock.now = 3.0
+    assert wheel.advance() == 1 and fired == ["a"]
+    clock.now = 19.0
+    assert wheel.advance() == 0
+    clock.now = 20.0
+    assert wheel.advance() == 1 and fired == ["a", "b"]
+    assert len(wheel) == 0 and wheel.next_deadline() is None
+
+
+def test_timer_wheel_cancel_and_next_deadline():
+    clock = Clock(0.0)
+    wheel = TimerWheel(clock=clock)
+    fired = []
+    timer = wheel.schedule(5, fired.append, 1)
+    wheel.schedule(9, fired.append, 2)
+    assert wheel.next_deadline() == pytest.approx(5.0)
+    assert wheel.cancel(timer) and not wheel.cancel(timer)
+    clock.now = 100.0
+    wheel.advance()
+    assert fired == [2]
+
+
+# --- Supervisor ---
+@pytest.fixture
+def setup():
+    clock = Clock()
+    broker = FakeBroker([
+        Position(2, "XAUUSDm", 0, 2000.0, 1985.0, 2030.0, 0.05),  # TP2 leg; TP1 leg (1) already closed
+    ])
+    ticks = FakeTicks()
+    moves = []
+
+    def move_sl(ticket, price):
+        applied = round(price - 0.5, 3)  # The broker side widens every stop a little
+        moves.append((ticket, price, applied))
+        return applied
+
+    supervisor = PositionSupervisor("XAUUSDm", broker, ticks, api=API, refresh_seconds=30, clock=clock,
+                                    trail_step_fraction=0.1, trail_min_interval=10, move_sl=move_sl,
+                                    profit_lock_rr=100)
+    trade = supervisor.manage_bracket(1, 2, 'BUY', 2000.0, 2030.0, 0.001, 3)
+    return SimpleNamespace(clock=clock, broker=broker, ticks=ticks, moves=moves, supervisor=supervisor, trade=trade)
+
+
+def test_breakeven_and_trailing_keep_the_applied_price(setup):
+    setup.ticks.set(2005.0)
+    setup.supervisor.run_once()
+    assert setup.trade.breakeven_done
+    assert setup.trade.trailing_sl == setup.moves[-1][2] == pytest.approx(1999.5)
+
+    setup.clock.now += 11
+    setup.ticks.set(2020.0)  # Trailing distance is 15: SL wants 2005.2
+    setup.supervisor.run_once()
+    assert setup.moves[-1][1] == pytest.approx(2005.2)
+    assert setup.trade.trailing_sl == pytest.approx(2004.7)
+
+
+def test_trailing_respects_minimum_step_and_interval(setup):
+    setup.ticks.set(2005.0)
+    setup.supervisor.run_once()
+    moves = len(setup.moves)
+    setup.clock.now += 11
+
+    # Under one step (1.5 = 10% of the 15.0 trailing distance): nothing sent
+    setup.ticks.set(2015.0 + 0.5)
+    setup.supervisor.run_once()
+    assert len(setup.moves) == moves
+
+    # A burst of improving ticks within the interval: one modification
+    for i in range(20):
+        setup.ticks.set(2020.0 + i)
+        setup.supervisor.run_once()
+        setup.clock.now += 0.1
+    assert len(setup.moves) == moves + 1
+    setup.clock.now += 10
+    setup.supervisor.run_once()
+    assert len(setup.moves) == moves + 2
+
+
+def test_failed_breakeven_is_retried(setup):
+    setup.supervisor.move_sl = lambda ticket, price: None
+    setup.ticks.set(2005.0)
+    setup.supervisor.run_once()
+    assert not setup.trade.breakeven_done
+    setup.supervisor.move_sl = lambda ticket, price: price
+    setup.clock.now += 31
+    setup.supervisor.run_once()
+    assert setup.trade.breakeven_done and setup.trade.trailing_sl == pytest.approx(2000.0001, abs=1e-3)
+
+
+def test_price_crossing_a_stop_rereads_positions_from_the_terminal(setup):
+    setup.ticks.set(2005.0)
+    setup.supervisor.run_once()  # Forced first refresh
+    setup.clock.now += 1
+    setup.supervisor.run_once()  # Not due, nothing crossed
+    reads = len(setup.broker.reads)
+    setup.ticks.set(2031.0)      # Through TP2
+    setup.supervisor.run_once()
+    assert len(setup.broker.reads) == reads + 1
+    assert setup.broker.reads[-1] == 0
+
+
+def test_a_failed_positions_read_is_not_taken_as_all_closed():
+    clock = Clock()
+    broker = FakeBroker([
+        Position(1, "XAUUSDm", 0, 2000.0, 1985.0, 2015.0, 0.05),
+        Position(2, "XAUUSDm", 0, 2000.0, 1985.0, 2030.0, 0.05),
+    ])
+    ticks = FakeTicks()
+    completed, closed = [], []
+    supervisor = PositionSupervisor("XAUUSDm", broker, ticks, api=API, refresh_seconds=30, clock=clock,
+                                    on_position_closed=lambda ticket, tracker: closed.append(ticket) or True,
+                                    on_trade_completed=completed.append)
+    trade = supervisor.manage_bracket(1, 2, 'BUY', 2000.0, 2030.0, 0.001, 3)
+    ticks.set(2005.0)
+    supervisor.run_once()
+
+    broker.open = None
+    clock.now += 31
+    supervisor.run_once()
+    assert completed == [] and closed == [] and not trade.breakeven_done
+    assert supervisor.stats()['managed_trades'] == 1
+    reads = len(broker.reads)
+    clock.now += 1
+    supervisor.run_once()  # Not marked refreshed: tried again on the next pass
+    assert len(broker.reads) == reads + 1
+
+    broker.open = []  # Both legs really closed
+    supervisor.run_once()
+    assert completed == [trade] and sorted(closed) == [1, 2]
@@ -0,0 +1,73 @@
+import pytest
+
+from src.stop_model import StopDistanceModel
+
+
+@pytest.fixture
+def model(tmp_path):
+    return StopDistanceModel(path=str(tmp_path / "stop_model.json"), safety_margin=0.1,
+                             default_min_stop={"XAUUSDm": 1.0})
+
+
+def test_unknown_symbol_uses_the_seeded_default(model):
+    assert model.min_distance("XAUUSDm", "London") == 1.0
+    assert model.min_distance("EURUSD", "London") == 0.0
+
+
+def test_accepts_far_above_the_minimum_do_not_become_the_minimum(model):
+    # The strategy always submits 15.0; the broker accepting it says nothing about smaller stops
+    for _ in range(5):
+        model.record("XAUUSDm", "London", 15.0, accepted=True, save=False)
+    assert model.min_distance("XAUUSDm", "London") == 1.0
+
+
+def test_rejections_raise_the_lower_bound_with_margin(model):
+    model.record("XAUUSDm", "NY", 2.0, accepted=False, save=False)
+    assert model.min_distance("XAUUSDm", "NY") == pytest.approx(2.2)
+    model.record("XAUUSDm", "NY", 15.0, accepted=True, save=False)
+    assert model.min_distance("XAUUSDm", "NY") == pytest.approx(2.2)
+
+
+def test_accepted_distance_caps_the_estimate(model):
+    model.record("XAUUSDm", "NY", 2.0, accepted=False, save=False)
+    model.record("XAUUSDm", "NY", 2.1, accepted=True, save=False)
+    # 2.0 * 1.1 = 2.2 would be more than a distance known to be accepted
+    assert model.min_distance("XAUUSDm", "NY") == pytest.approx(2.1)
+
+
+def test_rejection_beyond_an_accept_discards_the_accept(model):
+    model.record("XAUUSDm", "NY", 3.0, accepted=True, save=False)
+    model.record("XAUUSDm", "NY", 4.0, accepted=False, save=False)
+    assert model.min_distance("XAUUSDm", "NY") == pytest.approx(4.4)
+
+
+def test_stops_level_is_a_lower_bound(model):
+    model.observe_stops_level("XAUUSDm", "Asia", 500, 0.001)
+    assert model.min_distance("XAUUSDm", "Asia") == pytest.approx(1.0)
+    model.observe_stops_level("XAUUSDm", "Asia", 2000, 0.001)
+    assert model.min_distance("XAUUSDm", "Asia") == pytest.approx(2.2)
+
+
+def test_safe_sl_only_widens_stops_closer_than_the_minimum(model):
+    model.record("XAUUSDm", "NY", 2.0, accepted=False, save=False)
+    assert model.safe_sl("XAUUSDm", "NY", "BUY", 2000.0, 1999.0, 2) == 1997.8
+    assert model.safe_sl("XAUUSDm", "NY", "BUY", 2000.0, 1990.0, 2) == 1990.0
+    assert model.safe_sl("XAUUSDm", "NY", "SELL", 2000.0, 2001.0, 2) == 2002.2
+
+
+def test_outcomes_are_written_on_flush_only(model, tmp_path):
+    model.record("XAUUSDm", "NY", 2.0, accepted=False)
+    model.record_submission(retries=1)
+    assert model.dirty and not (tmp_path / "stop_model.json").exists()
+    model.flush()
+    assert not model.dirty
+    written = (tmp_path / "stop_model.json").stat().st_mtime_ns
+    model.flush()  # Nothing new: no write
+    assert (tmp_path / "stop_model.json").stat().st_mtime_ns == written
+
+
+def test_state_survives_a_restart(model):
+    model.record("XAUUSDm", "NY", 2.0, accepted=False)
+    model.flush()
+    reloaded = StopDistanceModel(path=model.path, default_min_stop={"XAUUSDm": 1.0})
+    assert reloaded.min_distance("XAUUSDm", "NY") == pytest.approx(2.2)
@@ -0,0 +1,104 @@
+import json
+
+import pytest
+
+from src import mt5_simulator
+from src.symbol_catalog import SymbolCatalog, parse_symbol
+
+
+class BrokerTerminal:
+    """The simulator API with extra symbols listed by symbols_get(), one list per server"""
+    def __init__(self, sim, extra):
+        self.sim = sim
+        self.extra = extra
+
+    def __getattr__(self, name):
+        return getattr(mt5_simulator, name)
+
+    def symbols_get(self, group=None):
+        gold = mt5_simulator.symbols_get()[0]
+        names = self.extra.get(self.sim.server, {})
+        return (gold,) + tuple(gold._replace(name=name, currency_base=base, currency_profit=quote, visible=visible)
+                               for name, (base, quote, visible) in names.items())
+
+
+@pytest.fixture
+def terminal(simulator):
+    simulator.initialize()
+    return BrokerTerminal(simulator, {
+        "Simulator-MT5": {"EURUSDm": ("EUR", "USD", True), "XAUEURm": ("XAU", "EUR", True)},
+        "Other-MT5": {"GOLD": ("XAU", "USD", True), "XAUUSD.pro": ("XAU", "USD", False)},
+    })
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("XAUUSDm", ("XAU", "USD", "m")),
+    ("XAUUSD.pro", ("XAU", "USD", ".pro")),
+    ("GOLD", ("XAU", "USD", "")),
+    ("GOLDmicro", ("XAU", "USD", "micro")),
+    ("EURUSD", ("EUR", "USD", "")),
+    ("US30", ("US30", "", "")),
+])
+def test_parse_symbol(name, expected):
+    assert parse_symbol(name) == expected
+
+
+def test_broker_currencies_override_the_name():
+    assert parse_symbol("GOLDEUR", "XAU", "EUR") == ("XAU", "EUR", "EUR")
+    assert parse_symbol("XAUUSDm", "xau", "usd") == ("XAU", "USD", "m")
+
+
+def test_catalog_is_built_once_and_reloaded_from_disk(terminal, simulator, tmp_path):
+    catalog = SymbolCatalog(api=terminal, directory=str(tmp_path))
+    assert catalog.ensure()
+    assert catalog.ensure()
+    assert simulator.calls['symbols_get'] == 1
+    assert catalog.resolve_gold() == "XAUUSDm"
+    assert catalog.resolve("EUR") == "EURUSDm"
+    assert catalog.resolve("GOLD", "EUR") == "XAUEURm"
+    assert catalog.get("XAUUSDm").trade_stops_level == simulator.stops_level
+
+    restarted = SymbolCatalog(api=terminal, directory=str(tmp_path))
+    assert restarted.ensure()
+    assert simulator.calls['symbols_get'] == 1
+    assert restarted.by_name == catalog.by_name
+    assert restarted.built_at == catalog.built_at
+
+
+def test_catalog_follows_a_server_change(terminal, simulator, tmp_path):
+    catalog = SymbolCatalog(api=terminal, directory=str(tmp_path))
+    catalog.ensure()
+    simulator.server = "Other-MT5"
+    assert catalog.ensure()
+    assert simulator.calls['symbols_get'] == 2
+    assert catalog.server == "Other-MT5"
+    assert catalog.get("EURUSDm") is None
+    assert catalog.resolve_gold() == "XAUUSDm"  # Preferred over GOLD by GOLD_CANDIDATES
+    assert catalog.resolve("XAU", prefer=["XAUUSD.pro"]) == "XAUUSD.pro"
+    assert [m.name for m in catalog.candidates("gold")] == ["XAUUSDm", "GOLD", "XAUUSD.pro"]
+
+    # Back on the first server: its stored catalog is reused
+    simulator.server = "Simulator-MT5"
+    assert catalog.ensure()
+    assert simulator.calls['symbols_get'] == 2
+    assert catalog.resolve("EUR") == "EURUSDm"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["Other-MT5.json", "Simulator-MT5.json"]
+
+
+def test_expired_or_unreadable_catalogs_are_rebuilt(terminal, simulator, tmp_path):
+    catalog = SymbolCatalog(api=terminal, directory=str(tmp_path), max_age=3600)
+    catalog.ensure()
+    path = tmp_path / "Simulator-MT5.json"
+    state = json.loads(path.read_text())
+    state['built_at'] -= 7200
+    path.write_text(json.dumps(state))
+
+    assert SymbolCatalog(api=terminal, directory=str(tmp_path), max_age=3600).ensure()
+    assert simulator.calls['symbols_get'] == 2
+
+    path.write_text("{not json")
+    rebuilt = SymbolCatalog(api=terminal, directory=str(tmp_path))
+    assert rebuilt.ensure()
+    assert simulator.calls['symbols_get'] == 3
+    assert rebuilt.resolve_gold() == "XAUUSDm"
+    assert json.loads(path.read_text())['server'] == "Simulator-MT5"
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.synthetic_data import GoldSeriesGenerator, load_series, trading_mask
+
+
+def generate(directory, **kwargs):
+    settings = dict(seed=3, start="2024-01-01", timeframe="M5")
+    settings.update(kwargs)
+    return GoldSeriesGenerator(**settings).write(directory, end="2024-03-01", chunk_days=10)
+
+
+def test_the_same_seed_gives_the_same_series(tmp_path):
+    generate(tmp_path / "a")
+    generate(tmp_path / "b")
+    generate(tmp_path / "c", seed=4)
+    a, b, c = (load_series(tmp_path / name) for name in "abc")
+    for column in a:
+        np.testing.assert_array_equal(a[column], b[column])
+    assert not np.array_equal(a['close'], c['close'])
+
+
+def test_bars_are_consistent_and_inside_the_trading_week(tmp_path):
+    meta = generate(tmp_path / "store")
+    bars = load_series(tmp_path / "store")
+    assert meta['rows'] == len(bars['time']) == sum(p['rows'] for p in meta['parts'])
+    assert np.all(np.diff(bars['time']) > 0) and np.all(bars['time'] % 300 == 0)
+    assert trading_mask(bars['time']).all()
+    assert np.all(bars['high'] >= np.maximum(bars['open'], bars['close']))
+    assert np.all(bars['low'] <= np.minimum(bars['open'], bars['close']))
+    assert np.all(bars['volume'] >= 1)
+
+
+def test_sweep_rate_controls_the_share_of_sweep_hours(tmp_path):
+    none = generate(tmp_path / "none", sweep_rate=0.0)['sweep_share']
+    every = generate(tmp_path / "all", sweep_rate=1.0)['sweep_share']
+    assert 0 < none < every <= 1
+
+
+def test_load_series_bounds_and_csv_round_trip(tmp_path):
+    csv_path = tmp_path / "bars.csv"
+    GoldSeriesGenerator(seed=3, start="2024-01-01", timeframe="M5").write(
+        tmp_path / "store", end="2024-03-01", chunk_days=10, csv_path=csv_path)
+    frame = load_series(tmp_path / "store", start="2024-02-01", end="2024-02-08", as_frame=True)
+    assert frame.index.min() >= pd.Timestamp("2024-02-01") and frame.index.max() < pd.Timestamp("2024-02-08")
+    csv = pd.read_csv(csv_path, index_col="timestamp", parse_dates=True).loc["2024-02-01":"2024-02-07"]
+    assert list(csv.index) == list(frame.index)
+    np.testing.assert_allclose(csv['close'].to_numpy(), frame['close'].to_numpy(), atol=0.0005)
+    only_close = load_series(tmp_path / "store", columns=["close"], end="2024-01-01")
+    assert list(only_close) == ["close"] and len(only_close['close']) == 0
+
+
+def test_ticks_stay_inside_their_bars(tmp_path):
+    GoldSeriesGenerator(seed=5, start="2024-01-02", timeframe="TICK", ticks_per_minute=5).write(
+        tmp_path / "ticks", end="2024-01-03")
+    ticks = load_series(tmp_path / "ticks")
+    assert np.all(np.diff(ticks['time_msc']) >= 0)
+    assert np.all(ticks['ask'] > ticks['bid'])
+    assert trading_mask(ticks['time_msc'] // 1000).all()
+    with pytest.raises(ValueError):
+        GoldSeriesGenerator(timeframe="M2")
@@ -0,0 +1,59 @@
+import pytest
+
+from src.trade_journal import JOURNAL_HEADERS, TradeJournal
+
+HEADERS = ["Ticket", "Comment"]
+
+
+def reopen(path):
+    journal = TradeJournal(path, HEADERS, fsync=False)
+    rows = journal.rows()
+    journal.close()
+    return rows
+
+
+def test_rows_survive_reopening_and_the_background_writer(tmp_path):
+    path = tmp_path / "journal.csv"
+    journal = TradeJournal(path, HEADERS, fsync=False)
+    journal.start()
+    for i in range(1000):
+        journal.append([i, f"row, {i}"])
+    journal.close()
+    journal = TradeJournal(path, HEADERS, fsync=False)
+    journal.append([1000, 'quote "x"'])
+    assert journal.rows()[-1] == ["1000", 'quote "x"']
+    assert len(journal.rows()) == 1001
+    journal.close()
+    assert path.read_text().splitlines()[0] == "Ticket,Comment"
+
+
+@pytest.mark.parametrize("torn", [b"12,partial", b"12," + b"x" * 200_000])
+def test_a_torn_last_row_is_cut_off(tmp_path, torn):
+    path = tmp_path / "journal.csv"
+    journal = TradeJournal(path, HEADERS, fsync=False)
+    journal.append([1, "kept"])
+    journal.close()
+    with open(path, "ab") as f:
+        f.write(torn)
+    assert reopen(path) == [["1", "kept"]]
+    assert path.read_bytes().endswith(b"kept\n")
+
+
+def test_a_torn_row_longer_than_the_scan_chunk_keeps_the_header(tmp_path):
+    path = tmp_path / "journal.csv"
+    path.write_bytes(b"Ticket,Comment\n" + b"y" * 1000)
+    journal = TradeJournal(tmp_path / "other.csv", HEADERS, fsync=False)
+    journal.path = str(path)
+    journal._repair_tail(chunk_size=64)
+    journal.close()
+    assert path.read_bytes() == b"Ticket,Comment\n"
+
+
+def test_a_torn_header_is_written_again(tmp_path):
+    path = tmp_path / "journal.csv"
+    path.write_bytes(b"Tick")
+    journal = TradeJournal(path, JOURNAL_HEADERS, fsync=False)
+    journal.append(["7"] + [""] * (len(JOURNAL_HEADERS) - 1))
+    assert journal.rows()[0][0] == "7"
+    journal.close()
+    assert path.read_text().splitlines()[0] == ",".join(JOURNAL_HEADERS)
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from src.trade_store import TradeStore
+
+
+def test_rows_are_written_in_batches_and_queried(tmp_path):
+    store = TradeStore(tmp_path / "trades.db", source="backtest", run_id="run-1", batch_size=10)
+    store.start()
+    for i in range(25):
+        store.add('closes', time=datetime(2025, 1, 2, 10) + timedelta(hours=i), symbol="XAUUSDm",
+                  direction="BUY", profit=10.0 if i % 5 else -20.0)
+    store.close()
+    assert len(store.closes(symbol="XAUUSDm", since="2025-01-02 20:00:00")) == 15
+    performance = store.performance(source="backtest")
+    assert performance['trades'] == 25 and performance['total_pnl'] == 20 * 10 - 5 * 20
+    assert {r['run_id'] for r in store.query("SELECT run_id FROM closes")} == {"run-1"}
+
+
+def test_the_same_close_is_stored_once(tmp_path):
+    store = TradeStore(tmp_path / "trades.db")
+    deal_time = datetime(2025, 3, 4, 12, 30, tzinfo=timezone.utc)
+    for _ in range(2):  # Live trader and journal reconciler both report the exit deal
+        store.add('fills', ticket=501, position_id=42, time=deal_time, profit=5.0)
+        store.add('closes', position_id=42, deal_ticket=501, time=deal_time, profit=5.0)
+    store.add('closes', position_id=42, deal_ticket=502, time=deal_time, profit=1.0)  # A second partial exit
+    store.flush()
+    assert [r['deal_ticket'] for r in store.closes()] == [501, 502]
+    assert len(store.query("SELECT * FROM fills")) == 1
+    store.close()
+
+
+def test_timestamps_are_stored_as_utc(tmp_path):
+    store = TradeStore(tmp_path / "trades.db")
+    plus_two = timezone(timedelta(hours=2))
+    store.add('signals', time=datetime(2025, 6, 1, 14, 0, tzinfo=plus_two), symbol="A")
+    store.add('signals', time=datetime(2025, 6, 1, 12, 30), symbol="B")
+    store.add('signals', time=pd.Timestamp("2025-06-01 13:00", tz="UTC"), symbol="C")
+    store.flush()
+    times = {r['symbol']: r['time'] for r in store.query("SELECT symbol, time FROM signals")}
+    assert times == {'A': "2025-06-01 12:00:00", 'B': "2025-06-01 12:30:00", 'C': "2025-06-01 13:00:00"}
+    since = datetime(2025, 6, 1, 14, 15, tzinfo=plus_two)
+    assert [r['symbol'] for r in store.query("SELECT symbol FROM signals WHERE time >= ? ORDER BY time",
+                                             ("2025-06-01 12:15:00",))] == ["B", "C"]
+    assert store.closes(since=since) == []
+    store.close()
+